@@ -1,202 +1,588 @@
-from fastapi import APIRouter, UploadFile, File, Depends
+import asyncio
+import json
+import shutil
+import tempfile
+from functools import partial
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
-from io import BytesIO
+from typing import Callable, List, Optional
 from app.crud.cargar_archivos import (
-    upsert_regional,
-    upsert_centro_formacion,
+    upsert_regionales_bulk,
+    upsert_centros_formacion_bulk,
     upsert_programas_formacion_bulk,
     upsert_grupos_bulk,
-    upsert_datos_grupo_bulk
+    upsert_datos_grupo_bulk,
+    get_estado_grupos_por_centros,
+    get_claves_existentes,
+    get_programas_por_ficha,
+    upsert_competencia_bulk,
+    upsert_resultado_aprendizaje_bulk,
+    upsert_programa_competencia_bulk,
+    upsert_juicios_evaluacion_bulk
 )
-from app.schemas.grupos import RegionalCreate
-from app.schemas.centro_formacion import CentroFormacionCreate
-from core.database import get_db
+from app.crud import import_run as crud_import_run
+from app.schemas.import_run import ImportRunOut, ImportRunDetalleOut
+from app.schemas.subidas import SubidaCreate, SubidaOut
+from app.utils.archivos import (
+    ArchivoTemporal, ArchivoDemasiadoGrande, guardar_subida_temporal, guardar_lote_temporal, extraer_libros_zip, eliminar_temporal, con_variante
+)
+from app.utils.delta import InstantaneaGrupos, COLUMNAS_DELTA_DATOS_GRUPO
+from app.utils import subidas
+from app.utils.fichas import obtener_resolutor_fichas, invalidar_resolutor_fichas
+from core.cache import marcar_cambio
+from app.utils.excel import FiltroFilas, leer_p04_por_lotes, leer_df14, leer_evaluaciones, leer_evaluaciones_lote
+from app.utils.validacion import VALIDACIONES
+from core.config import settings
+from app.api.dependencies import get_current_user
+from app.schemas.users import UserOut
+from core.database import get_db, SessionLocal
+from core.ejecutores import ejecutor_hilos, ejecutar_en_proceso, mapear_en_procesos, reservar_cupo, liberar_cupo
+from core.jobs import ProgresoIngesta, encolar_trabajo, obtener_trabajo
 import pandas as pd
 import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _reservar_cupo_o_503():
+    """Rechaza la carga con 503 y Retry-After si ya hay INGESTA_MAX_TRABAJOS en curso."""
+    if not reservar_cupo():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hay demasiadas cargas de archivos en proceso. Intente de nuevo en unos segundos.",
+            headers={"Retry-After": str(settings.INGESTA_RETRY_AFTER_SEGUNDOS)}
+        )
+
+def _filtros_p04(current_user: UserOut, cod_centro: Optional[int], cod_regional: Optional[int]) -> Optional[dict]:
+    """
+    Filtro de filas del P04 por código de centro o regional. Por defecto cada usuario
+    importa solo las fichas de su centro; el superadmin (1) importa todo el archivo
+    salvo que pida un centro o una regional.
+    """
+    if current_user.id_rol != 1:
+        if cod_regional is not None or (cod_centro is not None and cod_centro != current_user.cod_centro):
+            raise HTTPException(status_code=403, detail="Solo el superadmin puede importar fichas de otros centros")
+        return {"CODIGO_CENTRO": [current_user.cod_centro]}
+
+    filtros = {}
+    if cod_centro is not None:
+        filtros["CODIGO_CENTRO"] = [cod_centro]
+    if cod_regional is not None:
+        filtros["CODIGO_REGIONAL"] = [cod_regional]
+    return filtros or None
+
+def _procesar_y_registrar(
+    db: Session,
+    archivo: ArchivoTemporal,
+    tipo: str,
+    nombre_archivo: Optional[str],
+    procesar: Callable[[Session, str, ProgresoIngesta], dict],
+    progreso: ProgresoIngesta
+) -> dict:
+    """
+    Ejecuta `procesar` y deja la carga registrada en import_run con su hash, conteos,
+    duración y errores. Si el registro falla (p. ej. la tabla aún no existe) la carga
+    continúa igual: el historial no debe impedir importar.
+    """
+    try:
+        id_import = crud_import_run.create_import_run(db, tipo, archivo.sha256, nombre_archivo, archivo.tamano_bytes)
+    except Exception as e:
+        logger.error(f"No se pudo registrar la carga en import_run: {e}")
+        id_import = None
+
+    def registrar(estado: str, num_errores: int, resultado: Optional[dict]):
+        if id_import is None:
+            return
+        try:
+            crud_import_run.finalizar_import_run(
+                db, id_import, estado, progreso.filas_procesadas, num_errores,
+                progreso.duracion_segundos, resultado
+            )
+        except Exception as e:
+            logger.error(f"No se pudo finalizar el registro de la carga {id_import}: {e}")
+
+    try:
+        resultados = procesar(db, archivo.ruta, progreso)
+    except Exception as e:
+        db.rollback()
+        registrar(crud_import_run.ESTADO_FALLIDO, 1, {"errores": [str(e)]})
+        raise
+
+    errores = resultados.get("errores") or []
+    estado = crud_import_run.ESTADO_COMPLETADO_CON_ERRORES if errores else crud_import_run.ESTADO_COMPLETADO
+    # La última etapa de marcar_etapa() sigue abierta hasta que se cierra aquí
+    progreso.cerrar_etapa()
+    resultados["tiempos_etapas"] = progreso.resumen()["tiempos_etapas"]
+    registrar(estado, len(errores), resultados)
+    resultados["id_import"] = id_import
+    return resultados
+
+def _obtener_o_413(obtener_archivo: Callable[[], ArchivoTemporal]) -> ArchivoTemporal:
+    try:
+        return obtener_archivo()
+    except ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+async def _validar_carga(
+    obtener_archivo: Callable[[], ArchivoTemporal],
+    tipo: str,
+    db: Session,
+    reporte_csv: bool,
+    filtros: Optional[dict] = None
+):
+    """
+    Valida el archivo contra las restricciones de la base de datos (longitudes, NOT NULL,
+    enteros, fechas y llaves foráneas) sin escribir nada. Las llaves existentes se
+    consultan una vez por tabla y las reglas se evalúan por columna en el pool de procesos.
+
+    Retorna el resumen por regla o, con reporte_csv, un CSV con las filas observadas.
+    """
+    validar, conjuntos = VALIDACIONES[tipo]
+    if filtros:
+        validar = partial(validar, filtros=filtros)
+    _reservar_cupo_o_503()
+    loop = asyncio.get_running_loop()
+
+    def ejecutar():
+        try:
+            archivo = obtener_archivo()
+            try:
+                progreso = ProgresoIngesta(tipo, archivo.nombre_archivo)
+                with progreso.etapa("claves"):
+                    claves = get_claves_existentes(db, conjuntos)
+                with progreso.etapa("validacion"):
+                    resumen, observaciones = ejecutar_en_proceso(validar, archivo.ruta, claves)
+                resumen["tiempos_etapas"] = progreso.resumen()["tiempos_etapas"]
+                csv = observaciones.to_csv(index_label="fila_excel") if reporte_csv else None
+                return resumen, csv
+            finally:
+                eliminar_temporal(archivo.ruta)
+        finally:
+            liberar_cupo()
+
+    resumen, csv = await loop.run_in_executor(ejecutor_hilos, ejecutar)
+    if reporte_csv:
+        return Response(
+            content=csv,
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="validacion_{tipo}.csv"'}
+        )
+    return resumen
+
+async def _ejecutar_carga(
+    obtener_archivo: Callable[[], ArchivoTemporal],
+    tipo: str,
+    procesar: Callable[[Session, str, ProgresoIngesta], dict],
+    db: Session,
+    asincrono: bool,
+    force: bool = False,
+    dry_run: bool = False,
+    reporte_csv: bool = False,
+    filtros: Optional[dict] = None,
+    id_usuario: Optional[int] = None
+):
+    """
+    Ejecuta la importación con la función `procesar` sin bloquear el event loop:
+    `obtener_archivo` deja el archivo en un temporal con su SHA-256 (copiando el
+    UploadFile o ensamblando una subida por partes) y la importación corre en el pool
+    de hilos de ingesta (la lectura de los Excel va además al pool de procesos).
+    `obtener_archivo` se llama después de reservar el cupo, en el pool de hilos.
+
+    - Si ya se importó sin errores un archivo idéntico del mismo tipo y no se pasa
+      force=true, se retorna el resultado de esa carga sin volver a procesar.
+    - Síncrono: espera el resultado y lo retorna junto con los tiempos por etapa.
+    - Asíncrono: encola el trabajo con su propia sesión de base de datos y retorna
+      202 con el id para consultar /files/jobs/{id}. El estado vive en memoria del
+      proceso (core/jobs.py): la consulta solo funciona con un único worker.
+    - dry_run: solo valida el archivo (ver _validar_carga); no consulta ni registra el
+      historial y se ignora asincrono.
+    - filtros: filtro de filas que ya viene aplicado en `procesar`; se usa para que el
+      mismo archivo con otro filtro no cuente como duplicado y para la validación.
+    - Un archivo que supera INGESTA_MAX_TAMANO_BYTES al copiarlo al temporal se rechaza con 413.
+    """
+    obtener_archivo = partial(_obtener_o_413, obtener_archivo)
+    if dry_run:
+        return await _validar_carga(obtener_archivo, tipo, db, reporte_csv, filtros)
+
+    _reservar_cupo_o_503()
+    loop = asyncio.get_running_loop()
+
+    def preparar():
+        variante = json.dumps(filtros, sort_keys=True) if filtros else None
+        archivo = con_variante(obtener_archivo(), variante)
+        previa = None
+        if not force:
+            try:
+                previa = crud_import_run.get_importacion_previa(db, tipo, archivo.sha256)
+            except Exception as e:
+                logger.error(f"No se pudo consultar el historial de cargas: {e}")
+        if previa:
+            eliminar_temporal(archivo.ruta)
+        return archivo, previa
+
+    try:
+        archivo, previa = await loop.run_in_executor(ejecutor_hilos, preparar)
+    except Exception:
+        liberar_cupo()
+        raise
+
+    if previa:
+        liberar_cupo()
+        resultados = dict(previa.get("resultado") or {})
+        resultados.update({
+            "archivo_duplicado": True,
+            "id_import": previa["id_import"],
+            "fecha_importacion_original": previa["fecha_fin"],
+            "mensaje": "El archivo ya fue importado sin errores; no se volvió a procesar (use force=true para forzarlo)"
+        })
+        return resultados
+
+    if asincrono:
+        def trabajo(progreso: ProgresoIngesta) -> dict:
+            db_trabajo = SessionLocal()
+            try:
+                return _procesar_y_registrar(db_trabajo, archivo, tipo, archivo.nombre_archivo, procesar, progreso)
+            finally:
+                db_trabajo.close()
+
+        def al_terminar():
+            eliminar_temporal(archivo.ruta)
+            liberar_cupo()
+
+        progreso = encolar_trabajo(tipo, archivo.nombre_archivo, trabajo, al_terminar=al_terminar, id_usuario=id_usuario)
+        contenido = progreso.resumen()
+        contenido["url_estado"] = f"/files/jobs/{progreso.id}"
+        contenido["aviso"] = (
+            "El estado del trabajo se guarda en memoria del proceso que lo recibió: "
+            "consultarlo solo funciona si el servidor corre con un único worker"
+        )
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=jsonable_encoder(contenido))
+
+    def ejecutar() -> dict:
+        # El cupo se libera aquí y no en la corrutina: si el cliente se desconecta,
+        # el hilo sigue trabajando y el cupo debe seguir ocupado hasta que termine.
+        # Por lo mismo usa su propia sesión: get_db cierra la de la petición al desconectarse.
+        db_carga = SessionLocal()
+        try:
+            progreso = ProgresoIngesta(tipo, archivo.nombre_archivo)
+            progreso.iniciar()
+            resultados = _procesar_y_registrar(db_carga, archivo, tipo, archivo.nombre_archivo, procesar, progreso)
+            progreso.finalizar(resultados)
+            return resultados
+        finally:
+            db_carga.close()
+            eliminar_temporal(archivo.ruta)
+            liberar_cupo()
+
+    return await loop.run_in_executor(ejecutor_hilos, ejecutar)
+
+@router.get("/historial", response_model=List[ImportRunOut])
+def get_historial_cargas(
+    tipo_reporte: Optional[str] = Query(None, description="p04, df14 o evaluaciones (Opcional)"),
+    skip: int = Query(0, ge=0, description="Número de registros a omitir"),
+    limit: int = Query(50, ge=1, le=500, description="Número máximo de registros a devolver"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Historial de cargas de archivos, de la más reciente a la más antigua.
+    Solo para superadmin y admin.
+    """
+    if current_user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado para ver el historial de cargas")
+    try:
+        return crud_import_run.get_import_runs(db, tipo_reporte=tipo_reporte, skip=skip, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/historial/{id_import}", response_model=ImportRunDetalleOut)
+def get_detalle_carga(
+    id_import: int,
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Detalle de una carga, incluido el resultado completo que retornó la importación.
+    Solo para superadmin y admin.
+    """
+    if current_user.id_rol not in [1, 2]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado para ver el historial de cargas")
+    try:
+        carga = crud_import_run.get_import_run_by_id(db, id_import)
+        if carga is None:
+            raise HTTPException(status_code=404, detail="Carga no encontrada")
+        return carga
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{id_trabajo}")
+def get_estado_trabajo(
+    id_trabajo: str,
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Consulta el estado de una carga enviada con asincrono=true: etapa actual, filas
+    procesadas, filas por segundo, tiempo por etapa y, al terminar, los resultados.
+    Solo el usuario que envió la carga (o el superadmin) puede consultarla.
+
+    Los trabajos viven en memoria del proceso que los recibió y se descartan
+    INGESTA_TRABAJOS_TTL_MINUTOS después de terminar. Con varios workers de uvicorn
+    la consulta puede llegar a otro proceso y responder 404: este seguimiento solo
+    funciona con un único worker.
+    """
+    progreso = obtener_trabajo(id_trabajo)
+    if progreso is None or (progreso.id_usuario != current_user.id_usuario and current_user.id_rol != 1):
+        raise HTTPException(status_code=404, detail="Trabajo de carga no encontrado")
+    return progreso.resumen()
+
+def _subida_del_usuario(id_subida: str, current_user: UserOut) -> dict:
+    """Metadatos de la subida; 404 si no existe o es de otro usuario (salvo superadmin)."""
+    meta = subidas.obtener_subida(id_subida)
+    if meta is None or (meta["id_usuario"] != current_user.id_usuario and current_user.id_rol != 1):
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    return meta
+
+@router.post("/subidas", response_model=SubidaOut, status_code=status.HTTP_201_CREATED)
+def iniciar_subida(
+    subida: SubidaCreate,
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Inicia una subida por partes para archivos grandes. El cliente envía luego cada
+    parte con PUT /files/subidas/{id}/partes/{numero} (numeradas desde 0, todas de
+    tamano_parte bytes salvo la última), puede consultar en cualquier momento qué
+    partes y rangos de bytes ya tiene el servidor y termina con POST .../completar.
+    """
+    try:
+        return subidas.crear_subida(
+            subida.tipo_reporte, subida.nombre_archivo, subida.tamano_bytes,
+            current_user.id_usuario, subida.tamano_parte, subida.sha256
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/subidas/{id_subida}", response_model=SubidaOut)
+def get_estado_subida(
+    id_subida: str,
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Estado de una subida por partes: partes recibidas y faltantes y rangos de bytes
+    ya guardados, para reanudarla después de una desconexión.
+    """
+    _subida_del_usuario(id_subida, current_user)
+    return subidas.estado_subida(id_subida)
+
+@router.put("/subidas/{id_subida}/partes/{numero}", response_model=SubidaOut)
+async def subir_parte(
+    id_subida: str,
+    numero: int,
+    request: Request,
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Recibe la parte `numero` en el cuerpo de la petición (application/octet-stream) y
+    la escribe directamente en su desplazamiento del archivo en disco, sin cargarla
+    completa en memoria. Reenviar una parte la reemplaza.
+    """
+    meta = _subida_del_usuario(id_subida, current_user)
+    try:
+        inicio, largo = subidas.rango_parte(meta, numero)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # La escritura va al pool por defecto y no al de ingesta: las partes no deben
+    # esperar a que terminen las importaciones en curso
+    loop = asyncio.get_running_loop()
+    subidas.marcar_parte_recibida(id_subida, numero, recibida=False)
+    datos = await loop.run_in_executor(None, subidas.abrir_datos, id_subida)
+    escritos = 0
+    try:
+        datos.seek(inicio)
+        async for bloque in request.stream():
+            if not bloque:
+                continue
+            if escritos + len(bloque) > largo:
+                raise HTTPException(status_code=400, detail=f"La parte {numero} debe tener {largo} bytes")
+            await loop.run_in_executor(None, datos.write, bloque)
+            escritos += len(bloque)
+    finally:
+        await loop.run_in_executor(None, datos.close)
+
+    if escritos != largo:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La parte {numero} llegó incompleta ({escritos} de {largo} bytes); vuelva a enviarla"
+        )
+    subidas.marcar_parte_recibida(id_subida, numero)
+    return subidas.estado_subida(id_subida)
+
+@router.post("/subidas/{id_subida}/completar")
+async def completar_subida(
+    id_subida: str,
+    asincrono: bool = Query(False, description="Procesar en segundo plano y retornar el id del trabajo"),
+    force: bool = Query(False, description="Procesar aunque el mismo archivo ya se haya importado"),
+    dry_run: bool = Query(False, description="Solo validar el archivo (la subida se conserva para importarla después)"),
+    reporte_csv: bool = Query(False, description="Con dry_run=true, descargar en CSV las filas con observaciones"),
+    cod_centro: Optional[int] = Query(None, description="P04: importar solo las fichas de este centro"),
+    cod_regional: Optional[int] = Query(None, description="P04: importar solo las fichas de esta regional (solo superadmin)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Termina una subida por partes e importa el archivo ensamblado con el mismo proceso
+    de los endpoints de carga de un solo paso (P04, DF-14 o evaluaciones, según el
+    tipo_reporte indicado al iniciarla). El archivo no se copia: se verifica su SHA-256
+    sobre un mapeo en memoria y se entrega por ruta a los lectores de Excel.
+
+    La subida se borra cuando la importación termina (o queda encolada, con
+    asincrono=true). Si falla, o el archivo ya se había importado, se conserva para
+    reintentar (p. ej. con force=true) sin volver a enviar las partes.
+    """
+    meta = _subida_del_usuario(id_subida, current_user)
+    estado = subidas.estado_subida(id_subida)
+    if not estado["completa"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Faltan {len(estado['partes_faltantes'])} partes por subir: {estado['partes_faltantes'][:20]}"
+        )
+
+    tipo = meta["tipo_reporte"]
+    filtros = _filtros_p04(current_user, cod_centro, cod_regional) if tipo == "p04" else None
+    procesar = {
+        "p04": partial(procesar_archivo_p04, filtros=filtros),
+        "df14": procesar_archivo_df14,
+        "evaluaciones": procesar_archivo_evaluaciones
+    }[tipo]
+
+    try:
+        obtener_archivo = partial(subidas.ensamblar_subida, id_subida, conservar=True)
+        resultado = await _ejecutar_carga(
+            obtener_archivo, tipo, procesar, db, asincrono, force, dry_run, reporte_csv, filtros,
+            id_usuario=current_user.id_usuario
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not dry_run and not (isinstance(resultado, dict) and resultado.get("archivo_duplicado")):
+        subidas.eliminar_subida(id_subida)
+    return resultado
+
+@router.delete("/subidas/{id_subida}", status_code=status.HTTP_204_NO_CONTENT)
+def cancelar_subida(
+    id_subida: str,
+    current_user: UserOut = Depends(get_current_user)
+):
+    """Cancela una subida por partes y borra lo recibido."""
+    _subida_del_usuario(id_subida, current_user)
+    subidas.eliminar_subida(id_subida)
+
 @router.post("/upload-excel/")
 async def upload_excel(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    asincrono: bool = Query(False, description="Procesar en segundo plano y retornar el id del trabajo"),
+    force: bool = Query(False, description="Procesar aunque el mismo archivo ya se haya importado"),
+    dry_run: bool = Query(False, description="Solo validar el archivo contra la base de datos, sin escribir"),
+    reporte_csv: bool = Query(False, description="Con dry_run=true, descargar en CSV las filas con observaciones"),
+    cod_centro: Optional[int] = Query(None, description="Importar solo las fichas de este centro (por defecto el del usuario)"),
+    cod_regional: Optional[int] = Query(None, description="Importar solo las fichas de esta regional (solo superadmin)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
 ):
-    contents = await file.read()
-    
-    # Leer el archivo Excel con las nuevas columnas
-    df = pd.read_excel(
-        BytesIO(contents),
-        engine="openpyxl",
-        skiprows=4,
-        usecols=[
-            # Columnas existentes
-            "IDENTIFICADOR_FICHA", "CODIGO_CENTRO", "CODIGO_PROGRAMA", "VERSION_PROGRAMA", 
-            "NOMBRE_PROGRAMA_FORMACION", "ESTADO_CURSO", "NIVEL_FORMACION", "NOMBRE_JORNADA", 
-            "FECHA_INICIO_FICHA", "FECHA_TERMINACION_FICHA", "ETAPA_FICHA", "MODALIDAD_FORMACION",
-            "NOMBRE_RESPONSABLE", "NOMBRE_EMPRESA", "NOMBRE_MUNICIPIO_CURSO", "NOMBRE_PROGRAMA_ESPECIAL",
-            # Nuevas columnas
-            "CODIGO_REGIONAL", "NOMBRE_REGIONAL", "NOMBRE_CENTRO",
-            "TOTAL_APRENDICES_MASCULINOS", "TOTAL_APRENDICES_FEMENINOS", "TOTAL_APRENDICES_NOBINARIO",
-            "TOTAL_APRENDICES", "TOTAL_APRENDICES_ACTIVOS"
-        ],
-        dtype=str
-    )
-    
-    print(f"Columnas cargadas: {df.columns.tolist()}")
-    print(f"Filas cargadas: {len(df)}")
-
-    # Renombrar columnas
-    df = df.rename(columns={
-        # Columnas existentes
-        "IDENTIFICADOR_FICHA": "cod_ficha",
-        "CODIGO_CENTRO": "cod_centro",
-        "CODIGO_PROGRAMA": "cod_programa",
-        "VERSION_PROGRAMA": "la_version",
-        "ESTADO_CURSO": "estado_grupo",
-        "NIVEL_FORMACION": "nombre_nivel",
-        "NOMBRE_JORNADA": "jornada",
-        "FECHA_INICIO_FICHA": "fecha_inicio",
-        "FECHA_TERMINACION_FICHA": "fecha_fin",
-        "ETAPA_FICHA": "etapa",
-        "MODALIDAD_FORMACION": "modalidad",
-        "NOMBRE_RESPONSABLE": "responsable",
-        "NOMBRE_EMPRESA": "nombre_empresa",
-        "NOMBRE_MUNICIPIO_CURSO": "nombre_municipio",
-        "NOMBRE_PROGRAMA_ESPECIAL": "nombre_programa_especial",
-        "NOMBRE_PROGRAMA_FORMACION": "nombre",
-        # Nuevas columnas
-        "CODIGO_REGIONAL": "cod_regional",
-        "NOMBRE_REGIONAL": "nombre_regional",
-        "NOMBRE_CENTRO": "nombre_centro",
-        "TOTAL_APRENDICES_MASCULINOS": "num_aprendices_masculinos",
-        "TOTAL_APRENDICES_FEMENINOS": "num_aprendices_femenino",
-        "TOTAL_APRENDICES_NOBINARIO": "num_aprendices_no_binario",
-        "TOTAL_APRENDICES": "num_total_aprendices",
-        "TOTAL_APRENDICES_ACTIVOS": "num_total_aprendices_activos"
-    })
-
-    # Reemplazar valores NaN por None para compatibilidad con MySQL
-    df = df.where(pd.notnull(df), None)
-
-    # Convertir columnas numéricas
-    numeric_columns = [
-        "cod_ficha", "cod_centro", "cod_programa", "la_version", "cod_regional",
-        "num_aprendices_masculinos", "num_aprendices_femenino", "num_aprendices_no_binario",
-        "num_total_aprendices", "num_total_aprendices_activos"
-    ]
-    
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    """
+    Endpoint para procesar el archivo P04 (fichas, programas, centros y regionales).
 
-    # Filtrar por cod_centro específico (opcional - comentar si se quiere cargar todos)
-    # df = df[df["cod_centro"] == 9121]
+    Solo se importan las filas del centro del usuario (o del centro o regional pedidos,
+    si es superadmin); las demás se descartan al leer el archivo.
+    """
+    filtros = _filtros_p04(current_user, cod_centro, cod_regional)
+    procesar = partial(procesar_archivo_p04, filtros=filtros)
+    return await _ejecutar_carga(
+        partial(guardar_subida_temporal, file), "p04", procesar, db, asincrono, force, dry_run, reporte_csv, filtros,
+        id_usuario=current_user.id_usuario
+    )
 
-    # Eliminar filas con valores faltantes en campos obligatorios
-    required_fields = [
-        "cod_ficha", "cod_centro", "cod_programa", "la_version", "nombre", 
-        "fecha_inicio", "fecha_fin", "etapa", "responsable", "nombre_municipio"
-    ]
-    df = df.dropna(subset=required_fields)
+def procesar_archivo_p04(db: Session, ruta: str, progreso: ProgresoIngesta, filtros: Optional[dict] = None) -> dict:
+    """
+    Importa el archivo P04 guardado en `ruta`.
 
-    # Convertir fechas
-    df["fecha_inicio"] = pd.to_datetime(df["fecha_inicio"], format='%d/%m/%Y', errors="coerce").dt.date
-    df["fecha_fin"] = pd.to_datetime(df["fecha_fin"], format='%d/%m/%Y', errors="coerce").dt.date
-    
-    # Reemplazar valores NaT con None para compatibilidad con la base de datos
-    df["fecha_inicio"] = df["fecha_inicio"].where(pd.notnull(df["fecha_inicio"]), None)
-    df["fecha_fin"] = df["fecha_fin"].where(pd.notnull(df["fecha_fin"]), None)
+    El libro se lee por lotes en modo read_only y cada lote se limpia y se escribe
+    en la base de datos antes de leer el siguiente, de modo que la memoria usada no
+    depende del número de fichas del reporte. Por eso la lectura se queda en el hilo de
+    ingesta en lugar de ir al pool de procesos: los lotes se consumen a medida que se leen.
 
-    # Asegurar columnas de hora
-    df["hora_inicio"] = "00:00:00"
-    df["hora_fin"] = "00:00:00"
+    Antes de escribir, cada lote se compara contra el estado actual de las fichas de sus
+    centros y solo se envían a la base de datos los grupos nuevos o con cambios.
 
-    print(f"Filas después de limpieza: {len(df)}")
+    Regionales, centros, programas, grupos y datos de grupo se escriben con INSERT
+    multi-fila en una sola transacción que se confirma al final del archivo.
 
+    Con `filtros` (columna del Excel -> códigos permitidos, ver _filtros_p04) las filas
+    de otros centros se descartan mientras se lee el libro.
+    """
     # Resultados de procesamiento
     resultados = {
+        "filas_leidas": 0,
         "regionales_procesadas": 0,
         "centros_procesados": 0,
         "programas_procesados": 0,
         "grupos_procesados": 0,
         "datos_grupo_procesados": 0,
+        "delta": {
+            "fichas_nuevas": 0,
+            "fichas_cambiadas": 0,
+            "fichas_sin_cambios": 0,
+            "fichas_desaparecidas": 0
+        },
         "errores": []
     }
+    filtro = FiltroFilas(filtros) if filtros else None
+    if filtro:
+        resultados["filtro"] = filtros
+        resultados["filas_omitidas_por_filtro"] = 0
+
+    # Claves ya enviadas a la base de datos en lotes anteriores
+    regionales_vistas = set()
+    centros_vistos = set()
+    programas_vistos = set()
+
+    # Estado actual de las fichas de los centros presentes en el archivo
+    instantanea = InstantaneaGrupos(lambda centros: get_estado_grupos_por_centros(db, centros))
 
     try:
-        # 1. Procesar regionales (si existen datos)
-        if "cod_regional" in df.columns and "nombre_regional" in df.columns:
-            df_regionales = df[["cod_regional", "nombre_regional"]].dropna(subset=["cod_regional", "nombre_regional"]).drop_duplicates()
-            df_regionales = df_regionales.rename({"nombre_regional": "nombre"}, axis=1)
-            
-            for _, row in df_regionales.iterrows():
-                try:
-                    regional = RegionalCreate(
-                        cod_regional=int(row["cod_regional"]),
-                        nombre=str(row["nombre"])
-                    )
-                    upsert_regional(db, regional)
-                    resultados["regionales_procesadas"] += 1
-                except Exception as e:
-                    resultados["errores"].append(f"Error procesando regional {row['cod_regional']}: {e}")
-
-        # 2. Procesar centros de formación (si existen datos)
-        if all(col in df.columns for col in ["cod_centro", "nombre_centro", "cod_regional"]):
-            df_centros = df[["cod_centro", "nombre_centro", "cod_regional"]].dropna(subset=["cod_centro", "nombre_centro", "cod_regional"]).drop_duplicates()
-            
-            for _, row in df_centros.iterrows():
-                try:
-                    centro = CentroFormacionCreate(
-                        cod_centro=int(row["cod_centro"]),
-                        nombre_centro=str(row["nombre_centro"]),
-                        cod_regional=int(row["cod_regional"])
-                    )
-                    upsert_centro_formacion(db, centro)
-                    resultados["centros_procesados"] += 1
-                except Exception as e:
-                    resultados["errores"].append(f"Error procesando centro {row['cod_centro']}: {e}")
-
-        # 3. Procesar programas de formación
-        df_programas = df[["cod_programa", "la_version", "nombre"]].dropna(subset=["cod_programa", "la_version", "nombre"]).drop_duplicates()
-        df_programas["horas_lectivas"] = 0
-        df_programas["horas_productivas"] = 0
-        
-        programas_result = upsert_programas_formacion_bulk(db, df_programas)
-        resultados["programas_procesados"] = programas_result["programas_insertados"]
-        resultados["errores"].extend(programas_result["errores"])
+        lotes = leer_p04_por_lotes(ruta, filtro=filtro)
+        while True:
+            with progreso.etapa("lectura"):
+                df = next(lotes, None)
+            if df is None:
+                break
+            resultados["filas_leidas"] += len(df)
+            _procesar_lote_p04(db, df, resultados, regionales_vistas, centros_vistos, programas_vistos, instantanea, progreso)
+            progreso.sumar_filas(len(df))
 
-        # 4. Procesar grupos
-        df_grupos = df[[
-            "cod_ficha", "cod_centro", "cod_programa", "la_version", "estado_grupo",
-            "nombre_nivel", "jornada", "fecha_inicio", "fecha_fin", "etapa",
-            "modalidad", "responsable", "nombre_empresa", "nombre_municipio",
-            "nombre_programa_especial", "hora_inicio", "hora_fin"
-        ]].dropna(subset=["cod_ficha"])
-        
-        grupos_result = upsert_grupos_bulk(db, df_grupos)
-        resultados["grupos_procesados"] = grupos_result["grupos_insertados"]
-        resultados["errores"].extend(grupos_result["errores"])
-
-        # 5. Procesar datos de grupo (si existen datos)
-        datos_grupo_columns = [
-            "cod_ficha", "num_aprendices_masculinos", "num_aprendices_femenino",
-            "num_aprendices_no_binario", "num_total_aprendices", "num_total_aprendices_activos"
-        ]
-        
-        # Filtrar solo las columnas que existen en el DataFrame
-        existing_columns = [col for col in datos_grupo_columns if col in df.columns]
-        
-        if "cod_ficha" in existing_columns and len(existing_columns) > 1:
-            df_datos_grupo = df[existing_columns].dropna(subset=["cod_ficha"])
-            
-            # Filtrar filas que tienen al menos un dato de aprendices
-            numeric_cols = [col for col in existing_columns if col != "cod_ficha"]
-            df_datos_grupo = df_datos_grupo.dropna(subset=numeric_cols, how="all")
-            
-            if len(df_datos_grupo) > 0:
-                datos_result = upsert_datos_grupo_bulk(db, df_datos_grupo)
-                resultados["datos_grupo_procesados"] = datos_result["datos_insertados"]
-                resultados["errores"].extend(datos_result["errores"])
+        resultados["delta"]["fichas_desaparecidas"] = instantanea.fichas_desaparecidas()
+        if filtro:
+            resultados["filas_omitidas_por_filtro"] = filtro.filas_omitidas
+
+        # Toda la importación es una sola transacción; los lotes que fallaron ya se
+        # descartaron con su SAVEPOINT y quedan reportados en errores
+        with progreso.etapa("commit"):
+            db.commit()
+        # Las fichas pudieron cambiar de programa o versión
+        invalidar_resolutor_fichas()
+        marcar_cambio("regional", "centro_formacion", "programa_formacion", "grupo", "datos_grupo")
+
+        logger.info("P04 - filas después de limpieza: %s", resultados["filas_leidas"])
 
         # Mensaje final
         resultados["mensaje"] = "Carga completada con errores" if resultados["errores"] else "Carga completada exitosamente"
@@ -204,467 +590,328 @@ async def upload_excel(
         return resultados
 
     except Exception as e:
+        db.rollback()
         resultados["errores"].append(f"Error general en el procesamiento: {str(e)}")
-        resultados["mensaje"] = "Error crítico en el procesamiento"
+        resultados["mensaje"] = "Error crítico en el procesamiento; no se aplicaron cambios"
         return resultados
 
+def _procesar_lote_p04(
+    db: Session,
+    df: pd.DataFrame,
+    resultados: dict,
+    regionales_vistas: set,
+    centros_vistos: set,
+    programas_vistos: set,
+    instantanea: InstantaneaGrupos,
+    progreso: ProgresoIngesta
+):
+    """
+    Escribe un lote ya normalizado del P04: regionales y centros nuevos, programas,
+    y los grupos y datos de grupo que cambiaron, acumulando los conteos en `resultados`.
+    """
+    # 1. Procesar regionales (si existen datos)
+    with progreso.etapa("regionales"):
+        _procesar_regionales_lote(db, df, resultados, regionales_vistas)
+
+    # 2. Procesar centros de formación (si existen datos)
+    with progreso.etapa("centros"):
+        _procesar_centros_lote(db, df, resultados, centros_vistos)
+
+    # 3. Procesar programas de formación
+    with progreso.etapa("programas"):
+        _procesar_programas_lote(db, df, resultados, programas_vistos)
+
+    # 4. Comparar el lote contra el estado actual de sus centros
+    with progreso.etapa("delta"):
+        df = df.dropna(subset=["cod_ficha"]).astype({"cod_ficha": "int64"})
+        instantanea.asegurar_centros(df["cod_centro"].unique())
+        cambios = _calcular_delta_lote(df, instantanea, resultados)
+
+    # 5. Procesar grupos nuevos o con cambios
+    with progreso.etapa("grupos"):
+        _procesar_grupos_lote(db, df[cambios["grupo"].to_numpy()], resultados)
+
+    # 6. Procesar datos de grupo nuevos o con cambios (si existen datos)
+    with progreso.etapa("datos_grupo"):
+        _procesar_datos_grupo_lote(db, df[cambios["datos_grupo"].to_numpy()], resultados)
+
+def _calcular_delta_lote(df: pd.DataFrame, instantanea: InstantaneaGrupos, resultados: dict) -> pd.DataFrame:
+    """
+    Marca por fila si el grupo y los datos de grupo son nuevos o cambiaron, y suma al
+    resumen `delta` las fichas nuevas, cambiadas y sin cambios del lote. Una ficha que
+    se repite en el archivo se cuenta solo en su primera aparición.
+    """
+    por_ficha = df.set_index("cod_ficha")
+    grupo_distinto = instantanea.grupos_distintos(por_ficha)
+    # Las filas sin ningún dato de aprendices no se escriben en datos_grupo
+    tiene_datos = por_ficha[COLUMNAS_DELTA_DATOS_GRUPO].notna().any(axis=1)
+    datos_distintos = instantanea.datos_grupo_distintos(por_ficha) & tiene_datos
+    nuevas = instantanea.es_nueva(por_ficha.index)
+    primera = instantanea.primera_aparicion(por_ficha.index)
+    instantanea.marcar_vistas(por_ficha.index)
+
+    cambiadas = (grupo_distinto | datos_distintos) & ~nuevas
+    resultados["delta"]["fichas_nuevas"] += int((nuevas & primera).sum())
+    resultados["delta"]["fichas_cambiadas"] += int((cambiadas & primera).sum())
+    resultados["delta"]["fichas_sin_cambios"] += int((~(nuevas | cambiadas) & primera).sum())
+
+    return pd.DataFrame({
+        "grupo": grupo_distinto.to_numpy(),
+        "datos_grupo": datos_distintos.to_numpy()
+    }, index=df.index)
+
+def _procesar_regionales_lote(db: Session, df: pd.DataFrame, resultados: dict, regionales_vistas: set):
+    if "cod_regional" in df.columns and "nombre_regional" in df.columns:
+        df_regionales = df[["cod_regional", "nombre_regional"]].dropna(subset=["cod_regional", "nombre_regional"]).drop_duplicates()
+        df_regionales = df_regionales.rename({"nombre_regional": "nombre"}, axis=1)
+        df_regionales = df_regionales.astype({"cod_regional": "int64", "nombre": str})
+        claves = list(df_regionales.itertuples(index=False, name=None))
+        df_regionales = df_regionales[[clave not in regionales_vistas for clave in claves]]
+
+        if len(df_regionales) > 0:
+            regionales_result = upsert_regionales_bulk(db, df_regionales, confirmar=False)
+            resultados["regionales_procesadas"] += regionales_result["regionales_insertadas"] + regionales_result["regionales_actualizadas"]
+            resultados["errores"].extend(regionales_result["errores"])
+            regionales_vistas.update(claves)
+
+def _procesar_centros_lote(db: Session, df: pd.DataFrame, resultados: dict, centros_vistos: set):
+    if all(col in df.columns for col in ["cod_centro", "nombre_centro", "cod_regional"]):
+        df_centros = df[["cod_centro", "nombre_centro", "cod_regional"]].dropna(subset=["cod_centro", "nombre_centro", "cod_regional"]).drop_duplicates()
+        df_centros = df_centros.astype({"cod_centro": "int64", "nombre_centro": str, "cod_regional": "int64"})
+        claves = list(df_centros.itertuples(index=False, name=None))
+        df_centros = df_centros[[clave not in centros_vistos for clave in claves]]
+
+        if len(df_centros) > 0:
+            centros_result = upsert_centros_formacion_bulk(db, df_centros, confirmar=False)
+            resultados["centros_procesados"] += centros_result["centros_insertados"] + centros_result["centros_actualizados"]
+            resultados["errores"].extend(centros_result["errores"])
+            centros_vistos.update(claves)
+
+def _procesar_programas_lote(db: Session, df: pd.DataFrame, resultados: dict, programas_vistos: set):
+    df_programas = df[["cod_programa", "la_version", "nombre"]].dropna(subset=["cod_programa", "la_version", "nombre"]).drop_duplicates()
+    claves_programas = list(df_programas.itertuples(index=False, name=None))
+    df_programas = df_programas[[clave not in programas_vistos for clave in claves_programas]]
+    df_programas = df_programas.assign(horas_lectivas=0, horas_productivas=0)
+    
+    if len(df_programas) > 0:
+        programas_result = upsert_programas_formacion_bulk(db, df_programas, confirmar=False)
+        resultados["programas_procesados"] += programas_result["programas_insertados"] + programas_result["programas_actualizados"]
+        resultados["errores"].extend(programas_result["errores"])
+        programas_vistos.update(claves_programas)
+
+def _procesar_grupos_lote(db: Session, df: pd.DataFrame, resultados: dict):
+    if len(df) == 0:
+        return
+    df_grupos = df[[
+        "cod_ficha", "cod_centro", "cod_programa", "la_version", "estado_grupo",
+        "nombre_nivel", "jornada", "fecha_inicio", "fecha_fin", "etapa",
+        "modalidad", "responsable", "nombre_empresa", "nombre_municipio",
+        "nombre_programa_especial", "hora_inicio", "hora_fin"
+    ]].dropna(subset=["cod_ficha"])
+    
+    grupos_result = upsert_grupos_bulk(db, df_grupos, confirmar=False)
+    resultados["grupos_procesados"] += grupos_result["grupos_insertados"] + grupos_result["grupos_actualizados"]
+    resultados["errores"].extend(grupos_result["errores"])
+
+def _procesar_datos_grupo_lote(db: Session, df: pd.DataFrame, resultados: dict):
+    datos_grupo_columns = [
+        "cod_ficha", "num_aprendices_masculinos", "num_aprendices_femenino",
+        "num_aprendices_no_binario", "num_total_aprendices", "num_total_aprendices_activos"
+    ]
+    
+    # Filtrar solo las columnas que existen en el DataFrame
+    existing_columns = [col for col in datos_grupo_columns if col in df.columns]
+    
+    if "cod_ficha" in existing_columns and len(existing_columns) > 1:
+        df_datos_grupo = df[existing_columns].dropna(subset=["cod_ficha"])
+        
+        # Filtrar filas que tienen al menos un dato de aprendices
+        numeric_cols = [col for col in existing_columns if col != "cod_ficha"]
+        df_datos_grupo = df_datos_grupo.dropna(subset=numeric_cols, how="all")
+        
+        if len(df_datos_grupo) > 0:
+            datos_result = upsert_datos_grupo_bulk(db, df_datos_grupo, confirmar=False)
+            resultados["datos_grupo_procesados"] += datos_result["datos_insertados"] + datos_result["datos_actualizados"]
+            resultados["errores"].extend(datos_result["errores"])
+
 @router.post("/upload-df14-excel/", tags=["Cargar Archivos"])
 async def upload_df14_excel(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    asincrono: bool = Query(False, description="Procesar en segundo plano y retornar el id del trabajo"),
+    force: bool = Query(False, description="Procesar aunque el mismo archivo ya se haya importado"),
+    dry_run: bool = Query(False, description="Solo validar el archivo contra la base de datos, sin escribir"),
+    reporte_csv: bool = Query(False, description="Con dry_run=true, descargar en CSV las filas con observaciones"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
 ):
     """
     Endpoint para procesar el archivo DF-14 que contiene información de duraciones
     de programas y estados detallados de aprendices.
     """
-    from app.crud.cargar_archivos import update_programas_duracion_bulk, update_datos_grupo_bulk
-    
-    contents = await file.read()
-    
-    # Leer el archivo Excel DF-14
-    df = pd.read_excel(
-        BytesIO(contents),
-        engine="openpyxl",
-        skiprows=4,  # Ajustar según sea necesario
-        usecols=[
-            # Llaves identificadoras
-            "FICHA", "CODIGO_PROGRAMA", "VERSION_PROGRAMA",
-            # Duraciones de programas
-            "DURACION_ETAPA_LECTIVA", "DURACION_ETAPA_PRODUCTIVA",
-            # Datos de cupo y estados de aprendices
-            "CUPO", "EN_TRANSITO", "INDUCCION", "FORMACION", "CONDICIONADO",
-            "APLAZADO", "RETIRO_VOLUNTARIO", "CANCELAMIENTO_VIRT_COMP",
-            "DESERCION_VIRT_COMP", "CANCELADO", "POR_CERTIFICAR",
-            "CERTIFICADO", "TRASLADADO", "OTRO"
-        ],
-        dtype=str
+    return await _ejecutar_carga(
+        partial(guardar_subida_temporal, file), "df14", procesar_archivo_df14, db, asincrono, force, dry_run, reporte_csv,
+        id_usuario=current_user.id_usuario
     )
-    
-    print(f"Archivo DF-14 - Columnas cargadas: {df.columns.tolist()}")
-    print(f"Archivo DF-14 - Filas cargadas: {len(df)}")
-
-    # Renombrar columnas para que coincidan con la base de datos
-    df = df.rename(columns={
-        # Llaves identificadoras
-        "FICHA": "cod_ficha",
-        "CODIGO_PROGRAMA": "cod_programa",
-        "VERSION_PROGRAMA": "la_version",
-        # Duraciones de programas
-        "DURACION_ETAPA_LECTIVA": "horas_lectivas",
-        "DURACION_ETAPA_PRODUCTIVA": "horas_productivas",
-        # Datos de cupo y estados de aprendices
-        "CUPO": "cupo_total",
-        "EN_TRANSITO": "en_transito",
-        "INDUCCION": "induccion",
-        "FORMACION": "formacion",
-        "CONDICIONADO": "condicionado",
-        "APLAZADO": "aplazado",
-        "RETIRO_VOLUNTARIO": "retiro_voluntario",
-        "CANCELAMIENTO_VIRT_COMP": "cancelamiento_vit_comp",
-        "DESERCION_VIRT_COMP": "desercion_vit_comp",
-        "CANCELADO": "cancelado",
-        "POR_CERTIFICAR": "por_certificar",
-        "CERTIFICADO": "certificados",
-        "TRASLADADO": "traslados",
-        "OTRO": "otro"
-    })
-
-    # Reemplazar valores NaN por None para compatibilidad con MySQL
-    df = df.where(pd.notnull(df), None)
-
-    # Convertir columnas a tipos numéricos
-    numeric_columns = [
-        "cod_ficha", "cod_programa", "la_version", "horas_lectivas", "horas_productivas",
-        "cupo_total", "en_transito", "induccion", "formacion", "condicionado",
-        "aplazado", "retiro_voluntario", "cancelamiento_vit_comp", "desercion_vit_comp",
-        "cancelado", "por_certificar", "certificados", "traslados", "otro"
-    ]
-    
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    # Eliminar filas con valores faltantes en campos obligatorios
-    df = df.dropna(subset=["cod_ficha", "cod_programa", "la_version"])
-
-    print(f"Archivo DF-14 - Filas después de limpieza: {len(df)}")
+def procesar_archivo_df14(db: Session, ruta: str, progreso: ProgresoIngesta) -> dict:
+    """
+    Importa el archivo DF-14 guardado en `ruta`.
+    """
+    from app.crud.cargar_archivos import aplicar_df14_staging, COLUMNAS_DF14_PROGRAMA, COLUMNAS_DF14_DATOS_GRUPO
+    
+    # Leer y limpiar el archivo Excel DF-14 en el pool de procesos
+    with progreso.etapa("lectura"):
+        df = ejecutar_en_proceso(leer_df14, ruta)
 
-    # Resultados de procesamiento
-    resultados = {
-        "programas_actualizados": 0,
-        "datos_grupo_actualizados": 0,
-        "errores": []
-    }
+    logger.info("DF-14 - filas después de limpieza: %s", len(df))
+    progreso.sumar_filas(len(df))
 
     try:
-        # 1. Actualizar duraciones de programas
-        if all(col in df.columns for col in ["cod_programa", "la_version", "horas_lectivas", "horas_productivas"]):
-            df_programas = df[["cod_programa", "la_version", "horas_lectivas", "horas_productivas"]]
+        with progreso.etapa("preparacion"):
+            # 1. Duraciones de programas
+            df_programas = df.reindex(columns=COLUMNAS_DF14_PROGRAMA)
             df_programas = df_programas.dropna(subset=["cod_programa", "la_version"])
             df_programas = df_programas.drop_duplicates(subset=["cod_programa", "la_version"])
-            
-            if len(df_programas) > 0:
-                programas_result = update_programas_duracion_bulk(db, df_programas)
-                resultados["programas_actualizados"] = programas_result["programas_actualizados"]
-                resultados["errores"].extend(programas_result["errores"])
-
-        # 2. Actualizar datos de grupo
-        datos_grupo_columns = [
-            "cod_ficha", "cupo_total", "en_transito", "induccion", "formacion",
-            "condicionado", "aplazado", "retiro_voluntario", "cancelamiento_vit_comp",
-            "desercion_vit_comp", "cancelado", "por_certificar", "certificados",
-            "traslados", "otro"
-        ]
-        
-        # Filtrar solo las columnas que existen en el DataFrame
-        existing_columns = [col for col in datos_grupo_columns if col in df.columns]
-        
-        if "cod_ficha" in existing_columns and len(existing_columns) > 1:
-            df_datos_grupo = df[existing_columns]
-            df_datos_grupo = df_datos_grupo.dropna(subset=["cod_ficha"])
-            
-            # Filtrar filas que tienen al menos un dato de estado
+
+            # 2. Datos de grupo: filas que tienen al menos un dato de estado
+            existing_columns = [col for col in COLUMNAS_DF14_DATOS_GRUPO if col in df.columns]
             estado_cols = [col for col in existing_columns if col != "cod_ficha"]
-            df_datos_grupo = df_datos_grupo.dropna(subset=estado_cols, how="all")
-            
-            if len(df_datos_grupo) > 0:
-                datos_result = update_datos_grupo_bulk(db, df_datos_grupo)
-                resultados["datos_grupo_actualizados"] = datos_result["datos_actualizados"]
-                resultados["errores"].extend(datos_result["errores"])
+            df_datos_grupo = df[existing_columns].dropna(subset=["cod_ficha"])
+            if estado_cols:
+                df_datos_grupo = df_datos_grupo.dropna(subset=estado_cols, how="all")
+            else:
+                df_datos_grupo = df_datos_grupo.iloc[0:0]
+
+        # 3. Staging y UPDATE ... JOIN en una sola transacción
+        with progreso.etapa("actualizacion"):
+            resultados = aplicar_df14_staging(db, df_programas, df_datos_grupo)
+        if not resultados["errores"]:
+            marcar_cambio("programa_formacion", "datos_grupo")
 
         # Mensaje final
-        resultados["mensaje"] = "Archivo DF-14 procesado y datos actualizados correctamente"
         if resultados["errores"]:
-            resultados["mensaje"] += " (con algunos errores)"
+            resultados["mensaje"] = "Error procesando archivo DF-14; no se aplicaron cambios"
+        else:
+            resultados["mensaje"] = "Archivo DF-14 procesado y datos actualizados correctamente"
         
         return resultados
 
     except Exception as e:
-        resultados["errores"].append(f"Error general procesando DF-14: {str(e)}")
-        resultados["mensaje"] = "Error crítico procesando archivo DF-14"
-        return resultados
+        return {
+            "programas_actualizados": 0,
+            "datos_grupo_actualizados": 0,
+            "errores": [f"Error general procesando DF-14: {str(e)}"],
+            "mensaje": "Error crítico procesando archivo DF-14"
+        }
 
 @router.post("/upload-evaluaciones-excel/", tags=["Cargar Archivos"])
 async def upload_evaluaciones_excel(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    asincrono: bool = Query(False, description="Procesar en segundo plano y retornar el id del trabajo"),
+    force: bool = Query(False, description="Procesar aunque el mismo archivo ya se haya importado"),
+    dry_run: bool = Query(False, description="Solo validar el archivo contra la base de datos, sin escribir"),
+    reporte_csv: bool = Query(False, description="Con dry_run=true, descargar en CSV las filas con observaciones"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
 ):
     """
     Endpoint para procesar el archivo de evaluaciones que contiene:
     - Tabla 1: Ficha de caracterización (A2-A12)
     - Tabla 2: Datos de evaluaciones con competencias y resultados de aprendizaje
     """
-    from app.crud.cargar_archivos import upsert_competencia_bulk, upsert_resultado_aprendizaje_bulk, upsert_programa_competencia_bulk
-    
-    contents = await file.read()
-    
+    return await _ejecutar_carga(
+        partial(guardar_subida_temporal, file), "evaluaciones", procesar_archivo_evaluaciones, db, asincrono, force, dry_run, reporte_csv,
+        id_usuario=current_user.id_usuario
+    )
+
+def _resolver_fichas(db: Session, fichas: List[int]) -> dict:
+    """
+    cod_ficha -> (cod_programa, la_version) de las fichas que existen en grupo, con el
+    mapa compartido de app/utils/fichas.py: sin consultas si ya está cargado, y una sola
+    consulta para las fichas que aún no estaban en él.
+    """
+    resolutor = obtener_resolutor_fichas(lambda: get_programas_por_ficha(db))
+    return resolutor.resolver(fichas, lambda faltantes: get_programas_por_ficha(db, faltantes))
+
+def procesar_archivo_evaluaciones(db: Session, ruta: str, progreso: ProgresoIngesta) -> dict:
+    """
+    Importa el archivo de evaluaciones guardado en `ruta`.
+    """
     try:
-        # Leer la primera tabla (A2-A12) para obtener la ficha de caracterización
-        # La ficha está específicamente en la celda C3
-        df_ficha = pd.read_excel(
-            BytesIO(contents),
-            engine="openpyxl",
-            usecols="A:C",  # Columnas A, B y C
-            skiprows=1,     # Saltar las primeras 2 filas para llegar a la fila 3
-            nrows=1         # Leer solo 1 fila (fila 3)
-        )
-        
-        # Extraer la ficha de caracterización de la celda C3
-        ficha_caracterizacion = None
-        if len(df_ficha.columns) >= 3 and len(df_ficha) > 0:
-            ficha_value = df_ficha.iloc[0, 2]  # Tercera columna (C), primera fila
-            if pd.notna(ficha_value):
-                ficha_caracterizacion = str(ficha_value).strip()
-                # Limpiar y convertir a número si es posible
-                try:
-                    # Remover espacios y caracteres no numéricos excepto puntos y comas
-                    cleaned_value = ''.join(c for c in ficha_caracterizacion if c.isdigit() or c in '.,')
-                    if cleaned_value:
-                        ficha_caracterizacion = str(int(float(cleaned_value.replace(',', ''))))
-                except Exception as convert_error:
-                    print(f"No se pudo convertir la ficha a número: {convert_error}")
-                    # Mantener el valor original como string
-                    pass
-        
-        print(f"Ficha de caracterización encontrada en C3: {ficha_caracterizacion}")
-        
-        # Leer la segunda tabla con los datos de evaluaciones
-        # Buscar donde comienza la tabla de evaluaciones (después de A12)
-        df_evaluaciones = pd.read_excel(
-            BytesIO(contents),
-            engine="openpyxl",
-            skiprows=13  # Comenzar después de A12, ajustar según sea necesario
-        )
-        
-        # Renombrar columnas para facilitar el procesamiento
-        expected_columns = [
-            "tipo_documento", "numero_documento", "nombre", "apellidos", "estado",
-            "competencia", "resultado_aprendizaje", "juicio_evaluacion", 
-            "fecha_hora_juicio", "funcionario_registro"
-        ]
-        
-        # Asignar nombres a las columnas si coinciden en número
-        if len(df_evaluaciones.columns) >= len(expected_columns):
-            df_evaluaciones.columns = expected_columns + list(df_evaluaciones.columns[len(expected_columns):])
-        
-        print(f"Columnas de evaluaciones: {df_evaluaciones.columns.tolist()}")
-        print(f"Filas de evaluaciones cargadas: {len(df_evaluaciones)}")
-        
-        # Agregar la ficha de caracterización como nueva columna
-        df_evaluaciones["cod_ficha"] = ficha_caracterizacion
-        
-        # Limpiar datos
-        df_evaluaciones = df_evaluaciones.where(pd.notnull(df_evaluaciones), None)
-        df_evaluaciones = df_evaluaciones.dropna(subset=["competencia", "resultado_aprendizaje"])
-        
-        print(f"Filas después de limpieza: {len(df_evaluaciones)}")
-        
-        # Función para extraer código y nombre de una cadena
-        def extraer_codigo_nombre(texto):
-            if pd.isna(texto) or not isinstance(texto, str):
-                return None, None
-            
-            # Buscar patrón: número al inicio seguido de " - "
-            import re
-            match = re.match(r'^(\d+)\s*-\s*(.+)$', texto.strip())
-            if match:
-                codigo = int(match.group(1))
-                nombre = match.group(2).strip()
-                return codigo, nombre
-            return None, texto.strip()
-        
-        # Procesar competencias
-        competencias_data = []
-        competencias_vistas = set()
-        
-        for _, row in df_evaluaciones.iterrows():
-            if pd.notna(row["competencia"]):
-                cod_competencia, nombre_competencia = extraer_codigo_nombre(row["competencia"])
-                
-                if cod_competencia and cod_competencia not in competencias_vistas:
-                    # Extraer horas de la fecha_hora_juicio (si está disponible)
-                    horas = 0
-                    if pd.notna(row["fecha_hora_juicio"]):
-                        # Intentar extraer horas del campo si es un string con formato específico
-                        try:
-                            if isinstance(row["fecha_hora_juicio"], str):
-                                # Si hay un patrón específico para las horas, ajustar aquí
-                                horas = 0  # Por defecto
-                        except:
-                            horas = 0
-                    
-                    competencias_data.append({
-                        "cod_competencia": int(cod_competencia),
-                        "nombre": str(nombre_competencia) if nombre_competencia else "",
-                        "horas": int(horas) if pd.notna(horas) and horas is not None else 0
-                    })
-                    competencias_vistas.add(cod_competencia)
-        
-        # Procesar resultados de aprendizaje
-        resultados_data = []
-        resultados_vistos = set()
-        
-        for _, row in df_evaluaciones.iterrows():
-            if pd.notna(row["resultado_aprendizaje"]) and pd.notna(row["competencia"]):
-                cod_resultado, nombre_resultado = extraer_codigo_nombre(row["resultado_aprendizaje"])
-                cod_competencia, _ = extraer_codigo_nombre(row["competencia"])
-                
-                if cod_resultado and cod_competencia and cod_resultado not in resultados_vistos:
-                    resultados_data.append({
-                        "cod_resultado": int(cod_resultado),
-                        "nombre": str(nombre_resultado) if nombre_resultado else "",
-                        "cod_competencia": int(cod_competencia)
-                    })
-                    resultados_vistos.add(cod_resultado)
-        
-        # Convertir a DataFrames
-        df_competencias = pd.DataFrame(competencias_data)
-        df_resultados = pd.DataFrame(resultados_data)
-        
-        print(f"Competencias extraídas: {len(df_competencias)}")
-        print(f"Resultados de aprendizaje extraídos: {len(df_resultados)}")
-        
-        # Obtener cod_programa de la ficha de caracterización
-        cod_programa = None
-        debug_cod_programa = {}
-        
-        if ficha_caracterizacion:
-            try:
-                # Buscar directamente el cod_programa en la tabla grupos donde cod_programa = ficha
-                from sqlalchemy import text
-                
-                query_programa = text("""
-                    SELECT cod_programa 
-                    FROM grupo 
-                    WHERE cod_programa = :ficha_code 
-                    LIMIT 1
-                """)
-                result = db.execute(query_programa, {"ficha_code": ficha_caracterizacion}).fetchone()
-                
-                if result:
-                    cod_programa = result[0]
-                    debug_cod_programa = {
-                        "ficha_buscada": ficha_caracterizacion,
-                        "cod_programa_encontrado": cod_programa,
-                        "query_ejecutada": "SELECT cod_programa FROM grupo WHERE cod_programa = ficha",
-                        "tipo_busqueda": "string"
-                    }
-                    print(f"Código de programa encontrado (como string): {cod_programa}")
-                else:
-                    # Intentar buscar con conversión a entero
-                    try:
-                        ficha_as_int = int(ficha_caracterizacion)
-                        result_int = db.execute(query_programa, {"ficha_code": ficha_as_int}).fetchone()
-                        if result_int:
-                            cod_programa = result_int[0]
-                            debug_cod_programa = {
-                                "ficha_buscada": ficha_caracterizacion,
-                                "ficha_como_int": ficha_as_int,
-                                "cod_programa_encontrado": cod_programa,
-                                "query_ejecutada": "SELECT cod_programa FROM grupo WHERE cod_programa = ficha",
-                                "tipo_busqueda": "int"
-                            }
-                            print(f"Código de programa encontrado (como int): {cod_programa}")
-                        else:
-                            debug_cod_programa = {
-                                "ficha_buscada": ficha_caracterizacion,
-                                "ficha_como_int": ficha_as_int,
-                                "cod_programa_encontrado": None,
-                                "query_ejecutada": "SELECT cod_programa FROM grupo WHERE cod_programa = ficha",
-                                "tipo_busqueda": "ambos_fallaron"
-                            }
-                            print(f"No se encontró código de programa para la ficha: {ficha_caracterizacion}")
-                    except ValueError as ve:
-                        debug_cod_programa = {
-                            "ficha_buscada": ficha_caracterizacion,
-                            "error_conversion": str(ve),
-                            "query_ejecutada": "SELECT cod_programa FROM grupo WHERE cod_programa = ficha",
-                            "tipo_busqueda": "solo_string_fallido"
-                        }
-                        print(f"Error convirtiendo ficha a int: {ve}")
-                        print(f"No se encontró código de programa para la ficha (como string): {ficha_caracterizacion}")
-                
-                # Si aún no encontramos nada, hacer más debugging
-                if not cod_programa:
-                    print("DEBUGGING: Buscando información adicional...")
-                    
-                    # Verificar si la ficha existe en grupo
-                    check_grupos_query = text("""
-                        SELECT cod_ficha, cod_programa FROM grupo WHERE cod_ficha = :ficha_code
-                    """)
-                    grupos_result = db.execute(check_grupos_query, {"ficha_code": ficha_caracterizacion}).fetchone()
-                    if grupos_result:
-                        print(f"Ficha encontrada en grupo: cod_ficha={grupos_result[0]}, cod_programa={grupos_result[1]}")
-                        
-                        # Verificar si el programa existe en programa_formacion
-                        check_programa_query = text("""
-                            SELECT cod_programa FROM programa_formacion WHERE cod_programa = :cod_programa
-                        """)
-                        programa_result = db.execute(check_programa_query, {"cod_programa": grupos_result[1]}).fetchone()
-                        if programa_result:
-                            print(f"Programa encontrado en programa_formacion: {programa_result[0]}")
-                            cod_programa = programa_result[0]
-                        else:
-                            print(f"PROBLEMA: Programa {grupos_result[1]} NO existe en tabla programa_formacion")
-                    else:
-                        print(f"Ficha {ficha_caracterizacion} NO encontrada en tabla grupo")
-                    
-                    # Buscar fichas similares
-                    search_query = text("""
-                        SELECT g.cod_ficha, g.cod_programa FROM grupo g 
-                        WHERE g.cod_ficha LIKE :pattern 
-                        ORDER BY g.cod_ficha LIMIT 10
-                    """)
-                    similar_results = db.execute(search_query, {"pattern": f"%{ficha_caracterizacion[-4:]}%"}).fetchall()
-                    print(f"Fichas similares encontradas: {[(r[0], r[1]) for r in similar_results]}")
-                    
-                    # Contar total de grupos
-                    count_query = text("SELECT COUNT(*) FROM grupo WHERE cod_ficha IS NOT NULL")
-                    count_result = db.execute(count_query).fetchone()
-                    print(f"Total de grupos con cod_ficha en la base de datos: {count_result[0] if count_result else 0}")
-                    
-                    # Mostrar ejemplos de fichas
-                    sample_query = text("SELECT cod_ficha, cod_programa FROM grupo WHERE cod_ficha IS NOT NULL LIMIT 10")
-                    sample_results = db.execute(sample_query).fetchall()
-                    print(f"Ejemplos de fichas en la base de datos: {[(r[0], r[1]) for r in sample_results]}")
-                    
-            except Exception as e:
-                debug_cod_programa = {
-                    "ficha_buscada": ficha_caracterizacion,
-                    "error_excepcion": str(e),
-                    "query_ejecutada": "SELECT cod_programa FROM grupo WHERE cod_programa = ficha",
-                    "tipo_busqueda": "error_excepcion"
-                }
-                print(f"Error al buscar código de programa: {e}")
-                import traceback
-                print(f"Traceback completo: {traceback.format_exc()}")
-        else:
-            debug_cod_programa = {
-                "ficha_buscada": None,
-                "error": "No se pudo obtener ficha_caracterizacion",
-                "query_ejecutada": "ninguna",
-                "tipo_busqueda": "sin_ficha"
-            }
-            print("No se pudo obtener ficha_caracterizacion para buscar cod_programa")
-        
+        # Leer y transformar el archivo en el pool de procesos
+        progreso.marcar_etapa("lectura")
+        lectura = ejecutar_en_proceso(leer_evaluaciones, ruta)
+        ficha_caracterizacion = lectura["ficha_caracterizacion"]
+        df_evaluaciones = lectura["df_evaluaciones"]
+        df_competencias = lectura["df_competencias"]
+        df_resultados = lectura["df_resultados"]
+        df_juicios = lectura["df_juicios"]
+        progreso.sumar_filas(len(df_evaluaciones))
+
+        # Programa y versión de la ficha de caracterización, desde el mapa en memoria
+        progreso.marcar_etapa("programa")
+        cod_ficha = int(ficha_caracterizacion) if ficha_caracterizacion and str(ficha_caracterizacion).isdigit() else None
+        cod_programa, la_version = _resolver_fichas(db, [cod_ficha]).get(cod_ficha, (None, None))
+        if cod_ficha is not None and cod_programa is None:
+            logger.warning("La ficha %s no existe en grupo; no se crean relaciones programa-competencia", ficha_caracterizacion)
+
         # Crear relaciones programa-competencia
-        programa_competencia_data = []
-        if cod_programa and len(df_competencias) > 0:
-            print(f"Creando relaciones programa-competencia para programa {cod_programa} con {len(df_competencias)} competencias")
-            for idx, row in df_competencias.iterrows():
-                programa_competencia_data.append({
-                    # No incluir cod_prog_competencia ya que es AUTO_INCREMENT
-                    "cod_competencia": row['cod_competencia'],
-                    "cod_programa": cod_programa
-                })
+        if cod_programa is not None and len(df_competencias) > 0:
+            df_programa_competencia = pd.DataFrame({
+                "cod_programa": cod_programa,
+                "la_version": la_version,
+                "cod_competencia": df_competencias["cod_competencia"]
+            })
         else:
-            if not cod_programa:
-                print("No se puede crear relaciones programa-competencia: cod_programa no encontrado")
-            if len(df_competencias) == 0:
-                print("No se puede crear relaciones programa-competencia: no hay competencias extraídas")
-        
-        df_programa_competencia = pd.DataFrame(programa_competencia_data)
-        print(f"Relaciones programa-competencia creadas: {len(df_programa_competencia)}")
+            df_programa_competencia = pd.DataFrame()
+        logger.debug("Relaciones programa-competencia creadas: %s", len(df_programa_competencia))
         
         # Resultados de procesamiento
         resultados = {
             "ficha_caracterizacion": ficha_caracterizacion,
+            "cod_programa": cod_programa,
+            "la_version": la_version,
             "competencias_procesadas": 0,
             "resultados_procesados": 0,
             "programa_competencia_procesadas": 0,
             "registros_evaluaciones": int(len(df_evaluaciones)),
-            "errores": [],
-            # Campos de debug temporales
-            "debug_cod_programa_info": debug_cod_programa,
-            "debug_competencias_count": len(df_competencias),
-            "debug_programa_competencia_data_count": len(df_programa_competencia)
+            "juicios_insertados": 0,
+            "juicios_actualizados": 0,
+            "errores": []
         }
         
         # Guardar competencias en la base de datos
+        progreso.marcar_etapa("escritura")
         if len(df_competencias) > 0:
             competencias_result = upsert_competencia_bulk(db, df_competencias)
-            resultados["competencias_procesadas"] = int(competencias_result.get("competencias_insertadas", 0))
+            resultados["competencias_procesadas"] = competencias_result["competencias_insertadas"] + competencias_result["competencias_actualizadas"]
             resultados["errores"].extend(competencias_result.get("errores", []))
         
         # Guardar resultados de aprendizaje en la base de datos
         if len(df_resultados) > 0:
             resultados_result = upsert_resultado_aprendizaje_bulk(db, df_resultados)
-            resultados["resultados_procesados"] = int(resultados_result.get("resultados_insertados", 0))
+            resultados["resultados_procesados"] = resultados_result["resultados_insertados"] + resultados_result["resultados_actualizados"]
             resultados["errores"].extend(resultados_result.get("errores", []))
         
         # Guardar relaciones programa-competencia en la base de datos
         if len(df_programa_competencia) > 0:
-            try:
-                programa_comp_result = upsert_programa_competencia_bulk(db, df_programa_competencia)
-                resultados["programa_competencia_procesadas"] = int(programa_comp_result.get("relaciones_insertadas", 0))
-                resultados["errores"].extend(programa_comp_result.get("errores", []))
-                resultados["debug_programa_comp_result"] = programa_comp_result
-            except Exception as e:
-                error_msg = f"Error al procesar programa_competencia: {str(e)}"
-                resultados["errores"].append(error_msg)
-                resultados["debug_programa_comp_error"] = error_msg
-        else:
-            resultados["debug_programa_comp_message"] = "No hay relaciones programa-competencia para procesar"
+            programa_comp_result = upsert_programa_competencia_bulk(db, df_programa_competencia)
+            resultados["programa_competencia_procesadas"] = programa_comp_result["relaciones_insertadas"]
+            resultados["errores"].extend(programa_comp_result["errores"])
+
+        # Guardar los juicios por aprendiz (requieren que la ficha exista en grupo)
+        if len(df_juicios) > 0:
+            cod_ficha = int(df_juicios["cod_ficha"].iloc[0])
+            if cod_programa is not None:
+                juicios_result = upsert_juicios_evaluacion_bulk(db, df_juicios)
+                resultados["juicios_insertados"] = juicios_result["juicios_insertados"]
+                resultados["juicios_actualizados"] = juicios_result["juicios_actualizados"]
+                resultados["errores"].extend(juicios_result["errores"])
+            else:
+                resultados["errores"].append(
+                    f"La ficha {cod_ficha} no existe en grupo; no se guardaron los juicios evaluativos"
+                )
+        marcar_cambio("competencia", "resultado_aprendizaje", "programa_competencia")
         
         # Mensaje final
         resultados["mensaje"] = "Archivo de evaluaciones procesado correctamente"
@@ -674,6 +921,8 @@ async def upload_evaluaciones_excel(
         return resultados
         
     except Exception as e:
+        # Cada upsert confirma por separado: lo escrito antes del error ya está en la base de datos
+        marcar_cambio("competencia", "resultado_aprendizaje", "programa_competencia")
         return {
             "mensaje": "Error crítico procesando archivo de evaluaciones",
             "errores": [f"Error general: {str(e)}"],
@@ -682,7 +931,165 @@ async def upload_evaluaciones_excel(
             "resultados_procesados": 0,
             "programa_competencia_procesadas": 0,
             "registros_evaluaciones": 0,
-            "debug_cod_programa_info": {},
-            "debug_competencias_count": 0,
-            "debug_programa_competencia_data_count": 0
-        }
\ No newline at end of file
+            "juicios_insertados": 0,
+            "juicios_actualizados": 0
+        }
+
+@router.post("/upload-evaluaciones-lote/", tags=["Cargar Archivos"])
+async def upload_evaluaciones_lote(
+    files: List[UploadFile] = File(..., description="Varios reportes de evaluaciones (.xlsx) o un solo ZIP que los contenga"),
+    asincrono: bool = Query(False, description="Procesar en segundo plano y retornar el id del trabajo"),
+    force: bool = Query(False, description="Procesar aunque el mismo lote ya se haya importado"),
+    dry_run: bool = Query(False, description="Solo validar cada libro contra la base de datos, sin escribir"),
+    reporte_csv: bool = Query(False, description="Con dry_run=true, descargar en CSV las filas con observaciones de todos los libros"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Carga en una sola petición los reportes de evaluaciones de muchas fichas (p. ej. todo
+    un centro). Los libros se leen en paralelo en el pool de procesos; las competencias,
+    resultados de aprendizaje y relaciones programa-competencia de todos los archivos se
+    unen y se deduplican, y todo se escribe en una sola pasada por lotes y una sola
+    transacción. El resultado detalla la lectura de cada archivo.
+
+    Con dry_run=true cada libro se valida como en /upload-evaluaciones-excel/ y se
+    retornan los conteos del lote y de cada libro, sin escribir nada.
+    """
+    try:
+        return await _ejecutar_carga(
+            partial(guardar_lote_temporal, files), "evaluaciones_lote", procesar_lote_evaluaciones, db, asincrono, force,
+            dry_run, reporte_csv, id_usuario=current_user.id_usuario
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _unir(marcos: List[pd.DataFrame], claves: List[str], conservar: str = "first") -> pd.DataFrame:
+    """Concatena los DataFrames de varios libros y quita las filas repetidas por `claves`."""
+    marcos = [marco for marco in marcos if len(marco) > 0]
+    if not marcos:
+        return pd.DataFrame()
+    return pd.concat(marcos, ignore_index=True).drop_duplicates(subset=claves, keep=conservar).reset_index(drop=True)
+
+def procesar_lote_evaluaciones(db: Session, ruta: str, progreso: ProgresoIngesta) -> dict:
+    """
+    Importa el lote de reportes de evaluaciones del ZIP guardado en `ruta`.
+
+    - Cada libro se lee con leer_evaluaciones_lote en el pool de procesos, en paralelo;
+      un libro que no se puede leer se reporta y no detiene el resto.
+    - Competencias y resultados se deduplican entre todos los libros (se conserva la
+      primera aparición, como en la carga de un solo archivo).
+    - El programa y la versión de cada ficha salen del mapa compartido de fichas (ver
+      _resolver_fichas), y con ellos se arman las relaciones programa-competencia sin repetidos.
+    - Los juicios de fichas que no existen en grupo se descartan y se reportan por archivo.
+    - Todas las escrituras usan INSERT multi-fila en una sola transacción.
+    """
+    resultados = {
+        "archivos_recibidos": 0,
+        "archivos_procesados": 0,
+        "fichas": 0,
+        "competencias_procesadas": 0,
+        "resultados_procesados": 0,
+        "programa_competencia_procesadas": 0,
+        "registros_evaluaciones": 0,
+        "juicios_insertados": 0,
+        "juicios_actualizados": 0,
+        "archivos": [],
+        "errores": []
+    }
+
+    directorio = tempfile.mkdtemp(dir=settings.INGESTA_DIR_TEMPORAL, prefix="lote_")
+    try:
+        with progreso.etapa("extraccion"):
+            libros = extraer_libros_zip(ruta, directorio)
+        resultados["archivos_recibidos"] = len(libros)
+
+        with progreso.etapa("lectura"):
+            lecturas = mapear_en_procesos(leer_evaluaciones_lote, [ruta_libro for _, ruta_libro in libros])
+
+        leidos = []
+        for (nombre, _), (lectura, error) in zip(libros, lecturas):
+            if error is not None:
+                resultados["archivos"].append({"archivo": nombre, "error": str(error)})
+                resultados["errores"].append(f"{nombre}: no se pudo leer el archivo: {error}")
+                continue
+            ficha = lectura["ficha_caracterizacion"]
+            lectura["cod_ficha"] = int(ficha) if ficha and str(ficha).isdigit() else None
+            lectura["archivo"] = nombre
+            leidos.append(lectura)
+            resultados["archivos"].append({
+                "archivo": nombre,
+                "ficha_caracterizacion": ficha,
+                "registros_evaluaciones": lectura["registros_evaluaciones"],
+                "juicios": len(lectura["df_juicios"])
+            })
+            resultados["registros_evaluaciones"] += lectura["registros_evaluaciones"]
+            progreso.sumar_filas(lectura["registros_evaluaciones"])
+        resultados["archivos_procesados"] = len(leidos)
+
+        with progreso.etapa("programa"):
+            fichas = {lectura["cod_ficha"] for lectura in leidos if lectura["cod_ficha"] is not None}
+            resultados["fichas"] = len(fichas)
+            programas = _resolver_fichas(db, sorted(fichas))
+
+        with progreso.etapa("union"):
+            df_competencias = _unir([lectura["df_competencias"] for lectura in leidos], ["cod_competencia"])
+            df_resultados = _unir([lectura["df_resultados"] for lectura in leidos], ["cod_resultado"])
+            df_programa_competencia = _unir(
+                [
+                    pd.DataFrame({
+                        "cod_programa": programas[lectura["cod_ficha"]][0],
+                        "la_version": programas[lectura["cod_ficha"]][1],
+                        "cod_competencia": lectura["df_competencias"]["cod_competencia"]
+                    })
+                    for lectura in leidos if lectura["cod_ficha"] in programas
+                ],
+                ["cod_programa", "la_version", "cod_competencia"]
+            )
+            # Si dos archivos traen el mismo juicio, gana el que se procesa de último
+            df_juicios = _unir(
+                [lectura["df_juicios"] for lectura in leidos if lectura["cod_ficha"] in programas],
+                ["cod_ficha", "numero_documento", "cod_resultado"],
+                conservar="last"
+            )
+            for lectura in leidos:
+                if lectura["cod_ficha"] not in programas and len(lectura["df_juicios"]) > 0:
+                    resultados["errores"].append(
+                        f"{lectura['archivo']}: la ficha {lectura['ficha_caracterizacion']} no existe en grupo; "
+                        "no se guardaron sus juicios ni sus relaciones programa-competencia"
+                    )
+
+        with progreso.etapa("escritura"):
+            if len(df_competencias) > 0:
+                competencias_result = upsert_competencia_bulk(db, df_competencias, confirmar=False)
+                resultados["competencias_procesadas"] = competencias_result["competencias_insertadas"] + competencias_result["competencias_actualizadas"]
+                resultados["errores"].extend(competencias_result["errores"])
+            if len(df_resultados) > 0:
+                resultados_result = upsert_resultado_aprendizaje_bulk(db, df_resultados, confirmar=False)
+                resultados["resultados_procesados"] = resultados_result["resultados_insertados"] + resultados_result["resultados_actualizados"]
+                resultados["errores"].extend(resultados_result["errores"])
+            if len(df_programa_competencia) > 0:
+                programa_comp_result = upsert_programa_competencia_bulk(db, df_programa_competencia, confirmar=False)
+                resultados["programa_competencia_procesadas"] = programa_comp_result["relaciones_insertadas"]
+                resultados["errores"].extend(programa_comp_result["errores"])
+            if len(df_juicios) > 0:
+                juicios_result = upsert_juicios_evaluacion_bulk(db, df_juicios, confirmar=False)
+                resultados["juicios_insertados"] = juicios_result["juicios_insertados"]
+                resultados["juicios_actualizados"] = juicios_result["juicios_actualizados"]
+                resultados["errores"].extend(juicios_result["errores"])
+
+        with progreso.etapa("commit"):
+            db.commit()
+        marcar_cambio("competencia", "resultado_aprendizaje", "programa_competencia")
+
+        resultados["mensaje"] = "Lote de evaluaciones procesado correctamente"
+        if resultados["errores"]:
+            resultados["mensaje"] += " (con algunos errores)"
+        return resultados
+
+    except Exception as e:
+        db.rollback()
+        resultados["errores"].append(f"Error general procesando el lote de evaluaciones: {str(e)}")
+        resultados["mensaje"] = "Error crítico procesando el lote de evaluaciones; no se aplicaron cambios"
+        return resultados
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
@@ -1,8 +1,9 @@
 from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.crud.users import get_user_by_email, get_user_by_id
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.users import get_user_by_email, get_user_by_id, get_user_by_id_async
 from core.security import verify_password, verify_token
-from core.database import get_db
+from core.database import get_db, get_async_db
 from fastapi.security import OAuth2PasswordBearer
 
 
@@ -23,6 +24,25 @@ def get_current_user(
     return user_db
 
 
+async def get_current_user_async(
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    get_current_user para endpoints `async def`: consulta el usuario con la sesión
+    asíncrona para que la autenticación tampoco ocupe un hilo del threadpool.
+    """
+    user = verify_token(token)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Token Invalido")
+    user_db = await get_user_by_id_async(db, user)
+    if user_db is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    if not user_db.estado:
+        raise HTTPException(status_code=403, detail="Usuario inactivo. No autorizado")
+    return user_db
+
+
 def authenticate_user(username: str, password: str, db: Session):
     user = get_user_by_email(db, username)
     if not user:
@@ -1,23 +1,40 @@
 from ast import List
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.grupos import GrupoUpdate, GrupoOut, GrupoSelect, GrupoEnriched, DashboardKPISchema, GruposPorMunicipioSchema, GruposPorJornadaSchema, GruposPorModalidadSchema, GruposPorEtapaSchema, GruposPorNivelSchema, GrupoPage, GrupoAdvancedPage
 from app.crud import grupos as crud_grupo
-from core.database import get_db
-from app.api.dependencies import get_current_user
+from core.database import get_db, get_async_db, get_async_read_db
+from app.api.dependencies import get_current_user, get_current_user_async
 from app.schemas.users import UserOut
-from typing import List, Optional
+from typing import List, Literal, Optional
+from app.utils.cursores import decodificar_cursor
 
 router = APIRouter()
 
+DESCRIPCION_CURSOR = "Cursor opaco (next_cursor de la página anterior): pagina por llave en lugar de skip"
+DESCRIPCION_COUNT = (
+    "exact: total_items exacto (cacheado hasta que cambien los grupos); estimate: estimado con las "
+    "estadísticas de la tabla; none: sin total. Por defecto exact sin cursor y none con cursor"
+)
+
+def _paginacion(cursor: Optional[str], count: Optional[str]) -> tuple:
+    """cod_ficha del cursor (None sin cursor) y el modo de conteo del total."""
+    try:
+        despues_de = decodificar_cursor(cursor, [int])[0] if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    conteo = count or ("none" if cursor else "exact")
+    return despues_de, conteo
+
 # Rutas específicas primero para evitar conflictos con rutas paramétricas
 
 @router.get("/search", response_model=List[GrupoSelect])
-def search_grupos_for_select(
+async def search_grupos_for_select(
     search: str = Query("", description="Texto para buscar en código de ficha, nombre de programa, responsable o nombre del ambiente"),
     limit: int = Query(20, ge=1, le=100, description="Número máximo de resultados"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Busca grupos para usar en un select/autocompletar.
@@ -26,7 +43,7 @@ def search_grupos_for_select(
     Útil para formularios donde se necesita seleccionar un grupo.
     """
     try:
-        grupos = crud_grupo.search_grupos_for_select(db, search_text=search, limit=limit)
+        grupos = await crud_grupo.search_grupos_for_select(db, search_text=search, limit=limit)
         return grupos
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -34,13 +51,15 @@ def search_grupos_for_select(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/advanced-search/", response_model=GrupoAdvancedPage)
-def advanced_search_grupos(
+async def advanced_search_grupos(
     query: str,
     cod_centro: int,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description=DESCRIPCION_CURSOR),
+    count: Optional[Literal["exact", "estimate", "none"]] = Query(None, description=DESCRIPCION_COUNT),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Búsqueda avanzada de grupos con información enriquecida.
@@ -48,8 +67,11 @@ def advanced_search_grupos(
     Filtra SIEMPRE por el código de centro proporcionado.
     Incluye información del responsable y programa de formación.
     """
+    despues_de, conteo = _paginacion(cursor, count)
     try:
-        result = crud_grupo.advanced_search_grupos(db, search_term=query, cod_centro=cod_centro, skip=skip, limit=limit)
+        result = await crud_grupo.advanced_search_grupos(
+            db, search_term=query, cod_centro=cod_centro, skip=skip, limit=limit, despues_de=despues_de, conteo=conteo
+        )
         return result
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -57,11 +79,13 @@ def advanced_search_grupos(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=GrupoPage)
-def get_all_grupos(
+async def get_all_grupos(
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description=DESCRIPCION_CURSOR),
+    count: Optional[Literal["exact", "estimate", "none"]] = Query(None, description=DESCRIPCION_COUNT),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene una lista paginada de todos los grupos del sistema.
@@ -71,8 +95,9 @@ def get_all_grupos(
     if current_user.id_rol not in [1, 2]:
         raise HTTPException(status_code=401, detail="No autorizado para ver todos los grupos")
     
+    despues_de, conteo = _paginacion(cursor, count)
     try:
-        result = crud_grupo.get_grupos(db, skip=skip, limit=limit)
+        result = await crud_grupo.get_grupos(db, skip=skip, limit=limit, despues_de=despues_de, conteo=conteo)
         return result
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -80,18 +105,23 @@ def get_all_grupos(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/centro/{cod_centro}", response_model=GrupoPage)
-def get_grupos_by_centro(
+async def get_grupos_by_centro(
     cod_centro: int,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description=DESCRIPCION_CURSOR),
+    count: Optional[Literal["exact", "estimate", "none"]] = Query(None, description=DESCRIPCION_COUNT),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene una lista paginada de todos los grupos que pertenecen a un centro de formación.
     """
+    despues_de, conteo = _paginacion(cursor, count)
     try:
-        result = crud_grupo.get_grupos_by_cod_centro(db, cod_centro=cod_centro, skip=skip, limit=limit)
+        result = await crud_grupo.get_grupos_by_cod_centro(
+            db, cod_centro=cod_centro, skip=skip, limit=limit, despues_de=despues_de, conteo=conteo
+        )
         return result
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -100,7 +130,7 @@ def get_grupos_by_centro(
 
 
 @router.get("/kpis", response_model=DashboardKPISchema)
-def get_dashboard_kpis(
+async def get_dashboard_kpis(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -109,14 +139,14 @@ def get_dashboard_kpis(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene el número total de grupos según los filtros aplicados.
     """
     try:
-        kpis = crud_grupo.get_dashboard_kpis(db, cod_centro=cod_centro, estado_grupo=estado_grupo, nombre_nivel=nombre_nivel, etapa=etapa, modalidad=modalidad, jornada=jornada, nombre_municipio=nombre_municipio, año=año)
+        kpis = await crud_grupo.get_dashboard_kpis(db, cod_centro=cod_centro, estado_grupo=estado_grupo, nombre_nivel=nombre_nivel, etapa=etapa, modalidad=modalidad, jornada=jornada, nombre_municipio=nombre_municipio, año=año)
         return kpis
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -125,7 +155,7 @@ def get_dashboard_kpis(
 # --- Endpoints de Distribución con Filtros ---
 
 @router.get("/distribucion/por-municipio", response_model=List[GruposPorMunicipioSchema])
-def get_distribucion_por_municipio(
+async def get_distribucion_por_municipio(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -134,19 +164,19 @@ def get_distribucion_por_municipio(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por municipio con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_municipio_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return await crud_grupo.get_grupos_por_municipio_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-jornada", response_model=List[GruposPorJornadaSchema])
-def get_distribucion_por_jornada(
+async def get_distribucion_por_jornada(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -155,19 +185,19 @@ def get_distribucion_por_jornada(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por jornada con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_jornada_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return await crud_grupo.get_grupos_por_jornada_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-modalidad", response_model=List[GruposPorModalidadSchema])
-def get_distribucion_por_modalidad(
+async def get_distribucion_por_modalidad(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -176,19 +206,19 @@ def get_distribucion_por_modalidad(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por modalidad con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_modalidad_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return await crud_grupo.get_grupos_por_modalidad_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-etapa", response_model=List[GruposPorEtapaSchema])
-def get_distribucion_por_etapa(
+async def get_distribucion_por_etapa(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -197,19 +227,19 @@ def get_distribucion_por_etapa(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por etapa con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_etapa_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return await crud_grupo.get_grupos_por_etapa_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/distribucion/por-nivel", response_model=List[GruposPorNivelSchema])
-def get_distribucion_por_nivel(
+async def get_distribucion_por_nivel(
     cod_centro: int = Query(..., description="Código del centro de formación (Obligatorio)"),
     estado_grupo: Optional[str] = Query(None, description="Estado del grupo (Opcional)"),
     nombre_nivel: Optional[str] = Query(None, description="Nombre del nivel (Opcional)"),
@@ -218,14 +248,14 @@ def get_distribucion_por_nivel(
     jornada: Optional[str] = Query(None, description="Jornada (Opcional)"),
     nombre_municipio: Optional[str] = Query(None, description="Nombre del municipio (Opcional)"),
     año: Optional[int] = Query(None, description="Filtrar por año de inicio (Opcional)"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene la distribución de grupos por nivel de formación con filtros.
     """
     try:
-        return crud_grupo.get_grupos_por_nivel_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
+        return await crud_grupo.get_grupos_por_nivel_filtrado(db, cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,79 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from core.database import get_db
+from app.schemas.juicio_evaluacion import JuicioEvaluacionOut, TasaAprobacionFichaOut, TasaAprobacionCompetenciaOut
+from app.crud import juicio_evaluacion as crud_juicio
+from app.api.dependencies import get_current_user
+from app.schemas.users import UserOut
+
+router = APIRouter()
+
+# Endpoints específicos primero para evitar conflictos con rutas paramétricas
+@router.get("/tasas/ficha/{cod_ficha}", response_model=TasaAprobacionFichaOut)
+def get_tasa_aprobacion_ficha(
+    cod_ficha: int,
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Obtiene la tasa de aprobación de una ficha a partir de los juicios cargados.
+    """
+    try:
+        tasa = crud_juicio.get_tasa_aprobacion_ficha(db, cod_ficha)
+        if tasa is None:
+            raise HTTPException(status_code=404, detail="La ficha no tiene juicios evaluativos cargados")
+        return tasa
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tasas/fichas", response_model=List[TasaAprobacionFichaOut])
+def get_tasas_aprobacion_por_ficha(
+    cod_centro: int = Query(..., description="Código del centro de formación"),
+    skip: int = Query(0, ge=0, description="Número de registros a omitir"),
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a devolver"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Obtiene la tasa de aprobación de cada ficha del centro que tenga juicios cargados.
+    """
+    try:
+        return crud_juicio.get_tasas_aprobacion_por_ficha(db, cod_centro, skip=skip, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tasas/competencias", response_model=List[TasaAprobacionCompetenciaOut])
+def get_tasas_aprobacion_por_competencia(
+    cod_ficha: Optional[int] = Query(None, description="Limitar a una ficha (Opcional)"),
+    cod_centro: Optional[int] = Query(None, description="Limitar a las fichas de un centro (Opcional)"),
+    cod_competencia: Optional[int] = Query(None, description="Limitar a una competencia (Opcional)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Obtiene la tasa de aprobación por competencia.
+    """
+    try:
+        return crud_juicio.get_tasas_aprobacion_por_competencia(
+            db, cod_ficha=cod_ficha, cod_centro=cod_centro, cod_competencia=cod_competencia
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/ficha/{cod_ficha}", response_model=List[JuicioEvaluacionOut])
+def get_juicios_by_ficha(
+    cod_ficha: int,
+    numero_documento: Optional[str] = Query(None, description="Documento del aprendiz (Opcional)"),
+    db: Session = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Obtiene los juicios evaluativos de una ficha, opcionalmente de un solo aprendiz.
+    """
+    try:
+        return crud_juicio.get_juicios_by_ficha(db, cod_ficha, numero_documento)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
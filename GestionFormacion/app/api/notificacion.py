@@ -1,18 +1,18 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database import get_async_db
 from app.schemas import notificacion as schemas
 from app.schemas.users import UserOut
 from app.crud import notificacion as crud_notificacion
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user_async
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Notificacion])
-def get_notificaciones(
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+async def get_notificaciones(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene todas las notificaciones del usuario actual.
@@ -20,7 +20,7 @@ def get_notificaciones(
     Returns:
         Lista de notificaciones del usuario ordenadas por fecha descendente
     """
-    notificaciones = crud_notificacion.get_notifications_by_user_id(
+    notificaciones = await crud_notificacion.get_notifications_by_user_id(
         db=db, 
         user_id=current_user.id_usuario
     )
@@ -34,10 +34,10 @@ def get_notificaciones(
     return notificaciones
 
 @router.put("/{id_notificacion}/leer")
-def marcar_notificacion_leida(
+async def marcar_notificacion_leida(
     id_notificacion: int,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Marca una notificación como leída.
@@ -51,7 +51,7 @@ def marcar_notificacion_leida(
     Raises:
         HTTPException 404: Si la notificación no existe o no pertenece al usuario
     """
-    success = crud_notificacion.mark_notification_as_read(
+    success = await crud_notificacion.mark_notification_as_read(
         db=db,
         notificacion_id=id_notificacion,
         user_id=current_user.id_usuario
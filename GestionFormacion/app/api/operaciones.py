@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from core.cache import estadisticas_caches, estado_bus_caches
+from core.database import estado_pools
+from app.api.dependencies import get_current_user
+from app.schemas.users import UserOut
+
+router = APIRouter()
+
+@router.get("/bd")
+def get_estado_bd(
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Estado de los pools de conexiones del primario y de las réplicas de lectura:
+    conexiones en uso y libres, lecturas atendidas por cada réplica, lecturas que
+    volvieron al primario y retraso de replicación. Solo para el superadmin.
+    """
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado")
+    return estado_pools()
+
+@router.get("/caches")
+def get_estado_caches(
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Entradas, aciertos, fallos y expulsiones de las cachés en memoria de este proceso
+    (cada worker tiene las suyas). Solo para el superadmin.
+    """
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado")
+    return estadisticas_caches()
+
+@router.get("/caches/bus")
+def get_estado_bus_caches(
+    current_user: UserOut = Depends(get_current_user)
+):
+    """
+    Estado del bus de invalidación entre workers en este proceso: lecturas de
+    cache_version, errores y tablas invalidadas por cambios de otros procesos.
+    Solo para el superadmin.
+    """
+    if current_user.id_rol != 1:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado")
+    return estado_bus_caches()
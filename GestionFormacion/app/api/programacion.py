@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.schemas.programacion import (ProgramacionCreate, ProgramacionUpdate, ProgramacionOut, 
                                     CompetenciaOut, ResultadoAprendizajeOut, ValidarCruceRequest, ValidarCruceResponse)
 from app.crud import programacion as crud_programacion
-from core.database import get_db
-from app.api.dependencies import get_current_user
+from core.database import get_db, get_async_db, get_async_read_db
+from app.api.dependencies import get_current_user, get_current_user_async
 from app.schemas.users import UserOut
-from typing import List
+from typing import List, Optional
+from datetime import date, time
+from app.utils.cursores import decodificar_cursor
 
 router = APIRouter()
 
@@ -104,10 +107,10 @@ def get_resultados_by_competencia(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/instructor/{id_instructor}", response_model=List[ProgramacionOut])
-def get_programaciones_by_instructor(
+async def get_programaciones_by_instructor(
     id_instructor: int,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene todas las programaciones de un instructor específico.
@@ -119,7 +122,7 @@ def get_programaciones_by_instructor(
         raise HTTPException(status_code=403, detail="No autorizado para ver las programaciones de otro instructor")
 
     try:
-        programaciones = crud_programacion.get_programaciones_by_instructor(db, id_instructor=id_instructor)
+        programaciones = await crud_programacion.get_programaciones_by_instructor(db, id_instructor=id_instructor)
         return programaciones
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -127,21 +130,32 @@ def get_programaciones_by_instructor(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/all", response_model=List[ProgramacionOut])
-def get_all_programaciones(
+async def get_all_programaciones(
+    response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a devolver"),
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description="Cursor opaco (encabezado X-Next-Cursor de la página anterior): pagina por llave en lugar de skip"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene todas las programaciones con paginación.
     Solo superadmin (1) y admin (2) pueden ver todas las programaciones.
+    Si hay más registros, el encabezado X-Next-Cursor trae el cursor de la página siguiente.
     """
     if current_user.id_rol not in [1, 2]:
         raise HTTPException(status_code=403, detail="No autorizado para ver todas las programaciones")
+    try:
+        despues_de = decodificar_cursor(cursor, [date, time, int]) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     try:
-        programaciones = crud_programacion.get_all_programaciones(db, skip=skip, limit=limit)
+        programaciones, next_cursor = await crud_programacion.get_all_programaciones(
+            db, skip=skip, limit=limit, despues_de=despues_de
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return programaciones
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -169,16 +183,16 @@ def get_programacion_by_id(
 
 # Endpoint paramétrico general - debe ir después de los específicos
 @router.get("/{cod_ficha}", response_model=List[ProgramacionOut])
-def get_programaciones_by_ficha(
+async def get_programaciones_by_ficha(
     cod_ficha: int,
-    db: Session = Depends(get_db),
-    current_user: UserOut = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserOut = Depends(get_current_user_async)
 ):
     """
     Obtiene todas las programaciones de un grupo específico por cod_ficha.
     """
     try:
-        programaciones = crud_programacion.get_programaciones_by_ficha(db, cod_ficha=cod_ficha)
+        programaciones = await crud_programacion.get_programaciones_by_ficha(db, cod_ficha=cod_ficha)
         return programaciones
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -1,489 +1,593 @@
-from sqlalchemy import text
+from functools import lru_cache
+from typing import List, Optional, Sequence
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Connection
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 import logging
 import pandas as pd
-from app.schemas.centro_formacion import CentroFormacionCreate, CentroFormacionOut
-from app.schemas import grupos as schemas
+from app.schemas.centro_formacion import CentroFormacionOut
+from core.config import settings
 
 logger = logging.getLogger(__name__)
 
-def upsert_regional(db: Session, regional: schemas.RegionalCreate):
+# --- Escritura por lotes ---
+
+@lru_cache(maxsize=64)
+def _construir_insert_multifila(
+    tabla: str,
+    columnas: tuple,
+    columnas_actualizar: tuple,
+    num_filas: int,
+    ignorar_duplicados: bool
+):
     """
-    Inserta o actualiza una regional en la base de datos.
+    Construye (y reutiliza) la sentencia INSERT multi-fila para un tamaño de lote dado.
+    Los parámetros se nombran <columna>_<fila> para cada fila del lote.
     """
-    try:
-        query = text("""
-            INSERT INTO regional (cod_regional, nombre)
-            VALUES (:cod_regional, :nombre)
-            ON DUPLICATE KEY UPDATE nombre = VALUES(nombre)
-        """)
-        db.execute(query, regional.model_dump())
-        db.commit()
-        return True
-    except SQLAlchemyError as e:
-        db.rollback()
-        logger.error(f"Error al hacer upsert de regional: {e}")
-        raise Exception("Error de base de datos al procesar regional")
+    valores = ",\n".join(
+        "(" + ", ".join(f":{col}_{i}" for col in columnas) + ")"
+        for i in range(num_filas)
+    )
+    sql = f"INSERT {'IGNORE ' if ignorar_duplicados else ''}INTO {tabla} ({', '.join(columnas)})\nVALUES {valores}"
+    if columnas_actualizar:
+        sql += "\nON DUPLICATE KEY UPDATE " + ", ".join(
+            f"{col} = VALUES({col})" for col in columnas_actualizar
+        )
+    return text(sql)
 
-def upsert_centro_formacion(db: Session, centro: CentroFormacionCreate):
+def _registros_para_bd(df: pd.DataFrame, columnas: Sequence[str]) -> List[dict]:
     """
-    Inserta o actualiza un centro de formación en la base de datos.
+    Convierte las filas del DataFrame en diccionarios con tipos nativos de Python
+    y None en lugar de NaN/NaT. Las columnas ausentes se envían como None.
     """
-    try:
-        query = text("""
-            INSERT INTO centro_formacion (cod_centro, nombre_centro, cod_regional)
-            VALUES (:cod_centro, :nombre_centro, :cod_regional)
-            ON DUPLICATE KEY UPDATE 
-                nombre_centro = VALUES(nombre_centro),
-                cod_regional = VALUES(cod_regional)
-        """)
-        db.execute(query, centro.model_dump())
-        db.commit()
-        return True
-    except SQLAlchemyError as e:
-        db.rollback()
-        logger.error(f"Error al hacer upsert de centro de formación: {e}")
-        raise Exception("Error de base de datos al procesar centro de formación")
-
-def upsert_programas_formacion_bulk(db: Session, df_programas: pd.DataFrame):
+    datos = df.reindex(columns=list(columnas)).astype(object)
+    datos = datos.where(pd.notnull(datos), None)
+    return datos.to_dict("records")
+
+def upsert_por_lotes(
+    db: Session,
+    tabla: str,
+    columnas: Sequence[str],
+    df: pd.DataFrame,
+    columnas_actualizar: Optional[Sequence[str]] = None,
+    chunk_size: Optional[int] = None,
+    ignorar_duplicados: bool = False,
+    descripcion: Optional[str] = None
+) -> dict:
     """
-    Inserta o actualiza programas de formación en la base de datos de forma masiva.
+    Inserta o actualiza las filas del DataFrame en `tabla` enviando una sentencia
+    INSERT multi-fila por cada lote de `chunk_size` filas.
+
+    Cada lote se ejecuta dentro de un SAVEPOINT: si falla, solo se descartan las
+    filas de ese lote y se registra el error, el resto de la carga continúa.
+    No hace commit; eso le corresponde a quien llama.
+
+    Conteo a partir de rowcount (el dialecto MySQL de SQLAlchemy activa CLIENT_FOUND_ROWS):
+    - ON DUPLICATE KEY UPDATE: cada fila insertada suma 1, cada fila modificada suma 2
+      y cada fila sin cambios suma 1, por lo que actualizados = rowcount - filas del lote.
+      Igual que con la carga fila a fila, las filas sin cambios cuentan como insertadas.
+    - INSERT IGNORE: rowcount es el número de filas realmente insertadas.
+
+    Returns:
+        dict con las claves insertados, actualizados y errores
     """
-    programas_insertados = 0
-    programas_actualizados = 0
+    chunk_size = chunk_size or settings.INGESTA_CHUNK_SIZE
+    columnas = tuple(columnas)
+    columnas_actualizar = tuple(columnas_actualizar or ())
+    descripcion = descripcion or tabla
+
+    registros = _registros_para_bd(df, columnas)
+    indices = list(df.index)
+    insertados = 0
+    actualizados = 0
     errores = []
 
-    insert_programa_sql = text("""
-        INSERT INTO programa_formacion (
-            cod_programa, la_version, nombre, horas_lectivas, horas_productivas
-        ) VALUES (
-            :cod_programa, :la_version, :nombre, :horas_lectivas, :horas_productivas
+    for inicio in range(0, len(registros), chunk_size):
+        lote = registros[inicio:inicio + chunk_size]
+        query = _construir_insert_multifila(
+            tabla, columnas, columnas_actualizar, len(lote), ignorar_duplicados
         )
-        ON DUPLICATE KEY UPDATE nombre = VALUES(nombre)
-    """)
+        params = {
+            f"{col}_{i}": fila[col]
+            for i, fila in enumerate(lote)
+            for col in columnas
+        }
 
-    for idx, row in df_programas.iterrows():
         try:
-            db.execute(insert_programa_sql, row.to_dict())
-            programas_insertados += 1  # Contamos como inserción exitosa
+            with db.begin_nested():
+                result = db.execute(query, params)
         except SQLAlchemyError as e:
-            msg = f"Error al insertar programa (índice {idx}): {e}"
+            # Se usa el error original del driver para no volcar la sentencia multi-fila completa
+            msg = (f"Error al insertar {descripcion} (índices {indices[inicio]} a "
+                   f"{indices[inicio + len(lote) - 1]}, {len(lote)} filas): {getattr(e, 'orig', None) or e}")
             errores.append(msg)
-            logger.error(f"Error al insertar programa: {e}")
+            logger.error(msg, extra={"muestreo": f"upsert_por_lotes.{tabla}"})
+            continue
+
+        rowcount = max(result.rowcount or 0, 0)
+        if ignorar_duplicados:
+            insertados += rowcount
+        else:
+            actualizados_lote = min(max(rowcount - len(lote), 0), len(lote))
+            actualizados += actualizados_lote
+            insertados += len(lote) - actualizados_lote
 
-    db.commit()
     return {
-        "programas_insertados": programas_insertados,
-        "programas_actualizados": programas_actualizados,
+        "insertados": insertados,
+        "actualizados": actualizados,
         "errores": errores
     }
 
-def upsert_grupos_bulk(db: Session, df: pd.DataFrame):
+def upsert_regionales_bulk(db: Session, df_regionales: pd.DataFrame, confirmar: bool = True):
     """
-    Inserta o actualiza grupos en la base de datos de forma masiva.
+    Inserta o actualiza regionales (cod_regional, nombre) de forma masiva.
+
+    Args:
+        confirmar: Si es False no hace commit, para que la escritura quede en la misma
+            transacción que el resto de la importación
     """
-    grupos_insertados = 0
-    grupos_actualizados = 0
-    errores = []
+    resultado = upsert_por_lotes(
+        db,
+        tabla="regional",
+        columnas=["cod_regional", "nombre"],
+        columnas_actualizar=["nombre"],
+        df=df_regionales,
+        descripcion="regionales"
+    )
+
+    if confirmar:
+        db.commit()
+    return {
+        "regionales_insertadas": resultado["insertados"],
+        "regionales_actualizadas": resultado["actualizados"],
+        "errores": resultado["errores"]
+    }
 
-    insert_grupo_sql = text("""
-        INSERT INTO grupo (
-            cod_ficha, cod_centro, cod_programa, la_version, estado_grupo,
-            nombre_nivel, jornada, fecha_inicio, fecha_fin, etapa,
-            modalidad, responsable, nombre_empresa, nombre_municipio,
-            nombre_programa_especial, hora_inicio, hora_fin
-        ) VALUES (
-            :cod_ficha, :cod_centro, :cod_programa, :la_version, :estado_grupo,
-            :nombre_nivel, :jornada, :fecha_inicio, :fecha_fin, :etapa,
-            :modalidad, :responsable, :nombre_empresa, :nombre_municipio,
-            :nombre_programa_especial, :hora_inicio, :hora_fin
-        )
-        ON DUPLICATE KEY UPDATE
-            cod_centro = VALUES(cod_centro),
-            cod_programa = VALUES(cod_programa),
-            la_version = VALUES(la_version),
-            estado_grupo = VALUES(estado_grupo),
-            nombre_nivel = VALUES(nombre_nivel),
-            jornada = VALUES(jornada),
-            fecha_inicio = VALUES(fecha_inicio),
-            fecha_fin = VALUES(fecha_fin),
-            etapa = VALUES(etapa),
-            modalidad = VALUES(modalidad),
-            responsable = VALUES(responsable),
-            nombre_empresa = VALUES(nombre_empresa),
-            nombre_municipio = VALUES(nombre_municipio),
-            nombre_programa_especial = VALUES(nombre_programa_especial),
-            hora_inicio = VALUES(hora_inicio),
-            hora_fin = VALUES(hora_fin)
-    """)
-
-    for idx, row in df.iterrows():
-        try:
-            result = db.execute(insert_grupo_sql, row.to_dict())
-            if result.rowcount == 1:
-                grupos_insertados += 1
-            elif result.rowcount == 2:
-                grupos_actualizados += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar grupo (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar grupo: {e}")
+def upsert_centros_formacion_bulk(db: Session, df_centros: pd.DataFrame, confirmar: bool = True):
+    """
+    Inserta o actualiza centros de formación (cod_centro, nombre_centro, cod_regional)
+    de forma masiva. Ver upsert_regionales_bulk para `confirmar`.
+    """
+    resultado = upsert_por_lotes(
+        db,
+        tabla="centro_formacion",
+        columnas=["cod_centro", "nombre_centro", "cod_regional"],
+        columnas_actualizar=["nombre_centro", "cod_regional"],
+        df=df_centros,
+        descripcion="centros de formación"
+    )
+
+    if confirmar:
+        db.commit()
+    return {
+        "centros_insertados": resultado["insertados"],
+        "centros_actualizados": resultado["actualizados"],
+        "errores": resultado["errores"]
+    }
+
+def upsert_programas_formacion_bulk(db: Session, df_programas: pd.DataFrame, confirmar: bool = True):
+    """
+    Inserta o actualiza programas de formación en la base de datos de forma masiva.
+    """
+    resultado = upsert_por_lotes(
+        db,
+        tabla="programa_formacion",
+        columnas=["cod_programa", "la_version", "nombre", "horas_lectivas", "horas_productivas"],
+        columnas_actualizar=["nombre"],
+        df=df_programas,
+        descripcion="programas"
+    )
+
+    if confirmar:
+        db.commit()
+    return {
+        "programas_insertados": resultado["insertados"],
+        "programas_actualizados": resultado["actualizados"],
+        "errores": resultado["errores"]
+    }
 
-    db.commit()
+def upsert_grupos_bulk(db: Session, df: pd.DataFrame, confirmar: bool = True):
+    """
+    Inserta o actualiza grupos en la base de datos de forma masiva.
+    """
+    columnas = [
+        "cod_ficha", "cod_centro", "cod_programa", "la_version", "estado_grupo",
+        "nombre_nivel", "jornada", "fecha_inicio", "fecha_fin", "etapa",
+        "modalidad", "responsable", "nombre_empresa", "nombre_municipio",
+        "nombre_programa_especial", "hora_inicio", "hora_fin"
+    ]
+
+    # hora_inicio y hora_fin solo se escriben al crear el grupo: el P04 no trae horario
+    # y las horas asignadas desde la aplicación no deben volver a 00:00:00
+    resultado = upsert_por_lotes(
+        db,
+        tabla="grupo",
+        columnas=columnas,
+        columnas_actualizar=[col for col in columnas if col not in ("cod_ficha", "hora_inicio", "hora_fin")],
+        df=df,
+        descripcion="grupos"
+    )
+
+    if confirmar:
+        db.commit()
     return {
-        "grupos_insertados": grupos_insertados,
-        "grupos_actualizados": grupos_actualizados,
-        "errores": errores
+        "grupos_insertados": resultado["insertados"],
+        "grupos_actualizados": resultado["actualizados"],
+        "errores": resultado["errores"]
     }
 
-def upsert_datos_grupo_bulk(db: Session, df_datos_grupo: pd.DataFrame):
+def get_estado_grupos_por_centros(db: Session, centros: Sequence[int]) -> pd.DataFrame:
     """
-    Inserta o actualiza datos de grupo en la base de datos de forma masiva.
+    Obtiene en una sola consulta el estado actual de grupo y datos_grupo de todas las
+    fichas de los centros indicados, indexado por cod_ficha. Se usa para comparar el
+    P04 contra la base de datos y escribir solo las fichas nuevas o con cambios.
     """
-    datos_insertados = 0
-    datos_actualizados = 0
-    errores = []
+    columnas = [
+        "cod_ficha", "cod_centro", "cod_programa", "la_version", "estado_grupo",
+        "nombre_nivel", "jornada", "fecha_inicio", "fecha_fin", "etapa", "modalidad",
+        "responsable", "nombre_empresa", "nombre_municipio", "nombre_programa_especial",
+        "num_aprendices_masculinos", "num_aprendices_femenino", "num_aprendices_no_binario",
+        "num_total_aprendices", "num_total_aprendices_activos", "tiene_datos_grupo"
+    ]
+    try:
+        query = text("""
+            SELECT g.cod_ficha, g.cod_centro, g.cod_programa, g.la_version, g.estado_grupo,
+                   g.nombre_nivel, g.jornada, g.fecha_inicio, g.fecha_fin, g.etapa, g.modalidad,
+                   g.responsable, g.nombre_empresa, g.nombre_municipio, g.nombre_programa_especial,
+                   dg.num_aprendices_masculinos, dg.num_aprendices_femenino, dg.num_aprendices_no_binario,
+                   dg.num_total_aprendices, dg.num_total_aprendices_activos,
+                   dg.cod_ficha IS NOT NULL AS tiene_datos_grupo
+            FROM grupo g
+            LEFT JOIN datos_grupo dg ON dg.cod_ficha = g.cod_ficha
+            WHERE g.cod_centro IN :centros
+        """).bindparams(bindparam("centros", expanding=True))
+        filas = db.execute(query, {"centros": [int(c) for c in centros]}).fetchall()
+        return pd.DataFrame.from_records(filas, columns=columnas).set_index("cod_ficha")
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener el estado actual de los grupos: {e}")
+        raise Exception("Error de base de datos al obtener el estado actual de los grupos")
+
+# Consultas de las llaves existentes que usa la validación previa (dry_run) de los archivos
+_CONSULTAS_CLAVES = {
+    "regionales": "SELECT cod_regional FROM regional",
+    "centros": "SELECT cod_centro FROM centro_formacion",
+    "programas": "SELECT cod_programa, la_version FROM programa_formacion",
+    "fichas_grupo": "SELECT cod_ficha FROM grupo",
+    "fichas_datos_grupo": "SELECT cod_ficha FROM datos_grupo"
+}
+
+def get_claves_existentes(db: Session, conjuntos: Sequence[str]) -> dict:
+    """
+    Obtiene, con una consulta por conjunto, las llaves que ya existen en la base de datos
+    para validar las llaves foráneas de un archivo sin escribir nada.
 
-    insert_datos_sql = text("""
-        INSERT INTO datos_grupo (
-            cod_ficha, num_aprendices_masculinos, num_aprendices_femenino,
-            num_aprendices_no_binario, num_total_aprendices, num_total_aprendices_activos
-        ) VALUES (
-            :cod_ficha, :num_aprendices_masculinos, :num_aprendices_femenino,
-            :num_aprendices_no_binario, :num_total_aprendices, :num_total_aprendices_activos
-        )
-        ON DUPLICATE KEY UPDATE
-            num_aprendices_masculinos = VALUES(num_aprendices_masculinos),
-            num_aprendices_femenino = VALUES(num_aprendices_femenino),
-            num_aprendices_no_binario = VALUES(num_aprendices_no_binario),
-            num_total_aprendices = VALUES(num_total_aprendices),
-            num_total_aprendices_activos = VALUES(num_total_aprendices_activos)
-    """)
-
-    for idx, row in df_datos_grupo.iterrows():
-        try:
-            # Filtrar solo las columnas necesarias y con valores no nulos
-            data_dict = {
-                'cod_ficha': row['cod_ficha'],
-                'num_aprendices_masculinos': row.get('num_aprendices_masculinos'),
-                'num_aprendices_femenino': row.get('num_aprendices_femenino'),
-                'num_aprendices_no_binario': row.get('num_aprendices_no_binario'),
-                'num_total_aprendices': row.get('num_total_aprendices'),
-                'num_total_aprendices_activos': row.get('num_total_aprendices_activos')
+    Args:
+        conjuntos: Nombres de _CONSULTAS_CLAVES (regionales, centros, programas,
+            fichas_grupo, fichas_datos_grupo)
+
+    Returns:
+        dict: Un set por conjunto; enteros para llaves simples y tuplas para compuestas
+    """
+    claves = {}
+    try:
+        for conjunto in conjuntos:
+            filas = db.execute(text(_CONSULTAS_CLAVES[conjunto])).fetchall()
+            claves[conjunto] = {
+                int(fila[0]) if len(fila) == 1 else tuple(int(valor) for valor in fila)
+                for fila in filas
             }
-            
-            db.execute(insert_datos_sql, data_dict)
-            datos_insertados += 1  # Contamos como inserción exitosa
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar datos de grupo (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar datos de grupo: {e}")
+        return claves
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener las llaves existentes para validación: {e}")
+        raise Exception("Error de base de datos al obtener las llaves existentes para validación")
 
-    db.commit()
+def upsert_datos_grupo_bulk(db: Session, df_datos_grupo: pd.DataFrame, confirmar: bool = True):
+    """
+    Inserta o actualiza datos de grupo en la base de datos de forma masiva.
+    """
+    # Las columnas que no vengan en el DataFrame se envían como NULL
+    columnas = [
+        "cod_ficha", "num_aprendices_masculinos", "num_aprendices_femenino",
+        "num_aprendices_no_binario", "num_total_aprendices", "num_total_aprendices_activos"
+    ]
+
+    resultado = upsert_por_lotes(
+        db,
+        tabla="datos_grupo",
+        columnas=columnas,
+        columnas_actualizar=columnas[1:],
+        df=df_datos_grupo,
+        descripcion="datos de grupo"
+    )
+
+    if confirmar:
+        db.commit()
     return {
-        "datos_insertados": datos_insertados,
-        "datos_actualizados": datos_actualizados,
-        "errores": errores
+        "datos_insertados": resultado["insertados"],
+        "datos_actualizados": resultado["actualizados"],
+        "errores": resultado["errores"]
     }
 
-def insertar_datos_en_bd(db: Session, df_programas, df):
+# --- Aplicación del DF-14 mediante tablas de staging ---
+
+_STAGING_DF14_PROGRAMA = "tmp_df14_programa"
+_STAGING_DF14_DATOS_GRUPO = "tmp_df14_datos_grupo"
+
+COLUMNAS_DF14_PROGRAMA = ["cod_programa", "la_version", "horas_lectivas", "horas_productivas"]
+COLUMNAS_DF14_DATOS_GRUPO = [
+    "cod_ficha", "cupo_total", "en_transito", "induccion", "formacion", "condicionado",
+    "aplazado", "retiro_voluntario", "cancelado", "cancelamiento_vit_comp",
+    "desercion_vit_comp", "por_certificar", "certificados", "traslados", "otro"
+]
+
+# Máximo de fichas sin coincidencia que se listan en el resultado
+MUESTRA_SIN_COINCIDENCIA = 50
+
+def _crear_staging_df14(db: Session):
     """
-    Función legacy mantenida para compatibilidad. 
-    Se recomienda usar las funciones upsert específicas.
+    Crea las tablas temporales del DF-14. Las tablas TEMPORARY son propias de la
+    conexión y crearlas o borrarlas no hace commit implícito, así que todo el
+    proceso queda dentro de una sola transacción.
     """
-    programas_insertados = 0
-    programas_actualizados = 0
-    grupos_insertados = 0
-    grupos_actualizados = 0
-    errores = []
-
-    # 1. Insertar programas
-    insert_programa_sql = text("""
-        INSERT INTO programa_formacion (
-            cod_programa, la_version, nombre, horas_lectivas, horas_productivas
-        ) VALUES (
-            :cod_programa, :la_version, :nombre, :horas_lectivas, :horas_productivas
+    db.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {_STAGING_DF14_PROGRAMA}"))
+    db.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {_STAGING_DF14_DATOS_GRUPO}"))
+    db.execute(text(f"""
+        CREATE TEMPORARY TABLE {_STAGING_DF14_PROGRAMA} (
+            cod_programa INT NOT NULL,
+            la_version INT NOT NULL,
+            horas_lectivas INT,
+            horas_productivas INT,
+            PRIMARY KEY (cod_programa, la_version)
         )
-        ON DUPLICATE KEY UPDATE nombre = VALUES(nombre)
-    """)
-
-    for idx, row in df_programas.iterrows():
-        try:
-            result = db.execute(insert_programa_sql, row.to_dict())
-            rowcount = result.rowcount or 0
-            if rowcount == 1:
-                programas_insertados += 1
-            elif rowcount == 2:
-                programas_actualizados += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar programa (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar: {e}")
-
-    # 2. Insertar grupos
-    insert_grupo_sql = text("""
-        INSERT INTO grupo (
-            cod_ficha, cod_centro, cod_programa, la_version, estado_grupo,
-            nombre_nivel, jornada, fecha_inicio, fecha_fin, etapa,
-            modalidad, responsable, nombre_empresa, nombre_municipio,
-            nombre_programa_especial, hora_inicio, hora_fin
-        ) VALUES (
-            :cod_ficha, :cod_centro, :cod_programa, :la_version, :estado_grupo,
-            :nombre_nivel, :jornada, :fecha_inicio, :fecha_fin, :etapa,
-            :modalidad, :responsable, :nombre_empresa, :nombre_municipio,
-            :nombre_programa_especial, :hora_inicio, :hora_fin
+    """))
+    columnas_estado = ",\n            ".join(f"{col} INT" for col in COLUMNAS_DF14_DATOS_GRUPO[1:])
+    db.execute(text(f"""
+        CREATE TEMPORARY TABLE {_STAGING_DF14_DATOS_GRUPO} (
+            cod_ficha INT NOT NULL PRIMARY KEY,
+            {columnas_estado}
         )
-        ON DUPLICATE KEY UPDATE
-            estado_grupo=VALUES(estado_grupo),
-            etapa=VALUES(etapa),
-            responsable=VALUES(responsable),
-            nombre_programa_especial=VALUES(nombre_programa_especial),
-            hora_inicio=VALUES(hora_inicio),
-            hora_fin=VALUES(hora_fin)
-    """)
-
-    for idx, row in df.iterrows():
-        try:
-            result = db.execute(insert_grupo_sql, row.to_dict())
-            rowcount = result.rowcount or 0
-            if rowcount == 1:
-                grupos_insertados += 1
-            elif rowcount == 2:
-                grupos_actualizados += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar grupo (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar: {e}")
+    """))
 
-    # Confirmar cambios
-    db.commit()
+def _borrar_staging_df14(conexion: Connection):
+    try:
+        conexion.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {_STAGING_DF14_PROGRAMA}"))
+        conexion.execute(text(f"DROP TEMPORARY TABLE IF EXISTS {_STAGING_DF14_DATOS_GRUPO}"))
+    except SQLAlchemyError as e:
+        logger.error(f"Error al borrar las tablas de staging del DF-14: {e}")
 
-    return {
-        "programas_insertados": programas_insertados,
-        "programas_actualizados": programas_actualizados,
-        "grupos_insertados": grupos_insertados,
-        "grupos_actualizados": grupos_actualizados,
-        "errores": errores,
-        "mensaje": "Carga completada con errores" if errores else "Carga completada exitosamente"
-    }
+def _aplicar_staging_df14(db: Session) -> tuple:
+    """
+    Cuenta las coincidencias de las tablas de staging con programa_formacion y
+    datos_grupo y actualiza cada una con un único UPDATE ... JOIN.
 
-def update_programas_duracion_bulk(db: Session, df_programas: pd.DataFrame):
+    Returns:
+        tuple: (programas en staging, programas que coinciden, fichas en staging,
+        fichas que coinciden, muestra de fichas sin coincidencia)
     """
-    Actualiza las duraciones de los programas de formación con datos del archivo DF-14.
+    programas_staging, programas_coinciden = db.execute(text(f"""
+        SELECT COUNT(*), COUNT(p.cod_programa)
+        FROM {_STAGING_DF14_PROGRAMA} s
+        LEFT JOIN programa_formacion p
+            ON p.cod_programa = s.cod_programa AND p.la_version = s.la_version
+    """)).one()
+    fichas_staging, fichas_coinciden = db.execute(text(f"""
+        SELECT COUNT(*), COUNT(dg.cod_ficha)
+        FROM {_STAGING_DF14_DATOS_GRUPO} s
+        LEFT JOIN datos_grupo dg ON dg.cod_ficha = s.cod_ficha
+    """)).one()
+    muestra = db.execute(text(f"""
+        SELECT s.cod_ficha
+        FROM {_STAGING_DF14_DATOS_GRUPO} s
+        LEFT JOIN datos_grupo dg ON dg.cod_ficha = s.cod_ficha
+        WHERE dg.cod_ficha IS NULL
+        ORDER BY s.cod_ficha
+        LIMIT :limite
+    """), {"limite": MUESTRA_SIN_COINCIDENCIA}).scalars().all()
+
+    db.execute(text(f"""
+        UPDATE programa_formacion p
+        JOIN {_STAGING_DF14_PROGRAMA} s
+            ON p.cod_programa = s.cod_programa AND p.la_version = s.la_version
+        SET p.horas_lectivas = s.horas_lectivas,
+            p.horas_productivas = s.horas_productivas
+    """))
+    set_clause = ",\n            ".join(f"dg.{col} = s.{col}" for col in COLUMNAS_DF14_DATOS_GRUPO[1:])
+    db.execute(text(f"""
+        UPDATE datos_grupo dg
+        JOIN {_STAGING_DF14_DATOS_GRUPO} s ON dg.cod_ficha = s.cod_ficha
+        SET {set_clause}
+    """))
+    return programas_staging, programas_coinciden, fichas_staging, fichas_coinciden, muestra
+
+def aplicar_df14_staging(db: Session, df_programas: pd.DataFrame, df_datos_grupo: pd.DataFrame) -> dict:
     """
-    programas_actualizados = 0
-    errores = []
+    Aplica el DF-14 en una sola transacción:
 
-    update_programa_sql = text("""
-        UPDATE programa_formacion 
-        SET horas_lectivas = :horas_lectivas, 
-            horas_productivas = :horas_productivas 
-        WHERE cod_programa = :cod_programa AND la_version = :la_version
-    """)
+    1. Carga las duraciones y los estados de aprendices en tablas temporales de staging
+       con INSERT multi-fila por lotes.
+    2. Cuenta cuántas filas coinciden con programa_formacion y datos_grupo.
+    3. Actualiza cada tabla con un único UPDATE ... JOIN contra su staging.
+
+    Si cualquier paso falla se hace rollback de todo: no quedan fichas a medio actualizar.
+    Las tablas de staging se borran siempre, en la misma conexión que las creó.
+    """
+    resultados = {
+        "programas_actualizados": 0,
+        "programas_sin_coincidencia": 0,
+        "datos_grupo_actualizados": 0,
+        "fichas_sin_coincidencia": 0,
+        "fichas_sin_coincidencia_muestra": [],
+        "errores": []
+    }
 
-    for idx, row in df_programas.iterrows():
+    try:
+        # Las tablas TEMPORARY son de la conexión: después del commit o del rollback la
+        # sesión devuelve la suya al pool, así que se borran antes y sobre esta misma
+        conexion = db.connection()
+        errores_staging = []
         try:
-            # Filtrar solo los campos necesarios
-            data_dict = {
-                'cod_programa': row['cod_programa'],
-                'la_version': row['la_version'],
-                'horas_lectivas': row.get('horas_lectivas', 0),
-                'horas_productivas': row.get('horas_productivas', 0)
-            }
-            
-            db.execute(update_programa_sql, data_dict)
-            programas_actualizados += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al actualizar programa {row['cod_programa']}-{row['la_version']} (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al actualizar programa: {e}")
+            _crear_staging_df14(db)
+
+            # 1. Carga en staging (los duplicados del archivo conservan la primera fila)
+            for tabla, columnas, df, descripcion in (
+                (_STAGING_DF14_PROGRAMA, COLUMNAS_DF14_PROGRAMA, df_programas, "staging de programas"),
+                (_STAGING_DF14_DATOS_GRUPO, COLUMNAS_DF14_DATOS_GRUPO, df_datos_grupo, "staging de datos de grupo")
+            ):
+                carga = upsert_por_lotes(db, tabla, columnas, df, ignorar_duplicados=True, descripcion=descripcion)
+                if carga["errores"]:
+                    errores_staging = carga["errores"]
+                    break
+
+            # 2 y 3. Coincidencias y actualización por conjuntos
+            if not errores_staging:
+                programas_staging, programas_coinciden, fichas_staging, fichas_coinciden, muestra = _aplicar_staging_df14(db)
+        finally:
+            _borrar_staging_df14(conexion)
+
+        if errores_staging:
+            db.rollback()
+            resultados["errores"].extend(errores_staging)
+            resultados["errores"].append("No se aplicó ningún cambio del DF-14 porque falló la carga en staging")
+            return resultados
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error al aplicar el DF-14: {e}")
+        raise Exception("Error de base de datos al aplicar el DF-14; no se aplicó ningún cambio")
 
-    db.commit()
-    return {
-        "programas_actualizados": programas_actualizados,
-        "errores": errores
-    }
+    resultados["programas_actualizados"] = int(programas_coinciden)
+    resultados["programas_sin_coincidencia"] = int(programas_staging - programas_coinciden)
+    resultados["datos_grupo_actualizados"] = int(fichas_coinciden)
+    resultados["fichas_sin_coincidencia"] = int(fichas_staging - fichas_coinciden)
+    resultados["fichas_sin_coincidencia_muestra"] = [int(ficha) for ficha in muestra]
+    return resultados
 
-def update_datos_grupo_bulk(db: Session, df_datos_grupo: pd.DataFrame):
+def upsert_competencia_bulk(db: Session, df_competencias: pd.DataFrame, confirmar: bool = True):
     """
-    Actualiza los datos de grupo con información del archivo DF-14.
+    Inserta o actualiza competencias (cod_competencia, nombre, horas) de forma masiva.
+    Ver upsert_regionales_bulk para `confirmar`.
     """
-    datos_actualizados = 0
-    errores = []
-
-    update_datos_sql = text("""
-        UPDATE datos_grupo 
-        SET cupo_total = :cupo_total,
-            en_transito = :en_transito,
-            induccion = :induccion,
-            formacion = :formacion,
-            condicionado = :condicionado,
-            aplazado = :aplazado,
-            retiro_voluntario = :retiro_voluntario,
-            cancelado = :cancelado,
-            cancelamiento_vit_comp = :cancelamiento_vit_comp,
-            desercion_vit_comp = :desercion_vit_comp,
-            por_certificar = :por_certificar,
-            certificados = :certificados,
-            traslados = :traslados,
-            otro = :otro
-        WHERE cod_ficha = :cod_ficha
-    """)
-
-    for idx, row in df_datos_grupo.iterrows():
-        try:
-            # Preparar los datos para la actualización
-            data_dict = {
-                'cod_ficha': row['cod_ficha'],
-                'cupo_total': row.get('cupo_total'),
-                'en_transito': row.get('en_transito'),
-                'induccion': row.get('induccion'),
-                'formacion': row.get('formacion'),
-                'condicionado': row.get('condicionado'),
-                'aplazado': row.get('aplazado'),
-                'retiro_voluntario': row.get('retiro_voluntario'),
-                'cancelado': row.get('cancelado'),
-                'cancelamiento_vit_comp': row.get('cancelamiento_vit_comp'),
-                'desercion_vit_comp': row.get('desercion_vit_comp'),
-                'por_certificar': row.get('por_certificar'),
-                'certificados': row.get('certificados'),
-                'traslados': row.get('traslados'),
-                'otro': row.get('otro')
-            }
-            
-            db.execute(update_datos_sql, data_dict)
-            datos_actualizados += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al actualizar datos del grupo {row['cod_ficha']} (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al actualizar datos de grupo: {e}")
-
-    db.commit()
+    df = df_competencias.assign(nombre=df_competencias["nombre"].fillna("").astype(str).str[:500])
+    resultado = upsert_por_lotes(
+        db,
+        tabla="competencia",
+        columnas=["cod_competencia", "nombre", "horas"],
+        columnas_actualizar=["nombre", "horas"],
+        df=df,
+        descripcion="competencias"
+    )
+
+    if confirmar:
+        db.commit()
     return {
-        "datos_actualizados": datos_actualizados,
-        "errores": errores
+        "competencias_insertadas": resultado["insertados"],
+        "competencias_actualizadas": resultado["actualizados"],
+        "errores": resultado["errores"]
     }
 
-def upsert_competencia_bulk(db: Session, df_competencias: pd.DataFrame):
+def upsert_resultado_aprendizaje_bulk(db: Session, df_resultados: pd.DataFrame, confirmar: bool = True):
     """
-    Inserta o actualiza competencias en la base de datos en lote.
+    Inserta o actualiza resultados de aprendizaje (cod_resultado, nombre, cod_competencia)
+    de forma masiva. Ver upsert_regionales_bulk para `confirmar`.
     """
-    competencias_insertadas = 0
-    errores = []
-    
-    upsert_sql = text("""
-        INSERT INTO competencia (cod_competencia, nombre, horas)
-        VALUES (:cod_competencia, :nombre, :horas)
-        ON DUPLICATE KEY UPDATE 
-            nombre = VALUES(nombre),
-            horas = VALUES(horas)
-    """)
-    
-    for idx, row in df_competencias.iterrows():
-        try:
-            data_dict = {
-                'cod_competencia': row.get('cod_competencia'),
-                'nombre': row.get('nombre', '')[:500],  # Limitar longitud
-                'horas': row.get('horas', 0)
-            }
-            
-            db.execute(upsert_sql, data_dict)
-            competencias_insertadas += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar competencia {row['cod_competencia']} (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar competencia: {e}")
-
-    db.commit()
+    df = df_resultados.assign(nombre=df_resultados["nombre"].fillna("").astype(str).str[:500])
+    resultado = upsert_por_lotes(
+        db,
+        tabla="resultado_aprendizaje",
+        columnas=["cod_resultado", "nombre", "cod_competencia"],
+        columnas_actualizar=["nombre", "cod_competencia"],
+        df=df,
+        descripcion="resultados de aprendizaje"
+    )
+
+    if confirmar:
+        db.commit()
     return {
-        "competencias_insertadas": competencias_insertadas,
-        "errores": errores
+        "resultados_insertados": resultado["insertados"],
+        "resultados_actualizados": resultado["actualizados"],
+        "errores": resultado["errores"]
     }
 
-def upsert_resultado_aprendizaje_bulk(db: Session, df_resultados: pd.DataFrame):
+def upsert_programa_competencia_bulk(db: Session, df_programa_competencia: pd.DataFrame, confirmar: bool = True):
     """
-    Inserta o actualiza resultados de aprendizaje en la base de datos en lote.
+    Inserta relaciones programa-competencia (cod_programa, la_version, cod_competencia)
+    de forma masiva con INSERT IGNORE, sin cod_prog_competencia, que es AUTO_INCREMENT;
+    la llave única uq_programa_competencia evita duplicarlas al recargar un reporte.
+    Ver upsert_regionales_bulk para `confirmar`.
     """
-    resultados_insertados = 0
-    errores = []
-    
-    upsert_sql = text("""
-        INSERT INTO resultado_aprendizaje (cod_resultado, nombre, cod_competencia)
-        VALUES (:cod_resultado, :nombre, :cod_competencia)
-        ON DUPLICATE KEY UPDATE 
-            nombre = VALUES(nombre),
-            cod_competencia = VALUES(cod_competencia)
-    """)
-    
-    for idx, row in df_resultados.iterrows():
-        try:
-            data_dict = {
-                'cod_resultado': row.get('cod_resultado'),
-                'nombre': row.get('nombre', '')[:500],  # Limitar longitud
-                'cod_competencia': row.get('cod_competencia')
-            }
-            
-            db.execute(upsert_sql, data_dict)
-            resultados_insertados += 1
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar resultado de aprendizaje {row['cod_resultado']} (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar resultado de aprendizaje: {e}")
-
-    db.commit()
+    resultado = upsert_por_lotes(
+        db,
+        tabla="programa_competencia",
+        columnas=["cod_programa", "la_version", "cod_competencia"],
+        df=df_programa_competencia,
+        ignorar_duplicados=True,
+        descripcion="relaciones programa-competencia"
+    )
+
+    if confirmar:
+        db.commit()
     return {
-        "resultados_insertados": resultados_insertados,
-        "errores": errores
+        "relaciones_insertadas": resultado["insertados"],
+        "errores": resultado["errores"]
     }
 
-def upsert_programa_competencia_bulk(db: Session, df_programa_competencia: pd.DataFrame):
+def get_programas_por_ficha(db: Session, fichas: Optional[Sequence[int]] = None) -> dict:
     """
-    Inserta o actualiza relaciones programa-competencia en la base de datos en lote.
-    """
-    relaciones_insertadas = 0
-    errores = []
-    
-    print(f"CRUD: Iniciando inserción de {len(df_programa_competencia)} relaciones programa-competencia")
-    
-    # Usar INSERT IGNORE para evitar duplicados, sin especificar cod_prog_competencia (AUTO_INCREMENT)
-    upsert_sql = text("""
-        INSERT IGNORE INTO programa_competencia (cod_programa, cod_competencia)
-        VALUES (:cod_programa, :cod_competencia)
-    """)
-    
-    for idx, row in df_programa_competencia.iterrows():
-        try:
-            data_dict = {
-                'cod_programa': row.get('cod_programa'),
-                'cod_competencia': row.get('cod_competencia')
-            }
-            
-            print(f"CRUD: Insertando relación {idx+1}: programa={data_dict['cod_programa']}, competencia={data_dict['cod_competencia']}")
-            
-            result = db.execute(upsert_sql, data_dict)
-            if result.rowcount > 0:  # Si se insertó una nueva fila
-                relaciones_insertadas += 1
-                print(f"CRUD: Relación insertada exitosamente (rowcount: {result.rowcount})")
-            else:
-                print(f"CRUD: Relación ya existía, no se insertó (rowcount: {result.rowcount})")
-                
-        except SQLAlchemyError as e:
-            msg = f"Error al insertar programa-competencia programa:{row.get('cod_programa')} competencia:{row.get('cod_competencia')} (índice {idx}): {e}"
-            errores.append(msg)
-            logger.error(f"Error al insertar programa-competencia: {e}")
-            print(f"CRUD: ERROR - {msg}")
+    Programa de formación y versión de las fichas de grupo, en una sola consulta: de
+    todas las fichas si `fichas` es None, o solo de las indicadas.
 
+    Returns:
+        dict: cod_ficha -> (cod_programa, la_version)
+    """
     try:
+        if fichas is None:
+            filas = db.execute(text("""
+                SELECT cod_ficha, cod_programa, la_version
+                FROM grupo
+            """)).fetchall()
+        elif not fichas:
+            return {}
+        else:
+            query = text("""
+                SELECT cod_ficha, cod_programa, la_version
+                FROM grupo
+                WHERE cod_ficha IN :fichas
+            """).bindparams(bindparam("fichas", expanding=True))
+            filas = db.execute(query, {"fichas": [int(ficha) for ficha in fichas]}).fetchall()
+        return {int(fila[0]): (int(fila[1]), int(fila[2])) for fila in filas}
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener los programas de las fichas: {e}")
+        raise Exception("Error de base de datos al obtener los programas de las fichas")
+
+def upsert_juicios_evaluacion_bulk(db: Session, df_juicios: pd.DataFrame, confirmar: bool = True):
+    """
+    Carga los juicios evaluativos por aprendiz con INSERT multi-fila por lotes.
+
+    La llave única (cod_ficha, numero_documento, cod_resultado) hace la carga idempotente:
+    volver a subir el mismo reporte actualiza el juicio, la fecha y el funcionario en
+    lugar de duplicar filas. Ver upsert_regionales_bulk para `confirmar`.
+    """
+    columnas = [
+        "cod_ficha", "tipo_documento", "numero_documento", "nombre_aprendiz", "apellidos_aprendiz",
+        "estado_aprendiz", "cod_competencia", "cod_resultado", "juicio", "fecha_hora_juicio",
+        "funcionario_registro"
+    ]
+    resultado = upsert_por_lotes(
+        db,
+        "juicio_evaluacion",
+        columnas,
+        df_juicios,
+        columnas_actualizar=[
+            "tipo_documento", "nombre_aprendiz", "apellidos_aprendiz", "estado_aprendiz",
+            "cod_competencia", "juicio", "fecha_hora_juicio", "funcionario_registro"
+        ],
+        descripcion="juicios evaluativos"
+    )
+    if confirmar:
         db.commit()
-        print(f"CRUD: Commit exitoso. Total relaciones insertadas: {relaciones_insertadas}")
-    except Exception as e:
-        db.rollback()
-        error_msg = f"Error en commit: {e}"
-        errores.append(error_msg)
-        print(f"CRUD: ERROR en commit - {error_msg}")
-    
     return {
-        "relaciones_insertadas": relaciones_insertadas,
-        "errores": errores
+        "juicios_insertados": resultado["insertados"],
+        "juicios_actualizados": resultado["actualizados"],
+        "errores": resultado["errores"]
     }
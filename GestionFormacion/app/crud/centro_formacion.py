@@ -3,19 +3,25 @@ from sqlalchemy import text
 from typing import Optional, List
 from sqlalchemy.exc import SQLAlchemyError
 from app.schemas.centro_formacion import CentroFormacionOut
+from core.cache import cache_catalogo
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+# Catálogo de centros; solo cambia con la carga P04 (/files/upload-excel)
+_cache_centros = cache_catalogo("centros", ("centro_formacion", "regional"))
+
 def get_all_centros_formacion(db: Session) -> List[CentroFormacionOut]:
     """
     Obtiene todos los centros de formación.
     """
     try:
         query = text("SELECT * FROM centro_formacion")
-        results = db.execute(query).mappings().all()
-        return [CentroFormacionOut.model_validate(result) for result in results]
+        return _cache_centros.obtener_o_cargar(
+            ("todos",),
+            lambda: [CentroFormacionOut.model_validate(result) for result in db.execute(query).mappings().all()]
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener centros de formación: {e}")
         raise
@@ -27,8 +33,10 @@ def get_centro_formacion_by_cod_centro(db: Session, cod_centro: int) -> Optional
     """
     try:
         query = text("SELECT * FROM centro_formacion WHERE cod_centro = :cod_centro")
-        result = db.execute(query, {"cod_centro": cod_centro}).mappings().first()
-        return CentroFormacionOut.model_validate(result)
+        return _cache_centros.obtener_o_cargar(
+            ("por_codigo", cod_centro),
+            lambda: CentroFormacionOut.model_validate(db.execute(query, {"cod_centro": cod_centro}).mappings().first())
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener el centro de formación {cod_centro}: {e}")
         raise
@@ -40,8 +48,10 @@ def get_centro_formacion_by_nombre(db: Session, nombre_centro: str) -> Optional[
     """
     try:
         query = text("SELECT * FROM centro_formacion WHERE nombre_centro = :nombre_centro")
-        result = db.execute(query, {"nombre_centro": nombre_centro}).mappings().first()
-        return CentroFormacionOut.model_validate(result)
+        return _cache_centros.obtener_o_cargar(
+            ("por_nombre", nombre_centro),
+            lambda: CentroFormacionOut.model_validate(db.execute(query, {"nombre_centro": nombre_centro}).mappings().first())
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener el centro de formación por el nombre del centro {nombre_centro}: {e}")
         raise
@@ -53,8 +63,13 @@ def get_centro_formacion_by_cod_regional(db: Session, cod_regional: int) -> List
     """
     try:
         query = text("SELECT * FROM centro_formacion WHERE cod_regional = :cod_regional")
-        results = db.execute(query, {"cod_regional": cod_regional}).mappings().all()
-        return [CentroFormacionOut.model_validate(result) for result in results]
+        return _cache_centros.obtener_o_cargar(
+            ("por_regional", cod_regional),
+            lambda: [
+                CentroFormacionOut.model_validate(result)
+                for result in db.execute(query, {"cod_regional": cod_regional}).mappings().all()
+            ]
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener el centro de formación con el codigo de regional {cod_regional}: {e}")
         raise
@@ -3,10 +3,15 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.schemas.competencia import CompetenciaCreate, CompetenciaUpdate
 from typing import List
+from core.cache import cache_catalogo, marcar_cambio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Catálogo de competencias y su relación con los programas; lo invalidan las escrituras
+# de este módulo y las cargas de evaluaciones (/files/upload-evaluaciones-*)
+_cache_competencias = cache_catalogo("competencias", ("competencia", "programa_competencia", "programa_formacion"))
+
 def get_competencias_by_programa(db: Session, cod_programa: int, la_version: int = None):
     """
     Obtiene todas las competencias asociadas a un programa de formación específico.
@@ -20,10 +25,10 @@ def get_competencias_by_programa(db: Session, cod_programa: int, la_version: int
             WHERE pc.cod_programa = :cod_programa
             ORDER BY c.cod_competencia
         """)
-        result = db.execute(query, {
-            "cod_programa": cod_programa
-        }).mappings().all()
-        return result
+        return _cache_competencias.obtener_o_cargar(
+            ("por_programa", cod_programa),
+            lambda: db.execute(query, {"cod_programa": cod_programa}).mappings().all()
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener competencias por programa: {e}")
         raise Exception("Error de base de datos al obtener competencias del programa")
@@ -39,6 +44,7 @@ def create_competencia(db: Session, competencia: CompetenciaCreate):
         """)
         db.execute(query, competencia.model_dump())
         db.commit()
+        marcar_cambio("competencia")
         return True
     except SQLAlchemyError as e:
         db.rollback()
@@ -55,8 +61,10 @@ def get_competencia_by_id(db: Session, cod_competencia: int):
             FROM competencia
             WHERE cod_competencia = :cod_competencia
         """)
-        result = db.execute(query, {"cod_competencia": cod_competencia}).mappings().first()
-        return result
+        return _cache_competencias.obtener_o_cargar(
+            ("por_codigo", cod_competencia),
+            lambda: db.execute(query, {"cod_competencia": cod_competencia}).mappings().first()
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener competencia por ID: {e}")
         raise Exception("Error de base de datos al obtener la competencia")
@@ -71,8 +79,7 @@ def get_all_competencias(db: Session):
             FROM competencia
             ORDER BY cod_competencia
         """)
-        result = db.execute(query).mappings().all()
-        return result
+        return _cache_competencias.obtener_o_cargar(("todas",), lambda: db.execute(query).mappings().all())
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener todas las competencias: {e}")
         raise Exception("Error de base de datos al obtener las competencias")
@@ -98,6 +105,7 @@ def update_competencia(db: Session, cod_competencia: int, competencia_update: Co
         
         result = db.execute(query, fields)
         db.commit()
+        marcar_cambio("competencia")
         return result.rowcount > 0
     except SQLAlchemyError as e:
         db.rollback()
@@ -115,6 +123,7 @@ def delete_competencia(db: Session, cod_competencia: int) -> bool:
         """)
         result = db.execute(query, {"cod_competencia": cod_competencia})
         db.commit()
+        marcar_cambio("competencia")
         return result.rowcount > 0
     except SQLAlchemyError as e:
         db.rollback()
@@ -134,8 +143,10 @@ def get_programas_by_competencia(db: Session, cod_competencia: int):
             WHERE pc.cod_competencia = :cod_competencia
             ORDER BY pf.cod_programa, pf.la_version
         """)
-        result = db.execute(query, {"cod_competencia": cod_competencia}).mappings().all()
-        return result
+        return _cache_competencias.obtener_o_cargar(
+            ("programas", cod_competencia),
+            lambda: db.execute(query, {"cod_competencia": cod_competencia}).mappings().all()
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener programas por competencia: {e}")
         raise Exception("Error de base de datos al obtener programas de la competencia") 
\ No newline at end of file
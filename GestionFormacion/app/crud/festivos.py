@@ -2,10 +2,26 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from datetime import date, timedelta
 from typing import List, Dict
+from core.cache import cache_catalogo
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Los festivos se cargan con el esquema (db/init.sql) y la aplicación no los modifica:
+# un cambio manual en la tabla se ve cuando vence el TTL (CACHE_CATALOGOS_SEGUNDOS)
+_cache_festivos = cache_catalogo("festivos", ("festivos",))
+
+
+def _festivos(db: Session, year: int = None) -> List[date]:
+    """Festivos (de un año, si se indica), cacheados."""
+    if year:
+        query = text("SELECT festivo FROM festivos WHERE YEAR(festivo) = :year ORDER BY festivo")
+        return _cache_festivos.obtener_o_cargar(
+            ("por_anio", year), lambda: [row[0] for row in db.execute(query, {"year": year}).fetchall()]
+        )
+    query = text("SELECT festivo FROM festivos ORDER BY festivo")
+    return _cache_festivos.obtener_o_cargar(("todos",), lambda: [row[0] for row in db.execute(query).fetchall()])
+
 def get_festivos(db: Session) -> List[date]:
     """
     Obtiene todos los días festivos de la base de datos.
@@ -17,9 +33,7 @@ def get_festivos(db: Session) -> List[date]:
         List[date]: Lista de fechas festivas
     """
     try:
-        query = text("SELECT festivo FROM festivos ORDER BY festivo")
-        result = db.execute(query).fetchall()
-        return [row[0] for row in result]
+        return list(_festivos(db))
     except Exception as e:
         logger.error(f"Error al obtener festivos: {e}")
         raise Exception("Error de base de datos al obtener los festivos")
@@ -64,14 +78,7 @@ def get_festivos_y_domingos(db: Session, year: int = None) -> Dict[str, any]:
     """
     try:
         # Obtener festivos de la base de datos
-        if year:
-            query = text("SELECT festivo FROM festivos WHERE YEAR(festivo) = :year ORDER BY festivo")
-            result = db.execute(query, {"year": year}).fetchall()
-        else:
-            query = text("SELECT festivo FROM festivos ORDER BY festivo")
-            result = db.execute(query).fetchall()
-        
-        festivos = [row[0] for row in result]
+        festivos = list(_festivos(db, year))
         
         # Si se especifica un año, obtener domingos de ese año
         if year:
@@ -107,9 +114,7 @@ def get_festivos_by_year(db: Session, year: int) -> List[date]:
         List[date]: Lista de fechas festivas del año especificado
     """
     try:
-        query = text("SELECT festivo FROM festivos WHERE YEAR(festivo) = :year ORDER BY festivo")
-        result = db.execute(query, {"year": year}).fetchall()
-        return [row[0] for row in result]
+        return list(_festivos(db, year))
     except Exception as e:
         logger.error(f"Error al obtener festivos por año: {e}")
         raise Exception("Error de base de datos al obtener los festivos por año")
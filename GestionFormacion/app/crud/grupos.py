@@ -1,8 +1,14 @@
 from ast import List
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.schemas.grupos import GrupoUpdate
+from app.utils.cursores import cortar_pagina
+from core.cache import CacheLocal, SIN_VALOR, marcar_cambio
+from core.config import settings
+from core.database import AsyncSessionLocal, async_engine
 from typing import Optional, List
+from datetime import date
 import logging 
 logger = logging.getLogger(__name__)
 
@@ -40,58 +46,116 @@ def get_grupo_enriquecido_by_cod_ficha(db: Session, cod_ficha: int) -> Optional[
         raise Exception("Error de base de datos al obtener el grupo enriquecido")
     
 
-def get_grupos_by_cod_centro(db: Session, cod_centro: int, skip: int = 0, limit: int = 20):
+# Totales de los listados paginados por (listado, centro, filtros normalizados). Se
+# invalidan cuando cambia grupo o programa_formacion (edición de un grupo, carga del P04
+# o del DF-14) y, como máximo, a los CACHE_CONTEOS_SEGUNDOS
+_cache_conteos: CacheLocal[int] = CacheLocal(
+    "conteos_grupos", ("grupo", "programa_formacion"), settings.CACHE_CONTEOS_MAX_ENTRADAS, settings.CACHE_CONTEOS_SEGUNDOS
+)
+
+async def _contar(db: AsyncSession, clave: tuple, conteo: str, desde: str, params: dict) -> tuple:
+    """
+    total_items de un listado y si es aproximado, según `conteo`:
+    - "exact": COUNT(*) sobre `desde` (FROM ... WHERE ...), cacheado en _cache_conteos.
+      Si `db` está ligada a una réplica, el conteo que se cachea se toma del primario:
+      la réplica puede ir atrasada y un total viejo quedaría guardado con la versión nueva
+    - "estimate": filas estimadas por el optimizador (EXPLAIN) a partir de las
+      estadísticas de la tabla, sin recorrerla
+    - "none": sin total
+    """
+    if conteo == "none":
+        return None, False
+    if conteo == "estimate":
+        plan = (await db.execute(text(f"EXPLAIN SELECT 1 {desde}"), params)).mappings().first()
+        filas = float(plan.get("rows") or 0)
+        if plan.get("filtered") is not None:
+            filas = filas * float(plan["filtered"]) / 100
+        return int(filas), True
+
+    total = _cache_conteos.obtener(clave)
+    if total is SIN_VALOR:
+        versiones = _cache_conteos.versiones()
+        consulta = text(f"SELECT COUNT(*) {desde}")
+        if db.bind is async_engine:
+            total = (await db.execute(consulta, params)).scalar()
+        else:
+            async with AsyncSessionLocal() as primario:
+                total = (await primario.execute(consulta, params)).scalar()
+        _cache_conteos.guardar(clave, total, versiones)
+    return total, False
+
+def _paginacion_por_ficha(despues_de: Optional[int], columna: str, skip: int, limit: int, params: dict) -> tuple:
+    """
+    Condición extra y cláusula LIMIT de una página ordenada por cod_ficha descendente:
+    por llave (cod_ficha < cursor) si hay cursor, o con OFFSET si no. Se pide una fila
+    de más para saber si hay página siguiente (ver cortar_pagina).
+    """
+    params["limit"] = limit + 1
+    if despues_de is not None:
+        params["despues_de"] = despues_de
+        return f"AND {columna} < :despues_de", "LIMIT :limit"
+    params["skip"] = skip
+    return "", "LIMIT :limit OFFSET :skip"
+
+async def get_grupos_by_cod_centro(db: AsyncSession, cod_centro: int, skip: int = 0, limit: int = 20, despues_de: Optional[int] = None, conteo: str = "exact"):
     """
     Obtiene todos los grupos que pertenecen a un centro de formación específico con paginación.
+    Con `despues_de` (cod_ficha del cursor) la página se toma por llave en lugar de OFFSET;
+    `conteo` elige cómo se calcula total_items (ver _contar).
     """
     try:
-        # Consulta para obtener el conteo total
-        count_query = text("SELECT COUNT(*) as total FROM grupo WHERE cod_centro = :cod_centro")
-        total_count = db.execute(count_query, {"cod_centro": cod_centro}).scalar()
+        # Conteo total (cacheado, estimado u omitido)
+        total_count, aproximado = await _contar(
+            db, ("centro", cod_centro), conteo, "FROM grupo WHERE cod_centro = :cod_centro", {"cod_centro": cod_centro}
+        )
         
         # Consulta para obtener los grupos paginados
-        query = text("""
+        params = {"cod_centro": cod_centro}
+        condicion, limite = _paginacion_por_ficha(despues_de, "cod_ficha", skip, limit, params)
+        query = text(f"""
             SELECT * FROM grupo 
-            WHERE cod_centro = :cod_centro 
-            LIMIT :limit OFFSET :skip
+            WHERE cod_centro = :cod_centro {condicion}
+            ORDER BY cod_ficha DESC
+            {limite}
         """)
-        result = db.execute(query, {
-            "cod_centro": cod_centro, 
-            "limit": limit, 
-            "skip": skip
-        }).mappings().all()
+        result = (await db.execute(query, params)).mappings().all()
+        items, next_cursor = cortar_pagina(result, limit, lambda fila: [fila["cod_ficha"]])
         
         return {
-            "items": result,
-            "total_items": total_count
+            "items": items,
+            "total_items": total_count,
+            "total_aproximado": aproximado,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         logger.error(f"Error al obtener los grupos por el centro {cod_centro}: {e}")
         raise Exception("Error de base de datos al obtener el grupo por centro")
 
-def get_grupos(db: Session, skip: int = 0, limit: int = 20):
+async def get_grupos(db: AsyncSession, skip: int = 0, limit: int = 20, despues_de: Optional[int] = None, conteo: str = "exact"):
     """
-    Obtiene todos los grupos del sistema con paginación.
+    Obtiene todos los grupos del sistema con paginación (por llave si hay `despues_de`).
     """
     try:
-        # Consulta para obtener el conteo total
-        count_query = text("SELECT COUNT(*) as total FROM grupo")
-        total_count = db.execute(count_query).scalar()
+        # Conteo total (cacheado, estimado u omitido)
+        total_count, aproximado = await _contar(db, ("todos",), conteo, "FROM grupo", {})
         
         # Consulta para obtener los grupos paginados
-        query = text("""
+        params = {}
+        condicion, limite = _paginacion_por_ficha(despues_de, "cod_ficha", skip, limit, params)
+        query = text(f"""
             SELECT * FROM grupo 
+            WHERE 1 = 1 {condicion}
             ORDER BY cod_ficha DESC
-            LIMIT :limit OFFSET :skip
+            {limite}
         """)
-        result = db.execute(query, {
-            "limit": limit, 
-            "skip": skip
-        }).mappings().all()
+        result = (await db.execute(query, params)).mappings().all()
+        items, next_cursor = cortar_pagina(result, limit, lambda fila: [fila["cod_ficha"]])
         
         return {
-            "items": result,
-            "total_items": total_count
+            "items": items,
+            "total_items": total_count,
+            "total_aproximado": aproximado,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         logger.error(f"Error al obtener todos los grupos: {e}")
@@ -117,6 +181,7 @@ def update_grupo(db: Session, cod_ficha: int, grupo: GrupoUpdate) -> bool:
         
         result = db.execute(query, params)
         db.commit()
+        marcar_cambio("grupo")
         
         return result.rowcount > 0
     except Exception as e:
@@ -124,7 +189,7 @@ def update_grupo(db: Session, cod_ficha: int, grupo: GrupoUpdate) -> bool:
         logger.error(f"Error al actualizar el grupo: {e}")
         raise Exception("Error de base de datos al actualizar el grupo")
 
-def search_grupos_for_select(db: Session, search_text: str = "", limit: int = 20) -> List[dict]:
+async def search_grupos_for_select(db: AsyncSession, search_text: str = "", limit: int = 20) -> List[dict]:
     """
     Busca grupos para usar en un select/autocompletar.
     Retorna información básica de los grupos que coincidan con el texto de búsqueda.
@@ -152,7 +217,7 @@ def search_grupos_for_select(db: Session, search_text: str = "", limit: int = 20
                 ORDER BY g.cod_ficha DESC
                 LIMIT :limit
             """)
-            result = db.execute(query, {"limit": limit}).mappings().all()
+            result = (await db.execute(query, {"limit": limit})).mappings().all()
         else:
             # Detectar si es búsqueda numérica (código de ficha) o texto (nombre programa)
             is_numeric_search = search_text.strip().isdigit()
@@ -179,10 +244,10 @@ def search_grupos_for_select(db: Session, search_text: str = "", limit: int = 20
                     ORDER BY g.cod_ficha ASC
                     LIMIT :limit
                 """)
-                result = db.execute(query, {
+                result = (await db.execute(query, {
                     "search_pattern": search_pattern, 
                     "limit": limit
-                }).mappings().all()
+                })).mappings().all()
             else:
                 # Para texto: buscar en nombre de programa, responsable y nombre de ambiente con coincidencia parcial
                 search_pattern = f"%{search_text}%"
@@ -213,22 +278,23 @@ def search_grupos_for_select(db: Session, search_text: str = "", limit: int = 20
                     LIMIT :limit
                 """)
                 exact_pattern = f"{search_text}%"
-                result = db.execute(query, {
+                result = (await db.execute(query, {
                     "search_pattern": search_pattern,
                     "exact_pattern": exact_pattern,
                     "limit": limit
-                }).mappings().all()
+                })).mappings().all()
         
         return result
     except Exception as e:
         logger.error(f"Error al buscar grupos: {e}")
         raise Exception("Error de base de datos al buscar grupos")
 
-def advanced_search_grupos(db: Session, search_term: str, cod_centro: int, skip: int = 0, limit: int = 20):
+async def advanced_search_grupos(db: AsyncSession, search_term: str, cod_centro: int, skip: int = 0, limit: int = 20, despues_de: Optional[int] = None, conteo: str = "exact"):
     """
     Búsqueda avanzada de grupos con JOIN a programas de formación.
     Busca en código de ficha, nombre del responsable y nombre del programa.
     Filtra SIEMPRE por el código de centro proporcionado.
+    Paginación por llave con `despues_de` y `conteo`, como get_grupos_by_cod_centro.
     """
     try:
         # Añadir wildcards para la búsqueda LIKE
@@ -248,14 +314,22 @@ def advanced_search_grupos(db: Session, search_term: str, cod_centro: int, skip:
             "cod_centro": cod_centro
         }
         
-        # Consulta para obtener el conteo total de resultados de búsqueda
-        count_query = text(f"""
-            SELECT COUNT(*) as total 
-            FROM grupo g
-            LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
-            {where_clause}
-        """)
-        total_count = db.execute(count_query, params).scalar()
+        # Conteo total de resultados de búsqueda (cacheado, estimado u omitido); la
+        # búsqueda LIKE no distingue mayúsculas, así que el término va en minúsculas
+        total_count, aproximado = await _contar(
+            db,
+            ("busqueda", cod_centro, search_term.lower()),
+            conteo,
+            f"""
+                FROM grupo g
+                LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
+                {where_clause}
+            """,
+            params
+        )
+        
+        # Agregar parámetros de paginación
+        condicion, limite = _paginacion_por_ficha(despues_de, "g.cod_ficha", skip, limit, params)
         
         # Consulta para obtener los grupos paginados con información completa
         query = text(f"""
@@ -264,19 +338,19 @@ def advanced_search_grupos(db: Session, search_term: str, cod_centro: int, skip:
                 pf.nombre as programa_nombre
             FROM grupo g
             LEFT JOIN programa_formacion pf ON g.cod_programa = pf.cod_programa AND g.la_version = pf.la_version
-            {where_clause}
+            {where_clause} {condicion}
             ORDER BY g.cod_ficha DESC
-            LIMIT :limit OFFSET :skip
+            {limite}
         """)
         
-        # Agregar parámetros de paginación
-        params.update({"limit": limit, "skip": skip})
-        
-        result = db.execute(query, params).mappings().all()
+        result = (await db.execute(query, params)).mappings().all()
+        items, next_cursor = cortar_pagina(result, limit, lambda fila: [fila["cod_ficha"]])
         
         return {
-            "items": result,
-            "total_items": total_count
+            "items": items,
+            "total_items": total_count,
+            "total_aproximado": aproximado,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         logger.error(f"Error en búsqueda avanzada de grupos: {e}")
@@ -323,12 +397,14 @@ def _build_dynamic_where_clause(
         params["nombre_municipio"] = nombre_municipio
 
     if año is not None:
-        conditions.append("YEAR(g.fecha_inicio) = :año")
-        params["año"] = año
+        # Rango en lugar de YEAR(g.fecha_inicio) para que se pueda usar el índice sobre fecha_inicio
+        conditions.append("g.fecha_inicio >= :año_inicio AND g.fecha_inicio < :año_fin")
+        params["año_inicio"] = date(año, 1, 1)
+        params["año_fin"] = date(año + 1, 1, 1)
             
     return "WHERE " + " AND ".join(conditions), params
 
-def get_dashboard_kpis(db: Session, cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> dict:
+async def get_dashboard_kpis(db: AsyncSession, cod_centro: int, estado_grupo: Optional[str] = None, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> dict:
     """
     Calcula el número total de grupos y el total de aprendices en formación,
     basado en filtros obligatorios y un año opcional.
@@ -345,13 +421,13 @@ def get_dashboard_kpis(db: Session, cod_centro: int, estado_grupo: Optional[str]
             {where_clause}
         """
 
-        result = db.execute(text(query_str), params).mappings().one()
+        result = (await db.execute(text(query_str), params)).mappings().one()
         return result
     except Exception as e:
         logger.error(f"Error al calcular KPIs del dashboard: {e}")
         raise Exception("Error de base de datos al calcular KPIs")
 
-def get_grupos_por_municipio_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+async def get_grupos_por_municipio_filtrado(db: AsyncSession, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
     try:
         where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
         query_str = f"""
@@ -365,12 +441,12 @@ def get_grupos_por_municipio_filtrado(db: Session, cod_centro: int, estado_grupo
             GROUP BY g.nombre_municipio 
             ORDER BY cantidad DESC
         """
-        return db.execute(text(query_str), params).mappings().all()
+        return (await db.execute(text(query_str), params)).mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener grupos filtrados por municipio: {e}")
         raise Exception("Error de base de datos al agrupar por municipio")
 
-def get_grupos_por_jornada_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+async def get_grupos_por_jornada_filtrado(db: AsyncSession, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
     try:
         where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
         query_str = f"""
@@ -384,12 +460,12 @@ def get_grupos_por_jornada_filtrado(db: Session, cod_centro: int, estado_grupo:
             GROUP BY g.jornada 
             ORDER BY cantidad DESC
         """
-        return db.execute(text(query_str), params).mappings().all()
+        return (await db.execute(text(query_str), params)).mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener grupos filtrados por jornada: {e}")
         raise Exception("Error de base de datos al agrupar por jornada")
 
-def get_grupos_por_modalidad_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+async def get_grupos_por_modalidad_filtrado(db: AsyncSession, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
     try:
         where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
         query_str = f"""
@@ -403,12 +479,12 @@ def get_grupos_por_modalidad_filtrado(db: Session, cod_centro: int, estado_grupo
             GROUP BY g.modalidad 
             ORDER BY cantidad DESC
         """
-        return db.execute(text(query_str), params).mappings().all()
+        return (await db.execute(text(query_str), params)).mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener grupos filtrados por modalidad: {e}")
         raise Exception("Error de base de datos al agrupar por modalidad")
 
-def get_grupos_por_etapa_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+async def get_grupos_por_etapa_filtrado(db: AsyncSession, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
     try:
         where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
         query_str = f"""
@@ -422,12 +498,12 @@ def get_grupos_por_etapa_filtrado(db: Session, cod_centro: int, estado_grupo: st
             GROUP BY g.etapa 
             ORDER BY cantidad DESC
         """
-        return db.execute(text(query_str), params).mappings().all()
+        return (await db.execute(text(query_str), params)).mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener grupos filtrados por etapa: {e}")
         raise Exception("Error de base de datos al agrupar por etapa")
 
-def get_grupos_por_nivel_filtrado(db: Session, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
+async def get_grupos_por_nivel_filtrado(db: AsyncSession, cod_centro: int, estado_grupo: str, nombre_nivel: Optional[str] = None, etapa: Optional[str] = None, modalidad: Optional[str] = None, jornada: Optional[str] = None, nombre_municipio: Optional[str] = None, año: Optional[int] = None) -> List[dict]:
     try:
         where_clause, params = _build_dynamic_where_clause(cod_centro, estado_grupo, nombre_nivel, etapa, modalidad, jornada, nombre_municipio, año)
         query_str = f"""
@@ -441,7 +517,7 @@ def get_grupos_por_nivel_filtrado(db: Session, cod_centro: int, estado_grupo: st
             GROUP BY g.nombre_nivel 
             ORDER BY cantidad DESC
         """
-        return db.execute(text(query_str), params).mappings().all()
+        return (await db.execute(text(query_str), params)).mappings().all()
     except Exception as e:
         logger.error(f"Error al obtener grupos filtrados por nivel: {e}")
         raise Exception("Error de base de datos al agrupar por nivel")
\ No newline at end of file
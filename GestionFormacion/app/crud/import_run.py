@@ -0,0 +1,154 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from fastapi.encoders import jsonable_encoder
+from typing import Optional, List
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# La tabla import_run la crea db/init.sql en una instalación nueva; en una base de datos
+# existente hay que aplicar migraciones/0005 (python -m core.migraciones aplicar). Toda
+# carga de archivos la consulta: sin ella las cargas siguen, pero sin detectar archivos
+# duplicados ni guardar historial, y cada una deja errores en el log.
+
+# Estados de una carga
+ESTADO_EN_PROCESO = "en_proceso"
+ESTADO_COMPLETADO = "completado"
+ESTADO_COMPLETADO_CON_ERRORES = "completado_con_errores"
+ESTADO_FALLIDO = "fallido"
+
+_COLUMNAS_RESUMEN = """
+    id_import, tipo_reporte, hash_sha256, nombre_archivo, tamano_bytes, estado,
+    filas_procesadas, num_errores, duracion_segundos, fecha_inicio, fecha_fin
+"""
+
+def _con_resultado(fila) -> Optional[dict]:
+    """Convierte la fila en dict y decodifica la columna JSON resultado."""
+    if fila is None:
+        return None
+    datos = dict(fila)
+    if isinstance(datos.get("resultado"), str):
+        datos["resultado"] = json.loads(datos["resultado"])
+    return datos
+
+def create_import_run(db: Session, tipo_reporte: str, hash_sha256: str, nombre_archivo: Optional[str], tamano_bytes: int) -> int:
+    """
+    Registra el inicio de una carga y retorna su id_import.
+    """
+    try:
+        query = text("""
+            INSERT INTO import_run (tipo_reporte, hash_sha256, nombre_archivo, tamano_bytes, estado)
+            VALUES (:tipo_reporte, :hash_sha256, :nombre_archivo, :tamano_bytes, :estado)
+        """)
+        result = db.execute(query, {
+            "tipo_reporte": tipo_reporte,
+            "hash_sha256": hash_sha256,
+            "nombre_archivo": (nombre_archivo or "")[:255] or None,
+            "tamano_bytes": tamano_bytes,
+            "estado": ESTADO_EN_PROCESO
+        })
+        db.commit()
+        return result.lastrowid
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error al registrar la carga de archivo: {e}")
+        raise Exception("Error de base de datos al registrar la carga de archivo")
+
+def finalizar_import_run(
+    db: Session,
+    id_import: int,
+    estado: str,
+    filas_procesadas: int,
+    num_errores: int,
+    duracion_segundos: float,
+    resultado: Optional[dict]
+) -> bool:
+    """
+    Guarda el estado final, los conteos, la duración y el resultado de una carga.
+    """
+    try:
+        query = text("""
+            UPDATE import_run
+            SET estado = :estado,
+                filas_procesadas = :filas_procesadas,
+                num_errores = :num_errores,
+                duracion_segundos = :duracion_segundos,
+                resultado = :resultado,
+                fecha_fin = NOW()
+            WHERE id_import = :id_import
+        """)
+        result = db.execute(query, {
+            "id_import": id_import,
+            "estado": estado,
+            "filas_procesadas": filas_procesadas,
+            "num_errores": num_errores,
+            "duracion_segundos": round(duracion_segundos, 3),
+            "resultado": json.dumps(jsonable_encoder(resultado), ensure_ascii=False) if resultado is not None else None
+        })
+        db.commit()
+        return result.rowcount > 0
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error al finalizar el registro de la carga {id_import}: {e}")
+        raise Exception("Error de base de datos al finalizar el registro de la carga")
+
+def get_importacion_previa(db: Session, tipo_reporte: str, hash_sha256: str) -> Optional[dict]:
+    """
+    Busca la última carga completada sin errores del mismo tipo de reporte y con el mismo
+    contenido. Las cargas con errores o fallidas no cuentan, para que volver a subir el
+    archivo permita reintentar las filas que fallaron.
+    """
+    try:
+        query = text(f"""
+            SELECT {_COLUMNAS_RESUMEN}, resultado
+            FROM import_run
+            WHERE tipo_reporte = :tipo_reporte
+              AND hash_sha256 = :hash_sha256
+              AND estado = :estado
+            ORDER BY id_import DESC
+            LIMIT 1
+        """)
+        fila = db.execute(query, {
+            "tipo_reporte": tipo_reporte,
+            "hash_sha256": hash_sha256,
+            "estado": ESTADO_COMPLETADO
+        }).mappings().first()
+        return _con_resultado(fila)
+    except SQLAlchemyError as e:
+        logger.error(f"Error al buscar cargas previas del archivo: {e}")
+        raise Exception("Error de base de datos al buscar cargas previas del archivo")
+
+def get_import_runs(db: Session, tipo_reporte: Optional[str] = None, skip: int = 0, limit: int = 50) -> List[dict]:
+    """
+    Obtiene el historial de cargas, de la más reciente a la más antigua.
+    """
+    try:
+        where_clause = "WHERE tipo_reporte = :tipo_reporte" if tipo_reporte else ""
+        query = text(f"""
+            SELECT {_COLUMNAS_RESUMEN}
+            FROM import_run
+            {where_clause}
+            ORDER BY id_import DESC
+            LIMIT :limit OFFSET :skip
+        """)
+        return db.execute(query, {"tipo_reporte": tipo_reporte, "skip": skip, "limit": limit}).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener el historial de cargas: {e}")
+        raise Exception("Error de base de datos al obtener el historial de cargas")
+
+def get_import_run_by_id(db: Session, id_import: int) -> Optional[dict]:
+    """
+    Obtiene una carga con su resultado completo.
+    """
+    try:
+        query = text(f"""
+            SELECT {_COLUMNAS_RESUMEN}, resultado
+            FROM import_run
+            WHERE id_import = :id_import
+        """)
+        return _con_resultado(db.execute(query, {"id_import": id_import}).mappings().first())
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener la carga {id_import}: {e}")
+        raise Exception("Error de base de datos al obtener la carga")
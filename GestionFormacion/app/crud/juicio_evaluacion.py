@@ -0,0 +1,127 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Optional, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# La tabla juicio_evaluacion la crea db/init.sql en una instalación nueva; en una base de
+# datos existente hay que aplicar migraciones/0005 (python -m core.migraciones aplicar)
+
+# Columnas de conteo comunes a las consultas de tasas de aprobación
+_CONTEO_JUICIOS = """
+    COUNT(*) AS total_juicios,
+    CAST(COALESCE(SUM(j.juicio = 'APROBADO'), 0) AS INTEGER) AS aprobados,
+    CAST(COALESCE(SUM(j.juicio = 'NO APROBADO'), 0) AS INTEGER) AS no_aprobados,
+    CAST(COALESCE(SUM(j.juicio IS NULL OR j.juicio NOT IN ('APROBADO', 'NO APROBADO')), 0) AS INTEGER) AS por_evaluar,
+    ROUND(100 * SUM(j.juicio = 'APROBADO') / NULLIF(SUM(j.juicio IN ('APROBADO', 'NO APROBADO')), 0), 2) AS tasa_aprobacion
+"""
+
+def get_juicios_by_ficha(db: Session, cod_ficha: int, numero_documento: Optional[str] = None) -> List[dict]:
+    """
+    Obtiene los juicios evaluativos de una ficha, opcionalmente de un solo aprendiz.
+    Usa la llave única (cod_ficha, numero_documento, cod_resultado).
+    """
+    try:
+        query_str = """
+            SELECT j.cod_ficha, j.tipo_documento, j.numero_documento, j.nombre_aprendiz,
+                   j.apellidos_aprendiz, j.estado_aprendiz, j.cod_competencia, j.cod_resultado,
+                   j.juicio, j.fecha_hora_juicio, j.funcionario_registro
+            FROM juicio_evaluacion j
+            WHERE j.cod_ficha = :cod_ficha
+        """
+        params = {"cod_ficha": cod_ficha}
+        if numero_documento:
+            query_str += " AND j.numero_documento = :numero_documento"
+            params["numero_documento"] = numero_documento
+        query_str += " ORDER BY j.numero_documento, j.cod_competencia, j.cod_resultado"
+
+        return db.execute(text(query_str), params).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener juicios de la ficha {cod_ficha}: {e}")
+        raise Exception("Error de base de datos al obtener los juicios evaluativos")
+
+def get_tasa_aprobacion_ficha(db: Session, cod_ficha: int) -> Optional[dict]:
+    """
+    Calcula la tasa de aprobación de una ficha. Retorna None si la ficha no tiene juicios.
+    """
+    try:
+        query = text(f"""
+            SELECT j.cod_ficha,
+                   COUNT(DISTINCT j.numero_documento) AS total_aprendices,
+                   {_CONTEO_JUICIOS}
+            FROM juicio_evaluacion j
+            WHERE j.cod_ficha = :cod_ficha
+            GROUP BY j.cod_ficha
+        """)
+        return db.execute(query, {"cod_ficha": cod_ficha}).mappings().first()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al calcular la tasa de aprobación de la ficha {cod_ficha}: {e}")
+        raise Exception("Error de base de datos al calcular la tasa de aprobación de la ficha")
+
+def get_tasas_aprobacion_por_ficha(db: Session, cod_centro: int, skip: int = 0, limit: int = 100) -> List[dict]:
+    """
+    Calcula la tasa de aprobación de cada ficha de un centro que tenga juicios cargados.
+    """
+    try:
+        query = text(f"""
+            SELECT j.cod_ficha,
+                   COUNT(DISTINCT j.numero_documento) AS total_aprendices,
+                   {_CONTEO_JUICIOS}
+            FROM juicio_evaluacion j
+            INNER JOIN grupo g ON g.cod_ficha = j.cod_ficha
+            WHERE g.cod_centro = :cod_centro
+            GROUP BY j.cod_ficha
+            ORDER BY j.cod_ficha
+            LIMIT :limit OFFSET :skip
+        """)
+        return db.execute(query, {"cod_centro": cod_centro, "skip": skip, "limit": limit}).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al calcular tasas de aprobación por ficha del centro {cod_centro}: {e}")
+        raise Exception("Error de base de datos al calcular tasas de aprobación por ficha")
+
+def get_tasas_aprobacion_por_competencia(
+    db: Session,
+    cod_ficha: Optional[int] = None,
+    cod_centro: Optional[int] = None,
+    cod_competencia: Optional[int] = None
+) -> List[dict]:
+    """
+    Calcula la tasa de aprobación por competencia, opcionalmente limitada a una ficha,
+    a las fichas de un centro o a una sola competencia.
+    """
+    try:
+        joins = ""
+        conditions = []
+        params = {}
+
+        if cod_ficha is not None:
+            conditions.append("j.cod_ficha = :cod_ficha")
+            params["cod_ficha"] = cod_ficha
+        if cod_centro is not None:
+            joins = "INNER JOIN grupo g ON g.cod_ficha = j.cod_ficha"
+            conditions.append("g.cod_centro = :cod_centro")
+            params["cod_centro"] = cod_centro
+        if cod_competencia is not None:
+            conditions.append("j.cod_competencia = :cod_competencia")
+            params["cod_competencia"] = cod_competencia
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        query = text(f"""
+            SELECT j.cod_competencia,
+                   c.nombre AS nombre_competencia,
+                   COUNT(DISTINCT j.cod_ficha) AS total_fichas,
+                   {_CONTEO_JUICIOS}
+            FROM juicio_evaluacion j
+            LEFT JOIN competencia c ON c.cod_competencia = j.cod_competencia
+            {joins}
+            {where_clause}
+            GROUP BY j.cod_competencia, c.nombre
+            ORDER BY j.cod_competencia
+        """)
+        return db.execute(query, params).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al calcular tasas de aprobación por competencia: {e}")
+        raise Exception("Error de base de datos al calcular tasas de aprobación por competencia")
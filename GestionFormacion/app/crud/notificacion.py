@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from typing import Optional, List
@@ -35,7 +36,7 @@ def create_notification(db: Session, notificacion: schemas.NotificacionCreate) -
         logger.error(f"Error al crear notificación: {e}")
         return None
 
-def get_notifications_by_user_id(db: Session, user_id: int) -> Optional[List]:
+async def get_notifications_by_user_id(db: AsyncSession, user_id: int) -> Optional[List]:
     """
     Obtiene todas las notificaciones de un usuario específico ordenadas por fecha descendente.
     
@@ -58,13 +59,13 @@ def get_notifications_by_user_id(db: Session, user_id: int) -> Optional[List]:
             WHERE id_usuario = :user_id
             ORDER BY fecha_creacion DESC
         """)
-        result = db.execute(query, {"user_id": user_id}).mappings().all()
+        result = (await db.execute(query, {"user_id": user_id})).mappings().all()
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener notificaciones del usuario {user_id}: {e}")
         return None
 
-def mark_notification_as_read(db: Session, notificacion_id: int, user_id: int) -> bool:
+async def mark_notification_as_read(db: AsyncSession, notificacion_id: int, user_id: int) -> bool:
     """
     Marca una notificación como leída, verificando que pertenezca al usuario.
     
@@ -83,10 +84,10 @@ def mark_notification_as_read(db: Session, notificacion_id: int, user_id: int) -
             FROM notificacion 
             WHERE id_notificacion = :notificacion_id AND id_usuario = :user_id
         """)
-        result = db.execute(verify_query, {
+        result = (await db.execute(verify_query, {
             "notificacion_id": notificacion_id,
             "user_id": user_id
-        }).mappings().first()
+        })).mappings().first()
         
         if not result:
             logger.warning(f"Notificación {notificacion_id} no encontrada o no pertenece al usuario {user_id}")
@@ -98,14 +99,14 @@ def mark_notification_as_read(db: Session, notificacion_id: int, user_id: int) -
             SET leida = TRUE 
             WHERE id_notificacion = :notificacion_id AND id_usuario = :user_id
         """)
-        db.execute(update_query, {
+        await db.execute(update_query, {
             "notificacion_id": notificacion_id,
             "user_id": user_id
         })
-        db.commit()
+        await db.commit()
         return True
         
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error al marcar notificación como leída: {e}")
         return False
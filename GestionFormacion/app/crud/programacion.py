@@ -1,14 +1,23 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from fastapi import HTTPException
 from app.schemas.programacion import ProgramacionCreate, ProgramacionUpdate
 from app.crud import notificacion as crud_notificacion
 from app.schemas.notificacion import NotificacionCreate
+from app.utils.cursores import cortar_pagina
+from core.cache import cache_catalogo
 from typing import Optional, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Competencias y resultados de aprendizaje para los formularios de programación; los
+# invalidan app/crud/competencia.py y las cargas de evaluaciones
+_cache_resultados = cache_catalogo(
+    "resultados_aprendizaje", ("competencia", "programa_competencia", "resultado_aprendizaje")
+)
+
 def create_programacion(db: Session, programacion: ProgramacionCreate, id_user: int) -> Optional[dict]:
     """
     Crea una nueva programación.
@@ -129,7 +138,7 @@ def get_programacion_by_id(db: Session, id_programacion: int) -> Optional[dict]:
         logger.error(f"Error al obtener la programación {id_programacion}: {e}")
         raise Exception("Error de base de datos al obtener la programación")
 
-def get_programaciones_by_ficha(db: Session, cod_ficha: int) -> List[dict]:
+async def get_programaciones_by_ficha(db: AsyncSession, cod_ficha: int) -> List[dict]:
     """
     Obtiene todas las programaciones de un grupo específico.
     """
@@ -146,13 +155,13 @@ def get_programaciones_by_ficha(db: Session, cod_ficha: int) -> List[dict]:
             WHERE p.cod_ficha = :cod_ficha
             ORDER BY p.fecha_programada, p.hora_inicio
         """)
-        result = db.execute(query, {"cod_ficha": cod_ficha}).mappings().all()
+        result = (await db.execute(query, {"cod_ficha": cod_ficha})).mappings().all()
         return result
     except Exception as e:
         logger.error(f"Error al obtener las programaciones del grupo {cod_ficha}: {e}")
         raise Exception("Error de base de datos al obtener las programaciones del grupo")
 
-def get_programaciones_by_instructor(db: Session, id_instructor: int) -> List[dict]:
+async def get_programaciones_by_instructor(db: AsyncSession, id_instructor: int) -> List[dict]:
     """
     Obtiene todas las programaciones de un instructor específico.
     """
@@ -169,7 +178,7 @@ def get_programaciones_by_instructor(db: Session, id_instructor: int) -> List[di
             WHERE p.id_instructor = :id_instructor
             ORDER BY p.fecha_programada, p.hora_inicio
         """)
-        result = db.execute(query, {"id_instructor": id_instructor}).mappings().all()
+        result = (await db.execute(query, {"id_instructor": id_instructor})).mappings().all()
         return result
     except Exception as e:
         logger.error(f"Error al obtener las programaciones del instructor {id_instructor}: {e}")
@@ -263,12 +272,31 @@ def delete_programacion(db: Session, id_programacion: int) -> bool:
         logger.error(f"Error al eliminar la programación {id_programacion}: {e}")
         raise Exception("Error de base de datos al eliminar la programación")
 
-def get_all_programaciones(db: Session, skip: int = 0, limit: int = 100) -> List[dict]:
+async def get_all_programaciones(db: AsyncSession, skip: int = 0, limit: int = 100, despues_de: Optional[list] = None) -> tuple:
     """
-    Obtiene todas las programaciones con paginación.
+    Obtiene todas las programaciones con paginación, ordenadas por fecha descendente,
+    hora de inicio e id. Con `despues_de` ([fecha_programada, hora_inicio, id_programacion]
+    del cursor) la página se toma por llave en lugar de OFFSET.
+
+    Returns:
+        tuple: (programaciones de la página, cursor de la página siguiente o None)
     """
     try:
-        query = text("""
+        params = {"limit": limit + 1}
+        condicion, limite = "", "LIMIT :limit OFFSET :skip"
+        if despues_de is not None:
+            # Fecha descendente y, dentro del mismo día, hora e id ascendentes
+            condicion = """
+                WHERE p.fecha_programada <= :fecha
+                  AND (p.fecha_programada < :fecha
+                       OR p.hora_inicio > :hora
+                       OR (p.hora_inicio = :hora AND p.id_programacion > :id_programacion))
+            """
+            limite = "LIMIT :limit"
+            params.update({"fecha": despues_de[0], "hora": despues_de[1], "id_programacion": despues_de[2]})
+        else:
+            params["skip"] = skip
+        query = text(f"""
             SELECT p.*, 
                    u.nombre_completo as nombre_instructor,
                    c.nombre as nombre_competencia,
@@ -277,11 +305,14 @@ def get_all_programaciones(db: Session, skip: int = 0, limit: int = 100) -> List
             LEFT JOIN usuario u ON p.id_instructor = u.id_usuario
             LEFT JOIN competencia c ON p.cod_competencia = c.cod_competencia
             LEFT JOIN resultado_aprendizaje r ON p.cod_resultado = r.cod_resultado
-            ORDER BY p.fecha_programada DESC, p.hora_inicio
-            LIMIT :limit OFFSET :skip
+            {condicion}
+            ORDER BY p.fecha_programada DESC, p.hora_inicio, p.id_programacion
+            {limite}
         """)
-        result = db.execute(query, {"skip": skip, "limit": limit}).mappings().all()
-        return result
+        result = (await db.execute(query, params)).mappings().all()
+        return cortar_pagina(
+            result, limit, lambda fila: [fila["fecha_programada"], fila["hora_inicio"], fila["id_programacion"]]
+        )
     except Exception as e:
         logger.error(f"Error al obtener todas las programaciones: {e}")
         raise Exception("Error de base de datos al obtener las programaciones")
@@ -299,8 +330,10 @@ def get_competencias_by_programa(db: Session, cod_programa: int, la_version: int
             WHERE pc.cod_programa = :cod_programa
             ORDER BY c.nombre
         """)
-        result = db.execute(query, {"cod_programa": cod_programa}).mappings().all()
-        return result
+        return _cache_resultados.obtener_o_cargar(
+            ("competencias", cod_programa),
+            lambda: db.execute(query, {"cod_programa": cod_programa}).mappings().all()
+        )
     except Exception as e:
         logger.error(f"Error al obtener competencias del programa {cod_programa}: {e}")
         raise Exception("Error de base de datos al obtener las competencias del programa")
@@ -316,8 +349,10 @@ def get_resultados_by_competencia(db: Session, cod_competencia: int) -> List[dic
             WHERE cod_competencia = :cod_competencia
             ORDER BY nombre
         """)
-        result = db.execute(query, {"cod_competencia": cod_competencia}).mappings().all()
-        return result
+        return _cache_resultados.obtener_o_cargar(
+            ("resultados", cod_competencia),
+            lambda: db.execute(query, {"cod_competencia": cod_competencia}).mappings().all()
+        )
     except Exception as e:
         logger.error(f"Error al obtener resultados de la competencia {cod_competencia}: {e}")
         raise Exception("Error de base de datos al obtener los resultados de aprendizaje") 
\ No newline at end of file
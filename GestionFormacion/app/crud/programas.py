@@ -4,9 +4,14 @@ from sqlalchemy.exc import SQLAlchemyError
 from typing import Optional, List
 import logging
 from app.schemas.programas import ProgramaCreate, ProgramaUpdate
+from core.cache import cache_catalogo, marcar_cambio
 
 logger = logging.getLogger(__name__)
 
+# Catálogo de programas de formación; lo invalidan las escrituras de este módulo y las
+# cargas P04 y DF-14 (/files/upload-excel, /files/upload-df14-excel)
+_cache_programas = cache_catalogo("programas", ("programa_formacion",))
+
 def create_programa(db: Session, programa: ProgramaCreate) -> Optional[bool]:
     try:
         programa_data = programa.model_dump()
@@ -21,6 +26,7 @@ def create_programa(db: Session, programa: ProgramaCreate) -> Optional[bool]:
         """)
         db.execute(query, programa_data)
         db.commit()
+        marcar_cambio("programa_formacion")
         return True
     except SQLAlchemyError as e:
         db.rollback()
@@ -35,34 +41,39 @@ def get_programa(db: Session, cod_programa: int):
             WHERE cod_programa = :cod_programa
             ORDER BY la_version DESC
         """)
-        result = db.execute(query, {"cod_programa": cod_programa}).mappings().first()
-        return result
+        return _cache_programas.obtener_o_cargar(
+            ("por_codigo", cod_programa),
+            lambda: db.execute(query, {"cod_programa": cod_programa}).mappings().first()
+        )
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener programa: {e}")
         raise Exception("Error de base de datos al obtener el programa")
 
 def get_programas(db: Session, skip: int = 0, limit: int = 20):
     try:
-        # Consulta para obtener el conteo total
-        count_query = text("SELECT COUNT(*) as total FROM programa_formacion")
-        total_count = db.execute(count_query).scalar()
-        
-        # Consulta para obtener los programas paginados
-        query = text("""
-            SELECT cod_programa, la_version, nombre, horas_lectivas, horas_productivas
-            FROM programa_formacion
-            LIMIT :limit OFFSET :skip
-        """)
-        result = db.execute(query, {"limit": limit, "skip": skip}).mappings().all()
-        
-        return {
-            "items": result,
-            "total_items": total_count
-        }
+        return _cache_programas.obtener_o_cargar(("pagina", skip, limit), lambda: _pagina_programas(db, skip, limit))
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener programas: {e}")
         raise Exception("Error de base de datos al obtener los programas")
 
+def _pagina_programas(db: Session, skip: int, limit: int) -> dict:
+    # Consulta para obtener el conteo total
+    count_query = text("SELECT COUNT(*) as total FROM programa_formacion")
+    total_count = db.execute(count_query).scalar()
+    
+    # Consulta para obtener los programas paginados
+    query = text("""
+        SELECT cod_programa, la_version, nombre, horas_lectivas, horas_productivas
+        FROM programa_formacion
+        LIMIT :limit OFFSET :skip
+    """)
+    result = db.execute(query, {"limit": limit, "skip": skip}).mappings().all()
+    
+    return {
+        "items": result,
+        "total_items": total_count
+    }
+
 def search_programas(db: Session, search_term: str, skip: int = 0, limit: int = 20):
     try:
         # Añadir wildcards para la búsqueda LIKE
@@ -119,6 +130,7 @@ def update_programa(db: Session, cod_programa: int, programa_update: ProgramaUpd
         
         result = db.execute(query, fields)
         db.commit()
+        marcar_cambio("programa_formacion")
         
         return result.rowcount > 0
     except SQLAlchemyError as e:
@@ -135,6 +147,7 @@ def delete_programa(db: Session, cod_programa: int, la_version: int) -> bool:
         
         result = db.execute(query, {"cod_programa": cod_programa, "la_version": la_version})
         db.commit()
+        marcar_cambio("programa_formacion")
         
         return result.rowcount > 0
     except SQLAlchemyError as e:
@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from typing import Optional
@@ -50,16 +51,27 @@ def get_user_by_email(db: Session, email: str):
         raise Exception("Error de base de datos al obtener el usuario")
 
 
+_QUERY_USUARIO_POR_ID = text("""
+    SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
+           u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro, u.password_changed_at
+    FROM usuario u
+    INNER JOIN rol r ON u.id_rol = r.id_rol
+    WHERE u.id_usuario = :id
+""")
+
 def get_user_by_id(db: Session, id_user: int):
     try:
-        query = text("""
-            SELECT u.id_usuario, u.nombre_completo, u.identificacion, u.id_rol, r.nombre AS nombre_rol,
-                   u.correo, u.tipo_contrato, u.telefono, u.estado, u.cod_centro, u.password_changed_at
-            FROM usuario u
-            INNER JOIN rol r ON u.id_rol = r.id_rol
-            WHERE u.id_usuario = :id
-        """)
-        result = db.execute(query, {"id": id_user}).mappings().first()
+        result = db.execute(_QUERY_USUARIO_POR_ID, {"id": id_user}).mappings().first()
+        return result
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener usuario por id: {e}")
+        raise Exception("Error de base de datos al obtener el usuario")
+
+
+async def get_user_by_id_async(db: AsyncSession, id_user: int):
+    """get_user_by_id con una sesión asíncrona (ver get_current_user_async)."""
+    try:
+        result = (await db.execute(_QUERY_USUARIO_POR_ID, {"id": id_user})).mappings().first()
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener usuario por id: {e}")
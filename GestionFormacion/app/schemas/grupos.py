@@ -142,11 +142,17 @@ class GruposPorNivelSchema(BaseModel):
     total_aprendices_formacion: int
 
 # --- Schema para respuesta paginada de grupos ---
+# total_items es None cuando se pide sin conteo y total_aproximado indica que es una
+# estimación (count=estimate); next_cursor es None en la última página
 class GrupoPage(BaseModel):
-    total_items: int
+    total_items: Optional[int] = None
+    total_aproximado: bool = False
     items: List[GrupoOut]
+    next_cursor: Optional[str] = None
 
 # --- Schema para respuesta paginada de búsqueda avanzada ---
 class GrupoAdvancedPage(BaseModel):
-    total_items: int
-    items: List[GrupoAdvancedOut]
\ No newline at end of file
+    total_items: Optional[int] = None
+    total_aproximado: bool = False
+    items: List[GrupoAdvancedOut]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+# --- Schemas para el historial de cargas de archivos ---
+class ImportRunOut(BaseModel):
+    id_import: int
+    tipo_reporte: str
+    hash_sha256: str
+    nombre_archivo: Optional[str] = None
+    tamano_bytes: Optional[int] = None
+    estado: str
+    filas_procesadas: Optional[int] = 0
+    num_errores: Optional[int] = 0
+    duracion_segundos: Optional[float] = None
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ImportRunDetalleOut(ImportRunOut):
+    resultado: Optional[dict] = None
@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+# --- Schema para Juicio Evaluativo ---
+class JuicioEvaluacionOut(BaseModel):
+    cod_ficha: int
+    tipo_documento: Optional[str] = None
+    numero_documento: str
+    nombre_aprendiz: Optional[str] = None
+    apellidos_aprendiz: Optional[str] = None
+    estado_aprendiz: Optional[str] = None
+    cod_competencia: int
+    cod_resultado: int
+    juicio: Optional[str] = None
+    fecha_hora_juicio: Optional[datetime] = None
+    funcionario_registro: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# --- Schemas para tasas de aprobación ---
+class ConteoJuiciosBase(BaseModel):
+    """
+    Conteo de juicios. La tasa de aprobación es el porcentaje de aprobados sobre los
+    juicios ya emitidos (aprobados + no aprobados); es None si aún no hay ninguno.
+    """
+    total_juicios: int
+    aprobados: int
+    no_aprobados: int
+    por_evaluar: int
+    tasa_aprobacion: Optional[float] = None
+
+class TasaAprobacionFichaOut(ConteoJuiciosBase):
+    cod_ficha: int
+    total_aprendices: int
+
+class TasaAprobacionCompetenciaOut(ConteoJuiciosBase):
+    cod_competencia: int
+    nombre_competencia: Optional[str] = None
+    total_fichas: int
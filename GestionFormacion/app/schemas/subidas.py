@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+# --- Schemas para las subidas de archivos por partes ---
+class SubidaCreate(BaseModel):
+    tipo_reporte: Literal["p04", "df14", "evaluaciones"]
+    nombre_archivo: Optional[str] = Field(default=None, max_length=255)
+    tamano_bytes: int = Field(gt=0)
+    tamano_parte: Optional[int] = Field(default=None, ge=256 * 1024, le=64 * 1024 * 1024)
+    sha256: Optional[str] = Field(default=None, pattern=r"^[0-9a-fA-F]{64}$")
+
+class SubidaOut(BaseModel):
+    id_subida: str
+    tipo_reporte: str
+    nombre_archivo: Optional[str] = None
+    tamano_bytes: int
+    tamano_parte: int
+    total_partes: int
+    partes_recibidas: List[int]
+    partes_faltantes: List[int]
+    rangos_recibidos: List[List[int]]
+    bytes_recibidos: int
+    completa: bool
+    creado: str
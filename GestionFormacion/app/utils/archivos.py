@@ -0,0 +1,191 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import List, NamedTuple, Optional, Tuple
+from fastapi import UploadFile
+from core.config import settings
+
+
+TAMANO_BLOQUE_COPIA = 1024 * 1024
+
+# Fecha fija de los miembros del ZIP que arma guardar_lote_temporal, para que los
+# mismos libros den siempre el mismo SHA-256
+FECHA_MIEMBROS_LOTE = (1980, 1, 1, 0, 0, 0)
+
+
+class ArchivoDemasiadoGrande(ValueError):
+    """El archivo subido supera INGESTA_MAX_TAMANO_BYTES."""
+
+
+class ArchivoTemporal(NamedTuple):
+    ruta: str
+    sha256: str
+    tamano_bytes: int
+    nombre_archivo: Optional[str] = None
+
+
+def guardar_subida_temporal(file: UploadFile) -> ArchivoTemporal:
+    """
+    Copia el archivo subido a un temporal en INGESTA_DIR_TEMPORAL para que pueda
+    procesarse después de que termine la petición (FastAPI cierra el UploadFile
+    al enviar la respuesta). Quien lo usa debe borrarlo con eliminar_temporal().
+
+    El SHA-256 se calcula en la misma pasada de la copia, sin releer el archivo.
+
+    Returns:
+        ArchivoTemporal: Ruta del temporal, SHA-256 del contenido, tamaño en bytes y
+        nombre original del archivo
+
+    Raises:
+        ArchivoDemasiadoGrande: Si el archivo supera INGESTA_MAX_TAMANO_BYTES (la copia
+        se corta en cuanto lo supera y el temporal se borra)
+    """
+    os.makedirs(settings.INGESTA_DIR_TEMPORAL, exist_ok=True)
+    file.file.seek(0)
+    sha256 = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(
+        dir=settings.INGESTA_DIR_TEMPORAL, prefix="ingesta_", suffix=".xlsx", delete=False
+    ) as destino:
+        try:
+            tamano = _copiar_con_limite(file.file, destino, sha256=sha256)
+        except Exception:
+            destino.close()
+            eliminar_temporal(destino.name)
+            raise
+    return ArchivoTemporal(destino.name, sha256.hexdigest(), tamano, file.filename)
+
+
+def _copiar_con_limite(origen, destino, copiados: int = 0, sha256=None) -> int:
+    """
+    Copia `origen` en `destino` por bloques y retorna el total de bytes copiados
+    (sumando `copiados`, lo que ya se había copiado antes en el mismo destino).
+
+    Raises:
+        ArchivoDemasiadoGrande: En cuanto el total supera INGESTA_MAX_TAMANO_BYTES
+    """
+    while True:
+        bloque = origen.read(TAMANO_BLOQUE_COPIA)
+        if not bloque:
+            return copiados
+        copiados += len(bloque)
+        if copiados > settings.INGESTA_MAX_TAMANO_BYTES:
+            raise ArchivoDemasiadoGrande(
+                f"El archivo supera el tamaño máximo permitido ({settings.INGESTA_MAX_TAMANO_BYTES} bytes)"
+            )
+        if sha256 is not None:
+            sha256.update(bloque)
+        destino.write(bloque)
+
+
+def _sha256_archivo(ruta: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE_COPIA), b""):
+            sha256.update(bloque)
+    return sha256.hexdigest()
+
+
+def _es_zip(file: UploadFile) -> bool:
+    return (file.filename or "").lower().endswith(".zip")
+
+
+def guardar_lote_temporal(files: List[UploadFile]) -> ArchivoTemporal:
+    """
+    Guarda los archivos de una carga en lote como un único ZIP temporal: si se subió
+    un solo ZIP se copia tal cual; si se subieron varios libros se empaquetan sin
+    comprimir, ordenados por nombre y con fecha fija, para que el mismo conjunto de
+    libros dé el mismo SHA-256 (y se detecte como duplicado) en cualquier orden.
+
+    Raises:
+        ValueError: Si se mezclan ZIP con otros archivos o no hay archivos
+        ArchivoDemasiadoGrande: Si los libros juntos superan INGESTA_MAX_TAMANO_BYTES
+    """
+    if not files:
+        raise ValueError("No se recibieron archivos")
+    if len(files) == 1 and _es_zip(files[0]):
+        return guardar_subida_temporal(files[0])
+    if any(_es_zip(file) for file in files):
+        raise ValueError("Envíe un solo archivo ZIP o varios libros .xlsx, no ambos")
+    if len(files) > settings.INGESTA_LOTE_MAX_ARCHIVOS:
+        raise ValueError(f"El lote supera el máximo de {settings.INGESTA_LOTE_MAX_ARCHIVOS} archivos")
+
+    os.makedirs(settings.INGESTA_DIR_TEMPORAL, exist_ok=True)
+    descriptor, ruta = tempfile.mkstemp(dir=settings.INGESTA_DIR_TEMPORAL, prefix="ingesta_", suffix=".zip")
+    os.close(descriptor)
+    nombres = set()
+    copiados = 0
+    try:
+        with zipfile.ZipFile(ruta, "w", compression=zipfile.ZIP_STORED) as lote:
+            for indice, file in enumerate(sorted(files, key=lambda f: f.filename or "")):
+                nombre = os.path.basename(file.filename or "") or f"libro_{indice}.xlsx"
+                if nombre in nombres:
+                    nombre = f"{indice}_{nombre}"
+                nombres.add(nombre)
+                file.file.seek(0)
+                with lote.open(zipfile.ZipInfo(nombre, date_time=FECHA_MIEMBROS_LOTE), "w", force_zip64=True) as destino:
+                    copiados = _copiar_con_limite(file.file, destino, copiados)
+        return ArchivoTemporal(ruta, _sha256_archivo(ruta), os.path.getsize(ruta), f"lote de {len(files)} archivos")
+    except Exception:
+        eliminar_temporal(ruta)
+        raise
+
+
+def extraer_libros_zip(ruta: str, directorio: str) -> List[Tuple[str, str]]:
+    """
+    Extrae a `directorio` los libros .xlsx del ZIP (se omiten carpetas, archivos
+    ocultos y temporales de Excel), revisando antes el número de archivos y el tamaño
+    descomprimido contra INGESTA_LOTE_MAX_ARCHIVOS e INGESTA_MAX_TAMANO_BYTES.
+
+    Returns:
+        List: (nombre dentro del ZIP, ruta extraída) por libro
+
+    Raises:
+        ValueError: Si el archivo no es un ZIP válido, no tiene libros o supera los límites
+    """
+    try:
+        with zipfile.ZipFile(ruta) as lote:
+            miembros = [
+                info for info in lote.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not os.path.basename(info.filename).startswith((".", "~$"))
+                and info.filename.lower().endswith(".xlsx")
+            ]
+            if not miembros:
+                raise ValueError("El ZIP no contiene libros .xlsx")
+            if len(miembros) > settings.INGESTA_LOTE_MAX_ARCHIVOS:
+                raise ValueError(f"El lote supera el máximo de {settings.INGESTA_LOTE_MAX_ARCHIVOS} archivos")
+            if sum(info.file_size for info in miembros) > settings.INGESTA_MAX_TAMANO_BYTES:
+                raise ValueError(f"El contenido del ZIP supera el tamaño máximo permitido ({settings.INGESTA_MAX_TAMANO_BYTES} bytes)")
+
+            libros = []
+            for indice, info in enumerate(miembros):
+                destino = os.path.join(directorio, f"{indice:05d}.xlsx")
+                with lote.open(info) as origen, open(destino, "wb") as salida:
+                    shutil.copyfileobj(origen, salida, TAMANO_BLOQUE_COPIA)
+                libros.append((info.filename, destino))
+            return libros
+    except zipfile.BadZipFile:
+        raise ValueError("El archivo no es un ZIP válido")
+
+
+def con_variante(archivo: ArchivoTemporal, variante: Optional[str]) -> ArchivoTemporal:
+    """
+    Cambia el SHA-256 del archivo por el del contenido más `variante` cuando el
+    resultado de la importación depende de parámetros de la petición (p. ej. el
+    filtro por centro): así el mismo archivo con otro filtro no se toma como duplicado.
+    """
+    if not variante:
+        return archivo
+    huella = hashlib.sha256(f"{archivo.sha256}|{variante}".encode("utf-8")).hexdigest()
+    return archivo._replace(sha256=huella)
+
+
+def eliminar_temporal(ruta: str):
+    """Borra un archivo temporal ignorando si ya no existe."""
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
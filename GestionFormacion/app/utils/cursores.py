@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import date, time, timedelta
+from typing import Any, List, Sequence
+
+# --- Cursores opacos para paginación por llave (keyset) ---
+#
+# Un cursor guarda los valores de la llave de orden de la última fila de una página
+# (p. ej. [cod_ficha] o [fecha_programada, hora_inicio, id_programacion]) en JSON
+# codificado en base64 url-safe. La página siguiente filtra por "después de esa llave"
+# en lugar de usar OFFSET, así que la página N cuesta lo mismo que la primera.
+
+
+def _a_json(valor: Any) -> Any:
+    if isinstance(valor, (date, time)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        # Las columnas TIME de MariaDB llegan como timedelta con PyMySQL
+        segundos = int(valor.total_seconds())
+        return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+    return valor
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    datos = json.dumps([_a_json(valor) for valor in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str, tipos: Sequence[type]) -> List[Any]:
+    """
+    Valores de la llave guardados en `cursor`, convertidos a `tipos` (int, str, date o time).
+
+    Raises:
+        ValueError: Si el cursor no es válido para esta consulta
+    """
+    try:
+        datos = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(datos)
+        if not isinstance(valores, list) or len(valores) != len(tipos):
+            raise ValueError
+        return [tipo.fromisoformat(valor) if tipo in (date, time) else tipo(valor) for tipo, valor in zip(tipos, valores)]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("Cursor de paginación inválido")
+
+
+def cortar_pagina(filas: Sequence, limit: int, llave) -> tuple:
+    """
+    Las consultas piden limit + 1 filas: si llegó la fila extra hay otra página, y el
+    cursor siguiente sale de la llave (`llave(fila)`) de la última fila de esta página.
+
+    Returns:
+        tuple: (filas de la página, cursor siguiente o None)
+    """
+    if len(filas) <= limit:
+        return list(filas), None
+    pagina = list(filas[:limit])
+    return pagina, codificar_cursor(llave(pagina[-1]))
+
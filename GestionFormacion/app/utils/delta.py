@@ -0,0 +1,107 @@
+from typing import Callable, Iterable, List, Sequence
+import pandas as pd
+
+# --- Comparación del P04 contra el estado actual de la base de datos ---
+
+# Columnas de grupo que vienen del P04. hora_inicio y hora_fin no se comparan: el P04
+# no trae horario (siempre llega 00:00:00) y las horas se asignan desde la aplicación.
+COLUMNAS_DELTA_GRUPO = [
+    "cod_centro", "cod_programa", "la_version", "estado_grupo", "nombre_nivel",
+    "jornada", "fecha_inicio", "fecha_fin", "etapa", "modalidad", "responsable",
+    "nombre_empresa", "nombre_municipio", "nombre_programa_especial"
+]
+
+COLUMNAS_DELTA_DATOS_GRUPO = [
+    "num_aprendices_masculinos", "num_aprendices_femenino", "num_aprendices_no_binario",
+    "num_total_aprendices", "num_total_aprendices_activos"
+]
+
+_COLUMNAS_NUMERICAS = {
+    "cod_centro", "cod_programa", "la_version", *COLUMNAS_DELTA_DATOS_GRUPO
+}
+_COLUMNAS_FECHA = {"fecha_inicio", "fecha_fin"}
+
+
+def _normalizar(serie: pd.Series, columna: str) -> pd.Series:
+    """Lleva los valores del archivo y de la base de datos a un tipo comparable."""
+    if columna in _COLUMNAS_NUMERICAS:
+        return pd.to_numeric(serie, errors="coerce").astype("Float64")
+    if columna in _COLUMNAS_FECHA:
+        return pd.to_datetime(serie, errors="coerce")
+    return serie.astype("string").str.strip()
+
+
+def filas_distintas(entrante: pd.DataFrame, actual: pd.DataFrame, columnas: Sequence[str]) -> pd.Series:
+    """
+    Compara columna a columna, de forma vectorizada, las filas de `entrante` contra las
+    de `actual` con la misma llave (ambos indexados por la llave).
+
+    Returns:
+        pd.Series booleana alineada con `entrante`: True si la llave no existe en
+        `actual` o si alguna de las columnas cambió (dos nulos se consideran iguales)
+    """
+    alineado = actual.reindex(entrante.index)
+    distinto = ~entrante.index.isin(actual.index)
+    distinto = pd.Series(distinto, index=entrante.index)
+    for columna in columnas:
+        nuevo = _normalizar(entrante[columna], columna)
+        previo = _normalizar(alineado[columna], columna)
+        iguales = (nuevo == previo).fillna(False) | (nuevo.isna() & previo.isna())
+        distinto |= ~iguales.to_numpy(dtype=bool)
+    return distinto
+
+
+class InstantaneaGrupos:
+    """
+    Estado actual de grupo y datos_grupo de los centros que aparecen en la carga.
+
+    Cada centro se consulta una sola vez, la primera vez que aparece en un lote, con
+    `cargar_centros(centros)`, que debe retornar un DataFrame indexado por cod_ficha con
+    las columnas de COLUMNAS_DELTA_GRUPO, las de COLUMNAS_DELTA_DATOS_GRUPO y la columna
+    booleana tiene_datos_grupo.
+    """
+
+    def __init__(self, cargar_centros: Callable[[List[int]], pd.DataFrame]):
+        self._cargar_centros = cargar_centros
+        self._centros = set()
+        self._fichas_vistas = set()
+        self.actual = pd.DataFrame(
+            columns=COLUMNAS_DELTA_GRUPO + COLUMNAS_DELTA_DATOS_GRUPO + ["tiene_datos_grupo"]
+        )
+
+    def asegurar_centros(self, centros: Iterable):
+        """Carga el estado de los centros que aún no se han consultado."""
+        nuevos = sorted({int(c) for c in centros if pd.notna(c)} - self._centros)
+        if not nuevos:
+            return
+        estado = self._cargar_centros(nuevos)
+        if len(estado) > 0:
+            self.actual = estado if len(self.actual) == 0 else pd.concat([self.actual, estado])
+        self._centros.update(nuevos)
+
+    def grupos_distintos(self, df_grupos: pd.DataFrame) -> pd.Series:
+        """True para los grupos nuevos o con algún cambio (df indexado por cod_ficha)."""
+        return filas_distintas(df_grupos, self.actual, COLUMNAS_DELTA_GRUPO)
+
+    def datos_grupo_distintos(self, df_datos: pd.DataFrame) -> pd.Series:
+        """True para los datos de grupo nuevos o con algún cambio (df indexado por cod_ficha)."""
+        columnas = [col for col in COLUMNAS_DELTA_DATOS_GRUPO if col in df_datos.columns]
+        con_datos = self.actual[self.actual["tiene_datos_grupo"].astype(bool)]
+        return filas_distintas(df_datos, con_datos, columnas)
+
+    def es_nueva(self, fichas: pd.Index) -> pd.Series:
+        return pd.Series(~fichas.isin(self.actual.index), index=fichas)
+
+    def primera_aparicion(self, fichas: pd.Index) -> pd.Series:
+        """
+        True solo en la primera fila de cada ficha que no apareció en lotes anteriores,
+        para que una ficha repetida en el archivo se cuente una sola vez en el delta.
+        """
+        return pd.Series(~fichas.duplicated() & ~fichas.isin(list(self._fichas_vistas)), index=fichas)
+
+    def marcar_vistas(self, fichas: Iterable):
+        self._fichas_vistas.update(int(f) for f in fichas)
+
+    def fichas_desaparecidas(self) -> int:
+        """Fichas de los centros cargados que están en la base de datos pero no en el archivo."""
+        return int((~self.actual.index.isin(list(self._fichas_vistas))).sum())
@@ -0,0 +1,501 @@
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import pandas as pd
+from openpyxl import load_workbook
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Definición del reporte P04 ---
+
+# Columnas del archivo P04 y su nombre en la base de datos
+COLUMNAS_P04 = {
+    # Columnas existentes
+    "IDENTIFICADOR_FICHA": "cod_ficha",
+    "CODIGO_CENTRO": "cod_centro",
+    "CODIGO_PROGRAMA": "cod_programa",
+    "VERSION_PROGRAMA": "la_version",
+    "NOMBRE_PROGRAMA_FORMACION": "nombre",
+    "ESTADO_CURSO": "estado_grupo",
+    "NIVEL_FORMACION": "nombre_nivel",
+    "NOMBRE_JORNADA": "jornada",
+    "FECHA_INICIO_FICHA": "fecha_inicio",
+    "FECHA_TERMINACION_FICHA": "fecha_fin",
+    "ETAPA_FICHA": "etapa",
+    "MODALIDAD_FORMACION": "modalidad",
+    "NOMBRE_RESPONSABLE": "responsable",
+    "NOMBRE_EMPRESA": "nombre_empresa",
+    "NOMBRE_MUNICIPIO_CURSO": "nombre_municipio",
+    "NOMBRE_PROGRAMA_ESPECIAL": "nombre_programa_especial",
+    # Nuevas columnas
+    "CODIGO_REGIONAL": "cod_regional",
+    "NOMBRE_REGIONAL": "nombre_regional",
+    "NOMBRE_CENTRO": "nombre_centro",
+    "TOTAL_APRENDICES_MASCULINOS": "num_aprendices_masculinos",
+    "TOTAL_APRENDICES_FEMENINOS": "num_aprendices_femenino",
+    "TOTAL_APRENDICES_NOBINARIO": "num_aprendices_no_binario",
+    "TOTAL_APRENDICES": "num_total_aprendices",
+    "TOTAL_APRENDICES_ACTIVOS": "num_total_aprendices_activos"
+}
+
+# El encabezado del P04 está en la fila 5 (se omiten las 4 primeras filas)
+FILA_ENCABEZADO_P04 = 5
+
+COLUMNAS_NUMERICAS_P04 = [
+    "cod_ficha", "cod_centro", "cod_programa", "la_version", "cod_regional",
+    "num_aprendices_masculinos", "num_aprendices_femenino", "num_aprendices_no_binario",
+    "num_total_aprendices", "num_total_aprendices_activos"
+]
+
+CAMPOS_OBLIGATORIOS_P04 = [
+    "cod_ficha", "cod_centro", "cod_programa", "la_version", "nombre",
+    "fecha_inicio", "fecha_fin", "etapa", "responsable", "nombre_municipio"
+]
+
+
+def _como_entero(valor) -> Optional[int]:
+    """Código numérico de una celda (9121, 9121.0 o '9121') o None si no lo es."""
+    try:
+        return int(float(str(valor).strip()))
+    except (TypeError, ValueError):
+        return None
+
+
+class FiltroFilas:
+    """
+    Conserva solo las filas cuyo código en cada columna de `valores_por_columna`
+    (nombre de columna del Excel -> códigos permitidos) está entre los permitidos.
+    Se aplica a las celdas de cada fila antes de armar el lote, así que las filas
+    descartadas nunca llegan a un DataFrame. Cuenta las filas omitidas.
+    """
+
+    def __init__(self, valores_por_columna: Dict[str, Iterable[int]]):
+        self.valores_por_columna = {
+            columna: {int(valor) for valor in valores} for columna, valores in valores_por_columna.items()
+        }
+        self.filas_omitidas = 0
+
+    def conserva(self, valores: Dict[str, object]) -> bool:
+        if all(_como_entero(valores[columna]) in permitidos for columna, permitidos in self.valores_por_columna.items()):
+            return True
+        self.filas_omitidas += 1
+        return False
+
+
+def leer_excel_por_lotes(
+    fuente,
+    fila_encabezado: int,
+    columnas: List[str],
+    chunk_size: Optional[int] = None,
+    filtro: Optional[FiltroFilas] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Lee la primera hoja de un libro de Excel en modo read_only de openpyxl y entrega
+    DataFrames de como máximo `chunk_size` filas con solo las columnas solicitadas.
+
+    El libro nunca se carga completo en memoria: openpyxl recorre el XML de la hoja
+    a medida que se piden filas, así que el consumo se mantiene constante sin importar
+    el tamaño del archivo. El índice de cada lote es el número de fila en el Excel.
+
+    Args:
+        fuente: Ruta o archivo binario (con seek) del libro
+        fila_encabezado: Número de fila (base 1) donde están los nombres de columna
+        columnas: Nombres de columna a extraer, en el orden deseado
+        chunk_size: Filas por lote (por defecto settings.INGESTA_CHUNK_SIZE)
+        filtro: Filtro opcional por códigos (p. ej. CODIGO_CENTRO), aplicado al leer
+
+    Raises:
+        ValueError: Si el libro no tiene encabezado o faltan columnas solicitadas
+    """
+    chunk_size = chunk_size or settings.INGESTA_CHUNK_SIZE
+    libro = load_workbook(fuente, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(min_row=fila_encabezado, values_only=True)
+
+        encabezado = next(filas, None)
+        if encabezado is None:
+            raise ValueError(f"El archivo no tiene encabezado en la fila {fila_encabezado}")
+
+        posiciones = {
+            str(nombre).strip(): i for i, nombre in enumerate(encabezado) if nombre is not None
+        }
+        columnas_filtro = list(filtro.valores_por_columna) if filtro else []
+        faltantes = [col for col in columnas + columnas_filtro if col not in posiciones]
+        if faltantes:
+            raise ValueError(f"Columnas no encontradas en el archivo: {faltantes}")
+        indices = [posiciones[col] for col in columnas]
+        indices_filtro = {col: posiciones[col] for col in columnas_filtro}
+
+        lote = []
+        numeros_fila = []
+        for numero_fila, fila in enumerate(filas, start=fila_encabezado + 1):
+            valores = tuple(fila[i] if i < len(fila) else None for i in indices)
+            # Igual que pandas, se omiten las filas completamente vacías
+            if all(valor is None or valor == "" for valor in valores):
+                continue
+            if filtro and not filtro.conserva(
+                {col: fila[i] if i < len(fila) else None for col, i in indices_filtro.items()}
+            ):
+                continue
+            lote.append(valores)
+            numeros_fila.append(numero_fila)
+            if len(lote) >= chunk_size:
+                yield pd.DataFrame.from_records(lote, columns=columnas, index=numeros_fila)
+                lote = []
+                numeros_fila = []
+
+        if lote:
+            yield pd.DataFrame.from_records(lote, columns=columnas, index=numeros_fila)
+    finally:
+        libro.close()
+
+
+def convertir_fechas(serie: pd.Series, formato: str = "%d/%m/%Y") -> pd.Series:
+    """
+    Convierte una columna con fechas en texto (dd/mm/aaaa) o celdas de fecha de Excel
+    a objetos date, dejando None en los valores que no se pueden interpretar.
+    """
+    fechas = pd.to_datetime(serie, format=formato, errors="coerce").dt.date
+    return fechas.astype(object).where(fechas.notna(), None)
+
+
+def normalizar_lote_p04(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica al lote del P04 la misma limpieza que la carga completa: renombra columnas,
+    convierte los campos numéricos y de fecha, y descarta filas sin campos obligatorios.
+    """
+    df = df.rename(columns=COLUMNAS_P04)
+
+    for col in COLUMNAS_NUMERICAS_P04:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    # Las columnas de texto se dejan como str (igual que dtype=str en pd.read_excel)
+    columnas_texto = [col for col in df.columns if col not in COLUMNAS_NUMERICAS_P04
+                      and col not in ("fecha_inicio", "fecha_fin")]
+    for col in columnas_texto:
+        df[col] = df[col].map(lambda valor: None if valor is None or valor == "" else str(valor))
+
+    # Eliminar filas con valores faltantes en campos obligatorios
+    df = df.dropna(subset=CAMPOS_OBLIGATORIOS_P04)
+
+    df["fecha_inicio"] = convertir_fechas(df["fecha_inicio"])
+    df["fecha_fin"] = convertir_fechas(df["fecha_fin"])
+
+    # Asegurar columnas de hora
+    df["hora_inicio"] = "00:00:00"
+    df["hora_fin"] = "00:00:00"
+    return df
+
+
+def leer_p04_por_lotes(
+    fuente,
+    chunk_size: Optional[int] = None,
+    filtro: Optional[FiltroFilas] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Recorre el archivo P04 por lotes y entrega cada lote ya normalizado.
+    """
+    for lote in leer_excel_por_lotes(fuente, FILA_ENCABEZADO_P04, list(COLUMNAS_P04), chunk_size, filtro):
+        yield normalizar_lote_p04(lote)
+
+
+# --- Reporte DF-14 ---
+
+# Columnas del archivo DF-14 y su nombre en la base de datos
+COLUMNAS_DF14 = {
+    # Llaves identificadoras
+    "FICHA": "cod_ficha",
+    "CODIGO_PROGRAMA": "cod_programa",
+    "VERSION_PROGRAMA": "la_version",
+    # Duraciones de programas
+    "DURACION_ETAPA_LECTIVA": "horas_lectivas",
+    "DURACION_ETAPA_PRODUCTIVA": "horas_productivas",
+    # Datos de cupo y estados de aprendices
+    "CUPO": "cupo_total",
+    "EN_TRANSITO": "en_transito",
+    "INDUCCION": "induccion",
+    "FORMACION": "formacion",
+    "CONDICIONADO": "condicionado",
+    "APLAZADO": "aplazado",
+    "RETIRO_VOLUNTARIO": "retiro_voluntario",
+    "CANCELAMIENTO_VIRT_COMP": "cancelamiento_vit_comp",
+    "DESERCION_VIRT_COMP": "desercion_vit_comp",
+    "CANCELADO": "cancelado",
+    "POR_CERTIFICAR": "por_certificar",
+    "CERTIFICADO": "certificados",
+    "TRASLADADO": "traslados",
+    "OTRO": "otro"
+}
+
+# El encabezado del DF-14 está en la fila 5 (se omiten las 4 primeras filas)
+FILA_ENCABEZADO_DF14 = 5
+
+CAMPOS_OBLIGATORIOS_DF14 = ["cod_ficha", "cod_programa", "la_version"]
+
+
+def _leer_tabla_df14(ruta: str) -> pd.DataFrame:
+    """
+    Lee la tabla del DF-14 con las columnas usadas en la importación, ya renombradas
+    y sin convertir. El índice es el número de fila en el Excel: se toma de cada fila
+    al recorrer la hoja, así que las filas vacías omitidas no corren la numeración.
+    """
+    lotes = list(leer_excel_por_lotes(ruta, FILA_ENCABEZADO_DF14, list(COLUMNAS_DF14)))
+    if not lotes:
+        return pd.DataFrame(columns=list(COLUMNAS_DF14.values()))
+    return pd.concat(lotes).rename(columns=COLUMNAS_DF14)
+
+
+def _limpiar_df14(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte los números del DF-14 y descarta las filas sin llaves."""
+    # Reemplazar valores NaN por None para compatibilidad con MySQL
+    df = df.where(pd.notnull(df), None)
+
+    # Todas las columnas del DF-14 que se cargan son numéricas
+    for col in COLUMNAS_DF14.values():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    # Eliminar filas con valores faltantes en campos obligatorios
+    df = df.dropna(subset=CAMPOS_OBLIGATORIOS_DF14)
+    return df
+
+
+def leer_df14(ruta: str) -> pd.DataFrame:
+    """
+    Lee y normaliza el DF-14. Es una función de módulo para poder ejecutarla en el
+    pool de procesos (ver core.ejecutores).
+    """
+    df = _leer_tabla_df14(ruta)
+    logger.debug("DF-14 - columnas cargadas: %s", df.columns.tolist())
+    logger.info("DF-14 - filas cargadas: %s", len(df))
+    return _limpiar_df14(df)
+
+
+# --- Reporte de juicios evaluativos ---
+
+# La ficha de caracterización está en la celda C3 y la tabla de juicios empieza en la fila 14
+FILA_FICHA_EVALUACIONES = 3
+COLUMNA_FICHA_EVALUACIONES = 2  # C (base 0)
+FILA_ENCABEZADO_EVALUACIONES = 14
+
+# Nombres asignados por posición a las primeras columnas de la tabla de juicios
+COLUMNAS_EVALUACIONES = [
+    "tipo_documento", "numero_documento", "nombre", "apellidos", "estado",
+    "competencia", "resultado_aprendizaje", "juicio_evaluacion",
+    "fecha_hora_juicio", "funcionario_registro"
+]
+
+# Columnas de la tabla juicio_evaluacion que se cargan desde el reporte
+COLUMNAS_JUICIOS = [
+    "cod_ficha", "tipo_documento", "numero_documento", "nombre_aprendiz", "apellidos_aprendiz",
+    "estado_aprendiz", "cod_competencia", "cod_resultado", "juicio", "fecha_hora_juicio",
+    "funcionario_registro"
+]
+
+# Textos del tipo "220501046 - NOMBRE DE LA COMPETENCIA"
+PATRON_CODIGO_NOMBRE = re.compile(r"^(\d+)\s*-\s*(.+)$")
+
+
+def _normalizar_ficha(valor) -> Optional[str]:
+    """Deja solo los dígitos de la ficha de C3 (p. ej. 2847248.0 -> '2847248')."""
+    if valor is None or pd.isna(valor):
+        return None
+    ficha = str(valor).strip()
+    try:
+        # Remover espacios y caracteres no numéricos excepto puntos y comas
+        limpio = "".join(c for c in ficha if c.isdigit() or c in ".,")
+        if limpio:
+            ficha = str(int(float(limpio.replace(",", ""))))
+    except ValueError as e:
+        # Mantener el valor original como string
+        logger.warning("No se pudo convertir la ficha a número: %s", e, extra={"muestreo": "ficha_no_numerica"})
+    return ficha
+
+
+def separar_codigo_nombre(serie: pd.Series) -> pd.DataFrame:
+    """
+    Separa de forma vectorizada textos "código - nombre" en las columnas `codigo`
+    (entero o NA) y `nombre`. Los valores que no son texto quedan en NA.
+    """
+    texto = serie.astype(object).str.strip()
+    partes = texto.str.extract(PATRON_CODIGO_NOMBRE)
+    return pd.DataFrame({
+        "codigo": pd.to_numeric(partes[0], errors="coerce").astype("Int64"),
+        "nombre": partes[1].str.strip()
+    }, index=serie.index)
+
+
+def _texto_o_none(serie: pd.Series, largo: int) -> pd.Series:
+    """Convierte a texto recortado a `largo` caracteres, dejando None en vacíos."""
+    texto = serie.astype(object).where(serie.notna(), None)
+    texto = texto.map(lambda valor: None if valor is None else str(valor).strip()[:largo] or None)
+    return texto
+
+
+def _documento_como_texto(serie: pd.Series) -> pd.Series:
+    """Números de documento como texto sin decimales (10203040.0 -> '10203040')."""
+    numeros = pd.to_numeric(serie, errors="coerce")
+    enteros = numeros.notna() & (numeros % 1 == 0)
+    texto = _texto_o_none(serie, 20)
+    texto[enteros] = numeros[enteros].astype("int64").astype(str)
+    return texto
+
+
+def preparar_juicios(
+    df_evaluaciones: pd.DataFrame,
+    competencias: pd.DataFrame,
+    resultados: pd.DataFrame,
+    ficha_caracterizacion: Optional[str]
+) -> pd.DataFrame:
+    """
+    Construye las filas de juicio_evaluacion (una por aprendiz y resultado de aprendizaje)
+    a partir de la tabla del reporte y los códigos ya separados de competencia y resultado.
+    Si el mismo aprendiz y resultado aparecen repetidos se conserva la última fila.
+    """
+    cod_ficha = pd.to_numeric(pd.Series([ficha_caracterizacion]), errors="coerce").iloc[0]
+    if pd.isna(cod_ficha) or len(df_evaluaciones) == 0:
+        return pd.DataFrame(columns=COLUMNAS_JUICIOS)
+
+    juicio = _texto_o_none(df_evaluaciones["juicio_evaluacion"], 30)
+    df_juicios = pd.DataFrame({
+        "cod_ficha": int(cod_ficha),
+        "tipo_documento": _texto_o_none(df_evaluaciones["tipo_documento"], 10),
+        "numero_documento": _documento_como_texto(df_evaluaciones["numero_documento"]),
+        "nombre_aprendiz": _texto_o_none(df_evaluaciones["nombre"], 100),
+        "apellidos_aprendiz": _texto_o_none(df_evaluaciones["apellidos"], 100),
+        "estado_aprendiz": _texto_o_none(df_evaluaciones["estado"], 50),
+        "cod_competencia": competencias["codigo"],
+        "cod_resultado": resultados["codigo"],
+        "juicio": juicio.str.upper(),
+        "fecha_hora_juicio": pd.to_datetime(df_evaluaciones["fecha_hora_juicio"], errors="coerce"),
+        "funcionario_registro": _texto_o_none(df_evaluaciones["funcionario_registro"], 150)
+    }, index=df_evaluaciones.index)
+
+    df_juicios = df_juicios.dropna(subset=["numero_documento", "cod_competencia", "cod_resultado"])
+    df_juicios = df_juicios.drop_duplicates(subset=["numero_documento", "cod_resultado"], keep="last")
+    df_juicios["cod_competencia"] = df_juicios["cod_competencia"].astype("int64")
+    df_juicios["cod_resultado"] = df_juicios["cod_resultado"].astype("int64")
+    return df_juicios.reset_index(drop=True)
+
+
+def _leer_tabla_evaluaciones(ruta: str) -> Tuple[Optional[str], pd.DataFrame]:
+    """
+    Abre el libro una sola vez en modo read_only y lo recorre en una pasada: la fila 3
+    aporta la ficha, la 14 el encabezado y las siguientes los juicios.
+
+    Returns:
+        Tuple: Ficha de caracterización (C3) y la tabla de juicios sin limpiar, con el
+        número de fila del Excel como índice
+    """
+    ficha_caracterizacion = None
+    encabezado = None
+    filas = []
+    numeros_fila = []
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        for numero_fila, fila in enumerate(libro.active.iter_rows(values_only=True), start=1):
+            if numero_fila == FILA_FICHA_EVALUACIONES:
+                if len(fila) > COLUMNA_FICHA_EVALUACIONES:
+                    ficha_caracterizacion = _normalizar_ficha(fila[COLUMNA_FICHA_EVALUACIONES])
+            elif numero_fila == FILA_ENCABEZADO_EVALUACIONES:
+                encabezado = list(fila)
+            elif numero_fila > FILA_ENCABEZADO_EVALUACIONES:
+                # Igual que pandas, se omiten las filas completamente vacías
+                if any(valor is not None and valor != "" for valor in fila):
+                    filas.append(fila)
+                    numeros_fila.append(numero_fila)
+    finally:
+        libro.close()
+
+    if encabezado is None:
+        raise ValueError(f"El archivo no tiene encabezado en la fila {FILA_ENCABEZADO_EVALUACIONES}")
+
+    # Las primeras columnas se nombran por posición; el resto conserva su encabezado
+    columnas = [
+        COLUMNAS_EVALUACIONES[i] if i < len(COLUMNAS_EVALUACIONES) else (nombre if nombre is not None else f"columna_{i}")
+        for i, nombre in enumerate(encabezado)
+    ]
+    if len(columnas) < len(COLUMNAS_EVALUACIONES):
+        raise ValueError(f"Columnas no encontradas en el archivo: {COLUMNAS_EVALUACIONES[len(columnas):]}")
+    ancho = len(columnas)
+    df_evaluaciones = pd.DataFrame.from_records(
+        [tuple(fila[:ancho]) + (None,) * (ancho - len(fila)) for fila in filas],
+        columns=columnas,
+        index=numeros_fila
+    )
+    return ficha_caracterizacion, df_evaluaciones
+
+
+def leer_evaluaciones(ruta: str) -> dict:
+    """
+    Lee el reporte de juicios evaluativos y extrae la ficha de caracterización (C3),
+    la tabla de evaluaciones y las competencias y resultados de aprendizaje únicos.
+    Es una función de módulo para poder ejecutarla en el pool de procesos.
+
+    Returns:
+        dict: ficha_caracterizacion, df_evaluaciones, df_competencias, df_resultados
+        y df_juicios
+    """
+    ficha_caracterizacion, df_evaluaciones = _leer_tabla_evaluaciones(ruta)
+    logger.info("Evaluaciones - ficha de caracterización (C3): %s, filas cargadas: %s", ficha_caracterizacion, len(df_evaluaciones))
+
+    # Agregar la ficha de caracterización como nueva columna
+    df_evaluaciones["cod_ficha"] = ficha_caracterizacion
+
+    # Limpiar datos
+    df_evaluaciones = df_evaluaciones.dropna(subset=["competencia", "resultado_aprendizaje"])
+    df_evaluaciones = df_evaluaciones.astype(object).where(df_evaluaciones.notna(), None)
+
+    logger.debug("Evaluaciones - filas después de limpieza: %s", len(df_evaluaciones))
+
+    competencias = separar_codigo_nombre(df_evaluaciones["competencia"])
+    resultados = separar_codigo_nombre(df_evaluaciones["resultado_aprendizaje"])
+
+    # Competencias únicas (se conserva la primera aparición, con horas en 0)
+    con_competencia = competencias["codigo"].fillna(0) > 0
+    df_competencias = (
+        pd.DataFrame({
+            "cod_competencia": competencias.loc[con_competencia, "codigo"].astype("int64"),
+            "nombre": competencias.loc[con_competencia, "nombre"].fillna(""),
+            "horas": 0
+        })
+        .drop_duplicates(subset=["cod_competencia"])
+        .reset_index(drop=True)
+    )
+
+    # Resultados únicos que tienen código propio y de competencia
+    con_resultado = con_competencia & (resultados["codigo"].fillna(0) > 0)
+    df_resultados = (
+        pd.DataFrame({
+            "cod_resultado": resultados.loc[con_resultado, "codigo"].astype("int64"),
+            "nombre": resultados.loc[con_resultado, "nombre"].fillna(""),
+            "cod_competencia": competencias.loc[con_resultado, "codigo"].astype("int64")
+        })
+        .drop_duplicates(subset=["cod_resultado"])
+        .reset_index(drop=True)
+    )
+
+    logger.debug("Evaluaciones - competencias extraídas: %s, resultados de aprendizaje: %s", len(df_competencias), len(df_resultados))
+
+    df_juicios = preparar_juicios(df_evaluaciones, competencias, resultados, ficha_caracterizacion)
+
+    return {
+        "ficha_caracterizacion": ficha_caracterizacion,
+        "df_evaluaciones": df_evaluaciones,
+        "df_competencias": df_competencias,
+        "df_resultados": df_resultados,
+        "df_juicios": df_juicios
+    }
+
+
+def leer_evaluaciones_lote(ruta: str) -> dict:
+    """
+    leer_evaluaciones para la carga en lote: en lugar de la tabla completa de
+    evaluaciones retorna solo su número de filas (registros_evaluaciones), para no
+    serializarla de vuelta desde el pool de procesos por cada libro.
+    """
+    lectura = leer_evaluaciones(ruta)
+    lectura["registros_evaluaciones"] = len(lectura.pop("df_evaluaciones"))
+    return lectura
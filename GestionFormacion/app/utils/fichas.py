@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from core.config import settings
+
+# --- Resolución de ficha a programa de formación ---
+
+# cod_ficha -> (cod_programa, la_version)
+MapaFichas = Dict[int, Tuple[int, int]]
+
+
+class ResolutorFichas:
+    """
+    Mapa en memoria cod_ficha -> (cod_programa, la_version) de todas las fichas de grupo,
+    cargado con una sola consulta. Las búsquedas son de diccionario; las fichas que no
+    están en el mapa (p. ej. creadas por un P04 después de cargarlo) se consultan juntas
+    en una sola consulta con `cargar_faltantes` y se agregan al mapa.
+    """
+
+    def __init__(self, mapa: MapaFichas):
+        self._mapa = mapa
+        self._lock = threading.Lock()
+        self.cargado = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._mapa)
+
+    def resolver(
+        self,
+        fichas: Iterable[int],
+        cargar_faltantes: Optional[Callable[[List[int]], MapaFichas]] = None
+    ) -> MapaFichas:
+        """
+        Returns:
+            dict: cod_ficha -> (cod_programa, la_version) de las fichas que existen en grupo
+        """
+        fichas = {int(ficha) for ficha in fichas if ficha is not None}
+        with self._lock:
+            encontradas = {ficha: self._mapa[ficha] for ficha in fichas if ficha in self._mapa}
+        faltantes = sorted(fichas - encontradas.keys())
+        if faltantes and cargar_faltantes is not None:
+            nuevas = cargar_faltantes(faltantes)
+            with self._lock:
+                self._mapa.update(nuevas)
+            encontradas.update(nuevas)
+        return encontradas
+
+
+_compartido: Optional[ResolutorFichas] = None
+_compartido_lock = threading.Lock()
+
+
+def obtener_resolutor_fichas(cargar_todo: Callable[[], MapaFichas]) -> ResolutorFichas:
+    """
+    Resolutor compartido entre las importaciones del proceso. Se recarga con
+    `cargar_todo` cuando tiene más de INGESTA_FICHAS_CACHE_SEGUNDOS o después de
+    invalidar_resolutor_fichas(); con 0 segundos cada importación carga el suyo.
+    """
+    global _compartido
+    with _compartido_lock:
+        vigente = (
+            _compartido is not None
+            and time.monotonic() - _compartido.cargado < settings.INGESTA_FICHAS_CACHE_SEGUNDOS
+        )
+        if not vigente:
+            _compartido = ResolutorFichas(cargar_todo())
+        return _compartido
+
+
+def invalidar_resolutor_fichas():
+    """Descarta el mapa compartido; se llama después de confirmar una carga del P04."""
+    global _compartido
+    with _compartido_lock:
+        _compartido = None
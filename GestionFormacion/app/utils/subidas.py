@@ -0,0 +1,234 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from app.utils.archivos import ArchivoTemporal
+from core.config import settings
+
+# --- Subidas por partes reanudables ---
+#
+# Cada subida es un directorio en INGESTA_DIR_SUBIDAS con:
+# - subida.json: tipo de reporte, nombre, tamaño total, tamaño de parte, dueño, etc.
+# - datos: el archivo final, preasignado; cada parte se escribe en su desplazamiento
+# - partes/<numero>: marca vacía que se crea cuando la parte terminó de escribirse
+#
+# El estado vive en disco (no en memoria) para que una subida se pueda reanudar aunque
+# el cliente se reconecte contra otro proceso o el servidor se reinicie, y las partes
+# se pueden enviar en paralelo porque cada una escribe un rango distinto del archivo.
+
+ARCHIVO_METADATOS = "subida.json"
+ARCHIVO_DATOS = "datos"
+DIRECTORIO_PARTES = "partes"
+
+
+def _directorio(id_subida: str) -> str:
+    # El id es un uuid hex: se valida para que no se pueda salir de INGESTA_DIR_SUBIDAS
+    if not id_subida.isalnum():
+        raise ValueError("Identificador de subida inválido")
+    return os.path.join(settings.INGESTA_DIR_SUBIDAS, id_subida)
+
+
+def total_partes(meta: dict) -> int:
+    return max(1, -(-meta["tamano_bytes"] // meta["tamano_parte"]))
+
+
+def rango_parte(meta: dict, numero: int) -> tuple:
+    """
+    Desplazamiento y largo esperado de la parte `numero` (base 0).
+
+    Raises:
+        ValueError: Si la parte no existe para el tamaño declarado
+    """
+    if numero < 0 or numero >= total_partes(meta):
+        raise ValueError(f"La parte {numero} no existe; la subida tiene {total_partes(meta)} partes (0 a {total_partes(meta) - 1})")
+    inicio = numero * meta["tamano_parte"]
+    return inicio, min(meta["tamano_parte"], meta["tamano_bytes"] - inicio)
+
+
+def _depurar_subidas():
+    """
+    Elimina las subidas sin actividad desde hace más de INGESTA_SUBIDAS_TTL_HORAS. La
+    actividad es la fecha de modificación de subida.json, que se actualiza con cada
+    parte (la del directorio no cambia al escribir en partes/).
+    """
+    if not os.path.isdir(settings.INGESTA_DIR_SUBIDAS):
+        return
+    limite = time.time() - settings.INGESTA_SUBIDAS_TTL_HORAS * 3600
+    for nombre in os.listdir(settings.INGESTA_DIR_SUBIDAS):
+        ruta = os.path.join(settings.INGESTA_DIR_SUBIDAS, nombre)
+        try:
+            metadatos = os.path.join(ruta, ARCHIVO_METADATOS)
+            actividad = os.path.getmtime(metadatos if os.path.exists(metadatos) else ruta)
+            if actividad < limite:
+                shutil.rmtree(ruta, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def _registrar_actividad(id_subida: str):
+    """Actualiza la fecha de modificación de subida.json para que _depurar_subidas no la borre."""
+    try:
+        os.utime(os.path.join(_directorio(id_subida), ARCHIVO_METADATOS))
+    except FileNotFoundError:
+        pass
+
+
+def crear_subida(
+    tipo_reporte: str,
+    nombre_archivo: Optional[str],
+    tamano_bytes: int,
+    id_usuario: int,
+    tamano_parte: Optional[int] = None,
+    sha256: Optional[str] = None
+) -> dict:
+    """
+    Registra una subida por partes y preasigna el archivo de datos en disco.
+
+    Raises:
+        ValueError: Si el tamaño es inválido o supera INGESTA_MAX_TAMANO_BYTES
+    """
+    if tamano_bytes <= 0:
+        raise ValueError("El tamaño del archivo debe ser mayor que cero")
+    if tamano_bytes > settings.INGESTA_MAX_TAMANO_BYTES:
+        raise ValueError(f"El archivo supera el tamaño máximo permitido ({settings.INGESTA_MAX_TAMANO_BYTES} bytes)")
+
+    _depurar_subidas()
+    id_subida = uuid.uuid4().hex
+    directorio = _directorio(id_subida)
+    os.makedirs(os.path.join(directorio, DIRECTORIO_PARTES))
+
+    meta = {
+        "id_subida": id_subida,
+        "tipo_reporte": tipo_reporte,
+        "nombre_archivo": nombre_archivo,
+        "tamano_bytes": tamano_bytes,
+        "tamano_parte": tamano_parte or settings.INGESTA_TAMANO_PARTE_BYTES,
+        "sha256": sha256.lower() if sha256 else None,
+        "id_usuario": id_usuario,
+        "creado": datetime.now().isoformat(timespec="seconds")
+    }
+    with open(os.path.join(directorio, ARCHIVO_DATOS), "wb") as datos:
+        datos.truncate(tamano_bytes)
+    with open(os.path.join(directorio, ARCHIVO_METADATOS), "w", encoding="utf-8") as archivo:
+        json.dump(meta, archivo)
+    return estado_subida(id_subida)
+
+
+def obtener_subida(id_subida: str) -> Optional[dict]:
+    """Metadatos de la subida o None si no existe (o ya se completó o canceló)."""
+    try:
+        with open(os.path.join(_directorio(id_subida), ARCHIVO_METADATOS), encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def partes_recibidas(id_subida: str) -> List[int]:
+    try:
+        return sorted(int(nombre) for nombre in os.listdir(os.path.join(_directorio(id_subida), DIRECTORIO_PARTES)))
+    except FileNotFoundError:
+        return []
+
+
+def _rangos(meta: dict, partes: List[int]) -> List[List[int]]:
+    """Rangos de bytes [inicio, fin) ya recibidos, uniendo partes consecutivas."""
+    rangos = []
+    for numero in partes:
+        inicio, largo = rango_parte(meta, numero)
+        if rangos and rangos[-1][1] == inicio:
+            rangos[-1][1] = inicio + largo
+        else:
+            rangos.append([inicio, inicio + largo])
+    return rangos
+
+
+def estado_subida(id_subida: str) -> Optional[dict]:
+    """Metadatos más las partes recibidas, las faltantes y los rangos de bytes que ya están en el servidor."""
+    meta = obtener_subida(id_subida)
+    if meta is None:
+        return None
+    recibidas = partes_recibidas(id_subida)
+    rangos = _rangos(meta, recibidas)
+    recibidas_set = set(recibidas)
+    return {
+        **meta,
+        "total_partes": total_partes(meta),
+        "partes_recibidas": recibidas,
+        "partes_faltantes": [n for n in range(total_partes(meta)) if n not in recibidas_set],
+        "rangos_recibidos": rangos,
+        "bytes_recibidos": sum(fin - inicio for inicio, fin in rangos),
+        "completa": len(recibidas_set) == total_partes(meta)
+    }
+
+
+def abrir_datos(id_subida: str):
+    """Archivo de datos abierto para escribir en cualquier desplazamiento (sin truncarlo)."""
+    _registrar_actividad(id_subida)
+    return open(os.path.join(_directorio(id_subida), ARCHIVO_DATOS), "r+b")
+
+
+def marcar_parte_recibida(id_subida: str, numero: int, recibida: bool = True):
+    """Crea (o borra, si se está reescribiendo la parte) la marca de parte completa."""
+    ruta = os.path.join(_directorio(id_subida), DIRECTORIO_PARTES, str(numero))
+    if recibida:
+        open(ruta, "wb").close()
+        _registrar_actividad(id_subida)
+    else:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def eliminar_subida(id_subida: str):
+    shutil.rmtree(_directorio(id_subida), ignore_errors=True)
+
+
+def ensamblar_subida(id_subida: str, conservar: bool = False) -> ArchivoTemporal:
+    """
+    Cierra una subida completa: calcula el SHA-256 sobre el archivo mapeado en memoria
+    (sin copiarlo a un buffer de Python), lo compara con el declarado y mueve el archivo
+    a INGESTA_DIR_TEMPORAL con os.replace, sin copiar bytes. Desde ahí lo toma la misma
+    importación que usan las subidas de un solo paso, que lo borra al terminar.
+
+    Con conservar=True la subida sigue disponible: el temporal es un enlace duro al
+    mismo archivo, o una copia si el sistema de archivos no lo permite. Así la usa
+    /files/subidas/{id}/completar, que borra la subida solo cuando la importación la
+    aceptó (una validación dry_run, un duplicado o un error la dejan para reintentar).
+
+    Raises:
+        ValueError: Si faltan partes o el SHA-256 no coincide con el declarado
+    """
+    estado = estado_subida(id_subida)
+    if estado is None:
+        raise FileNotFoundError("Subida no encontrada")
+    if not estado["completa"]:
+        raise ValueError(f"Faltan partes por subir: {estado['partes_faltantes'][:20]}")
+
+    directorio = _directorio(id_subida)
+    ruta_datos = os.path.join(directorio, ARCHIVO_DATOS)
+    with open(ruta_datos, "rb") as datos, mmap.mmap(datos.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+        sha256 = hashlib.sha256(mapa).hexdigest()
+    if estado["sha256"] and estado["sha256"] != sha256:
+        raise ValueError("El SHA-256 del archivo ensamblado no coincide con el declarado; vuelva a enviar las partes")
+
+    os.makedirs(settings.INGESTA_DIR_TEMPORAL, exist_ok=True)
+    descriptor, ruta_final = tempfile.mkstemp(dir=settings.INGESTA_DIR_TEMPORAL, prefix="ingesta_", suffix=".xlsx")
+    os.close(descriptor)
+    if conservar:
+        os.remove(ruta_final)
+        try:
+            os.link(ruta_datos, ruta_final)
+        except OSError:
+            shutil.copyfile(ruta_datos, ruta_final)
+    else:
+        os.replace(ruta_datos, ruta_final)
+        eliminar_subida(id_subida)
+    return ArchivoTemporal(ruta_final, sha256, estado["tamano_bytes"], estado["nombre_archivo"])
@@ -0,0 +1,451 @@
+import shutil
+import tempfile
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import pandas as pd
+from app.utils.archivos import extraer_libros_zip
+from app.utils.excel import (
+    COLUMNAS_P04, FILA_ENCABEZADO_P04, CAMPOS_OBLIGATORIOS_P04, CAMPOS_OBLIGATORIOS_DF14,
+    COLUMNAS_EVALUACIONES,
+    FiltroFilas, leer_excel_por_lotes, convertir_fechas, separar_codigo_nombre,
+    _leer_tabla_df14, _leer_tabla_evaluaciones
+)
+from core.config import settings
+
+# --- Validación previa (dry_run) de los archivos contra las restricciones de db/init.sql ---
+
+SEVERIDAD_ERROR = "error"
+SEVERIDAD_ADVERTENCIA = "advertencia"
+
+# Filas de ejemplo (número de fila del Excel) que se reportan por regla
+MUESTRA_FILAS = 10
+# Máximo de filas con observaciones que se incluyen en el CSV descargable
+MAX_FILAS_CSV = 50000
+
+INT_MAXIMO = 2147483647
+
+
+class Regla(NamedTuple):
+    """
+    Restricción que se evalúa sobre un lote completo. `verificar` recibe el DataFrame
+    del lote y retorna una Series booleana alineada con él: True en las filas que la incumplen.
+    """
+    codigo: str
+    descripcion: str
+    verificar: Callable[[pd.DataFrame], pd.Series]
+    severidad: str = SEVERIDAD_ERROR
+
+
+def _presente(serie: pd.Series) -> pd.Series:
+    """True si la celda tiene un valor (las celdas vacías o solo con espacios cuentan como nulas)."""
+    texto = serie.astype("string").str.strip()
+    return (serie.notna() & (texto != "")).fillna(False).astype(bool)
+
+
+def _en_conjunto(df: pd.DataFrame, columnas: Sequence[str], conjunto: set) -> pd.Series:
+    """True si la llave (simple o compuesta) de la fila está en `conjunto`."""
+    valores = [pd.to_numeric(df[col], errors="coerce").round().astype("Int64") for col in columnas]
+    if len(valores) == 1:
+        return valores[0].isin(conjunto).fillna(False).astype(bool)
+    llaves = pd.MultiIndex.from_arrays(valores)
+    return pd.Series(llaves.isin(list(conjunto)), index=df.index)
+
+
+def regla_obligatoria(columna: str, campo: str) -> Regla:
+    return Regla(
+        f"obligatorio:{campo}",
+        f"{campo} es NOT NULL o requerido por la carga y la celda está vacía; la fila se descarta",
+        lambda df: ~_presente(df[columna])
+    )
+
+
+def regla_longitud(columna: str, campo: str, maximo: int, severidad: str = SEVERIDAD_ERROR) -> Regla:
+    return Regla(
+        f"longitud:{campo}",
+        f"{campo} admite como máximo {maximo} caracteres",
+        lambda df: (df[columna].astype("string").str.strip().str.len() > maximo).fillna(False),
+        severidad
+    )
+
+
+def regla_entero(columna: str, campo: str, severidad: str = SEVERIDAD_ERROR) -> Regla:
+    def verificar(df: pd.DataFrame) -> pd.Series:
+        numeros = pd.to_numeric(df[columna], errors="coerce")
+        invalido = numeros.isna() | (numeros % 1 != 0) | (numeros.abs() > INT_MAXIMO)
+        return _presente(df[columna]) & invalido.astype(bool)
+    return Regla(f"entero:{campo}", f"{campo} debe ser un entero INT válido", verificar, severidad)
+
+
+def regla_fecha(columna: str, campo: str, formato: str = "%d/%m/%Y", severidad: str = SEVERIDAD_ERROR) -> Regla:
+    return Regla(
+        f"fecha:{campo}",
+        f"{campo} no es una fecha válida ({formato}); se guardaría NULL",
+        lambda df: _presente(df[columna]) & convertir_fechas(df[columna], formato).isna(),
+        severidad
+    )
+
+
+class AcumuladorValidacion:
+    """
+    Evalúa las reglas lote a lote y acumula, por regla, el número de filas que la
+    incumplen con una muestra de sus números de fila, además de las filas con
+    observaciones para el CSV descargable.
+    """
+
+    def __init__(self, reglas: Sequence[Regla]):
+        self.reglas = list(reglas)
+        self.filas_validadas = 0
+        self.filas_rechazadas = 0
+        self.filas_con_advertencias = 0
+        self._conteos = {regla.codigo: 0 for regla in self.reglas}
+        self._muestras: Dict[str, List[int]] = {regla.codigo: [] for regla in self.reglas}
+        self._observaciones: List[pd.DataFrame] = []
+        self._filas_csv = 0
+        self.csv_truncado = False
+
+    def evaluar(self, df: pd.DataFrame):
+        rechazada = pd.Series(False, index=df.index)
+        advertida = pd.Series(False, index=df.index)
+        incumplidas = pd.Series("", index=df.index, dtype=object)
+
+        for regla in self.reglas:
+            mascara = pd.Series(regla.verificar(df), index=df.index).fillna(False).astype(bool)
+            cantidad = int(mascara.sum())
+            if cantidad == 0:
+                continue
+            self._conteos[regla.codigo] += cantidad
+            faltan = MUESTRA_FILAS - len(self._muestras[regla.codigo])
+            if faltan > 0:
+                self._muestras[regla.codigo].extend(int(fila) for fila in df.index[mascara][:faltan])
+            if regla.severidad == SEVERIDAD_ERROR:
+                rechazada |= mascara
+            else:
+                advertida |= mascara
+            incumplidas[mascara] = incumplidas[mascara] + regla.codigo + ";"
+
+        self.filas_validadas += len(df)
+        self.filas_rechazadas += int(rechazada.sum())
+        self.filas_con_advertencias += int((advertida & ~rechazada).sum())
+
+        con_observaciones = rechazada | advertida
+        if con_observaciones.any() and not self.csv_truncado:
+            observaciones = df[con_observaciones].copy()
+            observaciones.insert(0, "reglas", incumplidas[con_observaciones].str.rstrip(";"))
+            observaciones.insert(0, "rechazada", rechazada[con_observaciones])
+            espacio = MAX_FILAS_CSV - self._filas_csv
+            if len(observaciones) > espacio:
+                observaciones = observaciones.iloc[:espacio]
+                self.csv_truncado = True
+            self._observaciones.append(observaciones)
+            self._filas_csv += len(observaciones)
+
+    def resumen(self) -> dict:
+        reglas = [
+            {
+                "regla": regla.codigo,
+                "descripcion": regla.descripcion,
+                "severidad": regla.severidad,
+                "filas": self._conteos[regla.codigo],
+                "muestra_filas": self._muestras[regla.codigo]
+            }
+            for regla in self.reglas if self._conteos[regla.codigo] > 0
+        ]
+        if self.filas_rechazadas:
+            mensaje = "El archivo tiene filas que no cumplen las restricciones de la base de datos"
+        elif self.filas_con_advertencias:
+            mensaje = "El archivo se puede cargar, con advertencias"
+        else:
+            mensaje = "El archivo cumple todas las validaciones"
+        return {
+            "dry_run": True,
+            "filas_validadas": self.filas_validadas,
+            "filas_rechazadas": self.filas_rechazadas,
+            "filas_con_advertencias": self.filas_con_advertencias,
+            "filas_validas": self.filas_validadas - self.filas_rechazadas,
+            "reglas": reglas,
+            "csv_truncado": self.csv_truncado,
+            "mensaje": mensaje
+        }
+
+    def observaciones(self) -> pd.DataFrame:
+        """Filas con al menos una observación, indexadas por número de fila del Excel."""
+        if not self._observaciones:
+            return pd.DataFrame(columns=["rechazada", "reglas"])
+        return pd.concat(self._observaciones)
+
+
+# --- P04 ---
+
+_CAMPOS_P04 = {
+    "cod_ficha": "grupo.cod_ficha",
+    "cod_centro": "grupo.cod_centro",
+    "cod_programa": "grupo.cod_programa",
+    "la_version": "grupo.la_version",
+    "nombre": "programa_formacion.nombre",
+    "estado_grupo": "grupo.estado_grupo",
+    "nombre_nivel": "grupo.nombre_nivel",
+    "jornada": "grupo.jornada",
+    "fecha_inicio": "grupo.fecha_inicio",
+    "fecha_fin": "grupo.fecha_fin",
+    "etapa": "grupo.etapa",
+    "modalidad": "grupo.modalidad",
+    "responsable": "grupo.responsable",
+    "nombre_empresa": "grupo.nombre_empresa",
+    "nombre_municipio": "grupo.nombre_municipio",
+    "nombre_programa_especial": "grupo.nombre_programa_especial",
+    "cod_regional": "centro_formacion.cod_regional",
+    "nombre_regional": "regional.nombre",
+    "nombre_centro": "centro_formacion.nombre_centro",
+    "num_aprendices_masculinos": "datos_grupo.num_aprendices_masculinos",
+    "num_aprendices_femenino": "datos_grupo.num_aprendices_femenino",
+    "num_aprendices_no_binario": "datos_grupo.num_aprendices_no_binario",
+    "num_total_aprendices": "datos_grupo.num_total_aprendices",
+    "num_total_aprendices_activos": "datos_grupo.num_total_aprendices_activos"
+}
+
+# Longitud máxima de los VARCHAR de db/init.sql que se llenan desde el P04
+_LONGITUDES_P04 = {
+    "nombre": 255, "estado_grupo": 50, "nombre_nivel": 50, "jornada": 30, "etapa": 50,
+    "modalidad": 50, "responsable": 100, "nombre_empresa": 100, "nombre_municipio": 50,
+    "nombre_programa_especial": 100, "nombre_centro": 80, "nombre_regional": 100
+}
+
+_LLAVES_P04 = ["cod_ficha", "cod_centro", "cod_programa", "la_version", "cod_regional"]
+_CONTEOS_P04 = [
+    "num_aprendices_masculinos", "num_aprendices_femenino", "num_aprendices_no_binario",
+    "num_total_aprendices", "num_total_aprendices_activos"
+]
+
+
+def _reglas_p04(claves: dict) -> List[Regla]:
+    centros = claves["centros"]
+    regionales = claves["regionales"]
+
+    def centro_inexistente(df: pd.DataFrame) -> pd.Series:
+        # El centro se crea desde la misma fila si trae nombre y regional
+        puede_crearse = _presente(df["nombre_centro"]) & _presente(df["cod_regional"])
+        return _presente(df["cod_centro"]) & ~_en_conjunto(df, ["cod_centro"], centros) & ~puede_crearse
+
+    def regional_inexistente(df: pd.DataFrame) -> pd.Series:
+        crea_centro = (
+            ~_en_conjunto(df, ["cod_centro"], centros)
+            & _presente(df["nombre_centro"]) & _presente(df["cod_regional"])
+        )
+        return crea_centro & ~_en_conjunto(df, ["cod_regional"], regionales) & ~_presente(df["nombre_regional"])
+
+    reglas = [regla_obligatoria(col, _CAMPOS_P04[col]) for col in CAMPOS_OBLIGATORIOS_P04]
+    reglas += [regla_entero(col, _CAMPOS_P04[col]) for col in _LLAVES_P04]
+    reglas += [regla_entero(col, _CAMPOS_P04[col], SEVERIDAD_ADVERTENCIA) for col in _CONTEOS_P04]
+    reglas += [regla_fecha(col, _CAMPOS_P04[col]) for col in ("fecha_inicio", "fecha_fin")]
+    reglas += [regla_longitud(col, _CAMPOS_P04[col], maximo) for col, maximo in _LONGITUDES_P04.items()]
+    reglas += [
+        Regla(
+            "fk:grupo.cod_centro",
+            "El centro no existe en centro_formacion y la fila no trae NOMBRE_CENTRO y CODIGO_REGIONAL para crearlo",
+            centro_inexistente
+        ),
+        Regla(
+            "fk:centro_formacion.cod_regional",
+            "La regional no existe en regional y la fila no trae NOMBRE_REGIONAL para crearla",
+            regional_inexistente
+        )
+    ]
+    return reglas
+
+
+def validar_p04(ruta: str, claves: dict, filtros: Optional[dict] = None) -> Tuple[dict, pd.DataFrame]:
+    """
+    Valida el P04 por lotes, igual que la carga, sin escribir en la base de datos.
+    Con `filtros` solo se validan las filas de los centros o regionales que se importarían.
+    Es una función de módulo para poder ejecutarla en el pool de procesos.
+    """
+    acumulador = AcumuladorValidacion(_reglas_p04(claves))
+    filtro = FiltroFilas(filtros) if filtros else None
+    for lote in leer_excel_por_lotes(ruta, FILA_ENCABEZADO_P04, list(COLUMNAS_P04), filtro=filtro):
+        acumulador.evaluar(lote.rename(columns=COLUMNAS_P04))
+    resumen = acumulador.resumen()
+    if filtro:
+        resumen["filas_omitidas_por_filtro"] = filtro.filas_omitidas
+    return resumen, acumulador.observaciones()
+
+
+# --- DF-14 ---
+
+_CONTEOS_DF14 = [
+    "horas_lectivas", "horas_productivas", "cupo_total", "en_transito", "induccion",
+    "formacion", "condicionado", "aplazado", "retiro_voluntario", "cancelamiento_vit_comp",
+    "desercion_vit_comp", "cancelado", "por_certificar", "certificados", "traslados", "otro"
+]
+
+
+def _campo_df14(columna: str) -> str:
+    if columna in ("cod_programa", "la_version", "horas_lectivas", "horas_productivas"):
+        return f"programa_formacion.{columna}"
+    return f"datos_grupo.{columna}"
+
+
+def _reglas_df14(claves: dict) -> List[Regla]:
+    programas = claves["programas"]
+    fichas = claves["fichas_datos_grupo"]
+
+    reglas = [regla_obligatoria(col, _campo_df14(col)) for col in CAMPOS_OBLIGATORIOS_DF14]
+    reglas += [regla_entero(col, _campo_df14(col)) for col in CAMPOS_OBLIGATORIOS_DF14]
+    reglas += [regla_entero(col, _campo_df14(col), SEVERIDAD_ADVERTENCIA) for col in _CONTEOS_DF14]
+    reglas += [
+        Regla(
+            "fk:programa_formacion",
+            "El programa y versión no existen en programa_formacion; no se actualizan sus horas",
+            lambda df: _presente(df["cod_programa"]) & ~_en_conjunto(df, ["cod_programa", "la_version"], programas),
+            SEVERIDAD_ADVERTENCIA
+        ),
+        Regla(
+            "fk:datos_grupo.cod_ficha",
+            "La ficha no existe en datos_grupo (cargue primero el P04); no se actualizan sus datos",
+            lambda df: _presente(df["cod_ficha"]) & ~_en_conjunto(df, ["cod_ficha"], fichas),
+            SEVERIDAD_ADVERTENCIA
+        )
+    ]
+    return reglas
+
+
+def validar_df14(ruta: str, claves: dict) -> Tuple[dict, pd.DataFrame]:
+    """Valida el DF-14 sin escribir en la base de datos (ejecutable en el pool de procesos)."""
+    acumulador = AcumuladorValidacion(_reglas_df14(claves))
+    acumulador.evaluar(_leer_tabla_df14(ruta))
+    return acumulador.resumen(), acumulador.observaciones()
+
+
+# --- Juicios evaluativos ---
+
+# Columnas del reporte que se recortan al guardar en juicio_evaluacion
+_LONGITUDES_JUICIOS = {
+    "tipo_documento": ("juicio_evaluacion.tipo_documento", 10),
+    "numero_documento": ("juicio_evaluacion.numero_documento", 20),
+    "nombre": ("juicio_evaluacion.nombre_aprendiz", 100),
+    "apellidos": ("juicio_evaluacion.apellidos_aprendiz", 100),
+    "estado": ("juicio_evaluacion.estado_aprendiz", 50),
+    "juicio_evaluacion": ("juicio_evaluacion.juicio", 30),
+    "funcionario_registro": ("juicio_evaluacion.funcionario_registro", 150)
+}
+
+
+def _regla_codigo_nombre(columna: str, campo: str) -> Regla:
+    return Regla(
+        f"formato:{campo}",
+        f"{campo}: el texto no tiene la forma 'código - nombre'; la fila no se carga",
+        lambda df: _presente(df[columna]) & separar_codigo_nombre(df[columna])["codigo"].isna()
+    )
+
+
+def _reglas_evaluaciones(claves: dict, ficha_caracterizacion) -> List[Regla]:
+    cod_ficha = pd.to_numeric(pd.Series([ficha_caracterizacion]), errors="coerce").iloc[0]
+    ficha_existe = pd.notna(cod_ficha) and int(cod_ficha) in claves["fichas_grupo"]
+
+    reglas = [
+        Regla(
+            "obligatorio:juicio_evaluacion.cod_ficha",
+            "La celda C3 no trae una ficha de caracterización válida; no se guardan los juicios",
+            lambda df: pd.Series(pd.isna(cod_ficha), index=df.index)
+        ),
+        Regla(
+            "fk:juicio_evaluacion.cod_ficha",
+            "La ficha de C3 no existe en grupo (cargue primero el P04); no se guardan los juicios",
+            lambda df: pd.Series(pd.notna(cod_ficha) and not ficha_existe, index=df.index)
+        ),
+        regla_obligatoria("competencia", "competencia.cod_competencia"),
+        regla_obligatoria("resultado_aprendizaje", "resultado_aprendizaje.cod_resultado"),
+        _regla_codigo_nombre("competencia", "competencia.cod_competencia"),
+        _regla_codigo_nombre("resultado_aprendizaje", "resultado_aprendizaje.cod_resultado"),
+        regla_longitud("competencia", "competencia.nombre", 500, SEVERIDAD_ADVERTENCIA),
+        regla_longitud("resultado_aprendizaje", "resultado_aprendizaje.nombre", 500, SEVERIDAD_ADVERTENCIA),
+        regla_obligatoria("numero_documento", "juicio_evaluacion.numero_documento"),
+        Regla(
+            "fecha:juicio_evaluacion.fecha_hora_juicio",
+            "juicio_evaluacion.fecha_hora_juicio no es una fecha válida; se guardaría NULL",
+            lambda df: _presente(df["fecha_hora_juicio"])
+            & pd.to_datetime(df["fecha_hora_juicio"], errors="coerce").isna(),
+            SEVERIDAD_ADVERTENCIA
+        )
+    ]
+    # Los textos del aprendiz se recortan al guardarlos, por eso solo son advertencias
+    reglas += [
+        regla_longitud(col, campo, maximo, SEVERIDAD_ADVERTENCIA)
+        for col, (campo, maximo) in _LONGITUDES_JUICIOS.items()
+    ]
+    return reglas
+
+
+def validar_evaluaciones(ruta: str, claves: dict) -> Tuple[dict, pd.DataFrame]:
+    """Valida el reporte de juicios evaluativos sin escribir (ejecutable en el pool de procesos)."""
+    ficha_caracterizacion, df_evaluaciones = _leer_tabla_evaluaciones(ruta)
+    acumulador = AcumuladorValidacion(_reglas_evaluaciones(claves, ficha_caracterizacion))
+    acumulador.evaluar(df_evaluaciones[COLUMNAS_EVALUACIONES])
+    resumen = acumulador.resumen()
+    resumen["ficha_caracterizacion"] = ficha_caracterizacion
+    return resumen, acumulador.observaciones()
+
+
+def validar_evaluaciones_lote(ruta: str, claves: dict) -> Tuple[dict, pd.DataFrame]:
+    """
+    Valida cada libro del ZIP de una carga en lote con validar_evaluaciones y suma los
+    conteos (ejecutable en el pool de procesos). Un libro que no se puede leer se
+    reporta y no detiene el resto. Las observaciones llevan el nombre del libro.
+
+    Raises:
+        ValueError: Si el ZIP no es válido, no tiene libros o supera los límites
+    """
+    directorio = tempfile.mkdtemp(dir=settings.INGESTA_DIR_TEMPORAL, prefix="lote_")
+    try:
+        libros = extraer_libros_zip(ruta, directorio)
+        archivos = []
+        observaciones = []
+        for nombre, ruta_libro in libros:
+            try:
+                resumen_libro, observaciones_libro = validar_evaluaciones(ruta_libro, claves)
+            except Exception as e:
+                archivos.append({"archivo": nombre, "error": f"no se pudo leer el archivo: {e}"})
+                continue
+            archivos.append({
+                "archivo": nombre,
+                **{clave: resumen_libro[clave] for clave in (
+                    "ficha_caracterizacion", "filas_validadas", "filas_rechazadas",
+                    "filas_con_advertencias", "reglas", "mensaje"
+                )}
+            })
+            if len(observaciones_libro) > 0:
+                observaciones_libro.insert(0, "archivo", nombre)
+                observaciones.append(observaciones_libro)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    leidos = [archivo for archivo in archivos if "error" not in archivo]
+    filas_validadas = sum(archivo["filas_validadas"] for archivo in leidos)
+    filas_rechazadas = sum(archivo["filas_rechazadas"] for archivo in leidos)
+    if filas_rechazadas or len(leidos) < len(archivos):
+        mensaje = "Hay libros del lote que no se pueden leer o con filas que no cumplen las restricciones de la base de datos"
+    elif any(archivo["filas_con_advertencias"] for archivo in leidos):
+        mensaje = "El lote se puede cargar, con advertencias"
+    else:
+        mensaje = "Todos los libros del lote cumplen las validaciones"
+    resumen = {
+        "dry_run": True,
+        "archivos_recibidos": len(archivos),
+        "archivos_con_error": len(archivos) - len(leidos),
+        "filas_validadas": filas_validadas,
+        "filas_rechazadas": filas_rechazadas,
+        "filas_con_advertencias": sum(archivo["filas_con_advertencias"] for archivo in leidos),
+        "filas_validas": filas_validadas - filas_rechazadas,
+        "archivos": archivos,
+        "mensaje": mensaje
+    }
+    if not observaciones:
+        return resumen, pd.DataFrame(columns=["archivo", "rechazada", "reglas"])
+    return resumen, pd.concat(observaciones).iloc[:MAX_FILAS_CSV]
+
+
+# Función de validación y conjuntos de llaves (ver get_claves_existentes) por tipo de reporte
+VALIDACIONES = {
+    "p04": (validar_p04, ("regionales", "centros")),
+    "df14": (validar_df14, ("programas", "fichas_datos_grupo")),
+    "evaluaciones": (validar_evaluaciones, ("fichas_grupo",)),
+    "evaluaciones_lote": (validar_evaluaciones_lote, ("fichas_grupo",))
+}
@@ -0,0 +1,269 @@
+"""
+Generador de libros sintéticos del P04, DF-14 y reporte de juicios evaluativos con los
+encabezados, filas omitidas y celda de ficha (C3) que esperan los lectores de
+app/utils/excel.py.
+
+Los tres archivos de un mismo tamaño y semilla son coherentes entre sí: el DF-14 trae
+las mismas fichas y programas del P04 y el reporte de evaluaciones usa la primera ficha
+del P04, de modo que se pueden cargar en orden contra una base de datos vacía.
+
+Uso (desde GestionFormacion/):
+    python -m benchmarks.generar_archivos --tamanos 1000 10000 100000
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+from typing import List
+
+from openpyxl import Workbook
+
+from app.utils.excel import (
+    COLUMNAS_P04, COLUMNAS_DF14, FILA_ENCABEZADO_P04, FILA_ENCABEZADO_DF14,
+    FILA_FICHA_EVALUACIONES, COLUMNA_FICHA_EVALUACIONES, FILA_ENCABEZADO_EVALUACIONES
+)
+
+DIRECTORIO_DATOS = os.path.join(os.path.dirname(__file__), "datos")
+TAMANOS = [1000, 10000, 100000]
+SEMILLA = 20240501
+
+FICHA_INICIAL = 2500000
+NUM_REGIONALES = 33
+NUM_CENTROS = 117
+
+# Columnas que traen los reportes reales y que la carga ignora
+COLUMNAS_EXTRA_P04 = ["CODIGO_MUNICIPIO_CURSO", "NOMBRE_PAIS_CURSO", "CODIGO_SECTOR_PROGRAMA"]
+COLUMNAS_EXTRA_DF14 = ["NOMBRE_PROGRAMA", "FECHA_INICIO", "FECHA_FIN", "ESTADO_FICHA"]
+
+ESTADOS = ["En Ejecucion", "Terminada", "Terminada por fecha", "Cancelada"]
+NIVELES = ["TECNÓLOGO", "TÉCNICO", "OPERARIO", "AUXILIAR", "CURSO ESPECIAL"]
+JORNADAS = ["DIURNA", "NOCTURNA", "MIXTA", "FIN DE SEMANA"]
+ETAPAS = ["LECTIVA", "PRODUCTIVA"]
+MODALIDADES = ["PRESENCIAL", "VIRTUAL", "A DISTANCIA"]
+MUNICIPIOS = ["RIOHACHA", "MAICAO", "MEDELLÍN", "BOGOTÁ D.C.", "CALI", "BARRANQUILLA", "PASTO"]
+AREAS = [
+    "ANÁLISIS Y DESARROLLO DE SOFTWARE", "GESTIÓN CONTABLE Y DE INFORMACIÓN FINANCIERA",
+    "MANTENIMIENTO ELECTROMECÁNICO INDUSTRIAL", "PRODUCCIÓN AGROPECUARIA ECOLÓGICA",
+    "GESTIÓN DEL TALENTO HUMANO", "COCINA", "ENFERMERÍA", "SISTEMAS TELEINFORMÁTICOS"
+]
+NOMBRES = ["MARÍA", "JOSÉ", "ANA", "LUIS", "CARMEN", "JUAN", "LAURA", "CARLOS", "DIANA", "PEDRO"]
+APELLIDOS = ["GÓMEZ", "RODRÍGUEZ", "PÉREZ", "MARTÍNEZ", "LÓPEZ", "DÍAZ", "MEJÍA", "URIANA"]
+
+COMPETENCIAS_POR_PROGRAMA = 10
+RESULTADOS_POR_COMPETENCIA = 3
+
+
+def generar_fichas(num_fichas: int, semilla: int = SEMILLA) -> List[dict]:
+    """Fichas con su centro, regional y programa, compartidas por los tres archivos."""
+    aleatorio = random.Random(semilla)
+    regionales = [(5 + i, f"REGIONAL {i + 1}") for i in range(NUM_REGIONALES)]
+    centros = [
+        (9101 + i, f"CENTRO DE FORMACIÓN {i + 1}", regionales[i % NUM_REGIONALES])
+        for i in range(NUM_CENTROS)
+    ]
+    num_programas = max(20, num_fichas // 20)
+    programas = [
+        (
+            120000 + i,
+            aleatorio.randint(1, 3),
+            f"{aleatorio.choice(NIVELES)} EN {aleatorio.choice(AREAS)}",
+            aleatorio.choice([880, 1320, 1760, 2640]),
+            aleatorio.choice([440, 864])
+        )
+        for i in range(num_programas)
+    ]
+
+    fichas = []
+    for i in range(num_fichas):
+        cod_centro, nombre_centro, (cod_regional, nombre_regional) = aleatorio.choice(centros)
+        cod_programa, la_version, nombre_programa, horas_lectivas, horas_productivas = aleatorio.choice(programas)
+        inicio = date(2022, 1, 1) + timedelta(days=aleatorio.randint(0, 1000))
+        fichas.append({
+            "cod_ficha": FICHA_INICIAL + i,
+            "cod_centro": cod_centro,
+            "nombre_centro": nombre_centro,
+            "cod_regional": cod_regional,
+            "nombre_regional": nombre_regional,
+            "cod_programa": cod_programa,
+            "la_version": la_version,
+            "nombre_programa": nombre_programa,
+            "horas_lectivas": horas_lectivas,
+            "horas_productivas": horas_productivas,
+            "fecha_inicio": inicio,
+            "fecha_fin": inicio + timedelta(days=aleatorio.randint(180, 820)),
+            "aprendices": aleatorio.randint(10, 40)
+        })
+    return fichas
+
+
+def _filas_titulo(hoja, cantidad: int, titulo: str):
+    """Filas de título antes del encabezado, como en los reportes de Sofía Plus."""
+    for i in range(cantidad):
+        hoja.append([titulo if i == 0 else f"Generado para pruebas de rendimiento ({i})"])
+
+
+def generar_p04(ruta: str, fichas: List[dict], semilla: int = SEMILLA):
+    aleatorio = random.Random(semilla + 1)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    _filas_titulo(hoja, FILA_ENCABEZADO_P04 - 1, "REPORTE DE FICHAS P04")
+    columnas = list(COLUMNAS_P04) + COLUMNAS_EXTRA_P04
+    hoja.append(columnas)
+
+    for ficha in fichas:
+        aprendices = ficha["aprendices"]
+        masculinos = aleatorio.randint(0, aprendices)
+        no_binario = aleatorio.randint(0, 1)
+        fila = {
+            "IDENTIFICADOR_FICHA": ficha["cod_ficha"],
+            "CODIGO_CENTRO": ficha["cod_centro"],
+            "CODIGO_PROGRAMA": ficha["cod_programa"],
+            "VERSION_PROGRAMA": ficha["la_version"],
+            "NOMBRE_PROGRAMA_FORMACION": ficha["nombre_programa"],
+            "ESTADO_CURSO": aleatorio.choice(ESTADOS),
+            "NIVEL_FORMACION": ficha["nombre_programa"].split(" EN ")[0],
+            "NOMBRE_JORNADA": aleatorio.choice(JORNADAS),
+            "FECHA_INICIO_FICHA": ficha["fecha_inicio"].strftime("%d/%m/%Y"),
+            "FECHA_TERMINACION_FICHA": ficha["fecha_fin"].strftime("%d/%m/%Y"),
+            "ETAPA_FICHA": aleatorio.choice(ETAPAS),
+            "MODALIDAD_FORMACION": aleatorio.choice(MODALIDADES),
+            "NOMBRE_RESPONSABLE": f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}",
+            "NOMBRE_EMPRESA": aleatorio.choice([None, None, "EMPRESA DE PRUEBAS S.A.S."]),
+            "NOMBRE_MUNICIPIO_CURSO": aleatorio.choice(MUNICIPIOS),
+            "NOMBRE_PROGRAMA_ESPECIAL": aleatorio.choice(["SIN PROGRAMA ESPECIAL", "ARTICULACIÓN CON LA MEDIA"]),
+            "CODIGO_REGIONAL": ficha["cod_regional"],
+            "NOMBRE_REGIONAL": ficha["nombre_regional"],
+            "NOMBRE_CENTRO": ficha["nombre_centro"],
+            "TOTAL_APRENDICES_MASCULINOS": masculinos,
+            "TOTAL_APRENDICES_FEMENINOS": aprendices - masculinos - no_binario if aprendices > masculinos else 0,
+            "TOTAL_APRENDICES_NOBINARIO": no_binario,
+            "TOTAL_APRENDICES": aprendices,
+            "TOTAL_APRENDICES_ACTIVOS": aleatorio.randint(0, aprendices),
+            "CODIGO_MUNICIPIO_CURSO": aleatorio.randint(1000, 99999),
+            "NOMBRE_PAIS_CURSO": "COLOMBIA",
+            "CODIGO_SECTOR_PROGRAMA": aleatorio.randint(1, 40)
+        }
+        hoja.append([fila[col] for col in columnas])
+    libro.save(ruta)
+
+
+def generar_df14(ruta: str, fichas: List[dict], semilla: int = SEMILLA):
+    aleatorio = random.Random(semilla + 2)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    _filas_titulo(hoja, FILA_ENCABEZADO_DF14 - 1, "REPORTE DF-14 ESTADO DE APRENDICES POR FICHA")
+    columnas = list(COLUMNAS_DF14) + COLUMNAS_EXTRA_DF14
+    hoja.append(columnas)
+
+    estados = [col for col in COLUMNAS_DF14 if col not in (
+        "FICHA", "CODIGO_PROGRAMA", "VERSION_PROGRAMA", "DURACION_ETAPA_LECTIVA",
+        "DURACION_ETAPA_PRODUCTIVA", "CUPO"
+    )]
+    for ficha in fichas:
+        fila = {
+            "FICHA": ficha["cod_ficha"],
+            "CODIGO_PROGRAMA": ficha["cod_programa"],
+            "VERSION_PROGRAMA": ficha["la_version"],
+            "DURACION_ETAPA_LECTIVA": ficha["horas_lectivas"],
+            "DURACION_ETAPA_PRODUCTIVA": ficha["horas_productivas"],
+            "CUPO": ficha["aprendices"] + aleatorio.randint(0, 5),
+            "NOMBRE_PROGRAMA": ficha["nombre_programa"],
+            "FECHA_INICIO": ficha["fecha_inicio"].strftime("%d/%m/%Y"),
+            "FECHA_FIN": ficha["fecha_fin"].strftime("%d/%m/%Y"),
+            "ESTADO_FICHA": aleatorio.choice(ESTADOS)
+        }
+        for col in estados:
+            fila[col] = aleatorio.randint(0, 8)
+        # El DF-14 trae los números como texto
+        hoja.append([str(fila[col]) for col in columnas])
+    libro.save(ruta)
+
+
+def generar_evaluaciones(ruta: str, num_juicios: int, cod_ficha: int, semilla: int = SEMILLA):
+    """
+    Reporte de juicios de una ficha con `num_juicios` filas: cada aprendiz tiene un juicio
+    por resultado de aprendizaje (COMPETENCIAS_POR_PROGRAMA x RESULTADOS_POR_COMPETENCIA).
+    """
+    aleatorio = random.Random(semilla + 3)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+
+    for numero_fila in range(1, FILA_ENCABEZADO_EVALUACIONES):
+        if numero_fila == FILA_FICHA_EVALUACIONES:
+            fila = [None] * (COLUMNA_FICHA_EVALUACIONES + 1)
+            fila[0] = "Ficha de Caracterización:"
+            fila[COLUMNA_FICHA_EVALUACIONES] = str(cod_ficha)
+            hoja.append(fila)
+        elif numero_fila == 1:
+            hoja.append(["Reporte de Juicios Evaluativos"])
+        else:
+            hoja.append([f"Información de la ficha ({numero_fila})"])
+
+    hoja.append([
+        "Tipo de Documento", "Número de Documento", "Nombre", "Apellidos", "Estado",
+        "Competencia", "Resultado de Aprendizaje", "Juicio de Evaluación",
+        "Fecha y Hora del Juicio Evaluativo", "Funcionario que registro el juicio evaluativo"
+    ])
+
+    juicios_por_aprendiz = COMPETENCIAS_POR_PROGRAMA * RESULTADOS_POR_COMPETENCIA
+    for i in range(num_juicios):
+        aprendiz, posicion = divmod(i, juicios_por_aprendiz)
+        competencia = 220501000 + posicion // RESULTADOS_POR_COMPETENCIA
+        resultado = competencia * 10 + posicion % RESULTADOS_POR_COMPETENCIA
+        fecha = date(2024, 1, 1) + timedelta(days=aleatorio.randint(0, 300))
+        hoja.append([
+            "CC", 1000000000 + aprendiz,
+            NOMBRES[aprendiz % len(NOMBRES)], APELLIDOS[aprendiz % len(APELLIDOS)],
+            aleatorio.choice(["EN FORMACION", "EN FORMACION", "CANCELADO", "RETIRO VOLUNTARIO"]),
+            f"{competencia} - COMPETENCIA DE PRUEBA {competencia}",
+            f"{resultado} - RESULTADO DE APRENDIZAJE DE PRUEBA {resultado}",
+            aleatorio.choice(["APROBADO", "APROBADO", "APROBADO", "POR EVALUAR", "NO APROBADO"]),
+            f"{fecha.isoformat()} 10:00:00",
+            f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)}"
+        ])
+    libro.save(ruta)
+
+
+def rutas_archivos(tamano: int, directorio: str = DIRECTORIO_DATOS) -> dict:
+    return {
+        tipo: os.path.join(directorio, f"{tipo}_{tamano}.xlsx")
+        for tipo in ("p04", "df14", "evaluaciones")
+    }
+
+
+def generar_archivos(tamano: int, directorio: str = DIRECTORIO_DATOS, semilla: int = SEMILLA, reemplazar: bool = False) -> dict:
+    """
+    Genera (si no existen) los tres archivos de `tamano` fichas. En el reporte de
+    evaluaciones `tamano` es el número de juicios de la ficha.
+
+    Returns:
+        dict: Ruta de cada archivo por tipo de reporte
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rutas = rutas_archivos(tamano, directorio)
+    if not reemplazar and all(os.path.exists(ruta) for ruta in rutas.values()):
+        return rutas
+
+    fichas = generar_fichas(tamano, semilla)
+    generar_p04(rutas["p04"], fichas, semilla)
+    generar_df14(rutas["df14"], fichas, semilla)
+    generar_evaluaciones(rutas["evaluaciones"], tamano, fichas[0]["cod_ficha"], semilla)
+    return rutas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera archivos P04, DF-14 y de evaluaciones sintéticos")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS, help="Número de fichas por archivo")
+    parser.add_argument("--directorio", default=DIRECTORIO_DATOS)
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--reemplazar", action="store_true", help="Regenerar aunque los archivos ya existan")
+    args = parser.parse_args()
+
+    for tamano in args.tamanos:
+        rutas = generar_archivos(tamano, args.directorio, args.semilla, args.reemplazar)
+        for tipo, ruta in rutas.items():
+            print(f"{tipo:<13} {tamano:>7} -> {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Sesión que reemplaza a MariaDB en los benchmarks cuando no hay base de datos local.
+
+Compila cada sentencia con el dialecto MySQL (incluido el armado de parámetros, que es
+donde se va buena parte del tiempo de los INSERT multi-fila) y responde como una base
+de datos vacía. Sirve para medir el costo del lado de Python y contar sentencias; los
+tiempos de escritura reales solo se obtienen contra MariaDB.
+"""
+from contextlib import nullcontext
+
+from sqlalchemy.dialects import mysql
+
+
+class _ResultadoSimulado:
+    def __init__(self, rowcount: int = 0):
+        self.rowcount = rowcount
+        self.lastrowid = None
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def first(self):
+        return None
+
+    def all(self):
+        return []
+
+    def one(self):
+        return (0, 0)
+
+    def scalar(self):
+        return 0
+
+    def mappings(self):
+        return self
+
+    def scalars(self):
+        return self
+
+
+class SesionSimulada:
+    """
+    Implementa lo que usan las importaciones de Session: execute, commit, rollback,
+    begin_nested y connection (que aquí es la misma sesión).
+    """
+
+    def __init__(self):
+        self._dialecto = mysql.dialect()
+        self.sentencias = 0
+        self.parametros = 0
+        self.commits = 0
+
+    def execute(self, sentencia, parametros=None):
+        sentencia.compile(dialect=self._dialecto)
+        self.sentencias += 1
+        filas = 0
+        if isinstance(parametros, dict):
+            self.parametros += len(parametros)
+            # Los INSERT multi-fila nombran sus parámetros <columna>_<fila>
+            filas = len({
+                clave.rsplit("_", 1)[1] for clave in parametros if clave.rsplit("_", 1)[-1].isdigit()
+            }) or 1
+        elif isinstance(parametros, list):
+            self.parametros += sum(len(p) for p in parametros)
+            filas = len(parametros)
+        # Como una tabla vacía: cada fila del INSERT ... ON DUPLICATE KEY UPDATE es nueva
+        return _ResultadoSimulado(filas)
+
+    def exec_driver_sql(self, sentencia, parametros=None):
+        self.sentencias += 1
+        return _ResultadoSimulado()
+
+    def connection(self):
+        # Las tablas de staging del DF-14 se borran sobre la conexión de la sesión
+        return self
+
+    def begin_nested(self):
+        return nullcontext()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
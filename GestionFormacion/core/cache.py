@@ -0,0 +1,304 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Cachés en memoria del proceso ---
+#
+# Cada entrada guarda, además del valor, la versión que tenían sus tablas cuando se
+# cargó. Las escrituras llaman a marcar_cambio("tabla", ...) después del commit, lo que
+# sube la versión de esas tablas: las entradas que dependen de ellas dejan de servirse
+# sin tener que recorrer las cachés.
+#
+# Con varios workers (o contenedores) y CACHE_BUS=bd, marcar_cambio además publica el
+# cambio en el bus de invalidación: la tabla cache_version
+# (migraciones/0004): cada proceso la lee cada CACHE_BUS_INTERVALO_SEGUNDOS y sube su
+# versión local de las tablas que cambiaron en otro proceso, así que un worker deja de
+# servir datos viejos a más tardar un intervalo después del commit. El TTL sigue
+# acotando lo que pueda quedar desactualizado si el bus falla. Sin CACHE_BUS=bd (un solo
+# proceso, benchmarks con --simulado) el bus es BusNulo y no se escribe nada.
+
+V = TypeVar("V")
+
+# Valor que devuelve CacheLocal.obtener cuando la clave no está (None es un valor válido)
+SIN_VALOR = object()
+
+_versiones: Dict[str, int] = {}
+_versiones_lock = threading.Lock()
+
+
+def version_tabla(tabla: str) -> int:
+    return _versiones.get(tabla, 0)
+
+
+def _subir_versiones(tablas):
+    with _versiones_lock:
+        for tabla in tablas:
+            _versiones[tabla] = _versiones.get(tabla, 0) + 1
+
+
+def marcar_cambio(*tablas: str):
+    """Invalida todo lo cacheado que depende de `tablas`; se llama después de confirmar la escritura."""
+    _subir_versiones(tablas)
+    try:
+        bus.publicar(tablas)
+    except Exception as e:
+        # El cambio ya se ve en este proceso; en los demás, cuando venza el TTL
+        logger.error(f"No se pudo publicar el cambio de {', '.join(tablas)} en el bus de cachés: {e}")
+
+
+# --- Bus de invalidación entre procesos ---
+
+
+class BusNulo:
+    """Bus que no avisa a nadie: con un solo proceso basta con las versiones locales."""
+
+    def publicar(self, tablas: Sequence[str]):
+        pass
+
+    def leer(self) -> Dict[str, int]:
+        return {}
+
+
+class BusLocal:
+    """
+    Bus en memoria para pruebas: compartiendo una instancia entre varias suscripciones
+    se simulan varios procesos.
+    """
+
+    def __init__(self):
+        self._versiones: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def publicar(self, tablas: Sequence[str]):
+        with self._lock:
+            for tabla in tablas:
+                self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+
+    def leer(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versiones)
+
+
+class BusBaseDatos:
+    """Bus sobre la tabla cache_version del primario: una fila por tabla con un contador."""
+
+    def _engine(self):
+        # Import tardío: los módulos crud importan este módulo y no deben crear el motor
+        from core.database import engine
+        return engine
+
+    def publicar(self, tablas: Sequence[str]):
+        with self._engine().begin() as conexion:
+            for tabla in sorted(set(tablas)):
+                conexion.execute(
+                    text("""
+                        INSERT INTO cache_version (tabla, version) VALUES (:tabla, 1)
+                        ON DUPLICATE KEY UPDATE version = version + 1
+                    """),
+                    {"tabla": tabla}
+                )
+
+    def leer(self) -> Dict[str, int]:
+        with self._engine().connect() as conexion:
+            return {fila.tabla: fila.version for fila in conexion.execute(text("SELECT tabla, version FROM cache_version"))}
+
+
+class SuscripcionBus:
+    """
+    Hilo que lee el bus cada `intervalo` segundos y sube la versión local de las tablas
+    cuyo contador cambió. La primera lectura solo fija la línea base. Los cambios que
+    publicó este mismo proceso también se ven aquí y cuestan una invalidación de más.
+    """
+
+    def __init__(self, bus_origen, intervalo: float):
+        self.bus = bus_origen
+        self.intervalo = intervalo
+        self._vistas: Optional[Dict[str, int]] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+        self.lecturas = 0
+        self.errores = 0
+        self.invalidaciones = 0
+        self.ultima_lectura: Optional[float] = None
+        self.ultimo_error: Optional[str] = None
+
+    def revisar(self):
+        try:
+            remotas = self.bus.leer()
+        except (SQLAlchemyError, OSError) as e:
+            self.errores += 1
+            self.ultimo_error = str(e)
+            logger.warning(f"No se pudo leer el bus de cachés: {e}", extra={"muestreo": "bus_cache"})
+            return
+        if self._vistas is not None:
+            cambiadas = [tabla for tabla, version in remotas.items() if self._vistas.get(tabla) != version]
+            if cambiadas:
+                _subir_versiones(cambiadas)
+                self.invalidaciones += len(cambiadas)
+        self._vistas = remotas
+        self.lecturas += 1
+        self.ultima_lectura = time.time()
+        self.ultimo_error = None
+
+    def _vigilar(self):
+        while not self._detener.is_set():
+            self.revisar()
+            self._detener.wait(self.intervalo)
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._vigilar, name="bus-caches", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def estado(self) -> dict:
+        return {
+            "bus": type(self.bus).__name__,
+            "intervalo_segundos": self.intervalo,
+            "activa": self._hilo is not None,
+            "lecturas": self.lecturas,
+            "errores": self.errores,
+            "tablas_invalidadas": self.invalidaciones,
+            "ultima_lectura": self.ultima_lectura,
+            "ultimo_error": self.ultimo_error
+        }
+
+
+def _crear_bus():
+    return BusBaseDatos() if settings.CACHE_BUS == "bd" else BusNulo()
+
+
+bus = _crear_bus()
+_suscripcion: Optional[SuscripcionBus] = None
+
+
+def iniciar_bus_caches():
+    """Empieza a escuchar los cambios de los demás procesos (solo hace falta con CACHE_BUS=bd)."""
+    global _suscripcion
+    if _suscripcion is None and isinstance(bus, BusBaseDatos):
+        _suscripcion = SuscripcionBus(bus, settings.CACHE_BUS_INTERVALO_SEGUNDOS)
+        _suscripcion.iniciar()
+
+
+def detener_bus_caches():
+    global _suscripcion
+    if _suscripcion is not None:
+        _suscripcion.detener()
+        _suscripcion = None
+
+
+def estado_bus_caches() -> dict:
+    if _suscripcion is None:
+        return {"bus": type(bus).__name__, "activa": False}
+    return _suscripcion.estado()
+
+
+class CacheLocal(Generic[V]):
+    """
+    Caché LRU con TTL que depende de un conjunto de tablas. Es segura entre hilos (los
+    endpoints síncronos corren en el threadpool) y lleva contadores de aciertos y fallos.
+    """
+
+    def __init__(self, nombre: str, tablas: Sequence[str], max_entradas: int, ttl_segundos: float):
+        self.nombre = nombre
+        self.tablas = tuple(tablas)
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        # clave -> (valor, versiones de las tablas al cargarlo, instante de expiración)
+        self._entradas: "OrderedDict[Hashable, Tuple[V, Tuple[int, ...], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        _registradas.append(self)
+
+    def _versiones_actuales(self) -> Tuple[int, ...]:
+        return tuple(version_tabla(tabla) for tabla in self.tablas)
+
+    def obtener(self, clave: Hashable):
+        """Valor vigente de `clave`, o SIN_VALOR si no está, expiró o cambió alguna de sus tablas."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                valor, versiones, expira = entrada
+                if versiones == self._versiones_actuales() and time.monotonic() < expira:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._entradas[clave]
+            self.fallos += 1
+            return SIN_VALOR
+
+    def guardar(self, clave: Hashable, valor: V, versiones: Tuple[int, ...] = None):
+        """
+        Guarda `valor`. Si se leyó de la base de datos, conviene pasar las `versiones`
+        tomadas con versiones() antes de la consulta: así un cambio que ocurra mientras
+        tanto no queda oculto detrás de un valor viejo.
+        """
+        with self._lock:
+            self._entradas[clave] = (
+                valor,
+                versiones if versiones is not None else self._versiones_actuales(),
+                time.monotonic() + self.ttl_segundos
+            )
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.expulsiones += 1
+
+    def obtener_o_cargar(self, clave: Hashable, cargar: Callable[[], V]) -> V:
+        """Valor cacheado de `clave` o, si no está vigente, el que devuelve `cargar()` (que queda cacheado)."""
+        valor = self.obtener(clave)
+        if valor is SIN_VALOR:
+            versiones = self.versiones()
+            valor = cargar()
+            self.guardar(clave, valor, versiones)
+        return valor
+
+    def versiones(self) -> Tuple[int, ...]:
+        return self._versiones_actuales()
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        consultas = self.aciertos + self.fallos
+        return {
+            "nombre": self.nombre,
+            "tablas": list(self.tablas),
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "ttl_segundos": self.ttl_segundos,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "expulsiones": self.expulsiones,
+            "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else None
+        }
+
+
+_registradas: List[CacheLocal] = []
+
+
+def cache_catalogo(nombre: str, tablas: Sequence[str]) -> CacheLocal:
+    """Caché de un catálogo de referencia, con el tamaño y TTL de CACHE_CATALOGOS_*."""
+    return CacheLocal(nombre, tablas, settings.CACHE_CATALOGOS_MAX_ENTRADAS, settings.CACHE_CATALOGOS_SEGUNDOS)
+
+
+def estadisticas_caches() -> List[dict]:
+    return [cache.estadisticas() for cache in _registradas]
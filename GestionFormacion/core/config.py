@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # librería en Python que permite cargar variables de entorno
@@ -21,6 +22,60 @@ class Settings(BaseSettings):
     DB_NAME: str = os.getenv("DB_NAME", "")
 
     DATABASE_URL: str = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # Misma base de datos con el driver asíncrono, para los endpoints de lectura async
+    ASYNC_DATABASE_URL: str = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # Registrar cada sentencia SQL (logger sqlalchemy.engine); solo para depurar
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+    # Aplicar las migraciones pendientes de migraciones/ al iniciar el servidor (ver core/migraciones.py)
+    DB_MIGRAR_AL_INICIAR: bool = os.getenv("DB_MIGRAR_AL_INICIAR", "true").lower() == "true"
+    # Réplicas de solo lectura para dashboards y listados: "host[:puerto]" separados por
+    # coma, con el mismo usuario, contraseña y base de datos que el primario. Vacío = sin réplicas
+    DB_REPLICAS: str = os.getenv("DB_REPLICAS", "")
+    # Una réplica con más retraso que este (Seconds_Behind_Master) deja de recibir lecturas
+    DB_REPLICA_MAX_RETRASO_SEGUNDOS: int = int(os.getenv("DB_REPLICA_MAX_RETRASO_SEGUNDOS", "10"))
+    DB_REPLICA_CHEQUEO_SEGUNDOS: int = int(os.getenv("DB_REPLICA_CHEQUEO_SEGUNDOS", "5"))
+
+    # Configuración de logging (ver core/logging_config.py)
+    LOG_NIVEL: str = os.getenv("LOG_NIVEL", "INFO")
+    # Niveles por módulo, p. ej. "app.crud=DEBUG,sqlalchemy.engine=INFO"
+    LOG_NIVELES: str = os.getenv("LOG_NIVELES", "")
+    LOG_FORMATO: str = os.getenv("LOG_FORMATO", "json")
+    LOG_MUESTREO_PRIMEROS: int = int(os.getenv("LOG_MUESTREO_PRIMEROS", "10"))
+    LOG_MUESTREO_CADA: int = int(os.getenv("LOG_MUESTREO_CADA", "100"))
+
+    # Instrumentación por petición (ver core/instrumentacion.py)
+    INSTRUMENTACION_ACTIVA: bool = os.getenv("INSTRUMENTACION_ACTIVA", "true").lower() == "true"
+    # Peticiones más lentas que esto se registran con su lista de sentencias SQL
+    INSTRUMENTACION_LENTA_MS: int = int(os.getenv("INSTRUMENTACION_LENTA_MS", "1000"))
+    # Aviso de posible N+1 cuando una misma sentencia se repite más veces en una petición
+    INSTRUMENTACION_MAX_REPETICIONES: int = int(os.getenv("INSTRUMENTACION_MAX_REPETICIONES", "10"))
+
+    # Caché de los totales de los listados paginados de grupos (ver core/cache.py)
+    CACHE_CONTEOS_SEGUNDOS: int = int(os.getenv("CACHE_CONTEOS_SEGUNDOS", "60"))
+    CACHE_CONTEOS_MAX_ENTRADAS: int = int(os.getenv("CACHE_CONTEOS_MAX_ENTRADAS", "1000"))
+    # Caché de catálogos (competencias, resultados, programas, centros, festivos)
+    CACHE_CATALOGOS_SEGUNDOS: int = int(os.getenv("CACHE_CATALOGOS_SEGUNDOS", "300"))
+    CACHE_CATALOGOS_MAX_ENTRADAS: int = int(os.getenv("CACHE_CATALOGOS_MAX_ENTRADAS", "2000"))
+    # Bus de invalidación entre workers: "bd" (tabla cache_version) o "ninguno" (un solo proceso)
+    CACHE_BUS: str = os.getenv("CACHE_BUS", "ninguno").lower()
+    CACHE_BUS_INTERVALO_SEGUNDOS: float = float(os.getenv("CACHE_BUS_INTERVALO_SEGUNDOS", "2"))
+
+    # Configuración de la carga masiva de archivos
+    INGESTA_CHUNK_SIZE: int = int(os.getenv("INGESTA_CHUNK_SIZE", "1000"))
+    INGESTA_DIR_TEMPORAL: str = os.getenv("INGESTA_DIR_TEMPORAL", tempfile.gettempdir())
+    INGESTA_MAX_TRABAJOS: int = int(os.getenv("INGESTA_MAX_TRABAJOS", "2"))
+    INGESTA_TRABAJOS_TTL_MINUTOS: int = int(os.getenv("INGESTA_TRABAJOS_TTL_MINUTOS", "120"))
+    INGESTA_MAX_PROCESOS: int = int(os.getenv("INGESTA_MAX_PROCESOS", "2"))
+    INGESTA_RETRY_AFTER_SEGUNDOS: int = int(os.getenv("INGESTA_RETRY_AFTER_SEGUNDOS", "30"))
+    # Subidas por partes: debe estar en el mismo sistema de archivos que INGESTA_DIR_TEMPORAL
+    INGESTA_DIR_SUBIDAS: str = os.getenv("INGESTA_DIR_SUBIDAS", os.path.join(INGESTA_DIR_TEMPORAL, "subidas_ingesta"))
+    INGESTA_TAMANO_PARTE_BYTES: int = int(os.getenv("INGESTA_TAMANO_PARTE_BYTES", str(8 * 1024 * 1024)))
+    INGESTA_MAX_TAMANO_BYTES: int = int(os.getenv("INGESTA_MAX_TAMANO_BYTES", str(500 * 1024 * 1024)))
+    INGESTA_SUBIDAS_TTL_HORAS: int = int(os.getenv("INGESTA_SUBIDAS_TTL_HORAS", "24"))
+    # Carga de evaluaciones en lote (varios libros o un ZIP)
+    INGESTA_LOTE_MAX_ARCHIVOS: int = int(os.getenv("INGESTA_LOTE_MAX_ARCHIVOS", "500"))
+    # Vigencia del mapa ficha -> programa compartido entre importaciones de evaluaciones
+    INGESTA_FICHAS_CACHE_SEGUNDOS: int = int(os.getenv("INGESTA_FICHAS_CACHE_SEGUNDOS", "300"))
     
     # Configuración JWT
     # jwt_secret: str = os.getenv("JWT_SECRET")
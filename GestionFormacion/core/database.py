@@ -1,6 +1,10 @@
+import itertools
 import logging
-from typing import Generator
+import threading
+import time
+from typing import AsyncGenerator, Generator, List, Optional
 from sqlalchemy import create_engine, text, MetaData
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, DisconnectionError
 from sqlalchemy.pool import QueuePool
@@ -13,7 +17,7 @@ logger = logging.getLogger(__name__)
 # Crear el motor de base de datos con configuraciones óptimas
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=True,           # Activar o desactivar el modo debug para imprimir en consola todas las sentencias SQL
+    echo=settings.DB_ECHO,  # DB_ECHO=true registra todas las sentencias SQL (logger sqlalchemy.engine)
     pool_pre_ping=True,  # Verifica que las conexiones estén activas antes de usarlas
     pool_recycle=3600,   # Recicla conexiones después de una hora para evitar el error "connection has been closed"
     pool_size=10,        # Número máximo de conexiones permanentes en el pool
@@ -28,6 +32,24 @@ engine = create_engine(
 # - bind=engine: Vincula la sesión al motor creado anteriormente
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono (aiomysql) para los endpoints `async def` de lectura más concurridos
+# (listados y KPIs de grupos, listados de programación, notificaciones): mientras
+# esperan a MariaDB no ocupan un hilo del threadpool de Starlette. Tiene su propio pool
+# de conexiones, con los mismos parámetros que el síncrono.
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    echo=settings.DB_ECHO,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=30
+)
+
+# expire_on_commit=False: los resultados siguen siendo legibles después del commit sin
+# volver a la base de datos (que en una sesión asíncrona requeriría otro await)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Declarar la base para los modelos ORM
 Base = declarative_base()
 
@@ -63,6 +85,241 @@ def get_db() -> Generator:
         # Esto es esencial para evitar fugas de memoria y conexiones abiertas.
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependencia equivalente a get_db() con una AsyncSession, para endpoints `async def`.
+    La sesión se cierra (y su conexión vuelve al pool) al terminar la petición.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Error de base de datos: {str(e)}")
+            raise
+
+
+# --- Réplicas de lectura ---
+#
+# Con DB_REPLICAS configurado, los endpoints de dashboards y listados piden la sesión con
+# get_read_db() / get_async_read_db() en lugar de get_db() / get_async_db(): la sesión
+# queda ligada a una réplica (por turnos entre las sanas) y esas consultas no compiten
+# con las escrituras de la ingesta en el primario. Un hilo revisa cada
+# DB_REPLICA_CHEQUEO_SEGUNDOS el retraso de cada réplica; si ninguna está disponible o
+# todas superan DB_REPLICA_MAX_RETRASO_SEGUNDOS, las lecturas vuelven al primario.
+
+
+class Replica:
+    """Motores síncrono y asíncrono de una réplica, su estado de replicación y sus métricas."""
+
+    def __init__(self, host: str):
+        self.nombre = host
+        servidor = host if ":" in host else f"{host}:3306"
+        credenciales = f"{settings.DB_USER}:{settings.DB_PASSWORD}"
+        opciones = dict(pool_pre_ping=True, pool_recycle=3600, pool_size=10, max_overflow=20, pool_timeout=30)
+        self.engine = create_engine(
+            f"mysql+pymysql://{credenciales}@{servidor}/{settings.DB_NAME}",
+            echo=settings.DB_ECHO, poolclass=QueuePool, **opciones
+        )
+        self.async_engine = create_async_engine(
+            f"mysql+aiomysql://{credenciales}@{servidor}/{settings.DB_NAME}",
+            echo=settings.DB_ECHO, **opciones
+        )
+        # Hasta el primer chequeo la réplica no recibe lecturas
+        self.disponible = False
+        self.retraso: Optional[int] = None
+        self.ultimo_chequeo: Optional[float] = None
+        self.ultimo_error: Optional[str] = None
+        self.lecturas = 0
+        self.errores = 0
+
+    def apta(self) -> bool:
+        return self.disponible and self.retraso is not None and self.retraso <= settings.DB_REPLICA_MAX_RETRASO_SEGUNDOS
+
+    def verificar(self):
+        """
+        Lee Seconds_Behind_Master. Sin fila el servidor no replica de nadie (p. ej. el
+        mismo primario) y se toma retraso 0; NULL significa replicación detenida.
+        """
+        try:
+            with self.engine.connect() as conexion:
+                estado = conexion.execute(text("SHOW SLAVE STATUS")).mappings().first()
+            if estado is None:
+                self.retraso = 0
+            else:
+                self.retraso = estado["Seconds_Behind_Master"]
+            self.disponible = self.retraso is not None
+            self.ultimo_error = None if self.disponible else "Replicación detenida"
+        except SQLAlchemyError as e:
+            self.disponible = False
+            self.ultimo_error = str(e)
+            logger.warning(f"Réplica {self.nombre} no disponible: {str(e)}")
+        self.ultimo_chequeo = time.time()
+
+
+replicas: List[Replica] = [Replica(host.strip()) for host in settings.DB_REPLICAS.split(",") if host.strip()]
+
+_turno = itertools.count()
+_metricas_lock = threading.Lock()
+# Lecturas que fueron al primario porque no había réplica apta (o la elegida falló al conectar)
+_lecturas_primario = 0
+_monitor: Optional[threading.Thread] = None
+_monitor_detener = threading.Event()
+
+
+def _vigilar_replicas():
+    while not _monitor_detener.is_set():
+        for replica in replicas:
+            replica.verificar()
+        _monitor_detener.wait(settings.DB_REPLICA_CHEQUEO_SEGUNDOS)
+
+
+def _iniciar_monitor():
+    """Arranca el hilo de chequeo la primera vez que se pide una sesión de lectura."""
+    global _monitor
+    with _metricas_lock:
+        if _monitor is None:
+            _monitor_detener.clear()
+            _monitor = threading.Thread(target=_vigilar_replicas, name="monitor-replicas", daemon=True)
+            _monitor.start()
+
+
+def detener_monitor_replicas():
+    """Detiene el hilo de chequeo y cierra los pools de las réplicas (al apagar el servidor)."""
+    global _monitor
+    _monitor_detener.set()
+    if _monitor is not None:
+        _monitor.join(timeout=5)
+        _monitor = None
+    for replica in replicas:
+        replica.engine.dispose()
+
+
+def _elegir_replica() -> Optional[Replica]:
+    """Siguiente réplica apta por turnos, o None para leer del primario."""
+    if not replicas:
+        return None
+    _iniciar_monitor()
+    aptas = [replica for replica in replicas if replica.apta()]
+    if not aptas:
+        return None
+    return aptas[next(_turno) % len(aptas)]
+
+
+def _registrar_lectura(replica: Optional[Replica], error: bool = False):
+    global _lecturas_primario
+    with _metricas_lock:
+        if error:
+            replica.errores += 1
+            replica.disponible = False
+        elif replica is None:
+            _lecturas_primario += 1
+        else:
+            replica.lecturas += 1
+
+
+def _estado_pool(pool) -> dict:
+    return {
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "desborde": pool.overflow()
+    }
+
+
+def estado_pools() -> dict:
+    """Métricas de los pools del primario y de cada réplica (conexiones, lecturas, retraso)."""
+    return {
+        "primario": {
+            "pool": _estado_pool(engine.pool),
+            "pool_async": _estado_pool(async_engine.pool),
+            "lecturas_desviadas": _lecturas_primario
+        },
+        "replicas": [
+            {
+                "nombre": replica.nombre,
+                "apta": replica.apta(),
+                "disponible": replica.disponible,
+                "retraso_segundos": replica.retraso,
+                "ultimo_chequeo": replica.ultimo_chequeo,
+                "ultimo_error": replica.ultimo_error,
+                "lecturas": replica.lecturas,
+                "errores": replica.errores,
+                "pool": _estado_pool(replica.engine.pool),
+                "pool_async": _estado_pool(replica.async_engine.pool)
+            }
+            for replica in replicas
+        ],
+        "max_retraso_segundos": settings.DB_REPLICA_MAX_RETRASO_SEGUNDOS
+    }
+
+
+async def cerrar_conexiones():
+    """Cierra los pools del primario y de las réplicas y detiene el chequeo de réplicas."""
+    detener_monitor_replicas()
+    for replica in replicas:
+        await replica.async_engine.dispose()
+    await async_engine.dispose()
+    engine.dispose()
+
+
+def get_read_db() -> Generator:
+    """
+    Como get_db(), pero ligada a una réplica apta si hay alguna. Si la réplica no
+    responde al conectar se marca como no disponible y la lectura va al primario.
+    Solo para endpoints que no escriben.
+    """
+    replica = _elegir_replica()
+    db = None
+    if replica is not None:
+        db = SessionLocal(bind=replica.engine)
+        try:
+            db.connection()
+        except (OperationalError, DisconnectionError) as e:
+            db.close()
+            db = None
+            logger.warning(f"Réplica {replica.nombre} falló al conectar, se lee del primario: {str(e)}")
+            _registrar_lectura(replica, error=True)
+            replica = None
+    if db is None:
+        db = SessionLocal()
+    _registrar_lectura(replica)
+    try:
+        yield db
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error de base de datos: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Equivalente de get_read_db() con una AsyncSession, para endpoints `async def`."""
+    replica = _elegir_replica()
+    db = None
+    if replica is not None:
+        db = AsyncSessionLocal(bind=replica.async_engine)
+        try:
+            await db.connection()
+        except (OperationalError, DisconnectionError) as e:
+            await db.close()
+            db = None
+            logger.warning(f"Réplica {replica.nombre} falló al conectar, se lee del primario: {str(e)}")
+            _registrar_lectura(replica, error=True)
+            replica = None
+    if db is None:
+        db = AsyncSessionLocal()
+    _registrar_lectura(replica)
+    async with db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Error de base de datos: {str(e)}")
+            raise
+
+
 def check_database_connection() -> bool:
     """
     Verifica la conexión a la base de datos.
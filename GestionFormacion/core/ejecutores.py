@@ -0,0 +1,109 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from core.logging_config import configurar_logging
+
+logger = logging.getLogger(__name__)
+
+# Hilos donde corre cada importación (escrituras en la base de datos con la sesión
+# síncrona). Hay tantos hilos como cupos, así que una importación admitida nunca
+# queda esperando en la cola del pool.
+ejecutor_hilos = ThreadPoolExecutor(
+    max_workers=settings.INGESTA_MAX_TRABAJOS,
+    thread_name_prefix="ingesta"
+)
+
+_cupos = threading.BoundedSemaphore(settings.INGESTA_MAX_TRABAJOS)
+
+_ejecutor_procesos: Optional[ProcessPoolExecutor] = None
+_ejecutor_procesos_lock = threading.Lock()
+
+
+def reservar_cupo() -> bool:
+    """
+    Intenta ocupar uno de los INGESTA_MAX_TRABAJOS cupos de importación sin esperar.
+
+    Returns:
+        bool: False si todos los cupos están ocupados
+    """
+    return _cupos.acquire(blocking=False)
+
+
+def liberar_cupo():
+    _cupos.release()
+
+
+def _obtener_ejecutor_procesos() -> ProcessPoolExecutor:
+    """
+    Crea el pool de procesos la primera vez que se usa. Se usa 'spawn' porque el
+    proceso del servidor ya tiene hilos y hacer fork con hilos activos no es seguro.
+    """
+    global _ejecutor_procesos
+    with _ejecutor_procesos_lock:
+        if _ejecutor_procesos is None:
+            _ejecutor_procesos = ProcessPoolExecutor(
+                max_workers=settings.INGESTA_MAX_PROCESOS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configurar_logging
+            )
+        return _ejecutor_procesos
+
+
+def ejecutar_en_proceso(funcion: Callable, *args):
+    """
+    Ejecuta `funcion(*args)` en el pool de procesos y espera el resultado. Se usa para
+    la lectura y normalización de los Excel (pandas/openpyxl), que son CPU intensivas
+    y no liberan el GIL. `funcion` y sus argumentos deben poder serializarse con pickle.
+    """
+    global _ejecutor_procesos
+    try:
+        return _obtener_ejecutor_procesos().submit(funcion, *args).result()
+    except BrokenProcessPool:
+        # Un proceso hijo murió (p. ej. por memoria); se descarta el pool para recrearlo
+        logger.error("El pool de procesos de ingesta se rompió; se recreará en la próxima carga")
+        with _ejecutor_procesos_lock:
+            _ejecutor_procesos = None
+        raise
+
+
+def mapear_en_procesos(funcion: Callable, argumentos: Iterable) -> List[Tuple[object, Optional[Exception]]]:
+    """
+    Ejecuta `funcion(argumento)` para cada argumento repartiendo las llamadas entre
+    los INGESTA_MAX_PROCESOS procesos del pool y espera todas.
+
+    Returns:
+        List: (resultado, None) o (None, excepción) por argumento, en el mismo orden;
+        el error de un argumento no cancela los demás
+    """
+    global _ejecutor_procesos
+    ejecutor = _obtener_ejecutor_procesos()
+    futuros = [ejecutor.submit(funcion, argumento) for argumento in argumentos]
+    resultados = []
+    for futuro in futuros:
+        try:
+            resultados.append((futuro.result(), None))
+        except BrokenProcessPool:
+            logger.error("El pool de procesos de ingesta se rompió; se recreará en la próxima carga")
+            with _ejecutor_procesos_lock:
+                _ejecutor_procesos = None
+            for pendiente in futuros:
+                pendiente.cancel()
+            raise
+        except Exception as e:
+            resultados.append((None, e))
+    return resultados
+
+
+def cerrar_ejecutores():
+    """Detiene los pools al apagar la aplicación."""
+    global _ejecutor_procesos
+    ejecutor_hilos.shutdown(wait=False, cancel_futures=True)
+    with _ejecutor_procesos_lock:
+        if _ejecutor_procesos is not None:
+            _ejecutor_procesos.shutdown(wait=False, cancel_futures=True)
+            _ejecutor_procesos = None
@@ -1,3 +1,4 @@
+import logging
 import os
 from typing import List
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
@@ -6,6 +7,8 @@ from jinja2 import Template
 from core.config import settings
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 
 class EmailSchema(BaseModel):
     email: List[EmailStr]
@@ -96,7 +99,7 @@ class EmailService:
             return True
             
         except Exception as e:
-            print(f"Error al enviar correo: {str(e)}")
+            logger.error(f"Error al enviar correo: {str(e)}")
             return False
     
     async def send_template_email_async(
@@ -133,7 +136,7 @@ class EmailService:
             return True
             
         except Exception as e:
-            print(f"Error al enviar correo con plantilla: {str(e)}")
+            logger.error(f"Error al enviar correo con plantilla: {str(e)}")
             return False
     
     async def send_welcome_email(
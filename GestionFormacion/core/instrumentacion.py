@@ -0,0 +1,156 @@
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Instrumentación de consultas por petición ---
+#
+# MiddlewareInstrumentacion deja un RegistroConsultas en una ContextVar durante cada
+# petición HTTP; los eventos before/after_cursor_execute de SQLAlchemy (registrados para
+# todos los motores, síncronos y asíncronos) suman en él cada ida y vuelta a la base de
+# datos. Los endpoints síncronos corren en el threadpool con una copia del contexto, así
+# que también quedan contados. Al terminar la petición:
+# - la respuesta lleva `Server-Timing: db;dur=<ms>;desc="<n> consultas", app;dur=<ms>`
+# - si tardó más de INSTRUMENTACION_LENTA_MS se registra con sus sentencias
+# - si una misma sentencia se repitió más de INSTRUMENTACION_MAX_REPETICIONES veces se
+#   avisa de un posible N+1
+
+_registro_actual: ContextVar[Optional["RegistroConsultas"]] = ContextVar("registro_consultas", default=None)
+
+_NUMEROS = re.compile(r"\d+")
+
+# Largo máximo de cada sentencia en los logs
+_LARGO_SENTENCIA = 300
+
+
+def forma_sentencia(sentencia: str) -> str:
+    """
+    Forma de una sentencia para agrupar repeticiones: espacios colapsados y números
+    reemplazados por '?' (literales y sufijos de parámetros como :cod_ficha_3).
+    """
+    return _NUMEROS.sub("?", " ".join(sentencia.split()))
+
+
+class RegistroConsultas:
+    """Consultas ejecutadas durante una petición: total, tiempo en la base de datos y repeticiones por forma."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        # forma de la sentencia -> [ejecuciones, segundos]
+        self.por_forma: Dict[str, List] = {}
+
+    def agregar(self, sentencia: str, segundos: float):
+        self.consultas += 1
+        self.tiempo_bd += segundos
+        acumulado = self.por_forma.setdefault(forma_sentencia(sentencia), [0, 0.0])
+        acumulado[0] += 1
+        acumulado[1] += segundos
+
+    def server_timing(self, total_segundos: float) -> str:
+        return (
+            f'db;dur={self.tiempo_bd * 1000:.1f};desc="{self.consultas} consultas", '
+            f"app;dur={total_segundos * 1000:.1f}"
+        )
+
+    def sentencias(self) -> List[dict]:
+        """Sentencias agrupadas por forma, de la que más tiempo tomó a la que menos."""
+        return [
+            {"sentencia": forma[:_LARGO_SENTENCIA], "ejecuciones": ejecuciones, "ms": round(segundos * 1000, 1)}
+            for forma, (ejecuciones, segundos) in sorted(self.por_forma.items(), key=lambda item: -item[1][1])
+        ]
+
+
+def registro_actual() -> Optional[RegistroConsultas]:
+    return _registro_actual.get()
+
+
+# El inicio se guarda en el contexto de ejecución de la sentencia y no en la conexión:
+# after_cursor_execute no se dispara si la sentencia falla, y el contexto se descarta
+# con ella en lugar de quedar en una conexión del pool.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _registro_actual.get() is not None:
+        context.inicio_instrumentacion = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    registro = _registro_actual.get()
+    inicio = getattr(context, "inicio_instrumentacion", None)
+    if registro is not None and inicio is not None:
+        registro.agregar(statement, time.perf_counter() - inicio)
+
+
+class MiddlewareInstrumentacion:
+    """
+    Middleware ASGI que cuenta las consultas y el tiempo en la base de datos de cada
+    petición. Es ASGI puro (no BaseHTTPMiddleware) para no acumular en memoria las
+    respuestas en streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.INSTRUMENTACION_ACTIVA:
+            await self.app(scope, receive, send)
+            return
+
+        registro = RegistroConsultas()
+        token = _registro_actual.set(registro)
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                encabezados = list(mensaje.get("headers", []))
+                encabezados.append((b"server-timing", registro.server_timing(time.perf_counter() - inicio).encode("latin-1")))
+                mensaje = {**mensaje, "headers": encabezados}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _registro_actual.reset(token)
+            self._revisar(scope, registro, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _revisar(scope, registro: RegistroConsultas, total_segundos: float):
+        # Plantilla de la ruta (/grupos/{cod_ficha}) para agrupar peticiones a la misma ruta
+        ruta = getattr(scope.get("route"), "path", scope["path"])
+        peticion = f"{scope['method']} {ruta}"
+
+        for forma, (ejecuciones, segundos) in registro.por_forma.items():
+            if ejecuciones > settings.INSTRUMENTACION_MAX_REPETICIONES:
+                logger.warning(
+                    f"Posible N+1 en {peticion}: la misma sentencia se ejecutó {ejecuciones} veces",
+                    extra={
+                        "peticion": peticion,
+                        "sentencia": forma[:_LARGO_SENTENCIA],
+                        "ejecuciones": ejecuciones,
+                        "ms": round(segundos * 1000, 1),
+                        "muestreo": f"n_mas_1:{peticion}"
+                    }
+                )
+
+        if total_segundos * 1000 > settings.INSTRUMENTACION_LENTA_MS:
+            logger.warning(
+                f"Petición lenta {peticion}: {total_segundos * 1000:.0f} ms, "
+                f"{registro.consultas} consultas, {registro.tiempo_bd * 1000:.0f} ms en la base de datos",
+                extra={
+                    "peticion": peticion,
+                    "duracion_ms": round(total_segundos * 1000, 1),
+                    "consultas": registro.consultas,
+                    "tiempo_bd_ms": round(registro.tiempo_bd * 1000, 1),
+                    "sentencias": registro.sentencias()
+                }
+            )
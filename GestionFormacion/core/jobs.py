@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from core.config import settings
+from core.ejecutores import ejecutor_hilos
+
+logger = logging.getLogger(__name__)
+
+
+class ProgresoIngesta:
+    """
+    Registra el avance de una importación: etapa actual, filas procesadas y el
+    tiempo acumulado en cada etapa. Se usa tanto en las cargas síncronas como en
+    los trabajos en segundo plano.
+    """
+
+    def __init__(self, tipo: str, nombre_archivo: Optional[str] = None, id_usuario: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.nombre_archivo = nombre_archivo
+        # Usuario que envió la carga; solo él (o el superadmin) puede consultar el trabajo
+        self.id_usuario = id_usuario
+        self.estado = "en_cola"
+        self.etapa_actual: Optional[str] = None
+        self.filas_procesadas = 0
+        self.tiempos_etapas: Dict[str, float] = {}
+        self.resultado: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.creado = datetime.now()
+        self.finalizado: Optional[datetime] = None
+        self._inicio: Optional[float] = None
+        self._fin: Optional[float] = None
+        self._inicio_etapa: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        self.estado = "en_proceso"
+        self._inicio = time.perf_counter()
+
+    def finalizar(self, resultado: Optional[dict] = None, error: Optional[str] = None):
+        self.cerrar_etapa()
+        self._fin = time.perf_counter()
+        self.finalizado = datetime.now()
+        self.etapa_actual = None
+        self.resultado = resultado
+        self.error = error
+        self.estado = "fallido" if error else "completado"
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        """Marca `nombre` como etapa actual y acumula el tiempo que dura el bloque."""
+        self.etapa_actual = nombre
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.tiempos_etapas[nombre] = self.tiempos_etapas.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def marcar_etapa(self, nombre: str):
+        """
+        Cierra la etapa abierta con marcar_etapa() y empieza `nombre`. Útil en código
+        lineal donde envolver cada paso en etapa() obligaría a reindentarlo.
+        """
+        self.cerrar_etapa()
+        self.etapa_actual = nombre
+        self._inicio_etapa = time.perf_counter()
+
+    def cerrar_etapa(self):
+        """Suma a tiempos_etapas la etapa abierta con marcar_etapa(), si la hay."""
+        if self._inicio_etapa is None:
+            return
+        with self._lock:
+            self.tiempos_etapas[self.etapa_actual] = (
+                self.tiempos_etapas.get(self.etapa_actual, 0.0) + time.perf_counter() - self._inicio_etapa
+            )
+        self._inicio_etapa = None
+
+    def sumar_filas(self, cantidad: int):
+        with self._lock:
+            self.filas_procesadas += int(cantidad)
+
+    @property
+    def duracion_segundos(self) -> float:
+        if self._inicio is None:
+            return 0.0
+        return (self._fin or time.perf_counter()) - self._inicio
+
+    def resumen(self) -> dict:
+        duracion = self.duracion_segundos
+        return {
+            "id_trabajo": self.id,
+            "tipo": self.tipo,
+            "nombre_archivo": self.nombre_archivo,
+            "estado": self.estado,
+            "etapa": self.etapa_actual,
+            "filas_procesadas": self.filas_procesadas,
+            "filas_por_segundo": round(self.filas_procesadas / duracion, 2) if duracion > 0 else 0.0,
+            "duracion_segundos": round(duracion, 3),
+            "tiempos_etapas": {nombre: round(segundos, 3) for nombre, segundos in self.tiempos_etapas.items()},
+            "creado": self.creado,
+            "finalizado": self.finalizado,
+            "resultado": self.resultado,
+            "error": self.error
+        }
+
+
+# Registro en memoria de los trabajos del proceso actual: con varios workers, el estado
+# de un trabajo solo se puede consultar en el proceso que lo recibió
+_trabajos: Dict[str, ProgresoIngesta] = {}
+_trabajos_lock = threading.Lock()
+
+
+def _depurar_trabajos():
+    """Elimina del registro los trabajos terminados hace más de INGESTA_TRABAJOS_TTL_MINUTOS."""
+    limite = datetime.now() - timedelta(minutes=settings.INGESTA_TRABAJOS_TTL_MINUTOS)
+    with _trabajos_lock:
+        for id_trabajo in [i for i, t in _trabajos.items() if t.finalizado and t.finalizado < limite]:
+            del _trabajos[id_trabajo]
+
+
+def encolar_trabajo(
+    tipo: str,
+    nombre_archivo: Optional[str],
+    funcion: Callable[[ProgresoIngesta], dict],
+    al_terminar: Optional[Callable[[], None]] = None,
+    id_usuario: Optional[int] = None
+) -> ProgresoIngesta:
+    """
+    Registra un trabajo y ejecuta `funcion(progreso)` en el pool de hilos de ingesta.
+
+    Args:
+        tipo: Tipo de reporte (p04, df14, evaluaciones)
+        nombre_archivo: Nombre original del archivo subido
+        funcion: Función que hace la importación y retorna el diccionario de resultados
+        al_terminar: Limpieza opcional que se ejecuta siempre al final (p. ej. borrar el temporal)
+        id_usuario: Usuario dueño del trabajo
+
+    Returns:
+        ProgresoIngesta: El trabajo registrado, consultable con obtener_trabajo()
+    """
+    _depurar_trabajos()
+    progreso = ProgresoIngesta(tipo, nombre_archivo, id_usuario)
+    with _trabajos_lock:
+        _trabajos[progreso.id] = progreso
+
+    def ejecutar():
+        progreso.iniciar()
+        try:
+            progreso.finalizar(resultado=funcion(progreso))
+        except Exception as e:
+            logger.exception(f"Error en el trabajo de ingesta {progreso.id}: {e}")
+            progreso.finalizar(error=str(e))
+        finally:
+            if al_terminar:
+                al_terminar()
+
+    ejecutor_hilos.submit(ejecutar)
+    return progreso
+
+
+def obtener_trabajo(id_trabajo: str) -> Optional[ProgresoIngesta]:
+    with _trabajos_lock:
+        return _trabajos.get(id_trabajo)
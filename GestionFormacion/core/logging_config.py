@@ -0,0 +1,152 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from core.config import settings
+
+# --- Configuración de logging de la aplicación ---
+#
+# Los módulos siguen usando logging.getLogger(__name__). configurar_logging() deja en
+# el logger raíz un único QueueHandler: registrar un mensaje solo lo encola, y un hilo
+# (QueueListener) lo formatea y lo escribe en la consola, de modo que las rutas de la
+# ingesta no esperan a que termine la escritura en stdout/stderr.
+
+# Atributos estándar de LogRecord; los demás vienen de `extra` y se agregan al JSON
+_ATRIBUTOS_LOG_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "muestreo"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por mensaje con la fecha UTC, nivel, logger, mensaje y los campos de `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            "fecha": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+            "proceso": record.process,
+            "hilo": record.threadName
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_LOG_RECORD and not clave.startswith("_"):
+                registro[clave] = valor
+        if record.exc_info:
+            registro["excepcion"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            registro["excepcion"] = record.exc_text
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class _Encolador(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea el mensaje al encolarlo (eso lo hace el formateador de
+    la consola en el hilo del listener): solo resuelve los argumentos del mensaje y el
+    texto de la excepción, que no siempre se pueden serializar o siguen cambiando.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Muestreo de mensajes repetitivos (p. ej. uno por fila o por lote). Los mensajes que
+    se registran con extra={"muestreo": "<clave>"} pasan las primeras
+    LOG_MUESTREO_PRIMEROS veces por clave y luego uno de cada LOG_MUESTREO_CADA; los
+    que pasan llevan el número de ocurrencias en el campo `ocurrencias`. Los mensajes
+    sin clave de muestreo no se descartan nunca; los errores por fila de la ingesta se
+    muestrean porque de todas formas quedan completos en el resultado de la carga.
+    """
+
+    def __init__(self, primeros: int, cada: int):
+        super().__init__()
+        self._primeros = primeros
+        self._cada = max(cada, 1)
+        self._contadores: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        clave = getattr(record, "muestreo", None)
+        if clave is None:
+            return True
+        with self._lock:
+            ocurrencias = self._contadores.get(clave, 0) + 1
+            self._contadores[clave] = ocurrencias
+        record.ocurrencias = ocurrencias
+        return ocurrencias <= self._primeros or ocurrencias % self._cada == 0
+
+
+def _niveles_por_modulo(texto: str) -> Dict[str, str]:
+    """'sqlalchemy.engine=INFO,app.crud=DEBUG' -> {'sqlalchemy.engine': 'INFO', 'app.crud': 'DEBUG'}"""
+    niveles = {}
+    for parte in texto.split(","):
+        if "=" in parte:
+            modulo, nivel = parte.split("=", 1)
+            niveles[modulo.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar_logging():
+    """
+    Configura el logging de todo el proceso (una sola vez): nivel general LOG_NIVEL,
+    niveles por módulo de LOG_NIVELES, formato LOG_FORMATO ("json" o "texto"), muestreo
+    y escritura en la consola desde el hilo del QueueListener. Se llama al importar
+    main.py y al iniciar cada proceso del pool de ingesta.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        consola = logging.StreamHandler(sys.stderr)
+        if settings.LOG_FORMATO == "json":
+            consola.setFormatter(FormateadorJSON())
+        else:
+            consola.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        cola = queue.SimpleQueue()
+        encolador = _Encolador(cola)
+        encolador.addFilter(FiltroMuestreo(settings.LOG_MUESTREO_PRIMEROS, settings.LOG_MUESTREO_CADA))
+
+        raiz = logging.getLogger()
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        raiz.addHandler(encolador)
+        raiz.setLevel(settings.LOG_NIVEL.upper())
+        for modulo, nivel in _niveles_por_modulo(settings.LOG_NIVELES).items():
+            logging.getLogger(modulo).setLevel(nivel)
+
+        # Los mensajes de uvicorn también pasan por la cola
+        for nombre in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            logger_uvicorn = logging.getLogger(nombre)
+            logger_uvicorn.handlers.clear()
+            logger_uvicorn.propagate = True
+
+        _listener = logging.handlers.QueueListener(cola, consola, respect_handler_level=True)
+        _listener.start()
+        atexit.register(detener_logging)
+
+
+def detener_logging():
+    """Escribe los mensajes pendientes en la cola y detiene el hilo del QueueListener."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,197 @@
+"""
+Migraciones versionadas del esquema.
+
+db/init.sql crea el esquema base de una instalación nueva; los cambios posteriores van
+en migraciones/NNNN_descripcion.sql y se aplican en orden de versión. Las aplicadas
+quedan en la tabla schema_migrations con el SHA-256 del archivo, así que cada una se
+ejecuta una sola vez por base de datos.
+
+En MariaDB cada sentencia DDL confirma la transacción, así que una migración que falla
+a la mitad no se revierte: las migraciones se escriben idempotentes (IF NOT EXISTS) para
+que se puedan volver a ejecutar después de corregir el problema.
+
+Uso (desde GestionFormacion/):
+    python -m core.migraciones estado
+    python -m core.migraciones aplicar [--hasta 2] [--database-url mysql+pymysql://...]
+
+Con DB_MIGRAR_AL_INICIAR=true (por defecto) el servidor aplica las pendientes al iniciar.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migraciones")
+
+_PATRON_ARCHIVO = re.compile(r"^(\d{4})_([\w\-]+)\.sql$")
+
+# Evita que dos procesos (varios workers de uvicorn) apliquen las migraciones a la vez
+_NOMBRE_BLOQUEO = "gestion_formacion_migraciones"
+_ESPERA_BLOQUEO_SEGUNDOS = 300
+
+
+class Migracion(NamedTuple):
+    version: int
+    nombre: str
+    ruta: str
+    checksum: str
+
+
+def _leer(ruta: str) -> str:
+    with open(ruta, encoding="utf-8") as archivo:
+        return archivo.read()
+
+
+def sentencias_sql(contenido: str) -> List[str]:
+    """Sentencias de un archivo .sql: sin líneas de comentario y separadas por ';' al final de línea."""
+    sin_comentarios = "\n".join(linea for linea in contenido.splitlines() if not linea.lstrip().startswith("--"))
+    return [sentencia.strip() for sentencia in re.split(r";[ \t]*(?:\n|$)", sin_comentarios) if sentencia.strip()]
+
+
+def migraciones_disponibles(directorio: str = DIRECTORIO_MIGRACIONES) -> List[Migracion]:
+    """
+    Raises:
+        ValueError: Si dos archivos tienen la misma versión
+    """
+    migraciones = {}
+    for nombre_archivo in sorted(os.listdir(directorio)):
+        coincidencia = _PATRON_ARCHIVO.match(nombre_archivo)
+        if not coincidencia:
+            continue
+        version = int(coincidencia.group(1))
+        if version in migraciones:
+            raise ValueError(f"Versión de migración repetida: {version} ({nombre_archivo} y {migraciones[version].ruta})")
+        ruta = os.path.join(directorio, nombre_archivo)
+        migraciones[version] = Migracion(
+            version, coincidencia.group(2), ruta, hashlib.sha256(_leer(ruta).encode("utf-8")).hexdigest()
+        )
+    return [migraciones[version] for version in sorted(migraciones)]
+
+
+def _crear_tabla_control(conexion: Connection):
+    conexion.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            duracion_segundos DECIMAL(10,3),
+            fecha_aplicada DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conexion.commit()
+
+
+def _aplicadas(conexion: Connection) -> Dict[int, dict]:
+    filas = conexion.execute(text(
+        "SELECT version, nombre, checksum, fecha_aplicada FROM schema_migrations ORDER BY version"
+    )).mappings().all()
+    return {fila["version"]: dict(fila) for fila in filas}
+
+
+def estado_migraciones(engine: Engine, directorio: str = DIRECTORIO_MIGRACIONES) -> List[dict]:
+    """Cada migración disponible con su fecha de aplicación (None si está pendiente)."""
+    with engine.connect() as conexion:
+        _crear_tabla_control(conexion)
+        aplicadas = _aplicadas(conexion)
+    return [
+        {
+            "version": migracion.version,
+            "nombre": migracion.nombre,
+            "fecha_aplicada": aplicadas.get(migracion.version, {}).get("fecha_aplicada"),
+            "modificada": migracion.version in aplicadas and aplicadas[migracion.version]["checksum"] != migracion.checksum
+        }
+        for migracion in migraciones_disponibles(directorio)
+    ]
+
+
+def aplicar_migraciones(engine: Engine, hasta: Optional[int] = None, directorio: str = DIRECTORIO_MIGRACIONES) -> List[int]:
+    """
+    Aplica en orden las migraciones pendientes (hasta la versión `hasta`, si se indica).
+
+    Returns:
+        list: Versiones aplicadas en esta llamada
+
+    Raises:
+        RuntimeError: Si no se obtiene el bloqueo de migraciones a tiempo
+    """
+    aplicadas_ahora = []
+    with engine.connect() as conexion:
+        obtenido = conexion.execute(
+            text("SELECT GET_LOCK(:nombre, :espera)"),
+            {"nombre": _NOMBRE_BLOQUEO, "espera": _ESPERA_BLOQUEO_SEGUNDOS}
+        ).scalar()
+        if obtenido != 1:
+            raise RuntimeError("No se obtuvo el bloqueo de migraciones; otro proceso las está aplicando")
+        try:
+            _crear_tabla_control(conexion)
+            aplicadas = _aplicadas(conexion)
+            for migracion in migraciones_disponibles(directorio):
+                if hasta is not None and migracion.version > hasta:
+                    break
+                if migracion.version in aplicadas:
+                    if aplicadas[migracion.version]["checksum"] != migracion.checksum:
+                        logger.warning(f"La migración {migracion.version} ({migracion.nombre}) cambió después de aplicarse")
+                    continue
+
+                logger.info(f"Aplicando migración {migracion.version}: {migracion.nombre}")
+                inicio = time.perf_counter()
+                try:
+                    for sentencia in sentencias_sql(_leer(migracion.ruta)):
+                        # exec_driver_sql: el SQL de la migración va tal cual, sin interpretar ':'
+                        conexion.exec_driver_sql(sentencia)
+                    conexion.execute(
+                        text("""
+                            INSERT INTO schema_migrations (version, nombre, checksum, duracion_segundos)
+                            VALUES (:version, :nombre, :checksum, :duracion)
+                        """),
+                        {
+                            "version": migracion.version,
+                            "nombre": migracion.nombre,
+                            "checksum": migracion.checksum,
+                            "duracion": round(time.perf_counter() - inicio, 3)
+                        }
+                    )
+                    conexion.commit()
+                except Exception as e:
+                    conexion.rollback()
+                    logger.error(f"Error al aplicar la migración {migracion.version} ({migracion.nombre}): {e}")
+                    raise
+                aplicadas_ahora.append(migracion.version)
+        finally:
+            conexion.execute(text("SELECT RELEASE_LOCK(:nombre)"), {"nombre": _NOMBRE_BLOQUEO})
+            conexion.commit()
+    return aplicadas_ahora
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones versionadas del esquema")
+    parser.add_argument("accion", choices=["estado", "aplicar"])
+    parser.add_argument("--hasta", type=int, default=None, help="Última versión a aplicar")
+    parser.add_argument("--database-url", default=None, help="Por defecto DATABASE_URL de la configuración")
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from core.database import engine
+
+    if args.accion == "aplicar":
+        versiones = aplicar_migraciones(engine, hasta=args.hasta)
+        print(f"Migraciones aplicadas: {versiones or 'ninguna'}")
+    for migracion in estado_migraciones(engine):
+        estado = f"aplicada {migracion['fecha_aplicada']}" if migracion["fecha_aplicada"] else "pendiente"
+        if migracion["modificada"]:
+            estado += " (el archivo cambió después de aplicarla)"
+        print(f"{migracion['version']:04d} {migracion['nombre']}: {estado}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import logging
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
@@ -7,6 +8,8 @@ from sqlalchemy.orm import Session
 from app.crud import users as crud_users
 from core.database import get_db
 
+logger = logging.getLogger(__name__)
+
 # Configurar hashing de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -63,10 +66,10 @@ def verify_token(token: str):
         user_id = payload.get("sub")
         return int(user_id) if user_id is not None else None
     except jwt.ExpiredSignatureError: # Token ha expirado
-        print("Token expirado")
+        logger.info("Token expirado")
         return None
     except JWTError as e:
-        print("Error al decodificar el token:", str(e))
+        logger.warning("Error al decodificar el token: %s", e)
         return None
 
 # Función para verificar token de recuperación de contraseña
@@ -1,3 +1,6 @@
+from core.logging_config import configurar_logging, detener_logging
+configurar_logging()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import users
@@ -13,6 +16,14 @@ from app.api import competencia
 from app.api import resultado_aprendizaje
 from app.api import festivos
 from app.api import notificacion
+from app.api import juicio_evaluacion
+from app.api import operaciones
+from core.ejecutores import cerrar_ejecutores
+from core.config import settings
+from core.cache import detener_bus_caches, iniciar_bus_caches
+from core.database import cerrar_conexiones, engine
+from core.migraciones import aplicar_migraciones
+from core.instrumentacion import MiddlewareInstrumentacion
 
 
 
@@ -33,6 +44,8 @@ app.include_router(competencia.router, prefix="/competencias", tags=["Competenci
 app.include_router(resultado_aprendizaje.router, prefix="/resultados", tags=["Resultados de Aprendizaje"])
 app.include_router(festivos.router, prefix="/festivos", tags=["Festivos"])
 app.include_router(notificacion.router, prefix="/notificaciones", tags=["Notificaciones"])
+app.include_router(juicio_evaluacion.router, prefix="/juicios", tags=["Juicios Evaluativos"])
+app.include_router(operaciones.router, prefix="/operaciones", tags=["Operaciones"])
 
 # Configuración de CORS para permitir todas las solicitudes desde cualquier origen
 app.add_middleware(
@@ -41,8 +54,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],  # Permitir estos métodos HTTP
     allow_headers=["*"],  # Permitir cualquier encabezado en las solicitudes
+    expose_headers=["X-Next-Cursor"],  # Cursor de la página siguiente de /programacion/all
 )
 
+# Conteo y tiempo de las consultas SQL de cada petición (encabezado Server-Timing)
+app.add_middleware(MiddlewareInstrumentacion)
+
+@app.on_event("startup")
+def startup():
+    # Aplicar las migraciones pendientes del esquema antes de atender peticiones
+    if settings.DB_MIGRAR_AL_INICIAR:
+        aplicar_migraciones(engine)
+    # Escuchar los cambios que publican los demás workers para invalidar las cachés locales
+    iniciar_bus_caches()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Detener los pools de hilos y procesos de la carga de archivos
+    cerrar_ejecutores()
+    detener_bus_caches()
+    # Cerrar los pools de conexiones del primario y de las réplicas
+    await cerrar_conexiones()
+    detener_logging()
+
 @app.get("/")
 def read_root():
     return {
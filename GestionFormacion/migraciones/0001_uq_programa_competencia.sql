@@ -0,0 +1,12 @@
+-- Clave única de programa_competencia (db/init.sql la trae desde la carga de evaluaciones
+-- por mapa de fichas; las bases de datos creadas antes no la tienen). Se eliminan primero
+-- los duplicados, conservando el registro más antiguo de cada combinación.
+DELETE pc FROM programa_competencia pc
+JOIN programa_competencia anterior
+  ON anterior.cod_programa = pc.cod_programa
+ AND anterior.la_version = pc.la_version
+ AND anterior.cod_competencia = pc.cod_competencia
+ AND anterior.cod_prog_competencia < pc.cod_prog_competencia;
+
+ALTER TABLE programa_competencia
+  ADD UNIQUE KEY IF NOT EXISTS uq_programa_competencia (cod_programa, la_version, cod_competencia);
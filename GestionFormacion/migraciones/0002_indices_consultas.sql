@@ -0,0 +1,27 @@
+-- Índices compuestos para los predicados que usa app/crud/*.py. Las columnas de igualdad
+-- van primero y después las de rango u orden, para que el ORDER BY salga del índice.
+-- InnoDB descarta el índice que creó para la llave foránea cuando otro índice empieza
+-- por las mismas columnas, así que no quedan índices duplicados.
+
+-- Verificación de cruces de horario al crear/actualizar una programación
+-- (id_instructor = ? AND fecha_programada = ? AND rango de horas) y listado por
+-- instructor ORDER BY fecha_programada, hora_inicio
+CREATE INDEX IF NOT EXISTS idx_programacion_instructor_fecha
+  ON programacion (id_instructor, fecha_programada, hora_inicio);
+
+-- Programación de una ficha ORDER BY fecha_programada, hora_inicio
+CREATE INDEX IF NOT EXISTS idx_programacion_ficha_fecha
+  ON programacion (cod_ficha, fecha_programada, hora_inicio);
+
+-- Notificaciones del usuario ORDER BY fecha_creacion DESC
+CREATE INDEX IF NOT EXISTS idx_notificacion_usuario_fecha
+  ON notificacion (id_usuario, fecha_creacion);
+
+-- Dashboards y listados por centro: cod_centro siempre, estado_grupo casi siempre y el
+-- filtro por año como rango sobre fecha_inicio
+CREATE INDEX IF NOT EXISTS idx_grupo_centro_estado_inicio
+  ON grupo (cod_centro, estado_grupo, fecha_inicio);
+
+-- Instructores activos (id_rol = 3 AND estado = 1) ORDER BY nombre_completo
+CREATE INDEX IF NOT EXISTS idx_usuario_rol_estado_nombre
+  ON usuario (id_rol, estado, nombre_completo);
@@ -0,0 +1,10 @@
+-- Índices para la paginación por llave (cursor) de los listados.
+
+-- Grupos de un centro ORDER BY cod_ficha DESC, con cod_ficha < cursor
+CREATE INDEX IF NOT EXISTS idx_grupo_centro_ficha
+  ON grupo (cod_centro, cod_ficha);
+
+-- Todas las programaciones ORDER BY fecha_programada DESC, hora_inicio, id_programacion
+-- (índice descendente: MariaDB 10.8 o superior)
+CREATE INDEX IF NOT EXISTS idx_programacion_fecha_hora
+  ON programacion (fecha_programada DESC, hora_inicio, id_programacion);
@@ -0,0 +1,9 @@
+-- Bus de invalidación de las cachés en memoria entre workers (core/cache.py, CACHE_BUS=bd).
+-- Cada escritura suma 1 a la versión de las tablas que cambió; cada proceso lee esta
+-- tabla cada CACHE_BUS_INTERVALO_SEGUNDOS y descarta lo que tenga cacheado de ellas.
+
+CREATE TABLE IF NOT EXISTS cache_version (
+  tabla VARCHAR(64) NOT NULL PRIMARY KEY,
+  version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  fecha_actualizacion TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+);
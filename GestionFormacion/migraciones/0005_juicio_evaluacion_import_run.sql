@@ -0,0 +1,40 @@
+-- Tablas de los juicios evaluativos por aprendiz y del historial de cargas de archivos.
+-- db/init.sql ya las crea en una instalación nueva; esta migración las agrega a las bases
+-- de datos creadas antes (IF NOT EXISTS: no hace nada si ya están).
+
+CREATE TABLE IF NOT EXISTS juicio_evaluacion (
+    id_juicio INT AUTO_INCREMENT PRIMARY KEY,
+    cod_ficha INT NOT NULL,
+    tipo_documento VARCHAR(10),
+    numero_documento VARCHAR(20) NOT NULL,
+    nombre_aprendiz VARCHAR(100),
+    apellidos_aprendiz VARCHAR(100),
+    estado_aprendiz VARCHAR(50),
+    cod_competencia INT NOT NULL,
+    cod_resultado INT NOT NULL,
+    juicio VARCHAR(30),
+    fecha_hora_juicio DATETIME,
+    funcionario_registro VARCHAR(150),
+    UNIQUE KEY uq_juicio_ficha_aprendiz_resultado (cod_ficha, numero_documento, cod_resultado),
+    KEY idx_juicio_competencia (cod_competencia, juicio),
+    CONSTRAINT fk_juicio_ficha FOREIGN KEY (cod_ficha) REFERENCES grupo(cod_ficha),
+    CONSTRAINT fk_juicio_competencia FOREIGN KEY (cod_competencia) REFERENCES competencia(cod_competencia),
+    CONSTRAINT fk_juicio_resultado FOREIGN KEY (cod_resultado) REFERENCES resultado_aprendizaje(cod_resultado)
+);
+
+CREATE TABLE IF NOT EXISTS import_run (
+    id_import INT AUTO_INCREMENT PRIMARY KEY,
+    tipo_reporte VARCHAR(20) NOT NULL,
+    hash_sha256 CHAR(64) NOT NULL,
+    nombre_archivo VARCHAR(255),
+    tamano_bytes BIGINT,
+    estado VARCHAR(30) NOT NULL,
+    filas_procesadas INT DEFAULT 0,
+    num_errores INT DEFAULT 0,
+    duracion_segundos DECIMAL(10,3),
+    resultado JSON,
+    fecha_inicio DATETIME DEFAULT CURRENT_TIMESTAMP,
+    fecha_fin DATETIME,
+    KEY idx_import_tipo_hash (tipo_reporte, hash_sha256, estado),
+    KEY idx_import_fecha (fecha_inicio)
+);
@@ -0,0 +1,43 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app.utils import archivos
+from app.utils.archivos import ArchivoDemasiadoGrande, guardar_lote_temporal, guardar_subida_temporal
+from core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def directorio_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_DIR_TEMPORAL", str(tmp_path / "temporal"))
+    monkeypatch.setattr(settings, "INGESTA_MAX_TAMANO_BYTES", 100)
+    monkeypatch.setattr(archivos, "TAMANO_BLOQUE_COPIA", 16)
+
+
+def _archivo(contenido: bytes, nombre: str = "reporte.xlsx") -> UploadFile:
+    return UploadFile(io.BytesIO(contenido), filename=nombre)
+
+
+def test_subida_dentro_del_limite():
+    contenido = os.urandom(100)
+    archivo = guardar_subida_temporal(_archivo(contenido))
+    with open(archivo.ruta, "rb") as copia:
+        assert copia.read() == contenido
+    assert archivo.sha256 == hashlib.sha256(contenido).hexdigest()
+    assert archivo.tamano_bytes == 100
+
+
+def test_subida_que_supera_el_limite_no_deja_temporal():
+    with pytest.raises(ArchivoDemasiadoGrande):
+        guardar_subida_temporal(_archivo(os.urandom(101)))
+    assert os.listdir(settings.INGESTA_DIR_TEMPORAL) == []
+
+
+def test_lote_que_supera_el_limite_no_deja_temporal():
+    libros = [_archivo(os.urandom(60), "a.xlsx"), _archivo(os.urandom(60), "b.xlsx")]
+    with pytest.raises(ArchivoDemasiadoGrande):
+        guardar_lote_temporal(libros)
+    assert os.listdir(settings.INGESTA_DIR_TEMPORAL) == []
@@ -0,0 +1,208 @@
+import pytest
+
+from app.crud import competencia as crud_competencia
+from app.schemas.competencia import CompetenciaCreate
+from benchmarks.sesion_simulada import SesionSimulada
+from core import cache
+from core.cache import BusBaseDatos, BusLocal, BusNulo, CacheLocal, SIN_VALOR, SuscripcionBus, marcar_cambio
+from core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def bus_local(monkeypatch):
+    """Las pruebas no publican en la base de datos: cada una usa un bus en memoria."""
+    bus = BusLocal()
+    monkeypatch.setattr(cache, "bus", bus)
+    return bus
+
+
+def test_acierto_y_fallo():
+    c = CacheLocal("prueba_acierto", ("tabla_acierto",), 10, 60)
+    assert c.obtener("k") is SIN_VALOR
+    c.guardar("k", 1)
+    assert c.obtener("k") == 1
+    assert (c.aciertos, c.fallos) == (1, 1)
+
+
+def test_none_es_un_valor_cacheable():
+    c = CacheLocal("prueba_none", ("tabla_none",), 10, 60)
+    c.guardar("k", None)
+    assert c.obtener("k") is None
+
+
+def test_marcar_cambio_invalida_las_entradas_de_la_tabla():
+    c = CacheLocal("prueba_cambio", ("tabla_cambio", "otra_tabla_cambio"), 10, 60)
+    c.guardar("k", 1)
+    marcar_cambio("otra_tabla_cambio")
+    assert c.obtener("k") is SIN_VALOR
+
+
+def test_cambio_de_otra_tabla_no_invalida():
+    c = CacheLocal("prueba_sin_cambio", ("tabla_sin_cambio",), 10, 60)
+    c.guardar("k", 1)
+    marcar_cambio("tabla_ajena")
+    assert c.obtener("k") == 1
+
+
+def test_versiones_tomadas_antes_de_la_consulta():
+    c = CacheLocal("prueba_carrera", ("tabla_carrera",), 10, 60)
+    versiones = c.versiones()
+    # Una escritura confirma mientras se leía el valor: lo leído ya no se sirve
+    marcar_cambio("tabla_carrera")
+    c.guardar("k", "viejo", versiones)
+    assert c.obtener("k") is SIN_VALOR
+
+
+def test_ttl(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: ahora[0])
+    c = CacheLocal("prueba_ttl", ("tabla_ttl",), 10, 5)
+    c.guardar("k", 1)
+    ahora[0] += 4.9
+    assert c.obtener("k") == 1
+    ahora[0] += 0.2
+    assert c.obtener("k") is SIN_VALOR
+
+
+def test_expulsa_la_menos_usada():
+    c = CacheLocal("prueba_lru", ("tabla_lru",), 2, 60)
+    c.guardar("a", 1)
+    c.guardar("b", 2)
+    c.obtener("a")
+    c.guardar("c", 3)
+    assert c.obtener("b") is SIN_VALOR
+    assert c.obtener("a") == 1
+    assert c.expulsiones == 1
+
+
+def test_obtener_o_cargar_carga_una_vez():
+    c = CacheLocal("prueba_cargar", ("tabla_cargar",), 10, 60)
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        return len(cargas)
+
+    assert c.obtener_o_cargar("k", cargar) == 1
+    assert c.obtener_o_cargar("k", cargar) == 1
+    marcar_cambio("tabla_cargar")
+    assert c.obtener_o_cargar("k", cargar) == 2
+
+
+def test_estadisticas():
+    c = CacheLocal("prueba_estadisticas", ("tabla_estadisticas",), 10, 60)
+    c.guardar("k", 1)
+    c.obtener("k")
+    c.obtener("otra")
+    estadisticas = c.estadisticas()
+    assert estadisticas["entradas"] == 1
+    assert estadisticas["tasa_aciertos"] == 0.5
+    assert estadisticas in cache.estadisticas_caches()
+
+
+def test_invalidar_vacia_la_cache():
+    c = CacheLocal("prueba_invalidar", ("tabla_invalidar",), 10, 60)
+    c.guardar("a", 1)
+    c.guardar("b", 2)
+    c.invalidar()
+    assert c.obtener("a") is SIN_VALOR
+    assert c.estadisticas()["entradas"] == 0
+
+
+def test_catalogo_usa_la_configuracion(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_CATALOGOS_MAX_ENTRADAS", 7)
+    monkeypatch.setattr(settings, "CACHE_CATALOGOS_SEGUNDOS", 30)
+    catalogo = cache.cache_catalogo("prueba_catalogo", ("tabla_catalogo",))
+    assert (catalogo.max_entradas, catalogo.ttl_segundos) == (7, 30)
+
+
+def test_catalogo_se_invalida_al_escribir():
+    db = SesionSimulada()
+    crud_competencia._cache_competencias.invalidar()
+    crud_competencia.get_competencia_by_id(db, 220501001)
+    crud_competencia.get_competencia_by_id(db, 220501001)
+    assert db.sentencias == 1
+
+    crud_competencia.create_competencia(db, CompetenciaCreate(cod_competencia=220501002, nombre="Nueva", horas=48))
+    crud_competencia.get_competencia_by_id(db, 220501001)
+    # El INSERT y una nueva consulta: la escritura invalidó el catálogo
+    assert db.sentencias == 3
+
+
+def test_marcar_cambio_publica_en_el_bus(bus_local):
+    marcar_cambio("tabla_publicada", "tabla_publicada")
+    assert bus_local.leer() == {"tabla_publicada": 2}
+
+
+@pytest.mark.parametrize("valor, tipo", [("bd", BusBaseDatos), ("ninguno", BusNulo), ("local", BusNulo)])
+def test_solo_se_publica_en_la_base_de_datos_con_cache_bus_bd(monkeypatch, valor, tipo):
+    monkeypatch.setattr(settings, "CACHE_BUS", valor)
+    assert type(cache._crear_bus()) is tipo
+
+
+def test_bus_nulo_no_guarda_nada(monkeypatch):
+    nulo = BusNulo()
+    monkeypatch.setattr(cache, "bus", nulo)
+    c = CacheLocal("prueba_bus_nulo", ("tabla_bus_nulo",), 10, 60)
+    c.guardar("k", 1)
+    marcar_cambio("tabla_bus_nulo")
+    assert c.obtener("k") is SIN_VALOR
+    assert nulo.leer() == {}
+
+
+def test_marcar_cambio_invalida_aunque_el_bus_falle(monkeypatch):
+    class BusCaido:
+        def publicar(self, tablas):
+            raise OSError("sin conexión")
+
+    monkeypatch.setattr(cache, "bus", BusCaido())
+    c = CacheLocal("prueba_bus_caido", ("tabla_bus_caido",), 10, 60)
+    c.guardar("k", 1)
+    marcar_cambio("tabla_bus_caido")
+    assert c.obtener("k") is SIN_VALOR
+
+
+def test_suscripcion_primera_lectura_es_linea_base():
+    compartido = BusLocal()
+    compartido.publicar(["tabla_base"])
+    c = CacheLocal("prueba_base", ("tabla_base",), 10, 60)
+    c.guardar("k", 1)
+    suscripcion = SuscripcionBus(compartido, 60)
+    suscripcion.revisar()
+    assert c.obtener("k") == 1
+    assert suscripcion.invalidaciones == 0
+
+
+def test_suscripcion_invalida_lo_que_cambio_otro_proceso():
+    compartido = BusLocal()
+    suscripcion = SuscripcionBus(compartido, 60)
+    suscripcion.revisar()
+    c = CacheLocal("prueba_remota", ("tabla_remota",), 10, 60)
+    c.guardar("k", 1)
+    otra = CacheLocal("prueba_remota_otra", ("tabla_remota_otra",), 10, 60)
+    otra.guardar("k", 1)
+
+    # Otro worker confirma una escritura sobre tabla_remota
+    compartido.publicar(["tabla_remota"])
+    suscripcion.revisar()
+    assert c.obtener("k") is SIN_VALOR
+    assert otra.obtener("k") == 1
+    assert suscripcion.invalidaciones == 1
+
+    # Sin cambios nuevos no se invalida nada más
+    c.guardar("k", 2)
+    suscripcion.revisar()
+    assert c.obtener("k") == 2
+
+
+def test_suscripcion_registra_errores_de_lectura():
+    class BusCaido:
+        def leer(self):
+            raise OSError("sin conexión")
+
+    suscripcion = SuscripcionBus(BusCaido(), 60)
+    suscripcion.revisar()
+    estado = suscripcion.estado()
+    assert estado["errores"] == 1
+    assert estado["ultimo_error"] == "sin conexión"
+    assert estado["lecturas"] == 0
@@ -0,0 +1,63 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from app.utils.cursores import codificar_cursor, cortar_pagina, decodificar_cursor
+
+
+def test_ida_y_vuelta():
+    cursor = codificar_cursor([date(2025, 3, 1), time(7, 30), 42])
+    assert decodificar_cursor(cursor, [date, time, int]) == [date(2025, 3, 1), time(7, 30), 42]
+
+
+def test_timedelta_se_codifica_como_hora():
+    # PyMySQL entrega las columnas TIME como timedelta
+    cursor = codificar_cursor([timedelta(hours=14, minutes=5, seconds=9)])
+    assert decodificar_cursor(cursor, [time]) == [time(14, 5, 9)]
+
+
+def test_cursor_es_url_safe_sin_relleno():
+    cursor = codificar_cursor(["ñandú/+?", 1])
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decodificar_cursor(cursor, [str, int]) == ["ñandú/+?", 1]
+
+
+@pytest.mark.parametrize("cursor, tipos", [
+    ("no es base64!", [int]),
+    (codificar_cursor([1, 2]), [int]),
+    (codificar_cursor(["abc"]), [int]),
+    (codificar_cursor(["2025-13-01"]), [date]),
+])
+def test_cursor_invalido(cursor, tipos):
+    with pytest.raises(ValueError, match="Cursor de paginación inválido"):
+        decodificar_cursor(cursor, tipos)
+
+
+def test_cortar_pagina_sin_pagina_siguiente():
+    filas = [{"id": 1}, {"id": 2}]
+    assert cortar_pagina(filas, 2, lambda fila: [fila["id"]]) == (filas, None)
+
+
+def test_cortar_pagina_con_pagina_siguiente():
+    filas = [{"id": 1}, {"id": 2}, {"id": 3}]
+    pagina, siguiente = cortar_pagina(filas, 2, lambda fila: [fila["id"]])
+    assert pagina == filas[:2]
+    assert decodificar_cursor(siguiente, [int]) == [2]
+
+
+def test_recorrer_todas_las_paginas_con_llave_compuesta():
+    # Como la consulta de programacion: orden por (fecha, hora, id) y filtro "después de la llave"
+    filas = sorted(
+        [{"fecha": date(2025, 3, 1 + i % 3), "hora": time(7 + i % 2), "id": i} for i in range(11)],
+        key=lambda fila: (fila["fecha"], fila["hora"], fila["id"])
+    )
+    llave = lambda fila: [fila["fecha"], fila["hora"], fila["id"]]
+    vistas, cursor = [], None
+    while True:
+        desde = tuple(decodificar_cursor(cursor, [date, time, int])) if cursor else None
+        candidatas = [fila for fila in filas if desde is None or tuple(llave(fila)) > desde][:4 + 1]
+        pagina, cursor = cortar_pagina(candidatas, 4, llave)
+        vistas.extend(pagina)
+        if cursor is None:
+            break
+    assert vistas == filas
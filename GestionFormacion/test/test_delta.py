@@ -0,0 +1,69 @@
+import pandas as pd
+
+from app.api.cargar_archivos import _calcular_delta_lote
+from app.utils.delta import (
+    COLUMNAS_DELTA_DATOS_GRUPO, COLUMNAS_DELTA_GRUPO, InstantaneaGrupos, filas_distintas
+)
+
+
+def _grupo(cod_ficha: int, cod_centro: int = 9101, estado: str = "EN EJECUCION", aprendices=30, **cambios) -> dict:
+    fila = {columna: None for columna in COLUMNAS_DELTA_GRUPO + COLUMNAS_DELTA_DATOS_GRUPO}
+    fila.update({
+        "cod_ficha": cod_ficha, "cod_centro": cod_centro, "cod_programa": 228106, "la_version": 1,
+        "estado_grupo": estado, "fecha_inicio": "2024-02-01", "num_total_aprendices": aprendices
+    })
+    fila.update(cambios)
+    return fila
+
+
+def _estado_actual(*filas: dict) -> pd.DataFrame:
+    actual = pd.DataFrame(list(filas)).set_index("cod_ficha")
+    actual["tiene_datos_grupo"] = True
+    return actual
+
+
+def test_filas_distintas_normaliza_tipos_y_nulos():
+    actual = pd.DataFrame(
+        {"la_version": [1, 2], "fecha_inicio": [pd.Timestamp("2024-02-01"), None], "jornada": ["DIURNA", None]},
+        index=[1, 2]
+    )
+    entrante = pd.DataFrame(
+        {"la_version": ["1", "2"], "fecha_inicio": ["2024-02-01", None], "jornada": [" DIURNA ", "NOCTURNA"]},
+        index=[1, 2]
+    )
+    entrante.loc[3] = ["1", None, None]
+    distinto = filas_distintas(entrante, actual, ["la_version", "fecha_inicio", "jornada"])
+    assert distinto.tolist() == [False, True, True]
+
+
+def test_instantanea_consulta_cada_centro_una_vez():
+    consultas = []
+
+    def cargar(centros):
+        consultas.append(centros)
+        return _estado_actual(*[_grupo(c * 10, cod_centro=c) for c in centros])
+
+    instantanea = InstantaneaGrupos(cargar)
+    instantanea.asegurar_centros([1, 2, None])
+    instantanea.asegurar_centros([2, 3])
+    assert consultas == [[1, 2], [3]]
+
+    instantanea.marcar_vistas([10, 30])
+    assert instantanea.fichas_desaparecidas() == 1
+
+
+def test_delta_cuenta_una_vez_las_fichas_repetidas_entre_lotes():
+    instantanea = InstantaneaGrupos(lambda centros: _estado_actual(_grupo(1), _grupo(2)))
+    instantanea.asegurar_centros([9101])
+    resultados = {"delta": {"fichas_nuevas": 0, "fichas_cambiadas": 0, "fichas_sin_cambios": 0}}
+
+    lote_1 = pd.DataFrame([_grupo(1), _grupo(2, estado="TERMINADA"), _grupo(3)])
+    cambios = _calcular_delta_lote(lote_1, instantanea, resultados)
+    assert cambios["grupo"].tolist() == [False, True, True]
+
+    # La ficha 3 (nueva) y la 2 (cambiada) vuelven a aparecer, una de ellas dos veces
+    lote_2 = pd.DataFrame([_grupo(3), _grupo(2, estado="TERMINADA"), _grupo(3, aprendices=31), _grupo(4)])
+    _calcular_delta_lote(lote_2, instantanea, resultados)
+
+    assert resultados["delta"] == {"fichas_nuevas": 2, "fichas_cambiadas": 1, "fichas_sin_cambios": 1}
+    assert instantanea.fichas_desaparecidas() == 0
@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from app.utils.excel import (
+    COLUMNAS_EVALUACIONES, COLUMNAS_JUICIOS, FILA_ENCABEZADO_EVALUACIONES, _leer_tabla_evaluaciones, leer_evaluaciones,
+    preparar_juicios, separar_codigo_nombre
+)
+from benchmarks.generar_archivos import COMPETENCIAS_POR_PROGRAMA, RESULTADOS_POR_COMPETENCIA, generar_evaluaciones
+
+JUICIOS_POR_APRENDIZ = COMPETENCIAS_POR_PROGRAMA * RESULTADOS_POR_COMPETENCIA
+
+
+@pytest.fixture(scope="module")
+def ruta_evaluaciones(tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp("evaluaciones") / "evaluaciones.xlsx")
+    generar_evaluaciones(ruta, 2 * JUICIOS_POR_APRENDIZ, 2847248)
+    return ruta
+
+
+def test_separar_codigo_nombre():
+    serie = pd.Series(["220501046 - PROGRAMAR  ", "  38199 -ANALIZAR", "SIN CÓDIGO", None, 220501046], index=[5, 6, 7, 8, 9])
+    separado = separar_codigo_nombre(serie)
+    assert separado.index.tolist() == [5, 6, 7, 8, 9]
+    assert separado["codigo"].tolist()[:2] == [220501046, 38199]
+    assert separado["codigo"].isna().tolist() == [False, False, True, True, True]
+    assert separado["nombre"].tolist()[:2] == ["PROGRAMAR", "ANALIZAR"]
+
+
+def test_una_pasada_lee_ficha_y_tabla(ruta_evaluaciones):
+    ficha, tabla = _leer_tabla_evaluaciones(ruta_evaluaciones)
+    assert ficha == "2847248"
+    assert tabla.columns.tolist() == COLUMNAS_EVALUACIONES
+    assert len(tabla) == 2 * JUICIOS_POR_APRENDIZ
+    # El índice es el número de fila del Excel
+    assert tabla.index[0] == FILA_ENCABEZADO_EVALUACIONES + 1
+    assert tabla.iloc[0]["competencia"].startswith("220501000 - ")
+
+
+def test_leer_evaluaciones_extrae_catalogos_y_juicios(ruta_evaluaciones):
+    lectura = leer_evaluaciones(ruta_evaluaciones)
+    assert lectura["ficha_caracterizacion"] == "2847248"
+    assert len(lectura["df_competencias"]) == COMPETENCIAS_POR_PROGRAMA
+    assert len(lectura["df_resultados"]) == JUICIOS_POR_APRENDIZ
+    assert lectura["df_resultados"]["cod_resultado"].iloc[0] // 10 == lectura["df_resultados"]["cod_competencia"].iloc[0]
+    assert (lectura["df_competencias"]["horas"] == 0).all()
+
+    juicios = lectura["df_juicios"]
+    assert len(juicios) == 2 * JUICIOS_POR_APRENDIZ
+    assert (juicios["cod_ficha"] == 2847248).all()
+    assert juicios["numero_documento"].iloc[0] == "1000000000"
+
+
+def test_sin_encabezado(tmp_path):
+    libro = Workbook()
+    libro.active.append(["Reporte de Juicios Evaluativos"])
+    ruta = str(tmp_path / "vacio.xlsx")
+    libro.save(ruta)
+    with pytest.raises(ValueError, match=f"no tiene encabezado en la fila {FILA_ENCABEZADO_EVALUACIONES}"):
+        _leer_tabla_evaluaciones(ruta)
+
+
+def test_preparar_juicios_limpia_y_deduplica():
+    tabla = pd.DataFrame({
+        "tipo_documento": ["CC", "CC", "TI", "CC", "CC"],
+        "numero_documento": [10203040.0, 10203040.0, "A-55 ", None, 1],
+        "nombre": ["ANA", "ANA", "X" * 120, "SIN DOCUMENTO", "SIN RESULTADO"],
+        "apellidos": ["DÍAZ", "DÍAZ", None, None, None],
+        "estado": ["EN FORMACION"] * 5,
+        "competencia": ["220501000 - C"] * 5,
+        "resultado_aprendizaje": ["2205010000 - R", "2205010000 - R", "2205010001 - R", "2205010000 - R", "SIN CÓDIGO"],
+        "juicio_evaluacion": ["por evaluar", "aprobado", "APROBADO", "APROBADO", "APROBADO"],
+        "fecha_hora_juicio": ["2024-03-01 10:00:00", "2024-03-02 10:00:00", "no es fecha", None, None],
+        "funcionario_registro": [None] * 5
+    })
+    juicios = preparar_juicios(
+        tabla, separar_codigo_nombre(tabla["competencia"]), separar_codigo_nombre(tabla["resultado_aprendizaje"]), "2847248"
+    )
+    assert juicios.columns.tolist() == COLUMNAS_JUICIOS
+    # Sin documento o sin resultado la fila se descarta; el juicio repetido conserva la última fila
+    assert juicios["numero_documento"].tolist() == ["10203040", "A-55"]
+    primero, segundo = juicios.iloc[0], juicios.iloc[1]
+    assert (primero["cod_ficha"], primero["cod_resultado"], primero["juicio"]) == (2847248, 2205010000, "APROBADO")
+    assert primero["fecha_hora_juicio"] == pd.Timestamp("2024-03-02 10:00:00")
+    # Los textos se recortan al largo de la columna y las fechas inválidas quedan nulas
+    assert len(segundo["nombre_aprendiz"]) == 100
+    assert pd.isna(segundo["fecha_hora_juicio"])
+
+
+def test_preparar_juicios_sin_ficha():
+    tabla = pd.DataFrame(columns=COLUMNAS_EVALUACIONES)
+    vacio = separar_codigo_nombre(pd.Series([], dtype=object))
+    assert preparar_juicios(tabla, vacio, vacio, None).columns.tolist() == COLUMNAS_JUICIOS
@@ -0,0 +1,114 @@
+import pytest
+from fastapi import HTTPException
+from openpyxl import Workbook
+
+from app.api.cargar_archivos import _filtros_p04
+from app.schemas.users import UserOut
+from app.utils.excel import FILA_ENCABEZADO_P04, FiltroFilas, leer_excel_por_lotes, leer_p04_por_lotes
+from benchmarks.generar_archivos import generar_fichas, generar_p04
+
+
+@pytest.fixture(scope="module")
+def fichas():
+    return generar_fichas(25)
+
+
+@pytest.fixture(scope="module")
+def ruta_p04(tmp_path_factory, fichas):
+    ruta = str(tmp_path_factory.mktemp("excel") / "p04.xlsx")
+    generar_p04(ruta, fichas)
+    return ruta
+
+
+def _libro(tmp_path, filas) -> str:
+    libro = Workbook()
+    for fila in filas:
+        libro.active.append(fila)
+    ruta = str(tmp_path / "libro.xlsx")
+    libro.save(ruta)
+    return ruta
+
+
+def test_p04_por_lotes_acotados(ruta_p04, fichas):
+    lotes = list(leer_p04_por_lotes(ruta_p04, chunk_size=10))
+    assert [len(lote) for lote in lotes] == [10, 10, 5]
+    # El índice es el número de fila del Excel, continuo entre lotes
+    assert lotes[0].index[0] == FILA_ENCABEZADO_P04 + 1
+    assert lotes[-1].index[-1] == FILA_ENCABEZADO_P04 + len(fichas)
+
+    primera = lotes[0].iloc[0]
+    assert primera["cod_ficha"] == fichas[0]["cod_ficha"]
+    assert primera["cod_centro"] == fichas[0]["cod_centro"]
+    assert primera["fecha_inicio"] == fichas[0]["fecha_inicio"]
+    assert primera["hora_inicio"] == "00:00:00"
+    assert [int(f) for lote in lotes for f in lote["cod_ficha"]] == [f["cod_ficha"] for f in fichas]
+
+
+def test_solo_columnas_pedidas_y_sin_filas_vacias(tmp_path):
+    ruta = _libro(tmp_path, [
+        ["Título"],
+        ["B", "A", "IGNORADA"],
+        [2, 1, "x"],
+        [None, None, "solo ignorada"],
+        [],
+        [4, "", None],
+        [6, 5, None],
+    ])
+    lotes = list(leer_excel_por_lotes(ruta, 2, ["A", "B"], chunk_size=2))
+    assert [lote.index.tolist() for lote in lotes] == [[3, 6], [7]]
+    assert lotes[0].columns.tolist() == ["A", "B"]
+    assert lotes[0].loc[3].tolist() == [1, 2]
+    assert lotes[1].loc[7].tolist() == [5, 6]
+
+
+def test_columnas_faltantes(tmp_path):
+    ruta = _libro(tmp_path, [["A", "B"], [1, 2]])
+    with pytest.raises(ValueError, match=r"Columnas no encontradas en el archivo: \['C'\]"):
+        next(leer_excel_por_lotes(ruta, 1, ["A", "C"]))
+
+
+def test_sin_encabezado(tmp_path):
+    ruta = _libro(tmp_path, [["A"]])
+    with pytest.raises(ValueError, match="no tiene encabezado en la fila 5"):
+        next(leer_excel_por_lotes(ruta, 5, ["A"]))
+
+
+
+@pytest.mark.parametrize("valor, conservada", [(9101, True), (9101.0, True), (" 9101 ", True), (9102, False), (None, False), ("x", False)])
+def test_filtro_acepta_codigos_numericos_o_en_texto(valor, conservada):
+    filtro = FiltroFilas({"CODIGO_CENTRO": [9101]})
+    assert filtro.conserva({"CODIGO_CENTRO": valor}) is conservada
+    assert filtro.filas_omitidas == (0 if conservada else 1)
+
+
+def test_filtro_por_centro_al_leer(ruta_p04, fichas):
+    centros = {fichas[0]["cod_centro"], fichas[1]["cod_centro"]}
+    filtro = FiltroFilas({"CODIGO_CENTRO": centros})
+    lotes = list(leer_p04_por_lotes(ruta_p04, chunk_size=10, filtro=filtro))
+
+    esperadas = [f["cod_ficha"] for f in fichas if f["cod_centro"] in centros]
+    assert [int(f) for lote in lotes for f in lote["cod_ficha"]] == esperadas
+    assert set(int(c) for lote in lotes for c in lote["cod_centro"]) == centros
+    assert filtro.filas_omitidas == len(fichas) - len(esperadas)
+
+
+def test_filtro_con_columna_inexistente(ruta_p04):
+    with pytest.raises(ValueError, match="CODIGO_INEXISTENTE"):
+        next(leer_p04_por_lotes(ruta_p04, filtro=FiltroFilas({"CODIGO_INEXISTENTE": [1]})))
+
+
+def _usuario(id_rol: int) -> UserOut:
+    return UserOut(
+        id_usuario=7, nombre_completo="Usuario de prueba", identificacion="1000000", id_rol=id_rol,
+        correo="prueba@sena.edu.co", tipo_contrato="planta", telefono="3000000", estado=True, cod_centro=9101
+    )
+
+
+def test_filtros_p04_por_rol():
+    assert _filtros_p04(_usuario(2), None, None) == {"CODIGO_CENTRO": [9101]}
+    assert _filtros_p04(_usuario(2), 9101, None) == {"CODIGO_CENTRO": [9101]}
+    with pytest.raises(HTTPException) as error:
+        _filtros_p04(_usuario(2), 9102, None)
+    assert error.value.status_code == 403
+    assert _filtros_p04(_usuario(1), None, None) is None
+    assert _filtros_p04(_usuario(1), 9102, 5) == {"CODIGO_CENTRO": [9102], "CODIGO_REGIONAL": [5]}
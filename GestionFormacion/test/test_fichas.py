@@ -0,0 +1,56 @@
+import pytest
+
+from app.utils import fichas
+from app.utils.fichas import ResolutorFichas, invalidar_resolutor_fichas, obtener_resolutor_fichas
+from core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def sin_resolutor_compartido():
+    invalidar_resolutor_fichas()
+    yield
+    invalidar_resolutor_fichas()
+
+
+def test_resolver_consulta_las_faltantes_juntas():
+    consultas = []
+
+    def cargar_faltantes(faltantes):
+        consultas.append(faltantes)
+        return {ficha: (228106, 2) for ficha in faltantes if ficha != 3}
+
+    resolutor = ResolutorFichas({1: (228106, 1)})
+    assert resolutor.resolver([1, 2, 3, None, "2"], cargar_faltantes) == {1: (228106, 1), 2: (228106, 2)}
+    assert consultas == [[2, 3]]
+    # La ficha 2 quedó en el mapa; la 3 no existe y se vuelve a consultar
+    assert resolutor.resolver([2, 3], cargar_faltantes) == {2: (228106, 2)}
+    assert consultas == [[2, 3], [3]]
+    assert len(resolutor) == 2
+
+
+def test_resolver_sin_cargar_faltantes():
+    assert ResolutorFichas({1: (228106, 1)}).resolver([1, 2]) == {1: (228106, 1)}
+
+
+def test_resolutor_compartido_se_recarga_al_vencer_o_invalidar(monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_FICHAS_CACHE_SEGUNDOS", 60)
+    ahora = [1000.0]
+    monkeypatch.setattr(fichas.time, "monotonic", lambda: ahora[0])
+    cargas = []
+
+    def cargar_todo():
+        cargas.append(1)
+        return {1: (228106, len(cargas))}
+
+    primero = obtener_resolutor_fichas(cargar_todo)
+    assert obtener_resolutor_fichas(cargar_todo) is primero
+    ahora[0] += 60
+    assert obtener_resolutor_fichas(cargar_todo).resolver([1]) == {1: (228106, 2)}
+    invalidar_resolutor_fichas()
+    obtener_resolutor_fichas(cargar_todo)
+    assert len(cargas) == 3
+
+
+def test_sin_cache_cada_importacion_carga_su_mapa(monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_FICHAS_CACHE_SEGUNDOS", 0)
+    assert obtener_resolutor_fichas(dict) is not obtener_resolutor_fichas(dict)
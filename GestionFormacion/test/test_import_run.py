@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+import pytest
+
+from app.api import cargar_archivos
+from app.utils.archivos import ArchivoTemporal, con_variante
+from benchmarks.sesion_simulada import SesionSimulada
+from core.config import settings
+
+
+def test_con_variante():
+    archivo = ArchivoTemporal("/tmp/x.xlsx", "a" * 64, 10, "p04.xlsx")
+    assert con_variante(archivo, None) is archivo
+    centro = con_variante(archivo, '{"CODIGO_CENTRO": [9101]}')
+    assert centro.sha256 != archivo.sha256
+    assert centro.sha256 == con_variante(archivo, '{"CODIGO_CENTRO": [9101]}').sha256
+    assert centro.sha256 != con_variante(archivo, '{"CODIGO_CENTRO": [9102]}').sha256
+    assert centro._replace(sha256=archivo.sha256) == archivo
+
+
+@pytest.fixture
+def carga(tmp_path, monkeypatch):
+    """Archivo temporal de prueba, historial de cargas simulado y registro de lo procesado."""
+    monkeypatch.setattr(cargar_archivos, "SessionLocal", SesionSimulada)
+    estado = {"consultas": [], "procesados": [], "previa": None, "ruta": str(tmp_path / "ingesta.xlsx")}
+
+    def obtener_archivo():
+        with open(estado["ruta"], "wb") as archivo:
+            archivo.write(b"contenido")
+        return ArchivoTemporal(estado["ruta"], "b" * 64, 9, "p04.xlsx")
+
+    def get_importacion_previa(db, tipo, sha256):
+        estado["consultas"].append((tipo, sha256))
+        return estado["previa"]
+
+    def procesar(db, ruta, progreso):
+        estado["procesados"].append(ruta)
+        return {"errores": []}
+
+    monkeypatch.setattr(cargar_archivos.crud_import_run, "get_importacion_previa", get_importacion_previa)
+    estado["ejecutar"] = lambda **opciones: asyncio.run(cargar_archivos._ejecutar_carga(
+        obtener_archivo, "p04", procesar, SesionSimulada(), asincrono=False, **opciones
+    ))
+    return estado
+
+
+def _cupos_libres() -> int:
+    libres = 0
+    while cargar_archivos.reservar_cupo():
+        libres += 1
+    for _ in range(libres):
+        cargar_archivos.liberar_cupo()
+    return libres
+
+
+def test_archivo_ya_importado_no_se_procesa(carga):
+    carga["previa"] = {"id_import": 41, "fecha_fin": None, "resultado": {"grupos_procesados": 3}}
+    resultado = carga["ejecutar"]()
+
+    assert resultado["archivo_duplicado"] is True
+    assert (resultado["id_import"], resultado["grupos_procesados"]) == (41, 3)
+    assert carga["consultas"] == [("p04", "b" * 64)]
+    assert carga["procesados"] == []
+    assert not os.path.exists(carga["ruta"])
+    assert _cupos_libres() == settings.INGESTA_MAX_TRABAJOS
+
+
+def test_force_procesa_sin_consultar_el_historial(carga):
+    carga["previa"] = {"id_import": 41, "fecha_fin": None, "resultado": {}}
+    resultado = carga["ejecutar"](force=True)
+
+    assert "archivo_duplicado" not in resultado
+    assert carga["consultas"] == []
+    assert carga["procesados"] == [carga["ruta"]]
+    assert not os.path.exists(carga["ruta"])
+    assert _cupos_libres() == settings.INGESTA_MAX_TRABAJOS
+
+
+def test_filtro_cambia_la_huella_buscada(carga):
+    carga["ejecutar"](filtros={"CODIGO_CENTRO": [9101]})
+    (_, huella), = carga["consultas"]
+    assert huella != "b" * 64
+    assert carga["procesados"] == [carga["ruta"]]
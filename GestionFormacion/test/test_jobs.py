@@ -0,0 +1,28 @@
+from core.jobs import ProgresoIngesta
+
+
+def test_cerrar_etapa_suma_la_etapa_abierta():
+    progreso = ProgresoIngesta("evaluaciones")
+    progreso.iniciar()
+    progreso.marcar_etapa("lectura")
+    progreso.marcar_etapa("escritura")
+    assert set(progreso.resumen()["tiempos_etapas"]) == {"lectura"}
+
+    progreso.cerrar_etapa()
+    assert set(progreso.resumen()["tiempos_etapas"]) == {"lectura", "escritura"}
+
+    # Cerrar de nuevo (como hace finalizar) no vuelve a sumar la etapa
+    escritura = progreso.tiempos_etapas["escritura"]
+    progreso.finalizar({"errores": []})
+    assert progreso.tiempos_etapas["escritura"] == escritura
+    assert progreso.estado == "completado"
+
+
+def test_etapa_acumula_repeticiones():
+    progreso = ProgresoIngesta("p04")
+    for _ in range(3):
+        with progreso.etapa("lectura"):
+            pass
+    progreso.finalizar()
+    assert list(progreso.tiempos_etapas) == ["lectura"]
+    assert progreso.etapa_actual is None
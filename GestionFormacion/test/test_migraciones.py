@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import create_engine, event
+
+from core.migraciones import (
+    DIRECTORIO_MIGRACIONES, aplicar_migraciones, estado_migraciones, migraciones_disponibles, sentencias_sql
+)
+
+
+def test_sentencias_sql_omite_comentarios_y_separa_por_fin_de_linea():
+    contenido = """
+-- Comentario con ; al final;
+CREATE TABLE a (x INT);
+  -- comentario indentado
+INSERT INTO a VALUES (1);   
+INSERT INTO a (x) SELECT 2 WHERE 'a;b' <> ''
+"""
+    assert sentencias_sql(contenido) == [
+        "CREATE TABLE a (x INT)",
+        "INSERT INTO a VALUES (1)",
+        "INSERT INTO a (x) SELECT 2 WHERE 'a;b' <> ''",
+    ]
+
+
+def test_migraciones_disponibles_en_orden(tmp_path):
+    (tmp_path / "0002_segunda.sql").write_text("SELECT 2;", encoding="utf-8")
+    (tmp_path / "0001_primera.sql").write_text("SELECT 1;", encoding="utf-8")
+    (tmp_path / "notas.txt").write_text("no es una migración", encoding="utf-8")
+    (tmp_path / "3_sin_ceros.sql").write_text("SELECT 3;", encoding="utf-8")
+
+    migraciones = migraciones_disponibles(str(tmp_path))
+    assert [(m.version, m.nombre) for m in migraciones] == [(1, "primera"), (2, "segunda")]
+    assert all(len(m.checksum) == 64 for m in migraciones)
+
+
+def test_version_repetida(tmp_path):
+    (tmp_path / "0001_a.sql").write_text("SELECT 1;", encoding="utf-8")
+    (tmp_path / "0001_b.sql").write_text("SELECT 1;", encoding="utf-8")
+    with pytest.raises(ValueError, match="repetida"):
+        migraciones_disponibles(str(tmp_path))
+
+
+def test_migraciones_del_repositorio():
+    migraciones = migraciones_disponibles(DIRECTORIO_MIGRACIONES)
+    assert [m.version for m in migraciones] == list(range(1, len(migraciones) + 1))
+    for migracion in migraciones:
+        with open(migracion.ruta, encoding="utf-8") as archivo:
+            assert sentencias_sql(archivo.read()), migracion.nombre
+
+
+def test_tablas_de_las_migraciones_no_chocan_con_init_sql():
+    # db/init.sql ya crea estas tablas en una instalación nueva: la migración no debe fallar allí
+    for migracion in migraciones_disponibles(DIRECTORIO_MIGRACIONES):
+        with open(migracion.ruta, encoding="utf-8") as archivo:
+            for sentencia in sentencias_sql(archivo.read()):
+                if sentencia.upper().startswith("CREATE TABLE"):
+                    assert sentencia.upper().startswith("CREATE TABLE IF NOT EXISTS"), migracion.nombre
+
+
+@pytest.fixture
+def engine():
+    """SQLite en memoria con GET_LOCK/RELEASE_LOCK, que las migraciones toman en MariaDB."""
+    motor = create_engine("sqlite://")
+
+    @event.listens_for(motor, "connect")
+    def _funciones_de_bloqueo(conexion_dbapi, _registro):
+        conexion_dbapi.create_function("GET_LOCK", 2, lambda nombre, espera: 1)
+        conexion_dbapi.create_function("RELEASE_LOCK", 1, lambda nombre: 1)
+
+    return motor
+
+
+def test_aplicar_una_sola_vez(tmp_path, engine):
+    (tmp_path / "0001_tabla.sql").write_text("CREATE TABLE a (x INT);\nINSERT INTO a VALUES (1);", encoding="utf-8")
+    (tmp_path / "0002_fila.sql").write_text("INSERT INTO a VALUES (2);", encoding="utf-8")
+
+    assert aplicar_migraciones(engine, hasta=1, directorio=str(tmp_path)) == [1]
+    assert aplicar_migraciones(engine, directorio=str(tmp_path)) == [2]
+    assert aplicar_migraciones(engine, directorio=str(tmp_path)) == []
+
+    with engine.connect() as conexion:
+        assert conexion.exec_driver_sql("SELECT x FROM a ORDER BY x").scalars().all() == [1, 2]
+    estado = estado_migraciones(engine, str(tmp_path))
+    assert all(m["fecha_aplicada"] is not None and not m["modificada"] for m in estado)
+
+
+def test_migracion_modificada_despues_de_aplicarse(tmp_path, engine):
+    ruta = tmp_path / "0001_tabla.sql"
+    ruta.write_text("CREATE TABLE a (x INT);", encoding="utf-8")
+    aplicar_migraciones(engine, directorio=str(tmp_path))
+    ruta.write_text("CREATE TABLE a (x INT, y INT);", encoding="utf-8")
+
+    assert aplicar_migraciones(engine, directorio=str(tmp_path)) == []
+    assert estado_migraciones(engine, str(tmp_path))[0]["modificada"] is True
+
+
+def test_migracion_fallida_no_queda_registrada(tmp_path, engine):
+    (tmp_path / "0001_mala.sql").write_text("CREATE TABLA a (x INT);", encoding="utf-8")
+    with pytest.raises(Exception):
+        aplicar_migraciones(engine, directorio=str(tmp_path))
+    assert estado_migraciones(engine, str(tmp_path))[0]["fecha_aplicada"] is None
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from app.utils import subidas
+from core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def directorios(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_DIR_SUBIDAS", str(tmp_path / "subidas"))
+    monkeypatch.setattr(settings, "INGESTA_DIR_TEMPORAL", str(tmp_path / "temporal"))
+    os.makedirs(settings.INGESTA_DIR_SUBIDAS)
+
+
+def _subir(contenido: bytes, tamano_parte: int, sha256=None, partes=None) -> str:
+    meta = subidas.crear_subida("p04", "reporte.xlsx", len(contenido), 7, tamano_parte=tamano_parte, sha256=sha256)
+    id_subida = meta["id_subida"]
+    for numero in (range(meta["total_partes"]) if partes is None else partes):
+        inicio, largo = subidas.rango_parte(meta, numero)
+        with subidas.abrir_datos(id_subida) as datos:
+            datos.seek(inicio)
+            datos.write(contenido[inicio:inicio + largo])
+        subidas.marcar_parte_recibida(id_subida, numero)
+    return id_subida
+
+
+def test_partes_y_rangos():
+    meta = {"tamano_bytes": 10, "tamano_parte": 4}
+    assert subidas.total_partes(meta) == 3
+    assert subidas.rango_parte(meta, 2) == (8, 2)
+    with pytest.raises(ValueError):
+        subidas.rango_parte(meta, 3)
+
+
+@pytest.mark.parametrize("tamano", [0, -1])
+def test_tamano_invalido(tamano):
+    with pytest.raises(ValueError):
+        subidas.crear_subida("p04", "a.xlsx", tamano, 1)
+
+
+def test_tamano_maximo(monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_MAX_TAMANO_BYTES", 5)
+    with pytest.raises(ValueError, match="tamaño máximo"):
+        subidas.crear_subida("p04", "a.xlsx", 6, 1)
+
+
+def test_identificador_invalido():
+    # El id no puede salir de INGESTA_DIR_SUBIDAS; para la API es una subida inexistente
+    with pytest.raises(ValueError):
+        subidas.abrir_datos("../otro")
+    assert subidas.obtener_subida("../otro") is None
+
+
+def test_estado_con_partes_fuera_de_orden():
+    id_subida = _subir(b"0123456789", 4, partes=[2, 0])
+    estado = subidas.estado_subida(id_subida)
+    assert estado["partes_recibidas"] == [0, 2]
+    assert estado["partes_faltantes"] == [1]
+    assert estado["rangos_recibidos"] == [[0, 4], [8, 10]]
+    assert estado["bytes_recibidos"] == 6
+    assert not estado["completa"]
+
+
+def test_parte_reescrita_vuelve_a_faltar():
+    # Mientras se reescribe una parte su marca se borra: si el cliente se corta, se vuelve a pedir
+    id_subida = _subir(b"0123456789", 4)
+    subidas.marcar_parte_recibida(id_subida, 1, recibida=False)
+    estado = subidas.estado_subida(id_subida)
+    assert estado["partes_faltantes"] == [1]
+    assert estado["rangos_recibidos"] == [[0, 4], [8, 10]]
+    subidas.marcar_parte_recibida(id_subida, 1, recibida=False)
+    assert not subidas.estado_subida(id_subida)["completa"]
+
+
+def test_ensamblar_incompleta():
+    id_subida = _subir(b"0123456789", 4, partes=[0])
+    with pytest.raises(ValueError, match="Faltan partes"):
+        subidas.ensamblar_subida(id_subida)
+
+
+def test_ensamblar_sha256_distinto():
+    id_subida = _subir(b"0123456789", 4, sha256="0" * 64)
+    with pytest.raises(ValueError, match="SHA-256"):
+        subidas.ensamblar_subida(id_subida)
+    # La subida sigue disponible para reenviar las partes
+    assert subidas.obtener_subida(id_subida) is not None
+
+
+def test_ensamblar_y_conservar():
+    contenido = b"0123456789"
+    sha256 = hashlib.sha256(contenido).hexdigest()
+    id_subida = _subir(contenido, 4, sha256=sha256.upper())
+
+    archivo = subidas.ensamblar_subida(id_subida, conservar=True)
+    with open(archivo.ruta, "rb") as ensamblado:
+        assert ensamblado.read() == contenido
+    assert (archivo.sha256, archivo.tamano_bytes, archivo.nombre_archivo) == (sha256, 10, "reporte.xlsx")
+    assert subidas.estado_subida(id_subida)["completa"]
+
+    # Borrar el temporal no afecta a la subida conservada
+    os.remove(archivo.ruta)
+    assert subidas.ensamblar_subida(id_subida, conservar=True).sha256 == sha256
+
+
+def test_ensamblar_sin_conservar_borra_la_subida():
+    id_subida = _subir(b"0123456789", 4)
+    archivo = subidas.ensamblar_subida(id_subida)
+    assert os.path.exists(archivo.ruta)
+    assert subidas.obtener_subida(id_subida) is None
+    with pytest.raises(FileNotFoundError):
+        subidas.ensamblar_subida(id_subida)
+
+
+def _envejecer(id_subida: str, horas: float):
+    directorio = os.path.join(settings.INGESTA_DIR_SUBIDAS, id_subida)
+    instante = time.time() - horas * 3600
+    for ruta in (directorio, os.path.join(directorio, subidas.ARCHIVO_METADATOS)):
+        os.utime(ruta, (instante, instante))
+
+
+def test_depurar_subidas_abandonadas(monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_SUBIDAS_TTL_HORAS", 24)
+    abandonada = _subir(b"0123456789", 4, partes=[0])
+    reciente = _subir(b"0123456789", 4, partes=[0])
+    _envejecer(abandonada, 25)
+
+    subidas._depurar_subidas()
+    assert subidas.obtener_subida(abandonada) is None
+    assert subidas.obtener_subida(reciente) is not None
+
+
+def test_depurar_respeta_subidas_con_partes_recientes(monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_SUBIDAS_TTL_HORAS", 24)
+    id_subida = _subir(b"0123456789", 4, partes=[0])
+    _envejecer(id_subida, 25)
+
+    # Una parte nueva de una subida larga que sigue en curso
+    subidas.marcar_parte_recibida(id_subida, 1)
+    os.utime(os.path.join(settings.INGESTA_DIR_SUBIDAS, id_subida), (0, 0))
+
+    subidas._depurar_subidas()
+    assert subidas.estado_subida(id_subida)["partes_recibidas"] == [0, 1]
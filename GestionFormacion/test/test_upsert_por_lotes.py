@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.crud.cargar_archivos import upsert_por_lotes
+from benchmarks.sesion_simulada import SesionSimulada, _ResultadoSimulado
+
+COLUMNAS = ("cod_centro", "nombre_centro")
+
+
+class SesionConSavepoints(SesionSimulada):
+    """SesionSimulada que registra cada SAVEPOINT y permite fijar rowcount o fallar por lote."""
+
+    def __init__(self, rowcounts=None, fallar_en=()):
+        super().__init__()
+        self.rowcounts = list(rowcounts or [])
+        self.fallar_en = set(fallar_en)
+        self.lotes = []
+        self.savepoints = []
+
+    def execute(self, sentencia, parametros=None):
+        resultado = super().execute(sentencia, parametros)
+        numero = len(self.lotes)
+        self.lotes.append((str(sentencia), parametros))
+        if numero in self.fallar_en:
+            raise OperationalError(str(sentencia), parametros, Exception(f"lote {numero} rechazado"))
+        if self.rowcounts:
+            return _ResultadoSimulado(self.rowcounts.pop(0))
+        return resultado
+
+    @contextmanager
+    def begin_nested(self):
+        savepoint = {"lote": len(self.lotes), "revertido": False}
+        self.savepoints.append(savepoint)
+        try:
+            yield
+        except Exception:
+            savepoint["revertido"] = True
+            raise
+
+
+def _centros(cantidad: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "cod_centro": range(1, cantidad + 1),
+        "nombre_centro": [f"CENTRO {i}" for i in range(1, cantidad + 1)]
+    })
+
+
+def test_una_sentencia_multifila_y_un_savepoint_por_lote():
+    db = SesionConSavepoints()
+    resultado = upsert_por_lotes(db, "centro_formacion", COLUMNAS, _centros(5), ["nombre_centro"], chunk_size=2)
+
+    assert [len(parametros) for _, parametros in db.lotes] == [4, 4, 2]
+    sentencia, parametros = db.lotes[0]
+    sentencia = " ".join(sentencia.split())
+    assert "VALUES (:cod_centro_0, :nombre_centro_0), (:cod_centro_1, :nombre_centro_1)" in sentencia
+    assert "ON DUPLICATE KEY UPDATE nombre_centro = VALUES(nombre_centro)" in sentencia
+    assert parametros == {"cod_centro_0": 1, "nombre_centro_0": "CENTRO 1", "cod_centro_1": 2, "nombre_centro_1": "CENTRO 2"}
+    assert [savepoint["lote"] for savepoint in db.savepoints] == [0, 1, 2]
+    assert db.commits == 0
+    assert resultado == {"insertados": 5, "actualizados": 0, "errores": []}
+
+
+@pytest.mark.parametrize("rowcount, insertados, actualizados", [
+    (3, 3, 0),   # todas nuevas o sin cambios
+    (5, 1, 2),   # dos modificadas (cuentan 2 cada una)
+    (6, 0, 3),   # todas modificadas
+    (9, 0, 3),   # rowcount inesperado: nunca más actualizadas que filas
+    (0, 3, 0),   # rowcount menor que el lote
+    (-1, 3, 0),  # rowcount desconocido
+])
+def test_conteo_a_partir_de_rowcount(rowcount, insertados, actualizados):
+    db = SesionConSavepoints(rowcounts=[rowcount])
+    resultado = upsert_por_lotes(db, "centro_formacion", COLUMNAS, _centros(3), ["nombre_centro"], chunk_size=10)
+    assert (resultado["insertados"], resultado["actualizados"]) == (insertados, actualizados)
+
+
+def test_insert_ignore_cuenta_solo_las_insertadas():
+    db = SesionConSavepoints(rowcounts=[1])
+    resultado = upsert_por_lotes(db, "centro_formacion", COLUMNAS, _centros(3), ignorar_duplicados=True)
+    assert db.lotes[0][0].startswith("INSERT IGNORE INTO centro_formacion")
+    assert (resultado["insertados"], resultado["actualizados"]) == (1, 0)
+
+
+def test_lote_fallido_se_revierte_y_la_carga_continua():
+    df = _centros(5)
+    df.index = range(10, 15)
+    db = SesionConSavepoints(fallar_en={1})
+    resultado = upsert_por_lotes(db, "centro_formacion", COLUMNAS, df, ["nombre_centro"], chunk_size=2, descripcion="centros")
+
+    assert [savepoint["revertido"] for savepoint in db.savepoints] == [False, True, False]
+    assert (resultado["insertados"], resultado["actualizados"]) == (3, 0)
+    assert len(resultado["errores"]) == 1
+    # El mensaje trae los índices del DataFrame y el error del driver, no la sentencia completa
+    assert resultado["errores"][0] == "Error al insertar centros (índices 12 a 13, 2 filas): lote 1 rechazado"
@@ -0,0 +1,127 @@
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from app.utils import validacion
+from app.utils.excel import FILA_ENCABEZADO_DF14
+from app.utils.validacion import (
+    SEVERIDAD_ADVERTENCIA, AcumuladorValidacion, regla_entero, regla_fecha, regla_longitud, regla_obligatoria,
+    validar_df14, validar_evaluaciones_lote, validar_p04
+)
+from benchmarks.generar_archivos import FICHA_INICIAL, generar_df14, generar_evaluaciones, generar_fichas, generar_p04
+from core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def directorio_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTA_DIR_TEMPORAL", str(tmp_path / "temporal"))
+    os.makedirs(settings.INGESTA_DIR_TEMPORAL)
+
+
+@pytest.fixture(scope="module")
+def fichas():
+    return generar_fichas(25)
+
+
+def _incumple(regla, valores) -> list:
+    df = pd.DataFrame({"col": valores}, index=range(2, 2 + len(valores)))
+    return pd.Series(regla.verificar(df), index=df.index).tolist()
+
+
+def test_regla_obligatoria_trata_espacios_como_vacio():
+    assert _incumple(regla_obligatoria("col", "grupo.responsable"), ["ANA", "  ", None, ""]) == [False, True, True, True]
+
+
+def test_regla_longitud_ignora_espacios_y_nulos():
+    assert _incumple(regla_longitud("col", "grupo.jornada", 3), ["abc", " abc ", "abcd", None]) == [False, False, True, False]
+
+
+def test_regla_entero():
+    valores = [12, "12", 1.5, "x", 2147483648, None]
+    assert _incumple(regla_entero("col", "grupo.cod_ficha"), valores) == [False, False, True, True, True, False]
+
+
+def test_regla_fecha():
+    assert _incumple(regla_fecha("col", "grupo.fecha_inicio"), ["01/02/2024", "31/02/2024", "2024-02-01", None]) == [False, True, True, False]
+
+
+def test_acumulador_entre_lotes(monkeypatch):
+    monkeypatch.setattr(validacion, "MUESTRA_FILAS", 2)
+    monkeypatch.setattr(validacion, "MAX_FILAS_CSV", 3)
+    acumulador = AcumuladorValidacion([
+        regla_obligatoria("a", "tabla.a"),
+        regla_longitud("b", "tabla.b", 2, SEVERIDAD_ADVERTENCIA)
+    ])
+    acumulador.evaluar(pd.DataFrame({"a": [None, "x", None], "b": ["ok", "largo", "largo"]}, index=[6, 7, 8]))
+    acumulador.evaluar(pd.DataFrame({"a": [None, "y"], "b": ["ok", "ok"]}, index=[9, 10]))
+
+    resumen = acumulador.resumen()
+    assert (resumen["filas_validadas"], resumen["filas_rechazadas"], resumen["filas_con_advertencias"]) == (5, 3, 1)
+    assert resumen["filas_validas"] == 2
+    assert resumen["reglas"][0] == {
+        "regla": "obligatorio:tabla.a", "descripcion": resumen["reglas"][0]["descripcion"],
+        "severidad": "error", "filas": 3, "muestra_filas": [6, 8]
+    }
+    assert resumen["reglas"][1]["filas"] == 2
+    assert resumen["mensaje"] == "El archivo tiene filas que no cumplen las restricciones de la base de datos"
+
+    # Las observaciones se cortan en MAX_FILAS_CSV y conservan el número de fila del Excel
+    observaciones = acumulador.observaciones()
+    assert resumen["csv_truncado"] is True
+    assert observaciones.index.tolist() == [6, 7, 8]
+    assert observaciones.loc[8, "reglas"] == "obligatorio:tabla.a;longitud:tabla.b"
+    assert observaciones["rechazada"].tolist() == [True, False, True]
+
+
+def test_validar_p04_generado(tmp_path, fichas):
+    ruta = str(tmp_path / "p04.xlsx")
+    generar_p04(ruta, fichas)
+    # Sin centros ni regionales en la base de datos: cada fila trae los datos para crearlos
+    resumen, observaciones = validar_p04(ruta, {"centros": set(), "regionales": set()})
+    assert resumen["filas_validadas"] == len(fichas)
+    assert resumen["filas_rechazadas"] == 0
+    assert len(observaciones) == 0
+
+    centro = fichas[0]["cod_centro"]
+    resumen, _ = validar_p04(ruta, {"centros": set(), "regionales": set()}, filtros={"CODIGO_CENTRO": [centro]})
+    assert resumen["filas_validadas"] == sum(f["cod_centro"] == centro for f in fichas)
+    assert resumen["filas_omitidas_por_filtro"] == len(fichas) - resumen["filas_validadas"]
+
+
+def test_validar_df14_advierte_fichas_sin_datos_grupo(tmp_path, fichas):
+    ruta = str(tmp_path / "df14.xlsx")
+    generar_df14(ruta, fichas)
+    programas = {(f["cod_programa"], f["la_version"]) for f in fichas}
+    resumen, observaciones = validar_df14(ruta, {"programas": programas, "fichas_datos_grupo": {FICHA_INICIAL}})
+    assert resumen["filas_rechazadas"] == 0
+    assert [regla["regla"] for regla in resumen["reglas"]] == ["fk:datos_grupo.cod_ficha"]
+    assert resumen["filas_con_advertencias"] == len(fichas) - 1
+    assert resumen["mensaje"] == "El archivo se puede cargar, con advertencias"
+    # La primera ficha (fila siguiente al encabezado) sí existe: la primera observación es la de la fila de después
+    assert observaciones.index[0] == FILA_ENCABEZADO_DF14 + 2
+
+
+def test_lote_evaluaciones_valida_cada_libro(tmp_path):
+    generar_evaluaciones(str(tmp_path / "a.xlsx"), 12, 1000001)
+    generar_evaluaciones(str(tmp_path / "b.xlsx"), 8, 1000002)
+    (tmp_path / "danado.xlsx").write_bytes(b"no es un libro")
+    ruta = str(tmp_path / "lote.zip")
+    with zipfile.ZipFile(ruta, "w") as lote:
+        for nombre in ("a.xlsx", "b.xlsx", "danado.xlsx"):
+            lote.write(tmp_path / nombre, nombre)
+
+    resumen, observaciones = validar_evaluaciones_lote(ruta, {"fichas_grupo": {1000001}})
+
+    assert resumen["archivos_recibidos"] == 3
+    assert resumen["archivos_con_error"] == 1
+    assert resumen["filas_validadas"] == 20
+    # La ficha de b.xlsx no existe en grupo: se rechazan todas sus filas
+    assert resumen["filas_rechazadas"] == 8
+    por_archivo = {archivo["archivo"]: archivo for archivo in resumen["archivos"]}
+    assert por_archivo["a.xlsx"]["filas_rechazadas"] == 0
+    assert [regla["regla"] for regla in por_archivo["b.xlsx"]["reglas"]] == ["fk:juicio_evaluacion.cod_ficha"]
+    assert "error" in por_archivo["danado.xlsx"]
+    assert set(observaciones["archivo"]) == {"b.xlsx"}
+    assert os.listdir(settings.INGESTA_DIR_TEMPORAL) == []
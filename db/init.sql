@@ -2,6 +2,8 @@
 -- Script de inicialización para Docker
 -- Se ejecuta automáticamente al crear el contenedor
 -- La base de datos ya está creada por MARIADB_DATABASE
+-- Los cambios posteriores al esquema van en GestionFormacion/migraciones/
+-- y el backend los aplica al iniciar (core/migraciones.py)
 -- ======================================================
 
 USE gestion_formacion;
@@ -83,6 +85,7 @@ CREATE TABLE IF NOT EXISTS programa_competencia (
     cod_programa INT NOT NULL, 
     la_version INT NOT NULL,
     cod_competencia INT NOT NULL,
+    UNIQUE KEY uq_programa_competencia (cod_programa, la_version, cod_competencia),
     CONSTRAINT fk_pc_programa FOREIGN KEY (cod_programa, la_version) REFERENCES programa_formacion(cod_programa, la_version),
     CONSTRAINT fk_pc_competencia FOREIGN KEY (cod_competencia) REFERENCES competencia(cod_competencia)
 );
@@ -183,6 +186,45 @@ CREATE TABLE IF NOT EXISTS notificacion (
     CONSTRAINT fk_notificacion_usuario FOREIGN KEY (id_usuario) REFERENCES usuario(id_usuario)
 );
 
+-- Table for Evaluation Judgements (Juicios Evaluativos por aprendiz)
+CREATE TABLE IF NOT EXISTS juicio_evaluacion (
+    id_juicio INT AUTO_INCREMENT PRIMARY KEY,
+    cod_ficha INT NOT NULL,
+    tipo_documento VARCHAR(10),
+    numero_documento VARCHAR(20) NOT NULL,
+    nombre_aprendiz VARCHAR(100),
+    apellidos_aprendiz VARCHAR(100),
+    estado_aprendiz VARCHAR(50),
+    cod_competencia INT NOT NULL,
+    cod_resultado INT NOT NULL,
+    juicio VARCHAR(30),
+    fecha_hora_juicio DATETIME,
+    funcionario_registro VARCHAR(150),
+    UNIQUE KEY uq_juicio_ficha_aprendiz_resultado (cod_ficha, numero_documento, cod_resultado),
+    KEY idx_juicio_competencia (cod_competencia, juicio),
+    CONSTRAINT fk_juicio_ficha FOREIGN KEY (cod_ficha) REFERENCES grupo(cod_ficha),
+    CONSTRAINT fk_juicio_competencia FOREIGN KEY (cod_competencia) REFERENCES competencia(cod_competencia),
+    CONSTRAINT fk_juicio_resultado FOREIGN KEY (cod_resultado) REFERENCES resultado_aprendizaje(cod_resultado)
+);
+
+-- Table for File Import History (Historial de cargas de archivos)
+CREATE TABLE IF NOT EXISTS import_run (
+    id_import INT AUTO_INCREMENT PRIMARY KEY,
+    tipo_reporte VARCHAR(20) NOT NULL,
+    hash_sha256 CHAR(64) NOT NULL,
+    nombre_archivo VARCHAR(255),
+    tamano_bytes BIGINT,
+    estado VARCHAR(30) NOT NULL,
+    filas_procesadas INT DEFAULT 0,
+    num_errores INT DEFAULT 0,
+    duracion_segundos DECIMAL(10,3),
+    resultado JSON,
+    fecha_inicio DATETIME DEFAULT CURRENT_TIMESTAMP,
+    fecha_fin DATETIME,
+    KEY idx_import_tipo_hash (tipo_reporte, hash_sha256, estado),
+    KEY idx_import_fecha (fecha_inicio)
+);
+
 -- Table for Goals (Metas)
 CREATE TABLE IF NOT EXISTS metas(
     id_meta INT AUTO_INCREMENT PRIMARY KEY,